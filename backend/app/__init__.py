@@ -1,5 +1,5 @@
 from flask import Flask
-from backend.app.db import db
+from app.db import db
 from flask_cors import CORS
 
 
@@ -18,13 +18,50 @@ def create_app(config: dict | None = None):
     if config:
         app.config.update(config)
 
+    # Pool options must be in the config before the primary engine is created
+    from app import routing
+    routing.configure(app)
     db.init_app(app)
-    CORS(app)
+    routing.init_app(app)
+    from app.json_provider import FastJSONProvider
+    app.json = FastJSONProvider(app)
+    from app import compression
+    compression.init_app(app)
+    from app import metrics
+    metrics.init_app(app)
+    # Expose pagination and cache validator headers to the browser client
+    CORS(app, expose_headers=["X-Next-After", "ETag", "Last-Modified"])
+
+    from app import refcache
+    refcache.init_app(app)
+    from app import sourcing
+    sourcing.init_app(app)
+    from app import cost_rollup
+    cost_rollup.init_app(app)
+    from app import conditional
+    conditional.init_app(app)
+    from app import exports
+    exports.init_app(app)
+
+    # Attach the item search and spec attribute DDL to the items table before any create_all()
+    from app import search  # noqa: F401
+    from app import item_spec  # noqa: F401
 
     # Register blueprints (import after init_app to avoid import cycles)
     from app.routes.catalog import catalog_bp
     app.register_blueprint(catalog_bp)
     from app.routes.procurement import procurement_bp
     app.register_blueprint(procurement_bp)
+    from app.routes.mrp import mrp_bp
+    app.register_blueprint(mrp_bp)
+    from app.routes.stock import stock_bp
+    app.register_blueprint(stock_bp)
+    from app.routes.exports import exports_bp
+    app.register_blueprint(exports_bp)
+    from app.routes.system import system_bp
+    app.register_blueprint(system_bp)
+
+    from app import cli
+    cli.register(app)
 
     return app
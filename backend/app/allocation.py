@@ -0,0 +1,279 @@
+"""Lot and shade aware allocation of stock to a cutting order.
+
+Every panel of a garment has to be cut from the same dye lot, and panels
+that match each other (components whose BOM lines share a
+``color_match_rule``) from lots of the same shade. :func:`allocate` turns
+a BOM explosion for N garments into a reservation plan that respects
+this:
+
+- the components of one rule form a group that gets a single shade, the
+  one covering the most garments with the fewest lots and locations (or
+  the shade requested for the order);
+- each lot of a matched component covers whole garments, so no garment
+  mixes two lots of the same fabric; stock without a lot code is never
+  used for them;
+- components without a rule take any stock.
+
+Within those constraints lots are picked greedily: the smallest single
+lot that covers what is still needed, else the largest one and repeat;
+within a lot the biggest bins go first, which minimises the lots and
+locations touched.
+
+The shade of a lot is the ``shade_request`` of the purchase order lines
+that asked for it (``PoLine.lot_request``); lots never requested that way
+have no known shade and only match other lots without one. Stock in WIP
+and shipping locations is not allocated.
+
+The plan is advisory: nothing is reserved in the database, so two plans
+computed concurrently may count the same stock.
+"""
+from __future__ import annotations
+
+from collections import defaultdict
+from decimal import Decimal
+from typing import Iterable
+
+from app.bom_explosion import Explosion
+from app.db import db
+from app.models import Location, PoLine, StockOnHand
+
+# Location types whose stock is already committed elsewhere.
+UNPICKABLE = ("WIP", "SHIPPING")
+
+
+class Lot:
+    """Available quantity of one lot of one item, per location."""
+
+    __slots__ = ("code", "shade", "qty", "bins")
+
+    def __init__(self, code: str, shade: str | None):
+        self.code = code
+        self.shade = shade
+        self.qty = Decimal(0)
+        self.bins: list[tuple[int, Decimal]] = []
+
+    def take(self, qty: Decimal) -> list[tuple[int, Decimal]]:
+        """Split ``qty`` over the bins of the lot, biggest bins first."""
+        out = []
+        for location_id, available in self.bins:
+            if qty <= 0:
+                break
+            taken = min(available, qty)
+            out.append((location_id, taken))
+            qty -= taken
+        return out
+
+
+class LotIndex:
+    """Available lots per item, loaded in one query.
+
+    Attributes:
+        lots: item id -> list of :class:`Lot`, bins sorted biggest first.
+    """
+
+    def __init__(self, lots: dict[int, list[Lot]]):
+        self.lots = lots
+
+    @classmethod
+    def build(cls, item_ids: Iterable[int], warehouse_id: int | None = None) -> "LotIndex":
+        """Load the positive balances of ``item_ids`` with the shade of their lot.
+
+        Args:
+            item_ids: items to index.
+            warehouse_id: only stock in this warehouse when given.
+        """
+        item_ids = sorted(set(item_ids))
+        if not item_ids:
+            return cls({})
+        soh = StockOnHand
+        shades = (
+            db.select(PoLine.item_id, PoLine.lot_request.label("lot_code"),
+                      db.func.max(PoLine.shade_request).label("shade"))
+            .where(PoLine.item_id.in_(item_ids), PoLine.lot_request.is_not(None),
+                   PoLine.shade_request.is_not(None))
+            .group_by(PoLine.item_id, PoLine.lot_request)
+            .subquery("shades")
+        )
+        stmt = (
+            db.select(soh.item_id, soh.lot_code, soh.location_id, soh.qty, shades.c.shade)
+            .join(Location, Location.id == soh.location_id)
+            .outerjoin(shades, db.and_(shades.c.item_id == soh.item_id, shades.c.lot_code == soh.lot_code))
+            .where(soh.item_id.in_(item_ids), soh.qty > 0,
+                   db.func.coalesce(Location.type, "").not_in(UNPICKABLE))
+        )
+        if warehouse_id is not None:
+            stmt = stmt.where(Location.warehouse_id == warehouse_id)
+
+        by_key: dict[tuple, Lot] = {}
+        lots: dict[int, list[Lot]] = defaultdict(list)
+        for item_id, lot_code, location_id, qty, shade in db.session.execute(stmt):
+            lot = by_key.get((item_id, lot_code or ""))
+            if lot is None:
+                lot = by_key[(item_id, lot_code or "")] = Lot(lot_code or "", shade)
+                lots[item_id].append(lot)
+            lot.qty += qty
+            lot.bins.append((location_id, qty))
+        for lot in by_key.values():
+            lot.bins.sort(key=lambda b: (-b[1], b[0]))
+        return cls(dict(lots))
+
+    def matchable(self, item_id: int) -> list[Lot]:
+        """Lots of ``item_id`` that have a lot code."""
+        return [lot for lot in self.lots.get(item_id, ()) if lot.code]
+
+
+def _pick(lots: list[Lot], need, per_unit: Decimal | None = None) -> tuple:
+    """Choose lots to cover ``need``, fewest lots first.
+
+    Args:
+        lots: candidate lots.
+        need: garments to cover when ``per_unit`` is given (each lot then
+            covers whole garments of ``per_unit`` each), else a quantity.
+
+    Returns:
+        ``(covered, [(lot, qty), ...])`` where ``covered`` is in the unit
+        of ``need``.
+    """
+    def capacity(lot):
+        return int(lot.qty // per_unit) if per_unit else lot.qty
+
+    def qty_of(units):
+        return units * per_unit if per_unit else units
+
+    available = [lot for lot in lots if capacity(lot) > 0]
+    picks = []
+    covered = 0
+    while covered < need and available:
+        rest = need - covered
+        fits = [lot for lot in available if capacity(lot) >= rest]
+        if fits:
+            lot = min(fits, key=lambda lot: (len(lot.take(qty_of(rest))), lot.qty, lot.code))
+        else:
+            lot = max(available, key=lambda lot: (capacity(lot), -len(lot.bins), lot.code))
+        units = min(capacity(lot), rest)
+        picks.append((lot, qty_of(units)))
+        covered += units
+        available.remove(lot)
+    return covered, picks
+
+
+def _locations(picks: Iterable[tuple[Lot, Decimal]]) -> set[int]:
+    return {location_id for lot, qty in picks for location_id, _ in lot.take(qty)}
+
+
+def _allocate_group(items: list[tuple[int, Decimal]], garments: int, index: LotIndex,
+                    shade: str | None) -> tuple:
+    """Pick one shade and the lots of every item of a colour-match group.
+
+    Returns:
+        ``(shade, garments covered, {item_id: picks})``.
+    """
+    if shade is not None:
+        candidates = {shade}
+    else:
+        candidates = {lot.shade for item_id, _ in items for lot in index.matchable(item_id)}
+    best = None
+    for candidate in candidates:
+        lots = {
+            item_id: [lot for lot in index.matchable(item_id) if lot.shade == candidate]
+            for item_id, _ in items
+        }
+        covered = garments
+        for item_id, per_garment in items:
+            covered = min(covered, _pick(lots[item_id], covered, per_garment)[0])
+        picks = {item_id: _pick(lots[item_id], covered, per_garment)[1] for item_id, per_garment in items}
+        every_pick = [p for item_picks in picks.values() for p in item_picks]
+        key = (-covered, len(every_pick), len(_locations(every_pick)), candidate is None, candidate or "")
+        if best is None or key < best[0]:
+            best = (key, candidate, covered, picks)
+    if best is None:
+        return shade, 0, {}
+    return best[1:]
+
+
+class Plan:
+    """Reservation plan returned by :func:`allocate`."""
+
+    def __init__(self, bom_id: int, garments: int, shade: str | None, components: list[dict],
+                 groups: list[dict]):
+        self.bom_id = bom_id
+        self.garments = garments
+        self.shade = shade
+        self.components = components
+        self.groups = groups
+
+    @property
+    def complete(self) -> bool:
+        return all(c["short"] == 0 for c in self.components)
+
+    def to_dict(self) -> dict:
+        picks = [p for c in self.components for p in c["picks"]]
+        return {
+            "bom_id": self.bom_id,
+            "qty": self.garments,
+            "shade": self.shade,
+            "complete": self.complete,
+            "lots": len({(c["item_id"], p["lot_code"]) for c in self.components for p in c["picks"]}),
+            "locations": len({p["location_id"] for p in picks}),
+            "groups": self.groups,
+            "components": self.components,
+        }
+
+
+def allocate(explosion: Explosion, shade: str | None = None, warehouse_id: int | None = None,
+             index: LotIndex | None = None) -> Plan:
+    """Allocate on-hand lots to the purchased components of ``explosion``.
+
+    Args:
+        explosion: explosion of the garment BOM for a whole number of garments.
+        shade: shade every colour-matched group must use; by default each
+            group picks the shade that covers most garments.
+        warehouse_id: only allocate stock of this warehouse.
+        index: lot index to reuse; built from ``explosion`` when omitted.
+    """
+    garments = int(explosion.qty)
+    required = {i: q for i, q in explosion.components().items() if q > 0}
+    if index is None:
+        index = LotIndex.build(required, warehouse_id)
+
+    picks: dict[int, list[tuple[Lot, Decimal]]] = {}
+    shades: dict[int, str | None] = {}
+    groups: dict[str, list[tuple[int, Decimal]]] = defaultdict(list)
+    for item_id in sorted(required):
+        rule = explosion.rules.get(item_id)
+        if rule:
+            groups[rule].append((item_id, required[item_id] / garments))
+        else:
+            picks[item_id] = _pick(index.lots.get(item_id, []), required[item_id])[1]
+    group_out = []
+    for rule in sorted(groups):
+        group_shade, covered, group_picks = _allocate_group(groups[rule], garments, index, shade)
+        picks.update(group_picks)
+        for item_id, _ in groups[rule]:
+            shades[item_id] = group_shade
+        group_out.append({
+            "color_match_rule": rule, "shade": group_shade, "garments": covered,
+            "item_ids": [item_id for item_id, _ in groups[rule]],
+        })
+
+    components = []
+    for item_id in sorted(required):
+        item_picks = picks.get(item_id, [])
+        allocated = sum((qty for _, qty in item_picks), Decimal(0))
+        entry = {
+            "item_id": item_id,
+            "uom_id": explosion.uoms.get(item_id),
+            "color_match_rule": explosion.rules.get(item_id),
+            "required": required[item_id],
+            "allocated": allocated,
+            "short": max(required[item_id] - allocated, Decimal(0)),
+            "picks": [
+                {"lot_code": lot.code, "shade": lot.shade, "location_id": location_id, "qty": qty}
+                for lot, lot_qty in item_picks
+                for location_id, qty in lot.take(lot_qty)
+            ],
+        }
+        if item_id in shades:
+            entry["shade"] = shades[item_id]
+        components.append(entry)
+    return Plan(explosion.bom_id, garments, shade, components, group_out)
@@ -0,0 +1,260 @@
+"""BOM closure table for where-used lookups.
+
+``bom_closure`` holds one row per ``(ancestor, descendant, depth)``: every
+item reachable below a product item through its BOM lines, how many BOM
+paths of that depth lead there and their summed scrap-adjusted quantity
+per ancestor unit. "Which products use this fabric, at any depth" is then
+one range read of ``ix_bom_closure_descendant_id_depth`` instead of a
+recursive walk.
+
+The structure of a product item is the latest version of its BOMs (the
+highest ``(version, id)``, whatever the effective dates), optional lines
+included. :func:`refresh` re-derives one product after its BOMs change
+and applies the difference to the product and to every ancestor of it
+with additive ``paths``/``qty`` upserts, so the cost is proportional to
+the part of the closure that changes. :func:`rebuild` recomputes the whole
+table from ``bom_lines``.
+"""
+from __future__ import annotations
+
+from collections import defaultdict, deque
+from decimal import Decimal
+from typing import Iterable
+
+from app.bom_explosion import BomCycleError, effective_qty
+from app.db import db
+from app.models import Bom, BomClosure, BomLine, Item
+
+# Rows per INSERT when rebuilding.
+BATCH = 5000
+
+# Scale of bom_closure.qty; computed quantities are rounded to it so they
+# compare equal to the stored ones.
+_QTY = Decimal("0.000001")
+
+
+def latest_lines(product_ids: Iterable[int] | None = None) -> dict[int, dict[int, Decimal]]:
+    """Return ``{product: {component: qty}}`` of the latest BOM of each product.
+
+    Args:
+        product_ids: products to read; every product when None.
+    """
+    stmt = (
+        db.select(Bom.id, Bom.product_item_id, Bom.version,
+                  BomLine.component_item_id, BomLine.qty_per, BomLine.scrap_pct)
+        .outerjoin(BomLine, BomLine.bom_id == Bom.id)
+    )
+    if product_ids is not None:
+        stmt = stmt.where(Bom.product_item_id.in_(list(product_ids)))
+    latest: dict[int, tuple] = {}
+    lines: dict[int, dict[int, Decimal]] = defaultdict(lambda: defaultdict(Decimal))
+    for bom_id, product_id, version, component_id, qty_per, scrap_pct in db.session.execute(stmt):
+        key = (version or 0, bom_id)
+        if product_id not in latest or key > latest[product_id]:
+            latest[product_id] = key
+        if component_id is not None:
+            lines[bom_id][component_id] += effective_qty(qty_per, scrap_pct)
+    return {product_id: dict(lines.get(key[1], {})) for product_id, key in latest.items()}
+
+
+def _below(ancestor_ids: Iterable[int]) -> dict[int, dict[tuple[int, int], tuple[int, Decimal]]]:
+    """Return the stored closure of ``ancestor_ids``: ``{ancestor: {(descendant, depth): (paths, qty)}}``."""
+    c = BomClosure
+    out: dict[int, dict] = defaultdict(dict)
+    ancestor_ids = list(ancestor_ids)
+    if not ancestor_ids:
+        return out
+    rows = db.session.execute(
+        db.select(c.ancestor_id, c.descendant_id, c.depth, c.paths, c.qty)
+        .where(c.ancestor_id.in_(ancestor_ids))
+    )
+    for ancestor_id, descendant_id, depth, paths, qty in rows:
+        out[ancestor_id][(descendant_id, depth)] = (paths, Decimal(qty))
+    return out
+
+
+def _expand(children: dict[int, Decimal], below: dict[int, dict]) -> dict[tuple[int, int], list]:
+    """Closure of a product from its direct lines and the closures of its components."""
+    rows: dict[tuple[int, int], list] = {}
+    for child, qty in children.items():
+        row = rows.setdefault((child, 1), [0, Decimal(0)])
+        row[0] += 1
+        row[1] += qty
+        for (descendant, depth), (paths, sub_qty) in below.get(child, {}).items():
+            row = rows.setdefault((descendant, depth + 1), [0, Decimal(0)])
+            row[0] += paths
+            row[1] += qty * sub_qty
+    for row in rows.values():
+        row[1] = row[1].quantize(_QTY)
+    return rows
+
+
+def _lock(item_ids: Iterable[int], read: bool = False) -> None:
+    """Lock item rows on PostgreSQL so overlapping refreshes run one after the other."""
+    item_ids = sorted(set(item_ids))
+    if item_ids and db.session.get_bind().dialect.name == "postgresql":
+        db.session.execute(
+            db.select(Item.id).where(Item.id.in_(item_ids)).order_by(Item.id).with_for_update(read=read)
+        )
+
+
+def _apply(deltas: dict[tuple[int, int, int], list]) -> None:
+    """Add ``(paths, qty)`` deltas to closure rows, then drop rows left without paths."""
+    table = BomClosure.__table__
+    rows = [
+        {"ancestor_id": a, "descendant_id": d, "depth": depth, "paths": deltas[(a, d, depth)][0],
+         "qty": deltas[(a, d, depth)][1]}
+        for a, d, depth in sorted(deltas)
+    ]
+    if not rows:
+        return
+    dialect = db.session.get_bind().dialect.name
+    if dialect in ("postgresql", "sqlite"):
+        if dialect == "postgresql":
+            from sqlalchemy.dialects.postgresql import insert
+        else:
+            from sqlalchemy.dialects.sqlite import insert
+        stmt = insert(table)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[table.c.ancestor_id, table.c.descendant_id, table.c.depth],
+            set_={"paths": table.c.paths + stmt.excluded.paths, "qty": table.c.qty + stmt.excluded.qty},
+        )
+        db.session.execute(stmt, rows)
+    else:
+        for row in rows:
+            result = db.session.execute(
+                db.update(table)
+                .where(table.c.ancestor_id == row["ancestor_id"], table.c.descendant_id == row["descendant_id"],
+                       table.c.depth == row["depth"])
+                .values(paths=table.c.paths + row["paths"], qty=table.c.qty + row["qty"])
+            )
+            if result.rowcount == 0:
+                db.session.execute(db.insert(table), [row])
+    db.session.execute(
+        db.delete(table).where(table.c.ancestor_id.in_({a for a, _, _ in deltas}), table.c.paths <= 0)
+    )
+
+
+def refresh(item_id: int) -> int:
+    """Bring the closure in line with the current BOMs of product ``item_id``.
+
+    Call in the transaction that created or edited a BOM of ``item_id``,
+    after its lines are flushed.
+
+    Returns:
+        The number of closure rows changed.
+
+    Raises:
+        BomCycleError: if the new structure contains ``item_id`` itself.
+    """
+    _lock([item_id])
+    children = latest_lines([item_id]).get(item_id, {})
+    if item_id in children:
+        raise BomCycleError([item_id])
+    _lock(children, read=True)
+    below = _below([item_id, *children])
+    new = _expand(children, below)
+    if any(descendant == item_id for descendant, _ in new):
+        raise BomCycleError([item_id, *(c for c in children if any(d == item_id for d, _ in below.get(c, {})))])
+    old = below.get(item_id, {})
+    delta = {}
+    for key in new.keys() | old.keys():
+        paths, qty = new.get(key, (0, Decimal(0)))
+        old_paths, old_qty = old.get(key, (0, Decimal(0)))
+        if paths != old_paths or qty != old_qty:
+            delta[key] = (paths - old_paths, qty - old_qty)
+    if not delta:
+        return 0
+
+    c = BomClosure
+    ancestors = db.session.execute(
+        db.select(c.ancestor_id, c.depth, c.paths, c.qty).where(c.descendant_id == item_id)
+    ).all()
+    _lock(a for a, _, _, _ in ancestors)
+    rows: dict[tuple[int, int, int], list] = {}
+    for (descendant, depth), (paths, qty) in delta.items():
+        rows[(item_id, descendant, depth)] = [paths, qty]
+    for ancestor_id, up_depth, up_paths, up_qty in ancestors:
+        up_qty = Decimal(up_qty)
+        for (descendant, depth), (paths, qty) in delta.items():
+            row = rows.setdefault((ancestor_id, descendant, up_depth + depth), [0, Decimal(0)])
+            row[0] += up_paths * paths
+            row[1] += (up_qty * qty).quantize(_QTY)
+    _apply(rows)
+    return len(rows)
+
+
+def rebuild() -> int:
+    """Recompute the whole closure from the latest BOM of every product.
+
+    Products are expanded in topological order (components first), each
+    once, and the table is replaced in one transaction.
+
+    Returns:
+        The number of closure rows written.
+
+    Raises:
+        BomCycleError: if the BOM structures contain a cycle.
+    """
+    lines = latest_lines()
+    # Kahn's algorithm over product -> sub-assembly edges, components first.
+    waiting = {p: sum(1 for c in children if c in lines) for p, children in lines.items()}
+    parents: dict[int, list[int]] = defaultdict(list)
+    for product, children in lines.items():
+        for child in children:
+            if child in lines:
+                parents[child].append(product)
+    ready = deque(sorted(p for p, n in waiting.items() if n == 0))
+    closure: dict[int, dict] = {}
+    while ready:
+        product = ready.popleft()
+        closure[product] = {k: tuple(v) for k, v in _expand(lines[product], closure).items()}
+        for parent in parents[product]:
+            waiting[parent] -= 1
+            if waiting[parent] == 0:
+                ready.append(parent)
+    if len(closure) < len(lines):
+        raise BomCycleError(p for p in lines if p not in closure)
+
+    table = BomClosure.__table__
+    db.session.execute(db.delete(table))
+    batch, written = [], 0
+    for ancestor_id in sorted(closure):
+        for (descendant_id, depth), (paths, qty) in sorted(closure[ancestor_id].items()):
+            batch.append({"ancestor_id": ancestor_id, "descendant_id": descendant_id, "depth": depth,
+                          "paths": paths, "qty": qty})
+            if len(batch) == BATCH:
+                db.session.execute(db.insert(table), batch)
+                written += len(batch)
+                batch = []
+    if batch:
+        db.session.execute(db.insert(table), batch)
+        written += len(batch)
+    db.session.commit()
+    return written
+
+
+def where_used(item_id: int, max_depth: int | None = None) -> list[tuple[int, int, Decimal]]:
+    """Return the products that contain ``item_id``, nearest first.
+
+    Args:
+        item_id: component item.
+        max_depth: only look this many BOM levels up (1 = direct parents).
+
+    Returns:
+        ``[(product_item_id, depth, qty), ...]`` where ``depth`` is the
+        shallowest level the item appears at and ``qty`` the total
+        scrap-adjusted quantity per product unit over all paths within
+        ``max_depth``.
+    """
+    c = BomClosure
+    depth = db.func.min(c.depth)
+    stmt = (
+        db.select(c.ancestor_id, depth, db.func.sum(c.qty, type_=c.qty.type))
+        .where(c.descendant_id == item_id)
+        .group_by(c.ancestor_id)
+        .order_by(depth, c.ancestor_id)
+    )
+    if max_depth is not None:
+        stmt = stmt.where(c.depth <= max_depth)
+    return [tuple(row) for row in db.session.execute(stmt)]
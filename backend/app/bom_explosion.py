@@ -0,0 +1,243 @@
+"""Multi-level BOM explosion.
+
+:class:`BomGraph` loads every BOM reachable from a set of roots in a
+constant number of queries (a recursive CTE finds the reachable product
+items, one more query fetches their BOM lines) and picks the BOM version
+in effect for each product item. :meth:`BomGraph.explode` then propagates
+quantities down the graph in topological order, so each sub-assembly is
+expanded exactly once per run however many parents use it. A graph that
+cannot be ordered contains a cycle and raises :class:`BomCycleError`.
+
+Line quantities are scrap adjusted: ``qty_per * (1 + scrap_pct / 100)``,
+multiplied level by level.
+"""
+from __future__ import annotations
+
+from collections import defaultdict, deque
+from datetime import date
+from decimal import Decimal
+from typing import Iterable, NamedTuple
+
+from app.db import db
+from app.models import Bom, BomLine
+
+_HUNDRED = Decimal(100)
+
+
+class BomCycleError(ValueError):
+    """Raised when a BOM structure references itself."""
+
+    def __init__(self, item_ids: Iterable[int]):
+        self.item_ids = sorted(item_ids)
+        super().__init__(f"BOM cycle detected between items {self.item_ids}")
+
+
+class Line(NamedTuple):
+    """A BOM line reduced to what explosion needs."""
+
+    component_item_id: int
+    qty: Decimal
+    uom_id: int | None
+    is_optional: bool
+    color_match_rule: str | None
+
+
+def effective_qty(qty_per, scrap_pct) -> Decimal:
+    """Return the scrap-adjusted quantity of one BOM line."""
+    qty = Decimal(str(qty_per))
+    if scrap_pct:
+        qty *= 1 + Decimal(str(scrap_pct)) / _HUNDRED
+    return qty
+
+
+def _in_effect(effective_from, effective_to, on: date) -> bool:
+    return (effective_from is None or effective_from <= on) and (
+        effective_to is None or effective_to >= on
+    )
+
+
+class BomGraph:
+    """BOM structures keyed by product item, as in effect on one date.
+
+    Attributes:
+        bom_for_item: product item id -> id of the BOM in effect.
+        lines: BOM id -> list of :class:`Line`.
+        product_of: BOM id -> product item id.
+    """
+
+    def __init__(self, bom_for_item: dict[int, int], lines: dict[int, list[Line]],
+                 product_of: dict[int, int]):
+        self.bom_for_item = bom_for_item
+        self.lines = lines
+        self.product_of = product_of
+
+    @classmethod
+    def load(cls, bom_ids: Iterable[int] = (), item_ids: Iterable[int] = (),
+             on: date | None = None) -> "BomGraph":
+        """Load the BOM graph reachable from the given roots in two queries.
+
+        Args:
+            bom_ids: root BOMs (loaded whatever their effective dates).
+            item_ids: root product items (their BOM in effect is used).
+            on: date used to pick the BOM version of each product item.
+        """
+        on = on or date.today()
+        bom_ids = list(bom_ids)
+        item_ids = list(item_ids)
+
+        seeds = []
+        if bom_ids:
+            seeds.append(db.select(Bom.product_item_id.label("item_id")).where(Bom.id.in_(bom_ids)))
+            seeds.append(
+                db.select(BomLine.component_item_id.label("item_id"))
+                .where(BomLine.bom_id.in_(bom_ids))
+            )
+        if item_ids:
+            seeds.append(
+                db.select(Bom.product_item_id.label("item_id"))
+                .where(Bom.product_item_id.in_(item_ids))
+            )
+        if not seeds:
+            return cls({}, {}, {})
+        seed = db.union(*seeds).subquery("seed") if len(seeds) > 1 else seeds[0].subquery("seed")
+        reachable = db.select(seed.c.item_id).cte("reachable", recursive=True)
+        reachable = reachable.union(
+            db.select(BomLine.component_item_id)
+            .join(Bom, Bom.id == BomLine.bom_id)
+            .join(reachable, Bom.product_item_id == reachable.c.item_id)
+        )
+        reachable_items = db.select(reachable.c.item_id)
+
+        rows = db.session.execute(
+            db.select(
+                Bom.id, Bom.product_item_id, Bom.version, Bom.effective_from, Bom.effective_to,
+                BomLine.component_item_id, BomLine.qty_per, BomLine.scrap_pct, BomLine.uom_id,
+                BomLine.is_optional, BomLine.color_match_rule,
+            )
+            .outerjoin(BomLine, BomLine.bom_id == Bom.id)
+            .where(db.or_(Bom.product_item_id.in_(reachable_items), Bom.id.in_(bom_ids)))
+            .order_by(Bom.id, BomLine.id)
+        ).all()
+
+        lines: dict[int, list[Line]] = defaultdict(list)
+        product_of: dict[int, int] = {}
+        best: dict[int, tuple] = {}
+        for (bom_id, product_id, version, eff_from, eff_to,
+             component_id, qty_per, scrap_pct, uom_id, is_optional, rule) in rows:
+            if bom_id not in product_of:
+                product_of[bom_id] = product_id
+                if _in_effect(eff_from, eff_to, on):
+                    key = (version or 0, bom_id)
+                    if product_id not in best or key > best[product_id]:
+                        best[product_id] = key
+            if component_id is not None:
+                lines[bom_id].append(Line(
+                    component_id, effective_qty(qty_per, scrap_pct), uom_id,
+                    bool(is_optional), rule,
+                ))
+        bom_for_item = {item_id: key[1] for item_id, key in best.items()}
+        return cls(bom_for_item, dict(lines), product_of)
+
+    def explode(self, bom_id: int, qty=1, include_optional: bool = False) -> "Explosion":
+        """Return the gross requirement of every item below ``bom_id``.
+
+        Args:
+            bom_id: root BOM.
+            qty: number of parent units to build.
+            include_optional: whether ``is_optional`` lines are expanded.
+
+        Raises:
+            BomCycleError: if a sub-assembly (directly or not) contains itself.
+        """
+        def children(bom):
+            for line in self.lines.get(bom, ()):
+                if include_optional or not line.is_optional:
+                    yield line
+
+        # Collect the reachable sub-graph and count, for every node, the
+        # sub-assembly lines (not root lines) that point at it.
+        root_lines = list(children(bom_id))
+        remaining: dict[int, int] = defaultdict(int)
+        seen = set()
+        stack = [line.component_item_id for line in root_lines]
+        while stack:
+            item_id = stack.pop()
+            if item_id in seen:
+                continue
+            seen.add(item_id)
+            sub_bom = self.bom_for_item.get(item_id)
+            if sub_bom is None:
+                continue
+            for line in children(sub_bom):
+                remaining[line.component_item_id] += 1
+                stack.append(line.component_item_id)
+
+        # Kahn's algorithm: every node is expanded once, after all its parents.
+        gross: dict[int, Decimal] = defaultdict(Decimal)
+        uoms: dict[int, int | None] = {}
+        rules: dict[int, str] = {}
+        qty = Decimal(str(qty))
+        for line in root_lines:
+            gross[line.component_item_id] += qty * line.qty
+            uoms.setdefault(line.component_item_id, line.uom_id)
+            if line.color_match_rule:
+                rules.setdefault(line.component_item_id, line.color_match_rule)
+        ready = deque(i for i in seen if remaining[i] == 0)
+        processed = 0
+        while ready:
+            item_id = ready.popleft()
+            processed += 1
+            sub_bom = self.bom_for_item.get(item_id)
+            if sub_bom is None:
+                continue
+            parent_qty = gross[item_id]
+            for line in children(sub_bom):
+                child = line.component_item_id
+                gross[child] += parent_qty * line.qty
+                uoms.setdefault(child, line.uom_id)
+                if line.color_match_rule:
+                    rules.setdefault(child, line.color_match_rule)
+                remaining[child] -= 1
+                if remaining[child] == 0:
+                    ready.append(child)
+        if processed < len(seen):
+            raise BomCycleError(i for i in seen if remaining[i] > 0)
+        subassemblies = {i for i in seen if i in self.bom_for_item}
+        return Explosion(bom_id, qty, dict(gross), uoms, subassemblies, rules)
+
+
+class Explosion:
+    """Result of :meth:`BomGraph.explode`.
+
+    ``rules`` maps each item to the ``color_match_rule`` of the first line
+    using it that has one; items on unruled lines only are left out.
+    """
+
+    def __init__(self, bom_id: int, qty: Decimal, gross: dict[int, Decimal],
+                 uoms: dict[int, int | None], subassemblies: set[int],
+                 rules: dict[int, str] | None = None):
+        self.bom_id = bom_id
+        self.qty = qty
+        self.gross = gross
+        self.uoms = uoms
+        self.subassemblies = subassemblies
+        self.rules = rules or {}
+
+    def components(self) -> dict[int, Decimal]:
+        """Requirements of purchased (leaf) items, aggregated per item."""
+        return {i: q for i, q in self.gross.items() if i not in self.subassemblies}
+
+    def to_dict(self) -> dict:
+        def entries(ids):
+            return [
+                {"item_id": i, "qty": self.gross[i], "uom_id": self.uoms.get(i)}
+                for i in sorted(ids)
+            ]
+
+        leaves = [i for i in self.gross if i not in self.subassemblies]
+        return {
+            "bom_id": self.bom_id,
+            "qty": self.qty,
+            "components": entries(leaves),
+            "subassemblies": entries(self.subassemblies),
+        }
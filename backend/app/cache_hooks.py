@@ -0,0 +1,47 @@
+"""Session hooks shared by the in-process caches.
+
+The caches in ``app.extensions`` (reference data, sourcing index, BOM
+cost rollup) are invalidated the same way: each flush records what it
+touched in a set kept in ``session.info``, the set is applied to the
+cache once the transaction commits and thrown away on rollback, so a
+cache never drops (or reloads) entries for writes that did not happen.
+:func:`track` registers those three listeners for one cache.
+"""
+from __future__ import annotations
+
+from typing import Callable
+
+from flask import has_app_context
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+
+def pending(session: Session, session_key: str) -> set:
+    """Return the set of changes recorded under ``session_key`` in this transaction."""
+    return session.info.setdefault(session_key, set())
+
+
+def track(session_key: str, collect: Callable[[Session, set], None],
+          on_commit: Callable[[set], None]) -> None:
+    """Record changes on every flush and apply them when the transaction commits.
+
+    Args:
+        session_key: ``session.info`` key holding the recorded changes.
+        collect: called after each flush with the session and the set to
+            add the changes of that flush to.
+        on_commit: called after a commit with the non-empty set of
+            changes, inside an application context.
+    """
+    @event.listens_for(Session, "after_flush")
+    def _collect(session, flush_context):
+        collect(session, pending(session, session_key))
+
+    @event.listens_for(Session, "after_commit")
+    def _apply(session):
+        changed = session.info.pop(session_key, None)
+        if changed and has_app_context():
+            on_commit(changed)
+
+    @event.listens_for(Session, "after_rollback")
+    def _discard(session):
+        session.info.pop(session_key, None)
@@ -0,0 +1,154 @@
+"""Flask CLI commands.
+
+Run from ``backend/`` with ``flask --app app:create_app <command>``.
+"""
+import csv
+import json
+
+import click
+from flask.cli import with_appcontext
+
+
+@click.command("mrp-run")
+@with_appcontext
+@click.argument("demand_file", type=click.File("r"))
+@click.option("--today", help="Planning date (ISO); defaults to today.")
+@click.option("--output", type=click.File("w"), default="-", help="Where to write the JSON result.")
+def mrp_run(demand_file, today, output):
+    """Run MRP over DEMAND_FILE (JSON list or CSV with item_id,qty,due_date)."""
+    from datetime import date
+    from flask import current_app
+    from app import mrp
+    from app.bom_explosion import BomCycleError
+
+    if demand_file.name.endswith(".csv"):
+        records = list(csv.DictReader(demand_file))
+    else:
+        records = json.load(demand_file)
+        if isinstance(records, dict):
+            records = records.get("demand")
+    try:
+        demand = mrp.parse_demand(records)
+    except ValueError as e:
+        raise click.BadParameter(str(e), param_hint="DEMAND_FILE")
+    try:
+        today = date.fromisoformat(today) if today else None
+    except ValueError as e:
+        raise click.BadParameter(str(e), param_hint="--today")
+    run = mrp.MrpRun(demand, current_app.config["MRP_CLOSED_PO_STATUSES"], today=today)
+    try:
+        result = run.run()
+    except BomCycleError as e:
+        raise click.ClickException(str(e))
+    output.write(current_app.json.dumps(result, indent=2))
+    output.write("\n")
+
+
+@click.command("stock-checkpoint")
+@with_appcontext
+@click.option("--as-of", help="Checkpoint instant (ISO date = end of that day); defaults to today's start.")
+@click.option("--rebuild-stale", is_flag=True, help="Also rebuild every stale checkpoint first.")
+def stock_checkpoint(as_of, rebuild_stale):
+    """Build a stock balance checkpoint (run periodically, e.g. nightly)."""
+    from datetime import date, datetime, time, timedelta
+    from flask import current_app
+    from app import stock_checkpoints
+    from app.stock import naive_utc
+
+    chunk = current_app.config["STOCK_CHECKPOINT_CHUNK_ITEMS"]
+    if rebuild_stale:
+        for checkpoint in stock_checkpoints.rebuild_stale(chunk):
+            click.echo(f"rebuilt {checkpoint.as_of.isoformat()} {checkpoint.status}")
+    try:
+        if as_of is None:
+            at = datetime.combine(date.today(), time.min)
+        elif "T" in as_of or " " in as_of:
+            at = naive_utc(datetime.fromisoformat(as_of))
+        else:
+            at = datetime.combine(date.fromisoformat(as_of) + timedelta(days=1), time.min)
+    except (ValueError, OverflowError) as e:
+        raise click.BadParameter(str(e), param_hint="--as-of")
+    try:
+        checkpoint = stock_checkpoints.build_checkpoint(at, chunk)
+    except stock_checkpoints.CheckpointError as e:
+        raise click.BadParameter(str(e), param_hint="--as-of")
+    click.echo(f"checkpoint {checkpoint.id} at {checkpoint.as_of.isoformat()} {checkpoint.status}")
+
+
+@click.command("stock-availability-rebuild")
+@with_appcontext
+@click.option("--chunk-items", type=int, help="Item ids per committed chunk "
+              "(default STOCK_AVAILABILITY_CHUNK_ITEMS).")
+def stock_availability_rebuild(chunk_items):
+    """Recompute the stock availability rollup from the on-hand balances."""
+    from flask import current_app
+    from app import stock_availability
+
+    chunk = chunk_items or current_app.config["STOCK_AVAILABILITY_CHUNK_ITEMS"]
+    if chunk < 1:
+        raise click.BadParameter("must be positive", param_hint="--chunk-items")
+    rows = stock_availability.rebuild(chunk)
+    click.echo(f"stock availability rebuilt: {rows} rows")
+
+
+@click.command("stock-costing-replay")
+@with_appcontext
+@click.option("--chunk-moves", type=int, help="Moves per committed page (default STOCK_COSTING_CHUNK_MOVES).")
+def stock_costing_replay(chunk_moves):
+    """Recompute inventory costs from the whole move ledger (stop postings first)."""
+    from flask import current_app
+    from app import costing
+
+    chunk = chunk_moves or current_app.config["STOCK_COSTING_CHUNK_MOVES"]
+    if chunk < 1:
+        raise click.BadParameter("must be positive", param_hint="--chunk-moves")
+    method = current_app.config["STOCK_COSTING_METHOD"]
+    try:
+        counts = costing.replay(method, chunk)
+    except costing.CostingError as e:
+        raise click.ClickException(str(e))
+    click.echo(f"costed {counts['moves']} moves of {counts['items']} items ({method})")
+
+
+@click.command("bom-closure-rebuild")
+@with_appcontext
+def bom_closure_rebuild():
+    """Recompute the BOM closure table (where-used index) from the BOM lines."""
+    from app import bom_closure
+    from app.bom_explosion import BomCycleError
+
+    try:
+        rows = bom_closure.rebuild()
+    except BomCycleError as e:
+        raise click.ClickException(str(e))
+    click.echo(f"bom closure rebuilt: {rows} rows")
+
+
+@click.command("bom-cost-rollup")
+@with_appcontext
+@click.option("--output", type=click.File("w"), default="-", help="Where to write the JSON result.")
+def bom_cost_rollup(output):
+    """Re-cost every product in one pass, components before the products using them."""
+    from flask import current_app
+    from app import cost_rollup
+    from app.bom_explosion import BomCycleError
+
+    try:
+        costs = cost_rollup.get_rollup().rollup_all()
+    except BomCycleError as e:
+        raise click.ClickException(str(e))
+    output.write(current_app.json.dumps([
+        {"item_id": item_id, "cost": rolled.cost, "missing_prices": sorted(rolled.missing)}
+        for item_id, rolled in sorted(costs.items())
+    ], indent=2))
+    output.write("\n")
+
+
+def register(app) -> None:
+    """Attach the commands to ``app.cli``."""
+    app.cli.add_command(mrp_run)
+    app.cli.add_command(stock_checkpoint)
+    app.cli.add_command(stock_availability_rebuild)
+    app.cli.add_command(stock_costing_replay)
+    app.cli.add_command(bom_closure_rebuild)
+    app.cli.add_command(bom_cost_rollup)
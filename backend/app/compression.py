@@ -0,0 +1,136 @@
+"""In-process response compression.
+
+An ``after_request`` hook compresses JSON, NDJSON, CSV and text
+responses for clients that accept it, so large list payloads leave the
+worker already compressed:
+
+- the encoding is negotiated from ``Accept-Encoding``: ``br`` when the
+  optional ``brotli`` package is installed, otherwise ``gzip``;
+- buffered bodies smaller than ``COMPRESS_MIN_SIZE`` bytes are sent as is;
+- streamed (generator) bodies are compressed chunk by chunk, flushing the
+  encoder every ``COMPRESS_STREAM_FLUSH`` bytes of input so clients keep
+  receiving rows while the stream is produced.
+
+Compressed responses get ``Vary: Accept-Encoding`` and their ETag is made
+weak, since the bytes differ from the identity representation.
+"""
+from __future__ import annotations
+
+import zlib
+from typing import Iterable, Iterator
+
+from flask import current_app, request
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - optional dependency
+    brotli = None
+
+COMPRESSIBLE = {
+    "application/json",
+    "application/x-ndjson",
+    "application/jsonl",
+    "text/csv",
+    "text/plain",
+    "text/html",
+}
+
+
+def _encoding() -> str | None:
+    accepted = request.accept_encodings
+    if brotli is not None and accepted["br"]:
+        return "br"
+    if accepted["gzip"]:
+        return "gzip"
+    return None
+
+
+class _Encoder:
+    """Incremental compressor with a uniform ``compress``/``flush``/``finish`` API."""
+
+    def __init__(self, encoding: str, level: int):
+        self.encoding = encoding
+        if encoding == "br":
+            self._br = brotli.Compressor(quality=min(level, 11))
+        else:
+            self._gz = zlib.compressobj(level, zlib.DEFLATED, 31)
+
+    def compress(self, data: bytes) -> bytes:
+        if self.encoding == "br":
+            return self._br.process(data)
+        return self._gz.compress(data)
+
+    def flush(self) -> bytes:
+        if self.encoding == "br":
+            return self._br.flush()
+        return self._gz.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self) -> bytes:
+        if self.encoding == "br":
+            return self._br.finish()
+        return self._gz.flush(zlib.Z_FINISH)
+
+
+def compress_body(data: bytes, encoding: str, level: int) -> bytes:
+    """Compress a whole body."""
+    if encoding == "br":
+        return brotli.compress(data, quality=min(level, 11))
+    return zlib.compress(data, level, wbits=31)
+
+
+def compress_stream(chunks: Iterable[bytes | str], encoding: str, level: int,
+                    flush_every: int) -> Iterator[bytes]:
+    """Compress a chunked body, flushing after every ``flush_every`` input bytes."""
+    encoder = _Encoder(encoding, level)
+    pending = 0
+    for chunk in chunks:
+        if isinstance(chunk, str):
+            chunk = chunk.encode()
+        out = encoder.compress(chunk)
+        pending += len(chunk)
+        if pending >= flush_every:
+            out += encoder.flush()
+            pending = 0
+        if out:
+            yield out
+    yield encoder.finish()
+
+
+def _compress_response(response):
+    config = current_app.config
+    if (
+        not config["COMPRESS_ENABLED"]
+        or response.status_code < 200
+        or response.status_code in (204, 304)
+        or response.direct_passthrough
+        or "Content-Encoding" in response.headers
+        or response.mimetype not in COMPRESSIBLE
+    ):
+        return response
+    encoding = _encoding()
+    response.vary.add("Accept-Encoding")
+    if encoding is None:
+        return response
+    level = config["COMPRESS_LEVEL"]
+
+    if response.is_streamed:
+        response.response = compress_stream(
+            response.response, encoding, level, config["COMPRESS_STREAM_FLUSH"]
+        )
+        response.headers.pop("Content-Length", None)
+    else:
+        data = response.get_data()
+        if len(data) < config["COMPRESS_MIN_SIZE"]:
+            return response
+        response.set_data(compress_body(data, encoding, level))
+
+    response.headers["Content-Encoding"] = encoding
+    etag, weak = response.get_etag()
+    if etag and not weak:
+        response.set_etag(etag, weak=True)
+    return response
+
+
+def init_app(app) -> None:
+    """Register the compression hook on ``app``."""
+    app.after_request(_compress_response)
@@ -0,0 +1,183 @@
+"""Version-based conditional GETs for read endpoints.
+
+Every collection (``items``, ``boms``, ``suppliers``, ``supplier_items``,
+``pos``) and every hot resource (``items:<id>``, ``boms:<id>``) has a
+version row in ``resource_versions``. Write routes bump the keys they
+change with :func:`touch`, in the same transaction as the write, so the
+versions are shared by every worker process.
+
+Views wrapped with :func:`conditional` read the versions of their keys in
+one query and derive a strong ``ETag`` (and ``Last-Modified``) from them
+and the request URL, before rendering anything. A matching
+``If-None-Match`` (or a fresh ``If-Modified-Since``) is answered with 304
+straight away. ``Last-Modified`` has whole-second precision, so it is
+only sent once the second of the last write has passed; a later write
+then always falls in a later second and a client echoing the header in
+``If-Modified-Since`` never gets a stale 304. With ``cache=True`` the rendered body is also kept in a
+bounded per-application LRU keyed by that ETag, so an unchanged resource
+is rendered once per version.
+
+Writes that bypass the routes (scripts, SQL) do not bump versions; touch
+the affected keys afterwards.
+"""
+from __future__ import annotations
+
+import functools
+import hashlib
+import threading
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+
+from flask import Response, current_app, request
+
+from app.db import db
+from app.models import ResourceVersion
+
+
+class ResponseCache:
+    """Bounded LRU of rendered response bodies keyed by ETag."""
+
+    def __init__(self, maxsize: int):
+        self.maxsize = maxsize
+        self._lock = threading.Lock()
+        self._bodies: OrderedDict[str, tuple[bytes, str]] = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, etag: str) -> tuple[bytes, str] | None:
+        with self._lock:
+            entry = self._bodies.get(etag)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._bodies.move_to_end(etag)
+            self.hits += 1
+            return entry
+
+    def put(self, etag: str, body: bytes, mimetype: str) -> None:
+        if self.maxsize <= 0:
+            return
+        with self._lock:
+            self._bodies[etag] = (body, mimetype)
+            self._bodies.move_to_end(etag)
+            while len(self._bodies) > self.maxsize:
+                self._bodies.popitem(last=False)
+
+    def stats(self) -> dict:
+        return {"entries": len(self._bodies), "hits": self.hits, "misses": self.misses}
+
+
+def init_app(app) -> None:
+    """Attach a fresh response cache to ``app``."""
+    app.extensions["response_cache"] = ResponseCache(app.config["RESPONSE_CACHE_SIZE"])
+
+
+def get_cache() -> ResponseCache:
+    """Return the response cache of the current application."""
+    return current_app.extensions["response_cache"]
+
+
+def touch(*keys: str) -> None:
+    """Bump the versions of ``keys`` in the current transaction.
+
+    Keys are updated in sorted order so concurrent writers touching
+    overlapping keys lock them in the same order.
+    """
+    table = ResourceVersion.__table__
+    now = datetime.utcnow()
+    rows = [{"key": key, "version": 1, "updated_at": now} for key in sorted(set(keys))]
+    dialect = db.session.get_bind().dialect.name
+    if dialect in ("postgresql", "sqlite"):
+        if dialect == "postgresql":
+            from sqlalchemy.dialects.postgresql import insert
+        else:
+            from sqlalchemy.dialects.sqlite import insert
+        stmt = insert(table)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[table.c.key],
+            set_={"version": table.c.version + 1, "updated_at": stmt.excluded.updated_at},
+        )
+        db.session.execute(stmt, rows)
+        return
+    for row in rows:
+        result = db.session.execute(
+            db.update(table).where(table.c.key == row["key"])
+            .values(version=table.c.version + 1, updated_at=now)
+        )
+        if result.rowcount == 0:
+            db.session.execute(db.insert(table), [row])
+
+
+def _validators(keys: list[str]) -> tuple[str, datetime | None]:
+    rows = db.session.execute(
+        db.select(ResourceVersion.key, ResourceVersion.version, ResourceVersion.updated_at)
+        .where(ResourceVersion.key.in_(keys))
+    ).all()
+    versions = {key: (version, updated_at) for key, version, updated_at in rows}
+    digest = hashlib.sha1(request.full_path.encode())
+    for key in keys:
+        digest.update(f"|{key}={versions.get(key, (0,))[0]}".encode())
+    modified = [updated_at for _, updated_at in versions.values() if updated_at is not None]
+    return digest.hexdigest()[:32], max(modified) if modified else None
+
+
+def _last_modified_header(updated_at: datetime | None) -> datetime | None:
+    """``updated_at`` rounded up to the second, or None while that second is not over."""
+    if updated_at is None:
+        return None
+    header = updated_at.replace(microsecond=0)
+    if header < updated_at:
+        header += timedelta(seconds=1)
+    if header > datetime.utcnow():
+        return None
+    return header.replace(tzinfo=timezone.utc)
+
+
+def _not_modified(etag: str, updated_at: datetime | None) -> bool:
+    if request.if_none_match:
+        # Weak comparison: compressed responses carry the ETag as W/"...".
+        return request.if_none_match.contains_weak(etag)
+    since = request.if_modified_since
+    if since is None or updated_at is None:
+        return False
+    # Compare at full precision: a write later in the same second as ``since`` is newer.
+    return updated_at <= since.astimezone(timezone.utc).replace(tzinfo=None)
+
+
+def _finish(response: Response, etag: str, updated_at: datetime | None) -> Response:
+    response.set_etag(etag)
+    last_modified = _last_modified_header(updated_at)
+    if last_modified is not None:
+        response.last_modified = last_modified
+    # Let browsers keep the body but revalidate it on every use.
+    response.cache_control.no_cache = True
+    return response
+
+
+def conditional(*keys: str, cache: bool = False):
+    """Decorate a GET view with version-based ETag handling.
+
+    Args:
+        keys: version keys; ``str.format`` fields are filled from the view
+            arguments, e.g. ``"items:{item_id}"``.
+        cache: keep rendered 200 bodies in the response cache.
+    """
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapper(*args, **kwargs):
+            resolved = [key.format(**kwargs) for key in keys]
+            etag, updated_at = _validators(resolved)
+            if _not_modified(etag, updated_at):
+                return _finish(Response(status=304), etag, updated_at)
+            if cache:
+                entry = get_cache().get(etag)
+                if entry is not None:
+                    return _finish(Response(entry[0], mimetype=entry[1]), etag, updated_at)
+            response = current_app.make_response(view(*args, **kwargs))
+            if response.status_code != 200:
+                return response
+            if cache and not response.is_streamed:
+                get_cache().put(etag, response.get_data(), response.mimetype)
+            return _finish(response, etag, updated_at)
+        return wrapper
+    return decorator
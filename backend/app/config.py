@@ -3,4 +3,79 @@ class Config:
     # Use DATABASE_URL if set; otherwise fall back to a local SQLite file (backend/satorial55.db)
     SQLALCHEMY_DATABASE_URI = os.getenv("DATABASE_URL", "sqlite:///satorial55.db")
     SQLALCHEMY_TRACK_MODIFICATIONS = False
+    # Read replicas: comma-separated URLs; GET/HEAD requests of DB_REPLICA_BLUEPRINTS read from one of them
+    SQLALCHEMY_REPLICA_URIS = tuple(
+        u.strip() for u in os.getenv("DATABASE_REPLICA_URLS", "").split(",") if u.strip()
+    )
+    DB_REPLICA_BLUEPRINTS = tuple(
+        b.strip() for b in os.getenv("DB_REPLICA_BLUEPRINTS", "catalog,procurement").split(",") if b.strip()
+    )
+    # Read-your-writes: seconds a client keeps reading from the primary after a write (cookie based)
+    DB_REPLICA_STICKY_SECONDS = float(os.getenv("DB_REPLICA_STICKY_SECONDS", "5"))
+    DB_STICKY_COOKIE = os.getenv("DB_STICKY_COOKIE", "db_primary_until")
+    # Connection pools of QueuePool engines (PostgreSQL, file SQLite), primary and each replica
+    DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+    DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+    DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+    DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+    DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "1").lower() in ("1", "true", "yes")
     JWT_SECRET_KEY = os.getenv("JWT_SECRET_KEY", "dev-secret")
+    # GET /items keyset pagination: default/max page size and NDJSON stream chunk
+    ITEMS_PAGE_LIMIT = int(os.getenv("ITEMS_PAGE_LIMIT", "100"))
+    ITEMS_PAGE_MAX_LIMIT = int(os.getenv("ITEMS_PAGE_MAX_LIMIT", "1000"))
+    ITEMS_STREAM_CHUNK = int(os.getenv("ITEMS_STREAM_CHUNK", "1000"))
+    # Multi-get (GET /items?ids=, GET /boms?ids=, GET /stock/availability): maximum ids per request
+    MULTI_GET_MAX_IDS = int(os.getenv("MULTI_GET_MAX_IDS", "500"))
+    # GET /items/search result limits
+    SEARCH_DEFAULT_LIMIT = int(os.getenv("SEARCH_DEFAULT_LIMIT", "20"))
+    SEARCH_MAX_LIMIT = int(os.getenv("SEARCH_MAX_LIMIT", "100"))
+    # POST /items/bulk: rows per batch insert and max row errors reported
+    BULK_IMPORT_BATCH_SIZE = int(os.getenv("BULK_IMPORT_BATCH_SIZE", "1000"))
+    BULK_IMPORT_MAX_ERRORS = int(os.getenv("BULK_IMPORT_MAX_ERRORS", "1000"))
+    # MRP: purchase order statuses whose lines are not counted as open receipts
+    MRP_CLOSED_PO_STATUSES = tuple(
+        s.strip() for s in os.getenv("MRP_CLOSED_PO_STATUSES", "CLOSED,RECEIVED,CANCELLED").split(",") if s.strip()
+    )
+    # Response compression: gzip (or br with the brotli package) for bodies of at least COMPRESS_MIN_SIZE bytes
+    COMPRESS_ENABLED = os.getenv("COMPRESS_ENABLED", "1").lower() in ("1", "true", "yes")
+    COMPRESS_MIN_SIZE = int(os.getenv("COMPRESS_MIN_SIZE", "1024"))
+    COMPRESS_LEVEL = int(os.getenv("COMPRESS_LEVEL", "6"))
+    # Streamed responses: input bytes between encoder flushes
+    COMPRESS_STREAM_FLUSH = int(os.getenv("COMPRESS_STREAM_FLUSH", "65536"))
+    # Metrics: per-request SQL/latency instrumentation and the N+1 threshold
+    # (a request running one normalised statement more often than this is flagged)
+    METRICS_ENABLED = os.getenv("METRICS_ENABLED", "1").lower() in ("1", "true", "yes")
+    METRICS_N_PLUS_ONE_THRESHOLD = int(os.getenv("METRICS_N_PLUS_ONE_THRESHOLD", "20"))
+    # Stock posting: maximum number of moves accepted by one POST /stock/moves
+    STOCK_MOVES_MAX_BATCH = int(os.getenv("STOCK_MOVES_MAX_BATCH", "10000"))
+    # Stock checkpoints: item ids per committed chunk when building a checkpoint
+    STOCK_CHECKPOINT_CHUNK_ITEMS = int(os.getenv("STOCK_CHECKPOINT_CHUNK_ITEMS", "5000"))
+    # Stock availability rollup: item ids per committed chunk when rebuilding it
+    STOCK_AVAILABILITY_CHUNK_ITEMS = int(os.getenv("STOCK_AVAILABILITY_CHUNK_ITEMS", "5000"))
+    # Inventory costing: fifo (layers per item and lot) or average (moving average per item);
+    # changing it needs `flask stock-costing-replay`. Moves read per chunk when replaying.
+    STOCK_COSTING_METHOD = os.getenv("STOCK_COSTING_METHOD", "fifo")
+    STOCK_COSTING_CHUNK_MOVES = int(os.getenv("STOCK_COSTING_CHUNK_MOVES", "10000"))
+    # POST /stock/allocations: maximum garments per cutting order
+    ALLOCATION_MAX_GARMENTS = int(os.getenv("ALLOCATION_MAX_GARMENTS", "100000"))
+    # Purchase orders: maximum number of lines accepted by POST /pos/<id>/lines:batch
+    PO_LINES_MAX_BATCH = int(os.getenv("PO_LINES_MAX_BATCH", "5000"))
+    # Reference data cache: seconds before the UoM/category/supplier maps are reloaded
+    # (picks up renames committed by other processes)
+    REFCACHE_TTL = float(os.getenv("REFCACHE_TTL", "60"))
+    # Sourcing index: seconds before cached supplier offers of an item are reloaded
+    SOURCING_INDEX_TTL = float(os.getenv("SOURCING_INDEX_TTL", "300"))
+    # Sourcing index: items whose offers are kept per process (LRU entries)
+    SOURCING_INDEX_SIZE = int(os.getenv("SOURCING_INDEX_SIZE", "100000"))
+    # BOM cost rollup: seconds before a cached rolled cost is recomputed
+    COST_ROLLUP_TTL = float(os.getenv("COST_ROLLUP_TTL", "300"))
+    # Conditional GETs: rendered bodies of hot resources kept per process (LRU entries)
+    RESPONSE_CACHE_SIZE = int(os.getenv("RESPONSE_CACHE_SIZE", "2048"))
+    # Exports: output directory (relative to the instance folder), worker threads,
+    # queued+running jobs per process (more get 429) and rows per server-side cursor chunk
+    EXPORT_DIR = os.getenv("EXPORT_DIR", "exports")
+    EXPORT_MAX_WORKERS = int(os.getenv("EXPORT_MAX_WORKERS", "2"))
+    EXPORT_MAX_JOBS = int(os.getenv("EXPORT_MAX_JOBS", "4"))
+    EXPORT_CHUNK_ROWS = int(os.getenv("EXPORT_CHUNK_ROWS", "10000"))
+    # Seconds the files of a finished export are kept before a later submit deletes them (0 = forever)
+    EXPORT_RETENTION_SECONDS = int(os.getenv("EXPORT_RETENTION_SECONDS", "86400"))
@@ -0,0 +1,310 @@
+"""Rolled-up standard cost of products, memoized per item.
+
+The cost of one unit of a product item is the sum over the lines of its
+latest BOM (the structure :mod:`app.bom_closure` indexes) of the
+scrap-adjusted quantity times the unit cost of the component: the rolled
+cost of a component that has BOMs itself, otherwise its price. A price is
+the cheapest ``SupplierItem.price`` of the item (from the sourcing index,
+currencies not converted) or, without offers, the unit cost of its last
+costed receipt (``ItemCost.last_receipt_cost``). Components with neither
+count as zero and are reported as missing prices.
+
+:class:`CostRollup` caches the result for every item it rolls up, leaves
+and sub-assemblies included, and remembers which cached products used
+each item. Committing a change to a ``SupplierItem``, ``Bom`` or
+``BomLine``, or a costed receipt, drops the changed item and every cached
+product above it, nothing else. Entries also expire after
+``COST_ROLLUP_TTL`` seconds (a product never outlives the components it
+was rolled from) to pick up writes made by other processes.
+
+:meth:`CostRollup.rollup_all` re-costs the whole catalog in one pass:
+one query for every BOM, prices in batches, then each product once in
+topological order.
+
+One rollup lives in ``app.extensions["cost_rollup"]`` per application.
+"""
+from __future__ import annotations
+
+import threading
+import time
+from collections import defaultdict, deque
+from decimal import Decimal
+from typing import Iterable, NamedTuple
+
+from flask import current_app
+from sqlalchemy import inspect
+
+from app import cache_hooks, routing
+from app.bom_explosion import BomCycleError
+from app.db import db
+from app.models import Bom, BomLine, ItemCost, SupplierItem
+
+_CHUNK = 1000
+
+# session.info key of the items to drop at commit.
+_DIRTY = "cost_rollup_dirty"
+
+# Rolled costs are kept to this scale.
+_COST = Decimal("0.000001")
+
+
+class Rolled(NamedTuple):
+    """Unit cost of one item.
+
+    ``source`` is ``rollup`` for products, ``supplier`` or ``receipt`` for
+    priced leaves and None for leaves without a price. ``missing`` holds the
+    leaf items below (or equal to) the item that have no price.
+    """
+
+    cost: Decimal | None
+    source: str | None
+    missing: frozenset
+    components: tuple
+    loaded_at: float
+
+
+class CostRollup:
+    """Memoized, change-invalidated unit costs per item."""
+
+    def __init__(self, ttl: float = 300):
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._entries: dict[int, Rolled] = {}
+        self._users: dict[int, set[int]] = defaultdict(set)
+        self._generation = 0
+        self.hits = 0
+        self.misses = 0
+
+    def invalidate(self, item_ids: Iterable[int] | None = None) -> int:
+        """Drop ``item_ids`` and every cached product using them (all when None).
+
+        Returns:
+            The number of entries dropped.
+        """
+        with self._lock:
+            self._generation += 1
+            if item_ids is None:
+                dropped = len(self._entries)
+                self._entries.clear()
+                self._users.clear()
+                return dropped
+            dropped = 0
+            queue = deque(item_ids)
+            seen = set(queue)
+            while queue:
+                item_id = queue.popleft()
+                entry = self._entries.pop(item_id, None)
+                if entry is not None:
+                    dropped += 1
+                    for component in entry.components:
+                        self._users.get(component, set()).discard(item_id)
+                for user in self._users.pop(item_id, ()):
+                    if user not in seen:
+                        seen.add(user)
+                        queue.append(user)
+            return dropped
+
+    def _fresh(self, item_id: int, now: float) -> Rolled | None:
+        entry = self._entries.get(item_id)
+        if entry is not None and now - entry.loaded_at < self.ttl:
+            return entry
+        return None
+
+    def costs(self, item_ids: Iterable[int]) -> dict[int, Rolled]:
+        """Return the unit cost of every item in ``item_ids``.
+
+        Uncached items are rolled up together: their structures are read
+        one BOM level per query and the prices of all new leaves at once.
+
+        Raises:
+            BomCycleError: if a structure below the items contains itself.
+        """
+        now = time.monotonic()
+        item_ids = list(dict.fromkeys(item_ids))
+        result: dict[int, Rolled] = {}
+        known: dict[int, Rolled] = {}
+        frontier = []
+        for item_id in item_ids:
+            entry = self._fresh(item_id, now)
+            if entry is not None:
+                result[item_id] = entry
+            else:
+                frontier.append(item_id)
+        self.hits += len(result)
+        self.misses += len(frontier)
+        if not frontier:
+            return result
+
+        from app import bom_closure
+
+        generation = self._generation
+        structure: dict[int, dict[int, Decimal] | None] = {}
+        # Shared by every client: never fill from a lagging replica.
+        with routing.on_primary():
+            while frontier:
+                lines = bom_closure.latest_lines(frontier)
+                structure.update((item_id, lines.get(item_id)) for item_id in frontier)
+                found = set()
+                for item_id in frontier:
+                    for component in lines.get(item_id, ()):
+                        if component in structure or component in known or component in found:
+                            continue
+                        entry = self._fresh(component, now)
+                        if entry is not None:
+                            known[component] = entry
+                        else:
+                            found.add(component)
+                frontier = sorted(found)
+            computed = self._compute(structure, known, now)
+        self._store(computed, generation)
+        result.update((i, computed[i]) for i in item_ids if i in computed)
+        return result
+
+    def rollup_all(self) -> dict[int, Rolled]:
+        """Re-cost every product from scratch and replace the cache.
+
+        Returns:
+            The unit cost of every item with a BOM.
+        """
+        from app import bom_closure
+
+        now = time.monotonic()
+        generation = self._generation
+        with routing.on_primary():
+            lines = bom_closure.latest_lines()
+            structure: dict[int, dict[int, Decimal] | None] = dict(lines)
+            for components in lines.values():
+                for component in components:
+                    structure.setdefault(component, None)
+            computed = self._compute(structure, {}, now)
+        with self._lock:
+            if generation == self._generation:
+                self._entries.clear()
+                self._users.clear()
+        self._store(computed, generation)
+        return {item_id: computed[item_id] for item_id in lines}
+
+    def _compute(self, structure: dict[int, dict[int, Decimal] | None], known: dict[int, Rolled],
+                 now: float) -> dict[int, Rolled]:
+        """Cost the items of ``structure`` (products map to their lines, leaves to None)."""
+        leaves = [item_id for item_id, lines in structure.items() if lines is None]
+        out = dict(known)
+        for item_id, (price, source) in _prices(leaves).items():
+            missing = frozenset() if price is not None else frozenset((item_id,))
+            out[item_id] = Rolled(price, source, missing, (), now)
+
+        # Kahn's algorithm, components before the products using them.
+        waiting = {}
+        users: dict[int, list[int]] = defaultdict(list)
+        for item_id, lines in structure.items():
+            if lines is None:
+                continue
+            pending = [c for c in lines if c not in out]
+            waiting[item_id] = len(pending)
+            for component in pending:
+                users[component].append(item_id)
+        ready = deque(sorted(i for i, n in waiting.items() if n == 0))
+        done = 0
+        while ready:
+            item_id = ready.popleft()
+            done += 1
+            lines = structure[item_id]
+            cost, missing, loaded_at = Decimal(0), set(), now
+            for component, qty in lines.items():
+                entry = out[component]
+                if entry.cost is not None:
+                    cost += qty * entry.cost
+                missing |= entry.missing
+                loaded_at = min(loaded_at, entry.loaded_at)
+            out[item_id] = Rolled(cost.quantize(_COST), "rollup", frozenset(missing), tuple(lines), loaded_at)
+            for user in users.get(item_id, ()):
+                waiting[user] -= 1
+                if waiting[user] == 0:
+                    ready.append(user)
+        if done < len(waiting):
+            raise BomCycleError(i for i, n in waiting.items() if n > 0)
+        return {item_id: out[item_id] for item_id in structure}
+
+    def _store(self, computed: dict[int, Rolled], generation: int) -> None:
+        with self._lock:
+            # Do not cache costs read before a concurrent invalidation.
+            if generation != self._generation:
+                return
+            for item_id, entry in computed.items():
+                self._entries[item_id] = entry
+                for component in entry.components:
+                    self._users[component].add(item_id)
+
+    def stats(self) -> dict:
+        return {"entries": len(self._entries), "hits": self.hits, "misses": self.misses}
+
+
+def _prices(item_ids: list[int]) -> dict[int, tuple[Decimal | None, str | None]]:
+    """Return ``{item_id: (price, source)}`` for leaf items."""
+    from app import sourcing
+
+    prices: dict[int, tuple[Decimal | None, str | None]] = {}
+    unpriced = []
+    for item_id, offers in sourcing.get_index().sources_for(item_ids).items():
+        if offers:
+            prices[item_id] = (offers[0].price, "supplier")
+        else:
+            unpriced.append(item_id)
+    for start in range(0, len(unpriced), _CHUNK):
+        chunk = unpriced[start:start + _CHUNK]
+        rows = db.session.execute(
+            db.select(ItemCost.item_id, ItemCost.last_receipt_cost)
+            .where(ItemCost.item_id.in_(chunk), ItemCost.last_receipt_cost.is_not(None))
+        )
+        prices.update((item_id, (cost, "receipt")) for item_id, cost in rows)
+    for item_id in unpriced:
+        prices.setdefault(item_id, (None, None))
+    return prices
+
+
+def init_app(app) -> None:
+    """Attach a fresh rollup to ``app``."""
+    app.extensions["cost_rollup"] = CostRollup(ttl=app.config["COST_ROLLUP_TTL"])
+
+
+def get_rollup() -> CostRollup:
+    """Return the rollup of the current application."""
+    return current_app.extensions["cost_rollup"]
+
+
+def mark_changed(item_ids: Iterable[int]) -> None:
+    """Drop the costs of ``item_ids`` and their users when the transaction commits.
+
+    For writes the flush hooks below cannot see, such as core inserts of
+    costed receipts.
+    """
+    cache_hooks.pending(db.session, _DIRTY).update(item_ids)
+
+
+# ----------------------------------------------------------------------
+# Invalidation: record the items whose price or structure a flush touched
+# and drop them once the transaction commits (a rollback discards them).
+# ----------------------------------------------------------------------
+
+def _collect_changes(session, changed: set) -> None:
+    for obj in (*session.new, *session.dirty, *session.deleted):
+        if isinstance(obj, SupplierItem):
+            history = inspect(obj).attrs.item_id.history
+            changed.update(i for i in (obj.item_id, *history.deleted) if i is not None)
+        elif isinstance(obj, Bom):
+            history = inspect(obj).attrs.product_item_id.history
+            changed.update(i for i in (obj.product_item_id, *history.deleted) if i is not None)
+        elif isinstance(obj, BomLine):
+            with session.no_autoflush:
+                bom = session.get(Bom, obj.bom_id) if obj.bom_id is not None else None
+            if bom is not None:
+                changed.add(bom.product_item_id)
+
+
+def _invalidate(changed: set) -> None:
+    rollup = current_app.extensions.get("cost_rollup")
+    if rollup is not None:
+        rollup.invalidate(changed)
+
+
+cache_hooks.track(_DIRTY, _collect_changes, _invalidate)
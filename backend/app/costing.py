@@ -0,0 +1,565 @@
+"""Inventory costing: FIFO layers or moving average over the move ledger.
+
+Every receipt (a move into stock: ``to_location`` only) and issue (out of
+stock: ``from_location`` only) is costed when it is posted; transfers
+between locations do not change value. Results live in three tables:
+
+- ``stock_move_costs``: the cost of each receipt or issue and the item's
+  quantity and value after it, so the valuation at any date is the last
+  row of each item before it and COGS is a sum over a date range;
+- ``cost_layers`` (FIFO): one immutable layer per receipt, placed at its
+  position in the cumulative receipt stream of its ``(item, lot)``;
+- ``item_costs``: the current state of each item (totals, positions and
+  open FIFO layers), so appending moves reads one row per item.
+
+FIFO is position based: the receipts of a lot fill positions ``[0,
+received)`` of its stream and issues consume ``[issued, issued + qty)``,
+priced by the layers covering them. Stock issued beyond what was received
+is priced at the lot's last layer cost (else the item's average or last
+receipt cost) and the receipt that later covers it keeps its own cost.
+Receipts without ``unit_cost`` come in at that same fallback cost. The
+moving average is kept per item across lots.
+
+Moves posted after an item's last costed move are appended to its state
+(:func:`apply_moves`). A back-dated move re-costs only its item, from its
+``moved_at`` on: the costs from there are dropped, the state just before
+is rebuilt from the last ``stock_move_costs`` row of each lot and the
+layers still open at those positions, and the item's moves from there
+are costed again. :func:`replay` recomputes everything from the ledger,
+reading it in ``(item_id, moved_at, id)`` keyset pages, so memory holds
+one page and one item's state whatever the size of the ledger.
+"""
+from __future__ import annotations
+
+from collections import defaultdict, deque
+from datetime import datetime
+from decimal import ROUND_HALF_UP, Decimal
+
+from flask import current_app
+
+from app.db import db
+from app.models import CostLayer, ItemCost, StockMove, StockMoveCost
+
+FIFO = "fifo"
+AVERAGE = "average"
+METHODS = (FIFO, AVERAGE)
+
+_ZERO = Decimal(0)
+_PLACES = Decimal("0.0001")
+
+
+class CostingError(ValueError):
+    """Raised for an unknown costing method."""
+
+
+def _q(value: Decimal) -> Decimal:
+    return value.quantize(_PLACES, rounding=ROUND_HALF_UP)
+
+
+def _dec(value) -> Decimal:
+    return value if isinstance(value, Decimal) else Decimal(str(value))
+
+
+class LotStream:
+    """FIFO positions and open layers of one ``(item, lot)``.
+
+    Args:
+        received: total quantity received so far (end of the receipt stream).
+        issued: total quantity issued so far.
+        last_cost: unit cost of the latest layer, if any.
+        layers: open ``(start, qty, unit_cost)`` layers, oldest first.
+    """
+
+    __slots__ = ("received", "issued", "last_cost", "layers")
+
+    def __init__(self, received=_ZERO, issued=_ZERO, last_cost=None, layers=()):
+        self.received = received
+        self.issued = issued
+        self.last_cost = last_cost
+        self.layers = deque(layers)
+
+    def receive(self, qty: Decimal, unit_cost: Decimal) -> Decimal:
+        """Append a layer and return its start position."""
+        start = self.received
+        self.layers.append((start, qty, unit_cost))
+        self.received += qty
+        self.last_cost = unit_cost
+        self._prune()
+        return start
+
+    def issue(self, qty: Decimal, fallback: Decimal) -> Decimal:
+        """Consume ``qty`` from the oldest layers and return its cost."""
+        lo, hi = self.issued, self.issued + qty
+        cost = covered = _ZERO
+        for start, layer_qty, unit_cost in self.layers:
+            if start >= hi:
+                break
+            overlap = min(hi, start + layer_qty) - max(lo, start)
+            if overlap > 0:
+                cost += overlap * unit_cost
+                covered += overlap
+        if covered < qty:
+            cost += (qty - covered) * (self.last_cost if self.last_cost is not None else fallback)
+        self.issued = hi
+        self._prune()
+        return cost
+
+    def _prune(self) -> None:
+        layers = self.layers
+        while layers and layers[0][0] + layers[0][1] <= self.issued:
+            layers.popleft()
+
+    @property
+    def closed(self) -> bool:
+        """True once everything received has been issued and no layer is open."""
+        return self.received == self.issued and not self.layers
+
+    def open_layers(self) -> list[tuple[Decimal, Decimal]]:
+        """Return ``(remaining_qty, unit_cost)`` of the open layers."""
+        return [(start + qty - max(start, self.issued), unit_cost) for start, qty, unit_cost in self.layers]
+
+    def to_json(self) -> dict:
+        return {
+            "received": str(_q(self.received)),
+            "issued": str(_q(self.issued)),
+            "last_cost": None if self.last_cost is None else str(_q(self.last_cost)),
+            "layers": [[str(_q(v)) for v in layer] for layer in self.layers],
+        }
+
+    @classmethod
+    def from_json(cls, data: dict) -> "LotStream":
+        return cls(
+            Decimal(data["received"]), Decimal(data["issued"]),
+            None if data.get("last_cost") is None else Decimal(data["last_cost"]),
+            [tuple(Decimal(v) for v in layer) for layer in data.get("layers", ())],
+        )
+
+
+class ItemCostState:
+    """Running cost state of one item.
+
+    Args:
+        item_id: the item.
+        method: :data:`FIFO` or :data:`AVERAGE`.
+    """
+
+    def __init__(self, item_id: int, method: str):
+        if method not in METHODS:
+            raise CostingError(f"unknown costing method {method!r}")
+        self.item_id = item_id
+        self.method = method
+        self.qty = _ZERO
+        self.value = _ZERO
+        self.last_receipt_cost: Decimal | None = None
+        self.lots: dict[str, LotStream] = {}
+        self.last: tuple[datetime, int] | None = None
+
+    def _fallback(self, stream: LotStream | None) -> Decimal:
+        if stream is not None and stream.last_cost is not None:
+            return stream.last_cost
+        if self.qty > 0:
+            return self.value / self.qty
+        return self.last_receipt_cost if self.last_receipt_cost is not None else _ZERO
+
+    def apply(self, move_id: int, moved_at: datetime, lot_code: str | None, qty, unit_cost,
+              incoming: bool) -> tuple[dict, dict | None]:
+        """Cost one receipt (``incoming``) or issue.
+
+        Returns:
+            The ``stock_move_costs`` row and, for a FIFO receipt, the
+            ``cost_layers`` row.
+        """
+        # Lot keys are strings: they round-trip through the JSON of item_costs.lots.
+        lot = str(lot_code or "")
+        # Same precision as the ledger columns, so a replay from stored moves matches.
+        qty = _q(_dec(qty))
+        stream = self.lots.setdefault(lot, LotStream()) if self.method == FIFO else None
+        layer = None
+        if incoming:
+            unit = _q(_dec(unit_cost) if unit_cost is not None else self._fallback(stream))
+            value = _q(qty * unit)
+            if stream is not None:
+                start = stream.receive(qty, unit)
+                layer = {"move_id": move_id, "item_id": self.item_id, "lot_code": lot,
+                         "moved_at": moved_at, "start_pos": start, "qty": qty, "unit_cost": unit}
+            self.last_receipt_cost = unit
+            self.qty += qty
+            self.value += value
+        else:
+            if stream is not None:
+                value = _q(stream.issue(qty, self._fallback(None)))
+            else:
+                value = _q(qty * self._fallback(None))
+            unit = _q(value / qty) if qty else _ZERO
+            self.qty -= qty
+            self.value -= value
+            qty, value = -qty, -value
+        self.last = (moved_at, move_id)
+        return {
+            "move_id": move_id, "item_id": self.item_id, "lot_code": lot, "moved_at": moved_at,
+            "qty": qty, "value": value, "unit_cost": unit,
+            "qty_after": self.qty, "value_after": self.value,
+            "in_after": stream.received if stream is not None else None,
+            "out_after": stream.issued if stream is not None else None,
+        }, layer
+
+    def to_row(self) -> dict:
+        """Return the ``item_costs`` row of this state.
+
+        Closed lots are left out so the row does not grow with every lot
+        ever received; :func:`_reopen` restores one from the ledger when it
+        moves again.
+        """
+        return {
+            "item_id": self.item_id,
+            "method": self.method,
+            "qty": self.qty,
+            "value": self.value,
+            "last_moved_at": self.last[0] if self.last else None,
+            "last_move_id": self.last[1] if self.last else None,
+            "last_receipt_cost": self.last_receipt_cost,
+            "lots": {lot: stream.to_json() for lot, stream in self.lots.items() if not stream.closed},
+            "updated_at": datetime.utcnow(),
+        }
+
+    @classmethod
+    def from_row(cls, row) -> "ItemCostState":
+        state = cls(row.item_id, row.method)
+        state.qty, state.value = _dec(row.qty), _dec(row.value)
+        state.last_receipt_cost = None if row.last_receipt_cost is None else _dec(row.last_receipt_cost)
+        state.lots = {lot: LotStream.from_json(data) for lot, data in (row.lots or {}).items()}
+        if row.last_moved_at is not None:
+            state.last = (row.last_moved_at, row.last_move_id)
+        return state
+
+
+# ----------------------------------------------------------------------
+# Persistence
+# ----------------------------------------------------------------------
+
+def _costed(move_table=StockMove):
+    """Receipts and issues; transfers and moves without a date are not costed."""
+    src, dst = move_table.from_location, move_table.to_location
+    return db.and_(
+        move_table.moved_at.isnot(None),
+        db.or_(db.and_(src.is_(None), dst.isnot(None)), db.and_(src.isnot(None), dst.is_(None))),
+    )
+
+
+def _from(moved_at_col, id_col, position: tuple[datetime, int]):
+    """``(moved_at, id) >= position``."""
+    moved_at, move_id = position
+    return db.or_(moved_at_col > moved_at, db.and_(moved_at_col == moved_at, id_col >= move_id))
+
+
+def _write(cost_rows: list[dict], layer_rows: list[dict]) -> None:
+    if cost_rows:
+        db.session.execute(db.insert(StockMoveCost), cost_rows)
+    if layer_rows:
+        db.session.execute(db.insert(CostLayer), layer_rows)
+
+
+def _save_states(states, insert: bool = False) -> None:
+    rows = [state.to_row() for state in states]
+    if not rows:
+        return
+    table = ItemCost.__table__
+    if insert:
+        db.session.execute(db.insert(table), rows)
+        return
+    # Bind names must differ from the column names in an executemany UPDATE.
+    db.session.execute(
+        db.update(table).where(table.c.item_id == db.bindparam("b_item_id"))
+        .values({c: db.bindparam(f"b_{c}") for c in rows[0] if c != "item_id"}),
+        [{f"b_{c}": v for c, v in row.items()} for row in rows],
+    )
+
+
+def _load_states(item_ids, method: str) -> dict[int, ItemCostState]:
+    """Create missing state rows, then lock (PostgreSQL) and load them in id order."""
+    table = ItemCost.__table__
+    item_ids = sorted(item_ids)
+    dialect = db.session.get_bind().dialect.name
+    empty = [{"item_id": i, "method": method, "qty": 0, "value": 0, "lots": {}} for i in item_ids]
+    if dialect in ("postgresql", "sqlite"):
+        if dialect == "postgresql":
+            from sqlalchemy.dialects.postgresql import insert
+        else:
+            from sqlalchemy.dialects.sqlite import insert
+        db.session.execute(insert(table).on_conflict_do_nothing(index_elements=[table.c.item_id]), empty)
+    else:
+        existing = set(db.session.execute(
+            db.select(table.c.item_id).where(table.c.item_id.in_(item_ids))
+        ).scalars())
+        missing = [row for row in empty if row["item_id"] not in existing]
+        if missing:
+            db.session.execute(db.insert(table), missing)
+    stmt = db.select(table).where(table.c.item_id.in_(item_ids)).order_by(table.c.item_id)
+    if dialect == "postgresql":
+        stmt = stmt.with_for_update()
+    return {row.item_id: ItemCostState.from_row(row) for row in db.session.execute(stmt)}
+
+
+def _reopen(states: dict[int, ItemCostState], moves: dict[int, list[dict]]) -> None:
+    """Restore the streams of closed lots that ``moves`` touch again.
+
+    Their positions continue from the last ``stock_move_costs`` row of the
+    lot and their last layer cost from ``cost_layers``, as if they had
+    never been dropped from ``item_costs.lots``.
+    """
+    wanted = {
+        (item_id, str(move["lot_code"] or ""))
+        for item_id, item_moves in moves.items() if states[item_id].method == FIFO
+        for move in item_moves if str(move["lot_code"] or "") not in states[item_id].lots
+    }
+    if not wanted:
+        return
+    c, layer = StockMoveCost, CostLayer
+    item_ids = sorted({item_id for item_id, _ in wanted})
+    lots = sorted({lot for _, lot in wanted})
+    ranked = db.select(
+        c.item_id, c.lot_code, c.in_after, c.out_after,
+        db.func.row_number().over(partition_by=(c.item_id, c.lot_code),
+                                  order_by=(c.moved_at.desc(), c.move_id.desc())).label("rn"),
+    ).where(c.item_id.in_(item_ids), c.lot_code.in_(lots)).subquery()
+    for item_id, lot, received, issued in db.session.execute(
+        db.select(ranked.c.item_id, ranked.c.lot_code, ranked.c.in_after, ranked.c.out_after)
+        .where(ranked.c.rn == 1)
+    ):
+        if (item_id, lot) in wanted:
+            states[item_id].lots[lot] = LotStream(_dec(received or 0), _dec(issued or 0))
+    latest = db.select(
+        layer.item_id, layer.lot_code, layer.unit_cost,
+        db.func.row_number().over(partition_by=(layer.item_id, layer.lot_code),
+                                  order_by=layer.start_pos.desc()).label("rn"),
+    ).where(layer.item_id.in_(item_ids), layer.lot_code.in_(lots)).subquery()
+    for item_id, lot, unit_cost in db.session.execute(
+        db.select(latest.c.item_id, latest.c.lot_code, latest.c.unit_cost).where(latest.c.rn == 1)
+    ):
+        if (item_id, lot) in wanted and lot in states[item_id].lots:
+            states[item_id].lots[lot].last_cost = _dec(unit_cost)
+
+
+def _state_before(item_id: int, method: str, position: tuple[datetime, int]) -> ItemCostState:
+    """Rebuild the state of ``item_id`` from the costs left before ``position``.
+
+    Expects the costs and layers at or after ``position`` to be deleted.
+    """
+    c, layer = StockMoveCost, CostLayer
+    state = ItemCostState(item_id, method)
+    newest = (c.moved_at.desc(), c.move_id.desc())
+    last = db.session.execute(
+        db.select(c).where(c.item_id == item_id).order_by(*newest).limit(1)
+    ).scalar()
+    if last is None:
+        return state
+    state.qty, state.value = _dec(last.qty_after), _dec(last.value_after)
+    state.last = (last.moved_at, last.move_id)
+    state.last_receipt_cost = db.session.execute(
+        db.select(c.unit_cost).where(c.item_id == item_id, c.qty > 0).order_by(*newest).limit(1)
+    ).scalar()
+    if method != FIFO:
+        return state
+    ranked = db.select(
+        c.lot_code, c.in_after, c.out_after,
+        db.func.row_number().over(partition_by=c.lot_code, order_by=newest).label("rn"),
+    ).where(c.item_id == item_id).subquery()
+    heads = db.select(ranked.c.lot_code, ranked.c.in_after, ranked.c.out_after).where(ranked.c.rn == 1)
+    for lot, received, issued in db.session.execute(heads).all():
+        state.lots[lot] = LotStream(_dec(received or 0), _dec(issued or 0))
+    # Open layers of every lot in one query, then the latest layer cost per lot.
+    heads = heads.subquery()
+    open_layers = db.session.execute(
+        db.select(layer.lot_code, layer.start_pos, layer.qty, layer.unit_cost)
+        .join(heads, db.and_(heads.c.lot_code == layer.lot_code,
+                             layer.start_pos + layer.qty > db.func.coalesce(heads.c.out_after, 0)))
+        .where(layer.item_id == item_id)
+        .order_by(layer.lot_code, layer.start_pos)
+    ).all()
+    for lot, start, qty, unit_cost in open_layers:
+        state.lots[lot].layers.append((_dec(start), _dec(qty), _dec(unit_cost)))
+    latest = db.select(
+        layer.lot_code, layer.unit_cost,
+        db.func.row_number().over(partition_by=layer.lot_code, order_by=layer.start_pos.desc()).label("rn"),
+    ).where(layer.item_id == item_id).subquery()
+    for lot, unit_cost in db.session.execute(
+        db.select(latest.c.lot_code, latest.c.unit_cost).where(latest.c.rn == 1)
+    ):
+        if lot in state.lots:
+            state.lots[lot].last_cost = _dec(unit_cost)
+    return state
+
+
+def _recost(state: ItemCostState, position: tuple[datetime, int]) -> ItemCostState:
+    """Re-cost ``state.item_id`` from ``position`` on (moves already in the ledger)."""
+    item_id = state.item_id
+    c, layer, m = StockMoveCost, CostLayer, StockMove
+    db.session.execute(db.delete(c).where(c.item_id == item_id, _from(c.moved_at, c.move_id, position)))
+    db.session.execute(
+        db.delete(layer).where(layer.item_id == item_id, _from(layer.moved_at, layer.move_id, position))
+    )
+    state = _state_before(item_id, state.method, position)
+    moves = db.session.execute(
+        db.select(m.id, m.moved_at, m.lot_code, m.qty, m.unit_cost, m.to_location)
+        .where(m.item_id == item_id, _costed(), _from(m.moved_at, m.id, position))
+        .order_by(m.moved_at, m.id)
+    ).all()
+    cost_rows, layer_rows = [], []
+    for move_id, moved_at, lot, qty, unit_cost, to_location in moves:
+        row, new_layer = state.apply(move_id, moved_at, lot, qty, unit_cost, to_location is not None)
+        cost_rows.append(row)
+        if new_layer:
+            layer_rows.append(new_layer)
+    _write(cost_rows, layer_rows)
+    return state
+
+
+def apply_moves(moves: list[dict]) -> None:
+    """Cost newly inserted moves in the current transaction.
+
+    Args:
+        moves: move records with their ``id`` and ``moved_at`` set, as
+            inserted by :func:`app.stock.post_moves`.
+    """
+    by_item = defaultdict(list)
+    for move in moves:
+        if (move["from_location"] is None) != (move["to_location"] is None):
+            by_item[move["item_id"]].append(move)
+    if not by_item:
+        return
+    states = _load_states(by_item, current_app.config["STOCK_COSTING_METHOD"])
+    _reopen(states, by_item)
+    cost_rows, layer_rows = [], []
+    for item_id in sorted(by_item):
+        item_moves = sorted(by_item[item_id], key=lambda m: (m["moved_at"], m["id"]))
+        state = states[item_id]
+        first = (item_moves[0]["moved_at"], item_moves[0]["id"])
+        if state.last is not None and first < state.last:
+            # Back-dated: re-cost this item from the earliest new move on.
+            states[item_id] = _recost(state, first)
+            continue
+        for move in item_moves:
+            row, layer = state.apply(move["id"], move["moved_at"], move["lot_code"], move["qty"],
+                                     move["unit_cost"], move["to_location"] is not None)
+            cost_rows.append(row)
+            if layer:
+                layer_rows.append(layer)
+    _write(cost_rows, layer_rows)
+    _save_states(states.values())
+    # Receipt costs price the items without supplier offers in BOM cost rollups
+    from app import cost_rollup
+    cost_rollup.mark_changed(
+        item_id for item_id, item_moves in by_item.items()
+        if any(m["to_location"] is not None and m["unit_cost"] is not None for m in item_moves)
+    )
+
+
+def replay(method: str, chunk_moves: int = 10000) -> dict:
+    """Recompute all costs from the move ledger with ``method``.
+
+    Commits once per page of ``chunk_moves`` moves. Meant for maintenance
+    windows: postings made while it runs are not costed consistently and
+    need another replay.
+
+    Returns:
+        Counts of the ``moves`` costed and ``items`` with a state.
+    """
+    if method not in METHODS:
+        raise CostingError(f"unknown costing method {method!r}")
+    for model in (CostLayer, StockMoveCost, ItemCost):
+        db.session.execute(db.delete(model))
+    db.session.commit()
+
+    m = StockMove
+    key = (m.item_id, m.moved_at, m.id)
+    cols = db.select(m.item_id, m.id, m.moved_at, m.lot_code, m.qty, m.unit_cost, m.to_location)
+    last_key, state = None, None
+    moves = items = 0
+    while True:
+        stmt = cols.where(_costed()).order_by(*key).limit(chunk_moves)
+        if last_key is not None:
+            stmt = stmt.where(db.tuple_(*key) > last_key)
+        page = db.session.execute(stmt).all()
+        if not page:
+            break
+        cost_rows, layer_rows, done = [], [], []
+        for item_id, move_id, moved_at, lot, qty, unit_cost, to_location in page:
+            if state is None or state.item_id != item_id:
+                if state is not None:
+                    done.append(state)
+                state = ItemCostState(item_id, method)
+            row, layer = state.apply(move_id, moved_at, lot, qty, unit_cost, to_location is not None)
+            cost_rows.append(row)
+            if layer:
+                layer_rows.append(layer)
+        _write(cost_rows, layer_rows)
+        _save_states(done, insert=True)
+        db.session.commit()
+        moves += len(page)
+        items += len(done)
+        last_key = (page[-1][0], page[-1][2], page[-1][1])
+    if state is not None:
+        _save_states([state], insert=True)
+        db.session.commit()
+        items += 1
+    return {"moves": moves, "items": items}
+
+
+# ----------------------------------------------------------------------
+# Queries
+# ----------------------------------------------------------------------
+
+def valuation(item_ids: list[int] | None = None, as_of: datetime | None = None) -> list[tuple]:
+    """Return ``(item_id, qty, value)`` per item, now or just before ``as_of``.
+
+    Without ``item_ids`` only items with stock or value are returned.
+    """
+    if as_of is None:
+        source = db.select(ItemCost.item_id, ItemCost.qty, ItemCost.value)
+        if item_ids is not None:
+            source = source.where(ItemCost.item_id.in_(item_ids))
+    else:
+        c = StockMoveCost
+        ranked = db.select(
+            c.item_id, c.qty_after.label("qty"), c.value_after.label("value"),
+            db.func.row_number().over(partition_by=c.item_id,
+                                      order_by=(c.moved_at.desc(), c.move_id.desc())).label("rn"),
+        ).where(c.moved_at < as_of)
+        if item_ids is not None:
+            ranked = ranked.where(c.item_id.in_(item_ids))
+        ranked = ranked.subquery()
+        source = db.select(ranked.c.item_id, ranked.c.qty, ranked.c.value).where(ranked.c.rn == 1)
+    rows = source.subquery()
+    stmt = db.select(rows.c.item_id, rows.c.qty, rows.c.value).order_by(rows.c.item_id)
+    if item_ids is None:
+        stmt = stmt.where(db.or_(rows.c.qty != 0, rows.c.value != 0))
+    return db.session.execute(stmt).all()
+
+
+def cogs(since: datetime, until: datetime | None = None, item_ids: list[int] | None = None) -> dict[int, Decimal]:
+    """Return the cost of goods issued per item with ``since <= moved_at < until``."""
+    c = StockMoveCost
+    stmt = (
+        db.select(c.item_id, -db.func.sum(c.value, type_=c.value.type))
+        .where(c.qty < 0, c.moved_at >= since)
+        .group_by(c.item_id)
+    )
+    if until is not None:
+        stmt = stmt.where(c.moved_at < until)
+    if item_ids is not None:
+        stmt = stmt.where(c.item_id.in_(item_ids))
+    return dict(db.session.execute(stmt).all())
+
+
+def open_layers(item_ids: list[int]) -> dict[int, list[dict]]:
+    """Return the open FIFO layers of ``item_ids`` from their current state."""
+    rows = db.session.execute(db.select(ItemCost).where(ItemCost.item_id.in_(item_ids))).scalars()
+    out = {}
+    for row in rows:
+        state = ItemCostState.from_row(row)
+        out[row.item_id] = [
+            {"lot_code": lot, "qty": qty, "unit_cost": unit_cost}
+            for lot, stream in sorted(state.lots.items())
+            for qty, unit_cost in stream.open_layers()
+        ]
+    return out
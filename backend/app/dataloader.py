@@ -0,0 +1,124 @@
+"""Request-scoped batch loading of rows by primary key.
+
+Views that render many related rows (the components of a BOM, their
+categories and UoMs) ask a :class:`Loader` for ids instead of calling
+``session.get`` per row or touching lazy relationships. Ids passed to
+:meth:`Loader.want` are queued; the next :meth:`Loader.load_many` fetches
+every queued or requested id not seen yet with one ``IN`` query (split
+into chunks of ``CHUNK_SIZE`` ids) and keeps the results, misses included,
+for the rest of the request.
+
+One set of loaders lives in ``flask.g`` per request (see :func:`get_loaders`)
+and is discarded with the request context, so nothing outlives the
+transaction that read it.
+"""
+from __future__ import annotations
+
+from typing import Any, Iterable
+
+from flask import g
+from sqlalchemy.orm import selectinload
+
+from app.db import db
+from app.models import Bom, Item, ItemCategory, Uom
+
+# Ids per IN query; keeps statements well under the bind parameter limits.
+CHUNK_SIZE = 1000
+
+
+class Loader:
+    """Coalescing, caching primary-key loader for one model.
+
+    Args:
+        model: mapped class with an integer ``id`` primary key.
+        options: loader options applied to every query, e.g. ``selectinload``.
+    """
+
+    def __init__(self, model, *options):
+        self.model = model
+        self.options = options
+        self._rows: dict[int, Any] = {}
+        self._queued: set[int] = set()
+        self.queries = 0
+
+    def want(self, ids: Iterable[int | None]) -> None:
+        """Queue ``ids`` for the next :meth:`load_many` without querying."""
+        rows = self._rows
+        self._queued.update(id_ for id_ in ids if id_ is not None and id_ not in rows)
+
+    def load_many(self, ids: Iterable[int | None]) -> dict[int, Any]:
+        """Return ``{id: instance}`` for the ids of ``ids`` that exist.
+
+        Every queued id is fetched in the same query, so the results of
+        earlier :meth:`want` calls are cached afterwards too.
+        """
+        ids = [id_ for id_ in dict.fromkeys(ids) if id_ is not None]
+        self.want(ids)
+        if self._queued:
+            missing = sorted(self._queued)
+            self._queued.clear()
+            for start in range(0, len(missing), CHUNK_SIZE):
+                chunk = missing[start:start + CHUNK_SIZE]
+                stmt = db.select(self.model).where(self.model.id.in_(chunk)).options(*self.options)
+                found = {obj.id: obj for obj in db.session.execute(stmt).scalars()}
+                self.queries += 1
+                for id_ in chunk:
+                    self._rows[id_] = found.get(id_)
+        rows = self._rows
+        return {id_: rows[id_] for id_ in ids if rows[id_] is not None}
+
+    def load(self, id_: int | None):
+        """Return the instance with ``id_``, or None."""
+        return self.load_many((id_,)).get(id_)
+
+
+class Loaders:
+    """The loaders of one request."""
+
+    def __init__(self):
+        self.items = Loader(Item)
+        self.uoms = Loader(Uom)
+        self.categories = Loader(ItemCategory)
+        self.boms = Loader(Bom, selectinload(Bom.lines))
+
+    def stats(self) -> dict:
+        """Return the number of queries each loader ran."""
+        return {name: loader.queries for name, loader in vars(self).items()}
+
+
+def get_loaders() -> Loaders:
+    """Return the loaders of the current request, creating them on first use."""
+    if "dataloaders" not in g:
+        g.dataloaders = Loaders()
+    return g.dataloaders
+
+
+def item_dicts(ids: Iterable[int]) -> list[dict]:
+    """Render the items with ``ids`` (in that order, missing ones skipped).
+
+    Same keys as :data:`app.serializers.ITEM`; category and UoM codes come
+    from one batched query each instead of a lazy load per item.
+    """
+    loaders = get_loaders()
+    ids = list(dict.fromkeys(ids))
+    items = loaders.items.load_many(ids)
+    categories = loaders.categories.load_many(item.category_id for item in items.values())
+    uoms = loaders.uoms.load_many(item.base_uom_id for item in items.values())
+    out = []
+    for id_ in ids:
+        item = items.get(id_)
+        if item is None:
+            continue
+        category = categories.get(item.category_id)
+        uom = uoms.get(item.base_uom_id)
+        out.append({
+            "id": item.id,
+            "sku": item.sku,
+            "name": item.name,
+            "category": category.code if category else None,
+            "base_uom": uom.code if uom else None,
+            "brand": item.brand,
+            "active": item.active,
+            "spec": item.spec,
+        })
+    return out
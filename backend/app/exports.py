@@ -0,0 +1,311 @@
+"""Background exports of whole tables to CSV or Parquet files.
+
+A job reads its source (a :mod:`app.serializers` projection) through a
+server-side cursor, ``EXPORT_CHUNK_ROWS`` rows at a time, and appends each
+chunk to the output file, so memory stays constant however large the
+table is. When read replicas are configured (:mod:`app.routing`) jobs
+read from one of them.
+
+Jobs run on a per-application thread pool of ``EXPORT_MAX_WORKERS``
+threads (exports wait on the database and the disk, not the CPU, so
+threads are enough). At most ``EXPORT_MAX_JOBS`` jobs may be queued or
+running per process; :meth:`ExportManager.submit` raises
+:class:`ExportsBusy` beyond that, so a burst of exports never takes all
+connections and workers from the API.
+
+Each job lives in ``EXPORT_DIR`` as three files:
+
+- ``<id>.json``: status sidecar (state, rows written, total, timings),
+  rewritten atomically after every chunk;
+- ``<id>.csv`` / ``<id>.parquet``: the output, written as ``.part`` and
+  renamed when complete;
+- ``<id>.cancel``: created to request cancellation; the job checks for it
+  between chunks and removes it when it finishes.
+
+Sidecars make status and cancellation work across worker processes.
+Jobs do not survive a restart: a job whose process died stays
+``running`` with a stale ``updated_at``.
+
+The directory is created by the first export. Every submit also sweeps
+the files of jobs that finished more than ``EXPORT_RETENTION_SECONDS``
+ago, whichever process ran them.
+
+Parquet output needs the optional ``pyarrow`` package.
+"""
+from __future__ import annotations
+
+import csv
+import contextlib
+import json
+import os
+import re
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+
+from flask import current_app
+from sqlalchemy import Boolean, Date, DateTime, Integer, Numeric
+
+from app.db import db
+from app import serializers
+
+try:  # optional: Parquet output
+    import pyarrow
+    import pyarrow.parquet
+except ImportError:  # pragma: no cover - depends on the environment
+    pyarrow = None
+
+SOURCES = {
+    "items": serializers.ITEM,
+    "po_lines": serializers.PO_LINE,
+    "stock_moves": serializers.STOCK_MOVE,
+}
+FORMATS = ("csv", "parquet")
+
+QUEUED, RUNNING, DONE, FAILED, CANCELLED = "queued", "running", "done", "failed", "cancelled"
+FINISHED = frozenset((DONE, FAILED, CANCELLED))
+
+_JOB_ID = re.compile(r"^[0-9a-f]{32}$")
+
+
+class ExportError(ValueError):
+    """Invalid export request."""
+
+
+class ExportsBusy(RuntimeError):
+    """Too many export jobs queued or running."""
+
+
+class Cancelled(Exception):
+    """Raised inside a job when its cancel file appears."""
+
+
+def _now() -> str:
+    return datetime.now(timezone.utc).isoformat(timespec="seconds")
+
+
+def _arrow_type(field):
+    if field.convert is not None:
+        return pyarrow.string()
+    sql_type = field.column.type
+    if isinstance(sql_type, Boolean):
+        return pyarrow.bool_()
+    if isinstance(sql_type, Integer):
+        return pyarrow.int64()
+    if isinstance(sql_type, Numeric):
+        return pyarrow.decimal128(sql_type.precision or 38, sql_type.scale or 10)
+    if isinstance(sql_type, DateTime):
+        return pyarrow.timestamp("us")
+    if isinstance(sql_type, Date):
+        return pyarrow.date32()
+    return pyarrow.string()
+
+
+class CsvWriter:
+    def __init__(self, path: str, projection):
+        self._file = open(path, "w", newline="", encoding="utf-8")
+        self._csv = csv.writer(self._file)
+        self._csv.writerow(projection.names)
+
+    def write(self, rows) -> None:
+        self._csv.writerows(rows)
+
+    def close(self) -> None:
+        self._file.close()
+
+
+class ParquetWriter:
+    """Writes each chunk as one row group."""
+
+    def __init__(self, path: str, projection):
+        self._schema = pyarrow.schema(
+            [(f.name, _arrow_type(f)) for f in projection.fields]
+        )
+        self._writer = pyarrow.parquet.ParquetWriter(path, self._schema)
+
+    def write(self, rows) -> None:
+        columns = list(zip(*rows))
+        self._writer.write_table(pyarrow.Table.from_arrays(
+            [pyarrow.array(c, type=t) for c, t in zip(columns, self._schema.types)],
+            schema=self._schema,
+        ))
+
+    def close(self) -> None:
+        self._writer.close()
+
+
+WRITERS = {"csv": CsvWriter, "parquet": ParquetWriter}
+
+
+class ExportManager:
+    """Thread pool, admission cap and on-disk state of one application's exports."""
+
+    def __init__(self, app):
+        directory = app.config["EXPORT_DIR"]
+        if not os.path.isabs(directory):
+            directory = os.path.join(app.instance_path, directory)
+        self.directory = directory
+        self.app = app
+        self.max_jobs = app.config["EXPORT_MAX_JOBS"]
+        self.retention = app.config["EXPORT_RETENTION_SECONDS"]
+        self.chunk_rows = app.config["EXPORT_CHUNK_ROWS"]
+        self._executor = ThreadPoolExecutor(
+            max_workers=app.config["EXPORT_MAX_WORKERS"], thread_name_prefix="export"
+        )
+        self._lock = threading.Lock()
+        self._pending: set[str] = set()
+
+    # -- files ---------------------------------------------------------
+
+    def _path(self, job_id: str, suffix: str) -> str:
+        return os.path.join(self.directory, f"{job_id}{suffix}")
+
+    def output_path(self, job: dict) -> str:
+        return self._path(job["id"], f".{job['format']}")
+
+    def _save(self, job: dict) -> None:
+        job["updated_at"] = _now()
+        tmp = self._path(job["id"], ".json.tmp")
+        with open(tmp, "w") as f:
+            json.dump(job, f)
+        os.replace(tmp, self._path(job["id"], ".json"))
+
+    def _remove(self, job_id: str, suffix: str) -> None:
+        with contextlib.suppress(FileNotFoundError):
+            os.remove(self._path(job_id, suffix))
+
+    def get(self, job_id: str) -> dict | None:
+        """Return the status of a job, or None if unknown."""
+        if not _JOB_ID.match(job_id):
+            return None
+        try:
+            with open(self._path(job_id, ".json")) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+
+    def sweep(self) -> int:
+        """Delete the files of jobs finished more than ``retention`` seconds ago.
+
+        Returns:
+            The number of jobs removed. A retention of 0 keeps every job.
+        """
+        if self.retention <= 0 or not os.path.isdir(self.directory):
+            return 0
+        cutoff = datetime.now(timezone.utc) - timedelta(seconds=self.retention)
+        removed = 0
+        for name in os.listdir(self.directory):
+            job_id, ext = os.path.splitext(name)
+            if ext != ".json" or not _JOB_ID.match(job_id):
+                continue
+            try:
+                job = self.get(job_id)
+            except ValueError:  # sidecar being replaced by another process
+                continue
+            if job is None or job["status"] not in FINISHED or not job["finished_at"]:
+                continue
+            if datetime.fromisoformat(job["finished_at"]) > cutoff:
+                continue
+            # Sidecar first: the job then reads as unknown rather than done without its file.
+            for suffix in (".json", f".{job['format']}", ".cancel"):
+                self._remove(job_id, suffix)
+            removed += 1
+        return removed
+
+    # -- lifecycle -----------------------------------------------------
+
+    def submit(self, source: str, fmt: str) -> dict:
+        """Validate and queue an export; return its initial status."""
+        if source not in SOURCES:
+            raise ExportError(f"source must be one of {sorted(SOURCES)}")
+        if fmt not in FORMATS:
+            raise ExportError(f"format must be one of {list(FORMATS)}")
+        if fmt == "parquet" and pyarrow is None:
+            raise ExportError("parquet exports need the pyarrow package")
+        os.makedirs(self.directory, exist_ok=True)
+        self.sweep()
+        with self._lock:
+            if len(self._pending) >= self.max_jobs:
+                raise ExportsBusy(f"at most {self.max_jobs} exports may run at once")
+            job = {
+                "id": uuid.uuid4().hex, "source": source, "format": fmt, "status": QUEUED,
+                "rows_written": 0, "total_rows": None, "size_bytes": None, "error": None,
+                "created_at": _now(), "started_at": None, "finished_at": None,
+                "pid": os.getpid(),
+            }
+            self._save(job)
+            self._pending.add(job["id"])
+        status = dict(job)
+        self._executor.submit(self._run, job)
+        return status
+
+    def cancel(self, job_id: str) -> dict | None:
+        """Request cancellation; a queued job is cancelled before it starts."""
+        job = self.get(job_id)
+        if job is not None and job["status"] not in FINISHED:
+            open(self._path(job_id, ".cancel"), "w").close()
+        return job
+
+    def _check_cancel(self, job: dict) -> None:
+        if os.path.exists(self._path(job["id"], ".cancel")):
+            raise Cancelled()
+
+    def _run(self, job: dict) -> None:
+        part = self._path(job["id"], f".{job['format']}.part")
+        try:
+            with self.app.app_context():
+                self._check_cancel(job)
+                job.update(status=RUNNING, started_at=_now())
+                self._save(job)
+                self._export(job, part)
+            os.replace(part, self.output_path(job))
+            job.update(status=DONE, size_bytes=os.path.getsize(self.output_path(job)))
+        except Cancelled:
+            job["status"] = CANCELLED
+        except Exception as exc:  # noqa: BLE001 - recorded in the sidecar
+            self.app.logger.exception("export %s failed", job["id"])
+            job.update(status=FAILED, error=str(exc))
+        finally:
+            if job["status"] != DONE and os.path.exists(part):
+                os.remove(part)
+            self._remove(job["id"], ".cancel")
+            # Free the slot first: a client that sees the final status may submit again
+            with self._lock:
+                self._pending.discard(job["id"])
+            if job["status"] in FINISHED:
+                job["finished_at"] = _now()
+                self._save(job)
+
+    def _export(self, job: dict, path: str) -> None:
+        projection = SOURCES[job["source"]]
+        replicas = list(self.app.extensions["routing"].values())
+        engine = replicas[0] if replicas else db.engine
+        table = projection.fields[0].column.table
+        with engine.connect() as conn:
+            job["total_rows"] = conn.execute(db.select(db.func.count()).select_from(table)).scalar()
+            self._save(job)
+            result = conn.execution_options(stream_results=True, yield_per=self.chunk_rows).execute(
+                projection.select()
+            )
+            writer = WRITERS[job["format"]](path, projection)
+            try:
+                for rows in result.partitions():
+                    self._check_cancel(job)
+                    writer.write(projection.tuples(rows))
+                    job["rows_written"] += len(rows)
+                    self._save(job)
+            finally:
+                writer.close()
+
+    def shutdown(self) -> None:
+        self._executor.shutdown(wait=True)
+
+
+def get_manager() -> ExportManager:
+    return current_app.extensions["exports"]
+
+
+def init_app(app) -> None:
+    """Attach the export manager (its pool starts threads lazily)."""
+    app.extensions["exports"] = ExportManager(app)
@@ -0,0 +1,251 @@
+"""Streaming bulk import of catalog items.
+
+Parses a CSV or NDJSON body record by record, resolves category and UoM
+codes through map snapshots taken once per import from the reference-data
+cache, and writes items in batches
+with a single multi-row ``INSERT ... ON CONFLICT (sku)`` statement per
+batch. Each batch is committed on its own, so a bad row (or a failed
+batch) never aborts the rest of the file; invalid rows are collected in
+the returned error report instead. Only a body that cannot be read any
+further (bad encoding, malformed CSV) stops the import early; the report
+then carries the reason in ``fatal``.
+"""
+from __future__ import annotations
+
+import csv
+import io
+import json
+from typing import Iterable, Iterator
+
+from sqlalchemy.exc import SQLAlchemyError
+
+from app import item_spec, refcache
+from app.db import db
+from app.models import Item
+
+FORMATS = ("csv", "ndjson")
+CONFLICT_MODES = ("update", "skip")
+
+# Columns overwritten when an imported SKU already exists.
+_UPDATE_COLUMNS = ("name", "category_id", "base_uom_id", "brand", "active", "spec")
+_TRUE = ("1", "true", "yes", "y", "t")
+_FALSE = ("0", "false", "no", "n", "f")
+
+
+class RowError(ValueError):
+    """Raised for a record that cannot be imported."""
+
+
+class ImportAborted(ValueError):
+    """Raised when the rest of the body cannot be parsed."""
+
+
+def iter_records(stream, fmt: str) -> Iterator[tuple[int, dict | Exception]]:
+    """Yield ``(row_number, record)`` pairs from a binary stream.
+
+    Row numbers are 1-based and count data records only. A record that
+    cannot be parsed is yielded as the exception instead of a dict.
+
+    Raises:
+        ImportAborted: if the body is not valid UTF-8 or not valid CSV from
+            some point on; the records before it have been yielded.
+    """
+    # Buffer the raw WSGI stream; line iteration on it directly reads in
+    # tiny chunks.
+    lines = io.TextIOWrapper(io.BufferedReader(stream, 1 << 16), encoding="utf-8", newline="")
+    try:
+        yield from _iter_csv(lines) if fmt == "csv" else _iter_ndjson(lines)
+    except UnicodeDecodeError as e:
+        raise ImportAborted(f"body is not valid UTF-8: {e}") from e
+    except csv.Error as e:
+        raise ImportAborted(f"invalid CSV: {e}") from e
+
+
+def _iter_csv(lines) -> Iterator[tuple[int, dict]]:
+    yield from enumerate(csv.DictReader(lines), start=1)
+
+
+def _iter_ndjson(lines) -> Iterator[tuple[int, dict | Exception]]:
+    n = 0
+    for line in lines:
+        if not line.strip():
+            continue
+        n += 1
+        try:
+            record = json.loads(line)
+        except ValueError as e:
+            yield n, RowError(f"invalid JSON: {e}")
+            continue
+        yield n, record if isinstance(record, dict) else RowError("record must be a JSON object")
+
+
+def _as_bool(value) -> bool:
+    if value is None or value == "":
+        return True
+    if isinstance(value, bool):
+        return value
+    text = str(value).strip().lower()
+    if text in _TRUE:
+        return True
+    if text in _FALSE:
+        return False
+    raise RowError(f"invalid boolean for 'active': {value!r}")
+
+
+def _as_spec(value) -> dict:
+    try:
+        return item_spec.parse(value)
+    except ValueError as exc:
+        raise RowError(str(exc))
+
+
+def to_row(record: dict, categories: dict[str, int], uoms: dict[str, int]) -> dict:
+    """Validate a parsed record and map it to ``items`` column values."""
+    for key in ("sku", "name", "category", "base_uom"):
+        if not record.get(key):
+            raise RowError(f"'{key}' is required")
+    for key in ("category", "base_uom"):
+        if not isinstance(record[key], str):
+            raise RowError(f"'{key}' must be a code string")
+    category_id = categories.get(record["category"])
+    if category_id is None:
+        raise RowError(f"unknown category {record['category']!r}")
+    uom_id = uoms.get(record["base_uom"])
+    if uom_id is None:
+        raise RowError(f"unknown UoM {record['base_uom']!r}")
+    return {
+        "sku": str(record["sku"]),
+        "name": str(record["name"]),
+        "category_id": category_id,
+        "base_uom_id": uom_id,
+        "brand": record.get("brand") or None,
+        "active": _as_bool(record.get("active")),
+        "spec": _as_spec(record.get("spec")),
+    }
+
+
+def _upsert_statement(on_conflict: str):
+    """Build the batch insert for the current dialect."""
+    dialect = db.session.get_bind().dialect.name
+    if dialect == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+    elif dialect == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert
+    else:
+        # No portable upsert: duplicates surface as per-row errors.
+        return db.insert(Item.__table__)
+    # Core (not ORM-enabled) insert: rows go straight to executemany.
+    stmt = insert(Item.__table__)
+    if on_conflict == "skip":
+        stmt = stmt.on_conflict_do_nothing(index_elements=[Item.__table__.c.sku])
+    else:
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[Item.__table__.c.sku],
+            set_={c: getattr(stmt.excluded, c) for c in _UPDATE_COLUMNS},
+        )
+    # Rows left alone by DO NOTHING return nothing, so the result counts
+    # what was actually written.
+    return stmt.returning(Item.__table__.c.sku)
+
+
+class ImportReport:
+    """Counters and per-row errors of one import run."""
+
+    def __init__(self, max_errors: int):
+        self.processed = 0
+        self.written = 0
+        self.skipped = 0
+        self.fatal: str | None = None
+        self.errors: list[dict] = []
+        self.error_count = 0
+        self.max_errors = max_errors
+
+    def error(self, row: int, sku, message: str) -> None:
+        self.error_count += 1
+        if len(self.errors) < self.max_errors:
+            self.errors.append({"row": row, "sku": sku, "error": message})
+
+    def to_dict(self) -> dict:
+        return {
+            "processed": self.processed,
+            "written": self.written,
+            "skipped": self.skipped,
+            "failed": self.error_count,
+            "errors": self.errors,
+            "errors_truncated": self.error_count > len(self.errors),
+            "fatal": self.fatal,
+        }
+
+
+def _execute(stmt, rows: list[dict], report: ImportReport) -> None:
+    result = db.session.execute(stmt, rows)
+    written = len(result.all()) if result.returns_rows else len(rows)
+    db.session.commit()
+    report.written += written
+    report.skipped += len(rows) - written
+
+
+def _write_batch(stmt, batch: list[tuple[int, dict]], report: ImportReport) -> None:
+    # Within one statement a SKU may only appear once; the last record wins
+    # and the ones it replaces are reported.
+    last: dict[str, tuple[int, dict]] = {}
+    for n, row in batch:
+        previous = last.pop(row["sku"], None)
+        if previous is not None:
+            report.error(previous[0], row["sku"], f"duplicate sku, superseded by row {n}")
+        last[row["sku"]] = (n, row)
+    rows = list(last.values())
+    try:
+        _execute(stmt, [row for _, row in rows], report)
+        return
+    except SQLAlchemyError:
+        db.session.rollback()
+    # Fall back to one statement per row to pinpoint the failing records.
+    for n, row in rows:
+        try:
+            _execute(stmt, [row], report)
+        except SQLAlchemyError as e:
+            db.session.rollback()
+            report.error(n, row["sku"], str(e.orig) if getattr(e, "orig", None) else str(e))
+
+
+def import_items(
+    records: Iterable[tuple[int, dict | Exception]],
+    batch_size: int,
+    on_conflict: str = "update",
+    max_errors: int = 1000,
+) -> dict:
+    """Import parsed records in batches and return the report as a dict.
+
+    Args:
+        records: ``(row_number, record)`` pairs, e.g. from :func:`iter_records`.
+        batch_size: number of rows written per statement/commit.
+        on_conflict: ``"update"`` overwrites existing SKUs, ``"skip"`` keeps them.
+        max_errors: maximum number of row errors listed in the report.
+    """
+    cache = refcache.get_cache()
+    categories = cache.codes(refcache.CATEGORY)
+    uoms = cache.codes(refcache.UOM)
+    stmt = _upsert_statement(on_conflict)
+    report = ImportReport(max_errors)
+    batch: list[tuple[int, dict]] = []
+    try:
+        for n, record in records:
+            report.processed += 1
+            if isinstance(record, Exception):
+                report.error(n, None, str(record))
+                continue
+            try:
+                batch.append((n, to_row(record, categories, uoms)))
+            except RowError as e:
+                report.error(n, record.get("sku"), str(e))
+                continue
+            if len(batch) >= batch_size:
+                _write_batch(stmt, batch, report)
+                batch = []
+    except ImportAborted as e:
+        # Rows parsed before the bad part are still written.
+        report.fatal = str(e)
+    if batch:
+        _write_batch(stmt, batch, report)
+    return report.to_dict()
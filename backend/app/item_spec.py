@@ -0,0 +1,191 @@
+"""Item ``spec`` attributes: parsing and indexed filtering.
+
+``Item.spec`` is a JSON object (``JSONB`` on PostgreSQL), parsed once when
+an item is written and returned as an object. ``GET /items`` filters on
+its top-level keys with ``spec.<key><op><value>`` query parameters:
+
+- ``spec.color=navy``: equality (a numeric value also matches numbers);
+- ``spec.color!=navy``: inequality (items without the key never match);
+- ``spec.weight_gsm>=250``, ``<=``, ``>``, ``<``: numeric ranges.
+
+Indexing per dialect:
+
+- PostgreSQL: a GIN ``jsonb_path_ops`` index on ``spec`` serves equality
+  through ``spec @> {...}`` containment; ranges compare the numeric value
+  of the key (combine them with an equality filter to stay indexed).
+- SQLite: triggers keep ``item_spec_attrs`` (one row per item and scalar
+  top-level key, text and numeric value in separate columns) in sync with
+  ``items``, extracted with ``json_each``; every filter is an indexed
+  lookup on ``(key, value)`` returning item ids.
+- Other dialects use SQLAlchemy's generic JSON path operators unindexed.
+
+The DDL is attached to the ``items`` table so ``db.create_all()`` builds
+it; existing databases get it from the migration ``f2b7d4e8a1c9``.
+"""
+from __future__ import annotations
+
+import json
+import re
+
+from sqlalchemy import DDL, Numeric, case, column, event, func, or_, table, type_coerce
+from sqlalchemy.dialects.postgresql import JSONB
+
+from app.db import db
+from app.models import Item
+
+_KEY = re.compile(r"^[A-Za-z_][A-Za-z0-9_\-]*$")
+
+# Scalar JSON values as stored in item_spec_attrs: text (strings and
+# booleans) or number.
+_SQLITE_VALUES = (
+    "SELECT {item}, j.key, "
+    "CASE j.type WHEN 'text' THEN j.value WHEN 'true' THEN 'true' WHEN 'false' THEN 'false' END, "
+    "CASE WHEN j.type IN ('integer', 'real') THEN j.value END "
+    "FROM json_each(CASE WHEN json_valid({spec}) AND json_type({spec}) = 'object' "
+    "THEN {spec} ELSE '{{}}' END) AS j "
+    "WHERE j.type NOT IN ('object', 'array', 'null')"
+)
+
+SQLITE_DDL = [
+    "CREATE TABLE IF NOT EXISTS item_spec_attrs ("
+    "item_id INTEGER NOT NULL, key TEXT NOT NULL, value_text TEXT, value_num REAL, "
+    "PRIMARY KEY (item_id, key)) WITHOUT ROWID",
+    "CREATE INDEX IF NOT EXISTS ix_item_spec_attrs_text ON item_spec_attrs (key, value_text, item_id)",
+    "CREATE INDEX IF NOT EXISTS ix_item_spec_attrs_num ON item_spec_attrs (key, value_num, item_id)",
+    "CREATE TRIGGER IF NOT EXISTS items_spec_ai AFTER INSERT ON items BEGIN "
+    "INSERT INTO item_spec_attrs " + _SQLITE_VALUES.format(item="new.id", spec="new.spec") + "; END",
+    "CREATE TRIGGER IF NOT EXISTS items_spec_au AFTER UPDATE OF spec ON items BEGIN "
+    "DELETE FROM item_spec_attrs WHERE item_id = old.id; "
+    "INSERT INTO item_spec_attrs " + _SQLITE_VALUES.format(item="new.id", spec="new.spec") + "; END",
+    "CREATE TRIGGER IF NOT EXISTS items_spec_ad AFTER DELETE ON items BEGIN "
+    "DELETE FROM item_spec_attrs WHERE item_id = old.id; END",
+]
+
+POSTGRES_DDL = [
+    "CREATE INDEX IF NOT EXISTS ix_items_spec_gin ON items USING gin (spec jsonb_path_ops)",
+]
+
+for _stmt in SQLITE_DDL:
+    event.listen(Item.__table__, "after_create", DDL(_stmt).execute_if(dialect="sqlite"))
+for _stmt in POSTGRES_DDL:
+    event.listen(Item.__table__, "after_create", DDL(_stmt).execute_if(dialect="postgresql"))
+event.listen(
+    Item.__table__, "before_drop",
+    DDL("DROP TABLE IF EXISTS item_spec_attrs").execute_if(dialect="sqlite"),
+)
+
+_attrs = table(
+    "item_spec_attrs",
+    column("item_id"), column("key"), column("value_text"), column("value_num"),
+)
+
+
+def parse(value) -> dict:
+    """Return ``value`` (an object or its JSON text) as a dict.
+
+    Raises:
+        ValueError: ``value`` is not a JSON object.
+    """
+    if value is None or value == "":
+        return {}
+    if isinstance(value, str):
+        try:
+            value = json.loads(value)
+        except ValueError:
+            raise ValueError("'spec' must be valid JSON") from None
+    if not isinstance(value, dict):
+        raise ValueError("'spec' must be a JSON object")
+    return value
+
+
+def _number(value: str):
+    try:
+        number = float(value)
+    except ValueError:
+        return None
+    return number if number == number and abs(number) != float("inf") else None
+
+
+def parse_filters(args) -> list[tuple[str, str, str]]:
+    """Extract ``(key, op, value)`` spec filters from request query args.
+
+    ``spec.w>=250`` reaches Flask as the argument ``spec.w>`` with value
+    ``250``, and ``spec.w>250`` as ``spec.w>250`` with an empty value; both
+    spellings are recognised.
+
+    Raises:
+        ValueError: a malformed key or a non-numeric range bound.
+    """
+    filters = []
+    for name, value in args.items(multi=True):
+        if not name.startswith("spec."):
+            continue
+        key = name[5:]
+        if key[-1:] in (">", "<", "!"):
+            key, op = key[:-1], {">": ">=", "<": "<=", "!": "!="}[key[-1]]
+        elif not value and (">" in key or "<" in key):
+            op = ">" if ">" in key else "<"
+            key, value = key.split(op, 1)
+        else:
+            op = "="
+        if not _KEY.match(key):
+            raise ValueError(f"invalid spec key {key!r}")
+        if op in (">=", "<=", ">", "<") and _number(value) is None:
+            raise ValueError(f"spec.{key}{op} needs a number")
+        filters.append((key, op, value))
+    return filters
+
+
+def _compare(left, op: str, right):
+    return {
+        "=": left == right, "!=": left != right, ">=": left >= right,
+        "<=": left <= right, ">": left > right, "<": left < right,
+    }[op]
+
+
+def _sqlite_clause(key: str, op: str, value: str):
+    number = _number(value)
+    if op in ("=", "!="):
+        match = _attrs.c.value_text == value
+        if number is not None:
+            match = or_(match, _attrs.c.value_num == number)
+        ids = db.select(_attrs.c.item_id).where(_attrs.c.key == key, match)
+        if op == "=":
+            return Item.id.in_(ids)
+        has_key = db.select(_attrs.c.item_id).where(_attrs.c.key == key)
+        return Item.id.in_(has_key.except_(ids))
+    return Item.id.in_(
+        db.select(_attrs.c.item_id).where(_attrs.c.key == key, _compare(_attrs.c.value_num, op, number))
+    )
+
+
+def _postgres_clause(key: str, op: str, value: str):
+    # The column type is JSON with a JSONB variant; JSONB operators need the JSONB comparator.
+    spec = type_coerce(Item.spec, JSONB)
+    number = _number(value)
+    if op in ("=", "!="):
+        match = spec.contains({key: value})
+        if number is not None:
+            match = or_(match, spec.contains({key: number}))
+        if value in ("true", "false"):
+            match = or_(match, spec.contains({key: value == "true"}))
+        return match if op == "=" else db.and_(spec.has_key(key), ~match)
+    numeric = case((func.jsonb_typeof(spec[key]) == "number", spec[key].astext.cast(Numeric)))
+    return _compare(numeric, op, number)
+
+
+def _generic_clause(key: str, op: str, value: str):
+    number = _number(value)
+    if op in ("=", "!="):
+        match = Item.spec[key].as_string() == value
+        if number is not None:
+            match = or_(match, Item.spec[key].as_float() == number)
+        return match if op == "=" else db.and_(Item.spec[key].is_not(None), ~match)
+    return _compare(Item.spec[key].as_float(), op, number)
+
+
+def filter_clauses(filters: list[tuple[str, str, str]]) -> list:
+    """Return ``WHERE`` clauses on ``Item`` for :func:`parse_filters` output."""
+    dialect = db.session.get_bind().dialect.name
+    build = {"sqlite": _sqlite_clause, "postgresql": _postgres_clause}.get(dialect, _generic_clause)
+    return [build(key, op, value) for key, op, value in filters]
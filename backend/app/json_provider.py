@@ -0,0 +1,74 @@
+"""Fast JSON provider.
+
+Installed by ``create_app`` as ``app.json``, so ``jsonify`` and
+``request.get_json`` go through it. Encoding uses ``orjson`` when it is
+installed and the stdlib ``json`` module otherwise; both encode the
+values our queries return natively:
+
+- ``Decimal`` (``Numeric`` columns) as a JSON number,
+- ``date`` / ``datetime`` as ISO 8601 text,
+- NumPy scalars and arrays as numbers and lists.
+
+Routes and serializers can therefore hand rows straight to ``jsonify``
+without converting each value first. Keys keep their insertion order.
+"""
+from __future__ import annotations
+
+import json
+from datetime import date, datetime, time
+from decimal import Decimal
+from typing import Any
+
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - depends on the environment
+    orjson = None
+
+_ORJSON_OPTIONS = 0
+if orjson is not None:
+    _ORJSON_OPTIONS = orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY
+
+
+def _default(value: Any) -> Any:
+    """Encode the types neither encoder handles on its own."""
+    if isinstance(value, Decimal):
+        return float(value)
+    if isinstance(value, (datetime, date, time)):
+        return value.isoformat()
+    if hasattr(value, "tolist"):  # NumPy arrays and scalars
+        return value.tolist()
+    if isinstance(value, (set, frozenset)):
+        return list(value)
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+class FastJSONProvider(DefaultJSONProvider):
+    """JSON provider backed by orjson, falling back to the stdlib encoder."""
+
+    sort_keys = False
+    backend = "orjson" if orjson is not None else "json"
+
+    def dumpb(self, obj: Any) -> bytes:
+        """Serialize ``obj`` to UTF-8 JSON bytes."""
+        if orjson is not None:
+            return orjson.dumps(obj, default=_default, option=_ORJSON_OPTIONS)
+        return json.dumps(obj, default=_default, ensure_ascii=False,
+                          separators=(",", ":")).encode()
+
+    def dumps(self, obj: Any, **kwargs: Any) -> str:
+        if kwargs:
+            # Explicit stdlib options (indent, sort_keys, ...) are honoured.
+            kwargs.setdefault("default", _default)
+            return json.dumps(obj, **kwargs)
+        return self.dumpb(obj).decode()
+
+    def loads(self, s: str | bytes, **kwargs: Any) -> Any:
+        if orjson is not None and not kwargs:
+            return orjson.loads(s)
+        return json.loads(s, **kwargs)
+
+    def response(self, *args: Any, **kwargs: Any):
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(self.dumpb(obj) + b"\n", mimetype=self.mimetype)
@@ -0,0 +1,273 @@
+"""Per-request SQL and latency metrics in Prometheus text format.
+
+Flask's ``request_started`` / ``request_finished`` signals open and close
+a :class:`RequestStats` in ``flask.g``; SQLAlchemy
+``before_cursor_execute`` / ``after_cursor_execute`` events on every
+engine add each statement's count and time to the stats of the request
+that runs it. When the request finishes its figures are folded into the
+application's :class:`Registry`, labelled by URL rule (not path, so label
+cardinality stays bounded):
+
+- ``http_requests_total{endpoint,method,status}``
+- ``http_request_duration_seconds`` histogram per endpoint
+- ``http_request_db_queries`` histogram and ``db_queries_total`` /
+  ``db_query_duration_seconds_total`` counters per endpoint
+- ``n_plus_one_requests_total`` per endpoint
+
+and, per database bind whose pool is a :class:`app.routing.TimedQueuePool`:
+
+- ``db_pool_checkout_wait_seconds`` histogram and
+  ``db_pool_checkout_timeouts_total`` counter
+- ``db_pool_checked_out`` / ``db_pool_size`` gauges
+
+A request that runs the same normalised statement more than
+``METRICS_N_PLUS_ONE_THRESHOLD`` times is flagged as a likely N+1 with a
+warning log line and the counter above. Statements are counted by their
+raw text during the request (SQLAlchemy reuses the compiled string, so
+this is a cheap dict update) and only normalised once, at the end.
+
+Queries run while a streamed body is produced, after the view returned,
+are not attributed to the request. Metrics are per process.
+"""
+from __future__ import annotations
+
+import logging
+import re
+import threading
+import time
+from collections import Counter, defaultdict
+
+from flask import g, has_request_context, request, request_finished, request_started
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+logger = logging.getLogger(__name__)
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000)
+
+# Expanded IN lists and VALUES rows collapse to one placeholder group.
+_PLACEHOLDER_LIST = re.compile(r"\((?:\s*(?:\?|%s|%\(\w+\)s|\$\d+|:\w+)\s*,?)+\)")
+_NUMBER = re.compile(r"\b\d+\b")
+_SPACE = re.compile(r"\s+")
+
+
+def normalize(statement: str) -> str:
+    """Reduce a SQL statement to its shape: placeholder lists and numbers folded."""
+    statement = _PLACEHOLDER_LIST.sub("(?)", statement)
+    statement = _NUMBER.sub("N", statement)
+    return _SPACE.sub(" ", statement).strip()
+
+
+class RequestStats:
+    """SQL figures of one request."""
+
+    __slots__ = ("started", "queries", "db_time", "statements")
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.queries = 0
+        self.db_time = 0.0
+        self.statements: Counter = Counter()
+
+
+class Histogram:
+    """Cumulative-bucket histogram."""
+
+    __slots__ = ("bounds", "counts", "sum", "count")
+
+    def __init__(self, bounds):
+        self.bounds = bounds
+        self.counts = [0] * len(bounds)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        for i, bound in enumerate(self.bounds):
+            if value <= bound:
+                self.counts[i] += 1
+                break
+        self.sum += value
+        self.count += 1
+
+    def cumulative(self):
+        total = 0
+        for bound, n in zip(self.bounds, self.counts):
+            total += n
+            yield bound, total
+        yield "+Inf", self.count
+
+
+class Registry:
+    """Per-endpoint counters and histograms of one application."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.requests: Counter = Counter()
+        self.latency: dict[str, Histogram] = defaultdict(lambda: Histogram(LATENCY_BUCKETS))
+        self.query_counts: dict[str, Histogram] = defaultdict(lambda: Histogram(QUERY_BUCKETS))
+        self.queries: Counter = Counter()
+        self.db_time: Counter = Counter()
+        self.n_plus_one: Counter = Counter()
+
+    def record(self, endpoint: str, method: str, status: int, stats: RequestStats,
+               duration: float, n_plus_one: bool) -> None:
+        with self._lock:
+            self.requests[(endpoint, method, str(status))] += 1
+            self.latency[endpoint].observe(duration)
+            self.query_counts[endpoint].observe(stats.queries)
+            self.queries[endpoint] += stats.queries
+            self.db_time[endpoint] += stats.db_time
+            if n_plus_one:
+                self.n_plus_one[endpoint] += 1
+
+    def render(self, engines=None) -> str:
+        """Return all metrics in the Prometheus text exposition format.
+
+        Args:
+            engines: optional ``{bind_key: Engine}`` mapping (``db.engines``)
+                whose connection pools are reported too.
+        """
+        lines = []
+
+        def header(name, kind, text):
+            lines.append(f"# HELP {name} {text}")
+            lines.append(f"# TYPE {name} {kind}")
+
+        def histogram(name, histograms):
+            for endpoint, h in sorted(histograms.items()):
+                label = f'endpoint="{_escape(endpoint)}"'
+                for bound, total in h.cumulative():
+                    lines.append(f'{name}_bucket{{{label},le="{bound}"}} {total}')
+                lines.append(f"{name}_sum{{{label}}} {h.sum}")
+                lines.append(f"{name}_count{{{label}}} {h.count}")
+
+        def counter(name, values):
+            for endpoint, value in sorted(values.items()):
+                lines.append(f'{name}{{endpoint="{_escape(endpoint)}"}} {value}')
+
+        with self._lock:
+            header("http_requests_total", "counter", "Requests handled.")
+            for (endpoint, method, status), n in sorted(self.requests.items()):
+                lines.append(
+                    f'http_requests_total{{endpoint="{_escape(endpoint)}",'
+                    f'method="{method}",status="{status}"}} {n}'
+                )
+            header("http_request_duration_seconds", "histogram", "Request latency.")
+            histogram("http_request_duration_seconds", self.latency)
+            header("http_request_db_queries", "histogram", "SQL statements per request.")
+            histogram("http_request_db_queries", self.query_counts)
+            header("db_queries_total", "counter", "SQL statements run by requests.")
+            counter("db_queries_total", self.queries)
+            header("db_query_duration_seconds_total", "counter", "Time spent in SQL statements.")
+            counter("db_query_duration_seconds_total", self.db_time)
+            header("n_plus_one_requests_total", "counter",
+                   "Requests that repeated one SQL statement above the N+1 threshold.")
+            counter("n_plus_one_requests_total", self.n_plus_one)
+        if engines:
+            _render_pools(lines, header, engines)
+        return "\n".join(lines) + "\n"
+
+
+def _render_pools(lines, header, engines) -> None:
+    from app.routing import WAIT_BUCKETS
+
+    pools = sorted(
+        (key or "default", engine.pool) for key, engine in engines.items()
+        if hasattr(engine.pool, "checkout_stats")
+    )
+    if not pools:
+        return
+    header("db_pool_checkout_wait_seconds", "histogram", "Time spent waiting for a pooled connection.")
+    timeouts = []
+    for bind, pool in pools:
+        counts, total_sum, count, timed_out = pool.checkout_stats.snapshot()
+        label = f'bind="{_escape(bind)}"'
+        running = 0
+        for bound, n in zip(WAIT_BUCKETS, counts):
+            running += n
+            lines.append(f'db_pool_checkout_wait_seconds_bucket{{{label},le="{bound}"}} {running}')
+        lines.append(f'db_pool_checkout_wait_seconds_bucket{{{label},le="+Inf"}} {count}')
+        lines.append(f"db_pool_checkout_wait_seconds_sum{{{label}}} {total_sum}")
+        lines.append(f"db_pool_checkout_wait_seconds_count{{{label}}} {count}")
+        timeouts.append((label, timed_out))
+    header("db_pool_checkout_timeouts_total", "counter", "Checkouts that failed waiting for a connection.")
+    lines.extend(f"db_pool_checkout_timeouts_total{{{label}}} {n}" for label, n in timeouts)
+    header("db_pool_checked_out", "gauge", "Connections currently checked out.")
+    lines.extend(f'db_pool_checked_out{{bind="{_escape(b)}"}} {p.checkedout()}' for b, p in pools)
+    header("db_pool_size", "gauge", "Configured pool size (without overflow).")
+    lines.extend(f'db_pool_size{{bind="{_escape(b)}"}} {p.size()}' for b, p in pools)
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def get_registry(app) -> Registry:
+    return app.extensions["metrics"]
+
+
+# ----------------------------------------------------------------------
+# Hooks
+# ----------------------------------------------------------------------
+
+def _request_started(sender, **extra):
+    g._sql_stats = RequestStats()
+
+
+def _request_finished(sender, response, **extra):
+    stats = g.pop("_sql_stats", None)
+    if stats is None:
+        return
+    duration = time.perf_counter() - stats.started
+    endpoint = request.url_rule.rule if request.url_rule is not None else "unmatched"
+    threshold = sender.config["METRICS_N_PLUS_ONE_THRESHOLD"]
+    repeated = None
+    if stats.queries > threshold:
+        shapes: Counter = Counter()
+        for statement, n in stats.statements.items():
+            shapes[normalize(statement)] += n
+        shape, count = shapes.most_common(1)[0]
+        if count > threshold:
+            repeated = (shape, count)
+            logger.warning(
+                "N+1 suspected: %s %s ran %d times: %s",
+                request.method, endpoint, count, shape[:300],
+            )
+    get_registry(sender).record(
+        endpoint, request.method, response.status_code, stats, duration, repeated is not None
+    )
+
+
+@event.listens_for(Engine, "before_cursor_execute")
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("_query_started", []).append(time.perf_counter())
+
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = conn.info["_query_started"].pop()
+    if not has_request_context():
+        return
+    stats = g.get("_sql_stats")
+    if stats is not None:
+        stats.queries += 1
+        stats.db_time += time.perf_counter() - started
+        stats.statements[statement] += 1
+
+
+@event.listens_for(Engine, "handle_error")
+def _handle_error(context):
+    # A failed statement never reaches after_cursor_execute.
+    if context.connection is not None:
+        started = context.connection.info.get("_query_started")
+        if started:
+            started.pop()
+
+
+def init_app(app) -> None:
+    """Attach a registry to ``app`` and connect the request signals."""
+    app.extensions["metrics"] = Registry()
+    if app.config["METRICS_ENABLED"]:
+        request_started.connect(_request_started, app)
+        request_finished.connect(_request_finished, app)
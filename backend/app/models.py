@@ -1,10 +1,11 @@
 from datetime import datetime
 from sqlalchemy.dialects.postgresql import JSONB
 from sqlalchemy import (
-    Column, Integer, String, Text, Date, DateTime, Boolean, Numeric, ForeignKey, CheckConstraint
+    JSON, Column, Integer, String, Text, Date, DateTime, Boolean, Numeric, ForeignKey, CheckConstraint,
+    Index,
 )
 from sqlalchemy.orm import relationship
-from backend.app.db import db
+from app.db import db
 
 # --------------------------------------------
 # 🔹 Base Units and Catalog
@@ -31,8 +32,8 @@ class Item(db.Model):
     base_uom_id = Column(Integer, ForeignKey("uoms.id"))
     brand = Column(String)
     active = Column(Boolean, default=True)
-    # Use Text by default; if PostgreSQL is used, migrate this column to JSONB via Alembic
-    spec = Column(Text, default="{}")
+    # JSON object of free-form attributes (JSONB on PostgreSQL); filterable, see app.item_spec
+    spec = Column(JSON().with_variant(JSONB(), "postgresql"), default=dict)
     created_at = Column(DateTime, default=datetime.utcnow)
 
     category = relationship("ItemCategory")
@@ -46,7 +47,7 @@ class Item(db.Model):
 class Bom(db.Model):
     __tablename__ = "boms"
     id = Column(Integer, primary_key=True)
-    product_item_id = Column(Integer, ForeignKey("items.id"))
+    product_item_id = Column(Integer, ForeignKey("items.id"), index=True)
     version = Column(Integer, default=1)
     effective_from = Column(Date, default=datetime.utcnow)
     effective_to = Column(Date)
@@ -58,8 +59,8 @@ class Bom(db.Model):
 class BomLine(db.Model):
     __tablename__ = "bom_lines"
     id = Column(Integer, primary_key=True)
-    bom_id = Column(Integer, ForeignKey("boms.id", ondelete="CASCADE"))
-    component_item_id = Column(Integer, ForeignKey("items.id"))
+    bom_id = Column(Integer, ForeignKey("boms.id", ondelete="CASCADE"), index=True)
+    component_item_id = Column(Integer, ForeignKey("items.id"), index=True)
     qty_per = Column(Numeric(12, 4), nullable=False)
     uom_id = Column(Integer, ForeignKey("uoms.id"))
     scrap_pct = Column(Numeric(5, 2), default=0)
@@ -74,6 +75,19 @@ class BomLine(db.Model):
     uom = relationship("Uom")
 
 
+class BomClosure(db.Model):
+    """Every item below a product at every depth, maintained by :mod:`app.bom_closure`."""
+    __tablename__ = "bom_closure"
+    # Where-used reads the ancestors of one item, nearest first
+    __table_args__ = (Index("ix_bom_closure_descendant_id_depth", "descendant_id", "depth"),)
+    ancestor_id = Column(Integer, ForeignKey("items.id"), primary_key=True)
+    descendant_id = Column(Integer, ForeignKey("items.id"), primary_key=True)
+    depth = Column(Integer, primary_key=True)
+    # Number of BOM paths of this depth and their summed scrap-adjusted quantity per ancestor unit
+    paths = Column(Integer, nullable=False)
+    qty = Column(Numeric(18, 6), nullable=False)
+
+
 # --------------------------------------------
 # 🔹 Inventory and Warehouses
 # --------------------------------------------
@@ -88,7 +102,7 @@ class Warehouse(db.Model):
 class Location(db.Model):
     __tablename__ = "locations"
     id = Column(Integer, primary_key=True)
-    warehouse_id = Column(Integer, ForeignKey("warehouses.id"))
+    warehouse_id = Column(Integer, ForeignKey("warehouses.id"), index=True)
     code = Column(String)
     type = Column(String, CheckConstraint("type IN ('STORAGE','RECEIVING','SHIPPING','WIP')"))
 
@@ -98,7 +112,8 @@ class Location(db.Model):
 class StockOnHand(db.Model):
     __tablename__ = "stock_on_hand"
     item_id = Column(Integer, ForeignKey("items.id"), primary_key=True)
-    location_id = Column(Integer, ForeignKey("locations.id"), primary_key=True)
+    # The primary key leads with item_id; stock by location needs its own index
+    location_id = Column(Integer, ForeignKey("locations.id"), primary_key=True, index=True)
     lot_code = Column(String, primary_key=True, default="")
     qty = Column(Numeric(14, 4), default=0)
     uom_id = Column(Integer, ForeignKey("uoms.id"))
@@ -109,8 +124,22 @@ class StockOnHand(db.Model):
     uom = relationship("Uom")
 
 
+class StockAvailability(db.Model):
+    """On-hand quantity per item, warehouse and lot: ``stock_on_hand`` summed
+    over the locations of each warehouse, kept current by stock postings."""
+    __tablename__ = "stock_availability"
+    item_id = Column(Integer, ForeignKey("items.id"), primary_key=True)
+    # 0 for locations without a warehouse
+    warehouse_id = Column(Integer, primary_key=True)
+    lot_code = Column(String, primary_key=True, default="")
+    qty = Column(Numeric(14, 4), nullable=False, default=0)
+    updated_at = Column(DateTime, default=datetime.utcnow)
+
+
 class StockMove(db.Model):
     __tablename__ = "stock_moves"
+    # Item ledgers and as-of balances of given items read moves by item, then date
+    __table_args__ = (Index("ix_stock_moves_item_id_moved_at", "item_id", "moved_at"),)
     id = Column(Integer, primary_key=True)
     item_id = Column(Integer, ForeignKey("items.id"))
     from_location = Column(Integer)
@@ -120,7 +149,7 @@ class StockMove(db.Model):
     move_type = Column(String)
     ref_type = Column(String)
     ref_id = Column(Integer)
-    moved_at = Column(DateTime, default=datetime.utcnow)
+    moved_at = Column(DateTime, default=datetime.utcnow, index=True)
     lot_code = Column(String)
     unit_cost = Column(Numeric(12, 4))
 
@@ -128,6 +157,75 @@ class StockMove(db.Model):
     uom = relationship("Uom")
 
 
+class ItemCost(db.Model):
+    """Current cost state of an item, maintained by :mod:`app.costing`."""
+    __tablename__ = "item_costs"
+    item_id = Column(Integer, ForeignKey("items.id"), primary_key=True)
+    method = Column(String, CheckConstraint("method IN ('fifo','average')"), nullable=False)
+    qty = Column(Numeric(14, 4), nullable=False, default=0)
+    value = Column(Numeric(18, 4), nullable=False, default=0)
+    # Position of the last costed move; later postings are appended, earlier ones re-cost
+    last_moved_at = Column(DateTime)
+    last_move_id = Column(Integer)
+    # Price of receipts without unit_cost and of stock issued beyond what was received
+    last_receipt_cost = Column(Numeric(12, 4))
+    # FIFO: per lot, the receipt/issue positions and the open layers
+    lots = Column(JSON, nullable=False, default=dict)
+    updated_at = Column(DateTime, default=datetime.utcnow)
+
+
+class StockMoveCost(db.Model):
+    """Cost of one receipt or issue and the item's running totals after it."""
+    __tablename__ = "stock_move_costs"
+    # Valuation as of a date and re-costing read an item's costs by position
+    __table_args__ = (Index("ix_stock_move_costs_item_id_moved_at", "item_id", "moved_at", "move_id"),)
+    move_id = Column(Integer, ForeignKey("stock_moves.id"), primary_key=True)
+    item_id = Column(Integer, ForeignKey("items.id"), nullable=False)
+    lot_code = Column(String, nullable=False, default="")
+    moved_at = Column(DateTime, nullable=False)
+    qty = Column(Numeric(14, 4), nullable=False)
+    value = Column(Numeric(18, 4), nullable=False)
+    unit_cost = Column(Numeric(12, 4))
+    qty_after = Column(Numeric(14, 4), nullable=False)
+    value_after = Column(Numeric(18, 4), nullable=False)
+    # FIFO: cumulative received and issued quantity of the lot after this move
+    in_after = Column(Numeric(14, 4))
+    out_after = Column(Numeric(14, 4))
+
+
+class CostLayer(db.Model):
+    """FIFO receipt layer: ``qty`` at ``unit_cost`` from ``start_pos`` of its lot's stream."""
+    __tablename__ = "cost_layers"
+    __table_args__ = (Index("ix_cost_layers_item_id_lot_code_start_pos", "item_id", "lot_code", "start_pos"),)
+    move_id = Column(Integer, ForeignKey("stock_moves.id"), primary_key=True)
+    item_id = Column(Integer, ForeignKey("items.id"), nullable=False)
+    lot_code = Column(String, nullable=False, default="")
+    moved_at = Column(DateTime, nullable=False)
+    start_pos = Column(Numeric(14, 4), nullable=False)
+    qty = Column(Numeric(14, 4), nullable=False)
+    unit_cost = Column(Numeric(12, 4), nullable=False)
+
+
+class StockCheckpoint(db.Model):
+    """Materialised balances of all moves with ``moved_at < as_of``."""
+    __tablename__ = "stock_checkpoints"
+    id = Column(Integer, primary_key=True)
+    as_of = Column(DateTime, unique=True, nullable=False)
+    status = Column(String, CheckConstraint("status IN ('BUILDING','READY','STALE')"), nullable=False)
+    base_id = Column(Integer, ForeignKey("stock_checkpoints.id", ondelete="SET NULL"))
+    created_at = Column(DateTime, default=datetime.utcnow)
+    completed_at = Column(DateTime)
+
+
+class StockCheckpointBalance(db.Model):
+    __tablename__ = "stock_checkpoint_balances"
+    checkpoint_id = Column(Integer, ForeignKey("stock_checkpoints.id", ondelete="CASCADE"), primary_key=True)
+    item_id = Column(Integer, ForeignKey("items.id"), primary_key=True)
+    location_id = Column(Integer, ForeignKey("locations.id"), primary_key=True)
+    lot_code = Column(String, primary_key=True, default="")
+    qty = Column(Numeric(14, 4), nullable=False)
+
+
 # --------------------------------------------
 # 🔹 Procurement and Suppliers
 # --------------------------------------------
@@ -144,8 +242,10 @@ class Supplier(db.Model):
 
 class SupplierItem(db.Model):
     __tablename__ = "supplier_items"
+    # Sourcing looks offers up by item and keeps those with a price
+    __table_args__ = (Index("ix_supplier_items_item_id_price", "item_id", "price"),)
     id = Column(Integer, primary_key=True)
-    supplier_id = Column(Integer, ForeignKey("suppliers.id"))
+    supplier_id = Column(Integer, ForeignKey("suppliers.id"), index=True)
     item_id = Column(Integer, ForeignKey("items.id"))
     vendor_sku = Column(String)
     price = Column(Numeric(12, 4))
@@ -159,12 +259,14 @@ class SupplierItem(db.Model):
 class PurchaseOrder(db.Model):
     __tablename__ = "purchase_orders"
     id = Column(Integer, primary_key=True)
-    supplier_id = Column(Integer, ForeignKey("suppliers.id"))
+    supplier_id = Column(Integer, ForeignKey("suppliers.id"), index=True)
     po_number = Column(String, unique=True)
     status = Column(String)
     eta = Column(Date)
     currency = Column(String)
     total = Column(Numeric(12, 2))
+    # Unrounded sum(qty * price) of the lines; total is this rounded once
+    lines_total = Column(Numeric(20, 8))
     created_at = Column(DateTime, default=datetime.utcnow)
 
     supplier = relationship("Supplier", backref="purchase_orders")
@@ -173,8 +275,8 @@ class PurchaseOrder(db.Model):
 class PoLine(db.Model):
     __tablename__ = "po_lines"
     id = Column(Integer, primary_key=True)
-    po_id = Column(Integer, ForeignKey("purchase_orders.id", ondelete="CASCADE"))
-    item_id = Column(Integer, ForeignKey("items.id"))
+    po_id = Column(Integer, ForeignKey("purchase_orders.id", ondelete="CASCADE"), index=True)
+    item_id = Column(Integer, ForeignKey("items.id"), index=True)
     qty = Column(Numeric(12, 4))
     uom_id = Column(Integer, ForeignKey("uoms.id"))
     price = Column(Numeric(12, 4))
@@ -184,3 +286,15 @@ class PoLine(db.Model):
     po = relationship("PurchaseOrder", backref="lines")
     item = relationship("Item")
     uom = relationship("Uom")
+
+
+# --------------------------------------------
+# 🔹 System
+# --------------------------------------------
+
+class ResourceVersion(db.Model):
+    """Version counter of an API collection or resource, bumped by writes."""
+    __tablename__ = "resource_versions"
+    key = Column(String, primary_key=True)
+    version = Column(Integer, nullable=False, default=0)
+    updated_at = Column(DateTime, default=datetime.utcnow)
@@ -0,0 +1,220 @@
+"""Process-local cache of small, rarely written reference tables.
+
+Holds code->id and id->code maps for ``Uom`` and ``ItemCategory`` and the
+set of existing ``Supplier`` ids, so routes can resolve codes and check
+existence without a query per request.
+
+Each table has a version that is bumped after a commit that inserted,
+updated or deleted rows of it through the ORM session; the maps for a
+table are (re)loaded lazily on the first lookup after a bump. Bumps only
+see this process's commits, so the maps are also reloaded once they are
+older than ``REFCACHE_TTL`` seconds, which bounds how long a rename made
+by another process goes unnoticed. A lookup that misses the maps falls
+back to a point query, which also covers rows inserted by another
+process. Loads and point queries read the primary even
+in a request routed to a replica (:func:`app.routing.on_primary`).
+
+One cache lives in ``app.extensions["refcache"]`` per application.
+"""
+from __future__ import annotations
+
+import threading
+import time
+from collections import Counter
+
+from flask import current_app
+
+from app import cache_hooks, routing
+from app.db import db
+from app.models import ItemCategory, Supplier, Uom
+
+UOM = "uom"
+CATEGORY = "category"
+SUPPLIER = "supplier"
+
+_MODELS = {UOM: Uom, CATEGORY: ItemCategory, SUPPLIER: Supplier}
+_KIND_BY_MODEL = {model: kind for kind, model in _MODELS.items()}
+
+
+class ReferenceCache:
+    """Lazily loaded, version-invalidated maps of reference data."""
+
+    def __init__(self, ttl: float = 60):
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._versions = {kind: 0 for kind in _MODELS}
+        self._loaded: dict[str, int] = {}
+        self._loaded_at: dict[str, float] = {}
+        self._by_code: dict[str, dict[str, int]] = {}
+        self._by_id: dict[str, dict[int, str]] = {}
+        self._ids: set[int] = set()
+        self.hits: Counter = Counter()
+        self.misses: Counter = Counter()
+        self.loads: Counter = Counter()
+
+    # ------------------------------------------------------------------
+    # Loading and invalidation
+    # ------------------------------------------------------------------
+
+    def bump(self, kind: str) -> None:
+        """Mark ``kind`` as changed; the next lookup reloads it."""
+        with self._lock:
+            self._versions[kind] += 1
+
+    def _fresh(self, kind: str, version: int) -> bool:
+        return (self._loaded.get(kind) == version
+                and time.monotonic() - self._loaded_at[kind] < self.ttl)
+
+    def _ensure(self, kind: str) -> None:
+        if self._fresh(kind, self._versions[kind]):
+            return
+        with self._lock:
+            version = self._versions[kind]
+            if self._fresh(kind, version):
+                return
+            model = _MODELS[kind]
+            with routing.on_primary():
+                if kind == SUPPLIER:
+                    self._ids = set(db.session.execute(db.select(model.id)).scalars())
+                else:
+                    rows = db.session.execute(db.select(model.id, model.code)).all()
+                    self._by_code[kind] = {code: id_ for id_, code in rows}
+                    self._by_id[kind] = {id_: code for id_, code in rows}
+            self._loaded[kind] = version
+            self._loaded_at[kind] = time.monotonic()
+            self.loads[kind] += 1
+
+    # ------------------------------------------------------------------
+    # Lookups
+    # ------------------------------------------------------------------
+
+    def id_for(self, kind: str, code) -> int | None:
+        """Return the id of the ``kind`` row with ``code``, or None."""
+        if code is None:
+            return None
+        self._ensure(kind)
+        id_ = self._by_code[kind].get(code)
+        if id_ is not None:
+            self.hits[kind] += 1
+            return id_
+        self.misses[kind] += 1
+        model = _MODELS[kind]
+        with routing.on_primary():
+            id_ = db.session.execute(db.select(model.id).where(model.code == code)).scalar()
+        if id_ is not None:
+            self._by_code[kind][code] = id_
+            self._by_id[kind][id_] = code
+        return id_
+
+    def code_for(self, kind: str, id_) -> str | None:
+        """Return the code of the ``kind`` row with ``id_``, or None."""
+        if id_ is None:
+            return None
+        self._ensure(kind)
+        code = self._by_id[kind].get(id_)
+        if code is not None:
+            self.hits[kind] += 1
+            return code
+        self.misses[kind] += 1
+        model = _MODELS[kind]
+        with routing.on_primary():
+            code = db.session.execute(db.select(model.code).where(model.id == id_)).scalar()
+        if code is not None:
+            self._by_code[kind][code] = id_
+            self._by_id[kind][id_] = code
+        return code
+
+    def code_resolver(self, kind: str):
+        """Return a fast id->code function over the current map of ``kind``.
+
+        Meant for rendering many rows: the map is checked once, and only ids
+        missing from it go through :meth:`code_for`.
+        """
+        self._ensure(kind)
+        codes = self._by_id[kind]
+        hits = self.hits
+
+        def resolve(id_):
+            code = codes.get(id_)
+            if code is None:
+                return self.code_for(kind, id_)
+            hits[kind] += 1
+            return code
+
+        return resolve
+
+    def codes(self, kind: str) -> dict[str, int]:
+        """Return a snapshot of the code->id map for bulk resolution."""
+        self._ensure(kind)
+        self.hits[kind] += 1
+        return dict(self._by_code[kind])
+
+    def uom_id(self, code) -> int | None:
+        return self.id_for(UOM, code)
+
+    def uom_code(self, id_) -> str | None:
+        return self.code_for(UOM, id_)
+
+    def category_id(self, code) -> int | None:
+        return self.id_for(CATEGORY, code)
+
+    def category_code(self, id_) -> str | None:
+        return self.code_for(CATEGORY, id_)
+
+    def supplier_exists(self, supplier_id) -> bool:
+        """Return True when a supplier with ``supplier_id`` exists."""
+        self._ensure(SUPPLIER)
+        if supplier_id in self._ids:
+            self.hits[SUPPLIER] += 1
+            return True
+        self.misses[SUPPLIER] += 1
+        with routing.on_primary():
+            exists = db.session.get(Supplier, supplier_id) is not None
+        if not exists:
+            return False
+        self._ids.add(supplier_id)
+        return True
+
+    def stats(self) -> dict:
+        """Return hit/miss/load counters and the current version per table."""
+        return {
+            kind: {
+                "hits": self.hits[kind],
+                "misses": self.misses[kind],
+                "loads": self.loads[kind],
+                "version": self._versions[kind],
+            }
+            for kind in _MODELS
+        }
+
+
+def init_app(app) -> None:
+    """Attach a fresh cache to ``app``."""
+    app.extensions["refcache"] = ReferenceCache(ttl=app.config["REFCACHE_TTL"])
+
+
+def get_cache() -> ReferenceCache:
+    """Return the cache of the current application."""
+    return current_app.extensions["refcache"]
+
+
+# ----------------------------------------------------------------------
+# Version bumps: record which reference tables a flush touched and bump
+# them once the transaction commits (a rollback discards them).
+# ----------------------------------------------------------------------
+
+def _collect_changes(session, kinds: set) -> None:
+    for obj in (*session.new, *session.dirty, *session.deleted):
+        kind = _KIND_BY_MODEL.get(type(obj))
+        if kind:
+            kinds.add(kind)
+
+
+def _bump_versions(kinds: set) -> None:
+    cache = current_app.extensions.get("refcache")
+    if cache is not None:
+        for kind in kinds:
+            cache.bump(kind)
+
+
+cache_hooks.track("refcache_dirty", _collect_changes, _bump_versions)
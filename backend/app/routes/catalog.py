@@ -1,77 +1,269 @@
-from flask import Blueprint, request, jsonify, abort
+from flask import Blueprint, Response, abort, current_app, jsonify, request, stream_with_context
 from sqlalchemy.exc import IntegrityError
+from app.conditional import conditional, touch
 from app.db import db
-import json
 
 
 catalog_bp = Blueprint("catalog", __name__)
 
+# Ids and cursors are bound as BIGINT; larger values overflow the driver.
+_INT_MIN, _INT_MAX = -(2 ** 63), 2 ** 63 - 1
+
+def _int_arg(name: str, default: int | None = None) -> int | None:
+    """Read an integer query parameter, rejecting malformed or out-of-range values with 400."""
+    raw = request.args.get(name)
+    if raw is None or raw == "":
+        return default
+    try:
+        value = int(raw)
+    except ValueError:
+        abort(400, description=f"'{name}' must be an integer")
+    if not _INT_MIN <= value <= _INT_MAX:
+        abort(400, description=f"'{name}' is out of range")
+    return value
+
+
+def _ids_arg() -> list[int]:
+    """Read the comma-separated ``ids`` query parameter of a multi-get.
+
+    Duplicates are dropped and the request order is kept; malformed or
+    out-of-range ids, or more than ``MULTI_GET_MAX_IDS`` of them, are
+    rejected with 400.
+    """
+    try:
+        ids = list(dict.fromkeys(int(part) for part in request.args["ids"].split(",") if part.strip()))
+    except ValueError:
+        abort(400, description="'ids' must be a comma-separated list of integers")
+    if any(not _INT_MIN <= i <= _INT_MAX for i in ids):
+        abort(400, description="'ids' contains an id out of range")
+    if len(ids) > current_app.config["MULTI_GET_MAX_IDS"]:
+        abort(400, description=f"at most {current_app.config['MULTI_GET_MAX_IDS']} ids per request")
+    return ids
+
+
+def _wants_stream() -> bool:
+    """Return True when the client opted into NDJSON streaming."""
+    if request.args.get("stream", "").lower() in ("1", "true", "yes"):
+        return True
+    return request.accept_mimetypes.best == "application/x-ndjson"
+
+
 @catalog_bp.route("/items", methods=["GET"])
+@conditional("items")
 def list_items():
-    from app import db
-    from app.models import Item, ItemCategory
-    query = Item.query
+    """List catalog items with keyset pagination on ``Item.id``.
+
+    Query params:
+        ids: comma-separated item ids to fetch in one call (multi-get); the
+            items come back in that order, unknown ids are left out and the
+            other parameters are ignored.
+        category: optional category code filter.
+        q: optional search over sku, name, brand and spec (token prefixes).
+        spec.<key><op><value>: spec attribute filters, e.g.
+            ``spec.color=navy&spec.weight_gsm>=250`` (see :mod:`app.item_spec`).
+        after: only return items whose id is greater than this cursor.
+        limit: page size, capped by ``ITEMS_PAGE_MAX_LIMIT``.
+        stream: when truthy (or ``Accept: application/x-ndjson``) every
+            matching row is streamed as NDJSON from a server-side cursor;
+            ``limit`` is then optional.
+
+    Returns:
+        A JSON list with one page of items. When more rows exist the
+        ``X-Next-After`` header carries the cursor for the next page.
+    """
+    from app import dataloader, item_spec, refcache, search
+    from app.models import Item
+    from app.serializers import ITEM
+
+    if "ids" in request.args:
+        return jsonify(dataloader.item_dicts(_ids_arg()))
+    try:
+        spec_filters = item_spec.parse_filters(request.args)
+    except ValueError as e:
+        abort(400, description=str(e))
+    after = _int_arg("after")
+    limit = _int_arg("limit")
+    if limit is not None and limit < 1:
+        abort(400, description="'limit' must be positive")
+
+    # Category and UoM codes are resolved from the reference-data cache
+    # instead of two lazy loads per item.
+    stmt = ITEM.select()
     category = request.args.get("category")
     q = request.args.get("q")
     if category:
-        query = query.join(ItemCategory).filter(ItemCategory.code == category)
+        category_id = refcache.get_cache().category_id(category)
+        if category_id is None:
+            return jsonify([])
+        stmt = stmt.where(Item.category_id == category_id)
     if q:
-        query = query.filter(Item.name.ilike(f"%{q}%"))
-    items = query.all()
-    return jsonify([
-        {
-            "id": item.id,
-            "sku": item.sku,
-            "name": item.name,
-            "category": item.category.code if item.category else None,
-            "base_uom": item.uom.code if item.uom else None,
-            "brand": item.brand,
-            "active": item.active,
-            "spec": item.spec,
-        }
-        for item in items
-    ])
+        hits = search.matches(q)
+        if hits is None:
+            return jsonify([])
+        stmt = stmt.where(Item.id.in_(db.select(hits.c.id)))
+    if spec_filters:
+        stmt = stmt.where(*item_spec.filter_clauses(spec_filters))
+    if after is not None:
+        stmt = stmt.where(Item.id > after)
+
+    if _wants_stream():
+        if limit is not None:
+            stmt = stmt.limit(limit)
+        stmt = stmt.execution_options(yield_per=current_app.config["ITEMS_STREAM_CHUNK"])
+
+        render = ITEM.renderer()
+        dumpb = current_app.json.dumpb
+
+        def generate():
+            for row in db.session.execute(stmt):
+                yield dumpb(render(row)) + b"\n"
+
+        return Response(stream_with_context(generate()), mimetype="application/x-ndjson")
+
+    if limit is None:
+        limit = current_app.config["ITEMS_PAGE_LIMIT"]
+    limit = min(limit, current_app.config["ITEMS_PAGE_MAX_LIMIT"])
+    # Fetch one extra row to know whether another page exists.
+    rows = db.session.execute(stmt.limit(limit + 1)).all()
+    resp = jsonify(ITEM.rows(rows[:limit]))
+    if len(rows) > limit:
+        resp.headers["X-Next-After"] = str(rows[limit - 1][0])
+    return resp
+
+@catalog_bp.route("/items/search", methods=["GET"])
+@conditional("items")
+def search_items():
+    """Ranked item search for the catalog search box.
+
+    Query params:
+        q: search text; every word is prefix-matched against sku, name,
+            brand and spec.
+        limit: maximum number of results (default ``SEARCH_DEFAULT_LIMIT``,
+            capped by ``SEARCH_MAX_LIMIT``).
+
+    Returns:
+        A JSON list of items, best match first.
+    """
+    from app import search
+
+    q = request.args.get("q", "")
+    limit = _int_arg("limit", current_app.config["SEARCH_DEFAULT_LIMIT"])
+    if limit < 1:
+        abort(400, description="'limit' must be positive")
+    limit = min(limit, current_app.config["SEARCH_MAX_LIMIT"])
+    return jsonify(search.search_items(q, limit))
 
 @catalog_bp.route("/items/<int:item_id>", methods=["GET"])
+@conditional("items:{item_id}", "items:bulk", cache=True)
 def get_item(item_id):
     from app.models import Item
-    item = Item.query.get_or_404(item_id)
+    from app.serializers import ITEM
+    row = db.session.execute(ITEM.select().where(Item.id == item_id)).first()
+    if row is None:
+        abort(404)
+    return jsonify(ITEM.row(row))
+
+@catalog_bp.route("/items/<int:item_id>/sources", methods=["GET"])
+def item_sources(item_id):
+    """Rank the suppliers of an item for a requested quantity.
+
+    Served from the sourcing index (:mod:`app.sourcing`), not a table scan.
+
+    Query params:
+        qty: quantity needed (default 1); orders are rounded up to the MOQ.
+        need_by: optional ISO date; suppliers whose lead time meets it rank first.
+        currency: optional, only rank offers in this currency.
+
+    Returns:
+        JSON with the item, request and ``sources`` best first, each with
+        order quantity, total and effective unit cost and availability date.
+    """
+    from datetime import date
+    from decimal import Decimal, InvalidOperation
+    from app import sourcing
+    from app.models import Item
+
+    if db.session.get(Item, item_id) is None:
+        abort(404)
+    try:
+        qty = Decimal(request.args.get("qty", "1"))
+    except InvalidOperation:
+        abort(400, description="'qty' must be a number")
+    if not qty.is_finite() or qty <= 0:
+        abort(400, description="'qty' must be positive")
+    try:
+        need_by = date.fromisoformat(request.args["need_by"]) if request.args.get("need_by") else None
+    except ValueError:
+        abort(400, description="'need_by' must be an ISO date")
+
+    offers = sourcing.get_index().sources_for([item_id])[item_id]
+    quotes = sourcing.rank(offers, qty, need_by, currency=request.args.get("currency"))
     return jsonify({
-        "id": item.id,
-        "sku": item.sku,
-        "name": item.name,
-        "category": item.category.code if item.category else None,
-        "base_uom": item.uom.code if item.uom else None,
-        "brand": item.brand,
-        "active": item.active,
-        "spec": item.spec,
+        "item_id": item_id,
+        "qty": qty,
+        "need_by": need_by.isoformat() if need_by else None,
+        "sources": [q.to_dict() for q in quotes],
+    })
+
+
+@catalog_bp.route("/items/<int:item_id>/where_used", methods=["GET"])
+@conditional("boms", cache=True)
+def item_where_used(item_id):
+    """List every product that contains an item, at any BOM depth.
+
+    Answered from the BOM closure table (:mod:`app.bom_closure`).
+
+    Query params:
+        depth: optional maximum number of BOM levels up (1 = direct parents).
+
+    Returns:
+        JSON with ``item_id``, ``depth`` and ``used_in``: the products
+        nearest first, each with ``item_id``, the shallowest ``depth`` it
+        uses the item at and the total scrap-adjusted ``qty`` per unit.
+    """
+    from app import bom_closure
+    from app.models import Item
+
+    depth = _int_arg("depth")
+    if depth is not None and depth < 1:
+        abort(400, description="'depth' must be at least 1")
+    rows = bom_closure.where_used(item_id, depth)
+    if not rows and db.session.get(Item, item_id) is None:
+        abort(404)
+    return jsonify({
+        "item_id": item_id,
+        "depth": depth,
+        "used_in": [{"item_id": a, "depth": d, "qty": qty} for a, d, qty in rows],
     })
 
 @catalog_bp.route("/items", methods=["POST"])
 def create_item():
-    from app import db
-    from app.models import Item, ItemCategory, Uom
+    from app import item_spec, refcache
+    from app.models import Item
     data = request.get_json()
+    # Parsed once here; stored as a JSON object (JSONB on PostgreSQL)
     try:
-        category = ItemCategory.query.filter_by(code=data["category"]).first()
-        uom = Uom.query.filter_by(code=data["base_uom"]).first()
-        if not category or not uom:
+        spec_value = item_spec.parse(data.get("spec"))
+    except ValueError as e:
+        abort(400, description=str(e))
+    try:
+        cache = refcache.get_cache()
+        category_id = cache.category_id(data["category"])
+        uom_id = cache.uom_id(data["base_uom"])
+        if category_id is None or uom_id is None:
             abort(400, description="Invalid category or UoM.")
-        # Serialize 'spec' as a JSON string to store in a Text column
-        spec_value = data.get("spec", {})
-        if not isinstance(spec_value, str):
-            spec_value = json.dumps(spec_value)
 
         item = Item(
             sku=data["sku"],
             name=data["name"],
-            category_id=category.id,
-            base_uom_id=uom.id,
+            category_id=category_id,
+            base_uom_id=uom_id,
             brand=data.get("brand"),
             active=data.get("active", True),
             spec=spec_value,
         )
         db.session.add(item)
+        touch("items")
         db.session.commit()
         return jsonify({"id": item.id}), 201
     except IntegrityError:
@@ -81,9 +273,61 @@ def create_item():
         db.session.rollback()
         abort(400, description=str(e))
 
+@catalog_bp.route("/items/bulk", methods=["POST"])
+def bulk_import_items():
+    """Import many items from a streamed CSV or NDJSON body.
+
+    The format comes from ``?format=csv|ndjson`` or the Content-Type
+    (``text/csv`` / ``application/x-ndjson``). CSV needs a header row with
+    ``sku,name,category,base_uom`` and optional ``brand,active,spec``.
+
+    Query params:
+        batch_size: rows per insert statement (default ``BULK_IMPORT_BATCH_SIZE``).
+        on_conflict: ``update`` (default) overwrites existing SKUs, ``skip`` keeps them.
+
+    Returns:
+        JSON report with processed/written/skipped/failed counters and
+        per-row errors. A body that stops being readable (bad encoding,
+        malformed CSV) answers 400 with the report of the rows before it
+        and the reason in ``fatal``.
+    """
+    from app import item_import
+
+    fmt = request.args.get("format")
+    if fmt is None:
+        fmt = "csv" if request.mimetype in ("text/csv", "application/csv") else "ndjson"
+        if fmt == "ndjson" and request.mimetype not in ("application/x-ndjson", "application/jsonl"):
+            abort(415, description="Send text/csv or application/x-ndjson, or pass ?format=")
+    if fmt not in item_import.FORMATS:
+        abort(400, description="'format' must be csv or ndjson")
+    on_conflict = request.args.get("on_conflict", "update")
+    if on_conflict not in item_import.CONFLICT_MODES:
+        abort(400, description="'on_conflict' must be update or skip")
+    batch_size = _int_arg("batch_size", current_app.config["BULK_IMPORT_BATCH_SIZE"])
+    if batch_size < 1:
+        abort(400, description="'batch_size' must be positive")
+
+    try:
+        report = item_import.import_items(
+            item_import.iter_records(request.stream, fmt),
+            batch_size=batch_size,
+            on_conflict=on_conflict,
+            max_errors=current_app.config["BULK_IMPORT_MAX_ERRORS"],
+        )
+    finally:
+        # Batches are committed as they go; bump versions even if a later one failed.
+        db.session.rollback()
+        if on_conflict == "update":
+            # Overwritten SKUs change existing item resources too.
+            touch("items", "items:bulk")
+        else:
+            touch("items")
+        db.session.commit()
+    return jsonify(report), 400 if report["fatal"] else 200
+
 @catalog_bp.route("/boms", methods=["POST"])
 def create_bom():
-    from app import db
+    from app import bom_closure, db
     from app.models import Bom, BomLine
     data = request.get_json()
     try:
@@ -110,30 +354,33 @@ def create_bom():
                 notes=line.get("notes"),
             )
             db.session.add(bom_line)
+        db.session.flush()
+        bom_closure.refresh(bom.product_item_id)
+        touch("boms")
         db.session.commit()
         return jsonify({"id": bom.id}), 201
     except Exception as e:
         db.session.rollback()
         abort(400, description=str(e))
 
-@catalog_bp.route("/boms/<int:bom_id>", methods=["GET"])
-def get_bom(bom_id):
-    from app.models import Bom
-    bom = Bom.query.get_or_404(bom_id)
-    return jsonify({
+def _bom_dict(bom, lines: bool = True) -> dict:
+    """Render a BOM header and, with ``lines``, its lines."""
+    out = {
         "id": bom.id,
         "product_item_id": bom.product_item_id,
         "version": bom.version,
-        "effective_from": str(bom.effective_from) if bom.effective_from else None,
-        "effective_to": str(bom.effective_to) if bom.effective_to else None,
+        "effective_from": bom.effective_from,
+        "effective_to": bom.effective_to,
         "notes": bom.notes,
-        "lines": [
+    }
+    if lines:
+        out["lines"] = [
             {
                 "id": line.id,
                 "component_item_id": line.component_item_id,
-                "qty_per": float(line.qty_per),
+                "qty_per": line.qty_per,
                 "uom_id": line.uom_id,
-                "scrap_pct": float(line.scrap_pct) if line.scrap_pct else 0,
+                "scrap_pct": line.scrap_pct or 0,
                 "is_optional": line.is_optional,
                 "alt_group": line.alt_group,
                 "color_match_rule": line.color_match_rule,
@@ -142,19 +389,153 @@ def get_bom(bom_id):
             }
             for line in bom.lines
         ]
+    return out
+
+
+@catalog_bp.route("/boms/<int:bom_id>", methods=["GET"])
+@conditional("boms:{bom_id}", cache=True)
+def get_bom(bom_id):
+    from app.models import Bom
+    bom = Bom.query.get_or_404(bom_id)
+    return jsonify(_bom_dict(bom))
+
+
+@catalog_bp.route("/boms/<int:bom_id>/explode", methods=["GET"])
+def explode_bom(bom_id):
+    """Multi-level explosion of a BOM into aggregated requirements.
+
+    Query params:
+        qty: number of parent units (default 1).
+        include_optional: expand ``is_optional`` lines too (default false).
+        on: ISO date used to pick sub-assembly BOM versions (default today).
+
+    Returns:
+        JSON with scrap-adjusted gross quantities per purchased component
+        and per sub-assembly.
+    """
+    from datetime import date
+    from decimal import Decimal, InvalidOperation
+    from app.bom_explosion import BomCycleError, BomGraph
+    from app.models import Bom
+
+    if db.session.get(Bom, bom_id) is None:
+        abort(404)
+    try:
+        qty = Decimal(request.args.get("qty", "1"))
+    except InvalidOperation:
+        abort(400, description="'qty' must be a number")
+    if not qty.is_finite() or qty <= 0:
+        abort(400, description="'qty' must be positive")
+    try:
+        on = date.fromisoformat(request.args["on"]) if request.args.get("on") else None
+    except ValueError:
+        abort(400, description="'on' must be an ISO date")
+    include_optional = request.args.get("include_optional", "").lower() in ("1", "true", "yes")
+
+    graph = BomGraph.load(bom_ids=[bom_id], on=on)
+    try:
+        explosion = graph.explode(bom_id, qty, include_optional=include_optional)
+    except BomCycleError as e:
+        abort(400, description=str(e))
+    return jsonify(explosion.to_dict())
+
+
+@catalog_bp.route("/boms/<int:bom_id>/cost", methods=["GET"])
+def bom_cost(bom_id):
+    """Rolled-up standard cost of one unit of a BOM's product.
+
+    Components with BOMs of their own are costed through their latest
+    version, recursively; see :mod:`app.cost_rollup` for the prices used.
+    Sub-assembly costs are memoized across requests.
+
+    Returns:
+        JSON with ``bom_id``, ``product_item_id``, the unit ``cost``,
+        ``complete`` (false when some leaf has no price), the
+        ``missing_prices`` item ids and per component ``item_id``, the
+        scrap-adjusted ``qty``, ``unit_cost``, ``cost`` and ``source``.
+    """
+    from collections import defaultdict
+    from decimal import Decimal
+    from app import cost_rollup
+    from app.bom_explosion import BomCycleError, effective_qty
+    from app.models import Bom, BomLine
+
+    bom = db.session.get(Bom, bom_id)
+    if bom is None:
+        abort(404)
+    qtys = defaultdict(Decimal)
+    for component_id, qty_per, scrap_pct in db.session.execute(
+        db.select(BomLine.component_item_id, BomLine.qty_per, BomLine.scrap_pct)
+        .where(BomLine.bom_id == bom_id).order_by(BomLine.id)
+    ):
+        qtys[component_id] += effective_qty(qty_per, scrap_pct)
+    try:
+        costs = cost_rollup.get_rollup().costs(qtys)
+    except BomCycleError as e:
+        abort(400, description=str(e))
+    components, missing = [], set()
+    for item_id, qty in qtys.items():
+        rolled = costs[item_id]
+        missing |= rolled.missing
+        components.append({
+            "item_id": item_id,
+            "qty": qty,
+            "unit_cost": rolled.cost,
+            "cost": (qty * rolled.cost).quantize(Decimal("0.000001")) if rolled.cost is not None else None,
+            "source": rolled.source,
+        })
+    return jsonify({
+        "bom_id": bom.id,
+        "product_item_id": bom.product_item_id,
+        "cost": sum((c["cost"] for c in components if c["cost"] is not None), Decimal(0)),
+        "complete": not missing,
+        "missing_prices": sorted(missing),
+        "components": components,
     })
 
 
 @catalog_bp.route("/boms", methods=["GET"])
+@conditional("boms", "items")
 def list_boms():
-    """Simple listing of BOMs for the API.
+    """Simple listing of BOMs for the API, or a multi-get with ``ids``.
+
+    Query params:
+        ids: comma-separated BOM ids to fetch in one call; the BOMs come
+            back in that order with all header fields, unknown ids left out.
+        include: with ``ids``, comma-separated extras: ``lines`` (as in
+            ``GET /boms/<id>``) and ``components`` (the distinct component
+            items, rendered as in ``GET /items``).
 
     Returns:
         A JSON list with the main fields for each BOM.
     """
-    from app.models import Bom
-    boms = Bom.query.all()
-    return jsonify([
-        {"id": b.id, "product_item_id": b.product_item_id, "version": b.version}
-        for b in boms
-    ])
+    from app import dataloader
+    from app.serializers import BOM
+
+    if "ids" not in request.args:
+        return jsonify(BOM.fetch())
+    include = {part.strip() for part in request.args.get("include", "").split(",") if part.strip()}
+    if include - {"lines", "components"}:
+        abort(400, description="'include' accepts lines and components")
+    ids = _ids_arg()
+
+    # One query for the BOMs and their lines, one per related type for all components.
+    boms = dataloader.get_loaders().boms.load_many(ids)
+    components = {}
+    if "components" in include:
+        component_ids = [line.component_item_id for bom in boms.values() for line in bom.lines]
+        components = {item["id"]: item for item in dataloader.item_dicts(component_ids)}
+    out = []
+    for bom_id in ids:
+        bom = boms.get(bom_id)
+        if bom is None:
+            continue
+        entry = _bom_dict(bom, lines="lines" in include)
+        if "components" in include:
+            entry["components"] = [
+                components[item_id]
+                for item_id in dict.fromkeys(line.component_item_id for line in bom.lines)
+                if item_id in components
+            ]
+        out.append(entry)
+    return jsonify(out)
@@ -0,0 +1,83 @@
+"""Export routes.
+
+Blueprint for background table exports (:mod:`app.exports`).
+
+Routes:
+ - POST /exports
+ - GET /exports/<id>
+ - POST /exports/<id>/cancel
+ - GET /exports/<id>/download
+"""
+from flask import Blueprint, abort, jsonify, request, send_file, url_for
+from werkzeug.exceptions import TooManyRequests
+
+exports_bp = Blueprint("exports", __name__)
+
+
+def _job(job_id: str) -> dict:
+    from app import exports
+
+    job = exports.get_manager().get(job_id)
+    if job is None:
+        abort(404, description="export not found")
+    return job
+
+
+@exports_bp.route("/exports", methods=["POST"])
+def create_export():
+    """Queue an export of a whole table.
+
+    Args:
+        request.json: {"source": "items" | "po_lines" | "stock_moves",
+            "format": "csv" (default) | "parquet"}
+
+    Returns:
+        202 with the job status and a Location header to poll; 429 when
+        too many exports are already queued or running.
+    """
+    from app import exports
+
+    data = request.get_json(silent=True) or {}
+    try:
+        job = exports.get_manager().submit(data.get("source"), data.get("format", "csv"))
+    except exports.ExportError as exc:
+        abort(400, description=str(exc))
+    except exports.ExportsBusy as exc:
+        raise TooManyRequests(description=str(exc), retry_after=30)
+    response = jsonify(job)
+    response.status_code = 202
+    response.headers["Location"] = url_for("exports.get_export", job_id=job["id"])
+    return response
+
+
+@exports_bp.route("/exports/<job_id>", methods=["GET"])
+def get_export(job_id: str):
+    """Return the status and progress (rows_written / total_rows) of an export."""
+    return jsonify(_job(job_id))
+
+
+@exports_bp.route("/exports/<job_id>/cancel", methods=["POST"])
+def cancel_export(job_id: str):
+    """Request cancellation of a queued or running export (409 if finished)."""
+    from app import exports
+
+    job = _job(job_id)
+    if job["status"] in exports.FINISHED:
+        abort(409, description=f"export is already {job['status']}")
+    exports.get_manager().cancel(job_id)
+    return jsonify(job), 202
+
+
+@exports_bp.route("/exports/<job_id>/download", methods=["GET"])
+def download_export(job_id: str):
+    """Send the finished export file (409 until the job is done)."""
+    from app import exports
+
+    job = _job(job_id)
+    if job["status"] != exports.DONE:
+        abort(409, description=f"export is {job['status']}")
+    mimetype = "text/csv" if job["format"] == "csv" else "application/vnd.apache.parquet"
+    return send_file(
+        exports.get_manager().output_path(job), mimetype=mimetype, as_attachment=True,
+        download_name=f"{job['source']}-{job['id'][:8]}.{job['format']}",
+    )
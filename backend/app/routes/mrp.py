@@ -0,0 +1,49 @@
+"""Planning routes.
+
+Blueprint exposing material requirements planning runs.
+
+Routes:
+ - POST /mrp/runs
+"""
+from datetime import date
+
+from flask import Blueprint, abort, current_app, jsonify, request
+
+from app.db import db
+
+mrp_bp = Blueprint("mrp", __name__)
+
+
+@mrp_bp.route("/mrp/runs", methods=["POST"])
+def create_mrp_run():
+    """Run MRP over a demand list and return the planned orders.
+
+    Args:
+        request.json: {"demand": [{"item_id", "qty", "due_date"}, ...],
+            "today": optional ISO planning date}
+
+    Returns:
+        JSON with ``planned_orders`` (make/buy orders per item with due
+        date, order date and suggested supplier) and run ``stats``.
+    """
+    from app import mrp
+    from app.bom_explosion import BomCycleError
+    from app.models import Item
+
+    data = request.get_json() or {}
+    try:
+        demand = mrp.parse_demand(data.get("demand"))
+        today = date.fromisoformat(data["today"]) if data.get("today") else None
+    except ValueError as e:
+        abort(400, description=str(e))
+
+    item_ids = {item_id for item_id, _, _ in demand}
+    found = set(db.session.execute(db.select(Item.id).where(Item.id.in_(item_ids))).scalars())
+    if found != item_ids:
+        abort(400, description=f"unknown item ids: {sorted(item_ids - found)}")
+
+    run = mrp.MrpRun(demand, current_app.config["MRP_CLOSED_PO_STATUSES"], today=today)
+    try:
+        return jsonify(run.run())
+    except BomCycleError as e:
+        abort(400, description=str(e))
@@ -6,11 +6,15 @@ Routes:
  - POST /suppliers, GET /suppliers
  - POST /supplier_items, GET /supplier_items
  - POST /pos, GET /pos
- - POST /pos/<id>/lines
+ - POST /pos/<id>/lines, POST /pos/<id>/lines:batch
+
+GET routes answer conditional requests from collection versions
+(:mod:`app.conditional`); every write route touches the versions it changes.
 
 Docstrings follow Google style and include explanatory comments.
 """
 from flask import Blueprint, request, jsonify, abort
+from app.conditional import conditional, touch
 from app.db import db
 
 procurement_bp = Blueprint("procurement", __name__)
@@ -41,27 +45,18 @@ def create_supplier():
         currency=data.get("currency"),
     )
     db.session.add(supplier)
+    touch("suppliers")
     db.session.commit()
     return jsonify({"id": supplier.id}), 201
 
 
 @procurement_bp.route("/suppliers", methods=["GET"])
+@conditional("suppliers")
 def list_suppliers():
     """Return list of suppliers."""
-    from app.models import Supplier
+    from app.serializers import SUPPLIER
 
-    suppliers = Supplier.query.all()
-    return jsonify([
-        {
-            "id": s.id,
-            "name": s.name,
-            "country": s.country,
-            "payment_terms": s.payment_terms,
-            "lead_time_days": s.lead_time_days,
-            "currency": s.currency,
-        }
-        for s in suppliers
-    ])
+    return jsonify(SUPPLIER.fetch())
 
 
 @procurement_bp.route("/supplier_items", methods=["POST"])
@@ -76,11 +71,12 @@ def create_supplier_item():
     if not supplier_id or not item_id:
         abort(400, description="supplier_id and item_id are required")
 
-    from app.models import Supplier, Item, SupplierItem
+    from app import refcache
+    from app.models import Item, SupplierItem
 
-    if not Supplier.query.get(supplier_id):
+    if not refcache.get_cache().supplier_exists(supplier_id):
         abort(400, description="supplier not found")
-    if not Item.query.get(item_id):
+    if db.session.get(Item, item_id) is None:
         abort(400, description="item not found")
 
     si = SupplierItem(
@@ -92,28 +88,18 @@ def create_supplier_item():
         incoterms=data.get("incoterms"),
     )
     db.session.add(si)
+    touch("supplier_items")
     db.session.commit()
     return jsonify({"id": si.id}), 201
 
 
 @procurement_bp.route("/supplier_items", methods=["GET"])
+@conditional("supplier_items")
 def list_supplier_items():
     """List supplier items."""
-    from app.models import SupplierItem
-
-    items = SupplierItem.query.all()
-    return jsonify([
-        {
-            "id": i.id,
-            "supplier_id": i.supplier_id,
-            "item_id": i.item_id,
-            "vendor_sku": i.vendor_sku,
-            "price": float(i.price) if i.price is not None else None,
-            "moq": float(i.moq) if i.moq is not None else None,
-            "incoterms": i.incoterms,
-        }
-        for i in items
-    ])
+    from app.serializers import SUPPLIER_ITEM
+
+    return jsonify(SUPPLIER_ITEM.fetch())
 
 
 @procurement_bp.route("/pos", methods=["POST"])
@@ -128,9 +114,10 @@ def create_po():
     if not supplier_id:
         abort(400, description="supplier_id is required")
 
-    from app.models import Supplier, PurchaseOrder
+    from app import refcache
+    from app.models import PurchaseOrder
 
-    if not Supplier.query.get(supplier_id):
+    if not refcache.get_cache().supplier_exists(supplier_id):
         abort(400, description="supplier not found")
 
     po = PurchaseOrder(
@@ -140,70 +127,148 @@ def create_po():
         eta=data.get("eta"),
         currency=data.get("currency"),
         total=0,
+        lines_total=0,
     )
     db.session.add(po)
+    touch("pos")
     db.session.commit()
     return jsonify({"id": po.id}), 201
 
 
 @procurement_bp.route("/pos", methods=["GET"])
+@conditional("pos")
 def list_pos():
     """List purchase orders."""
+    from app.serializers import PURCHASE_ORDER
+
+    return jsonify(PURCHASE_ORDER.fetch())
+
+
+def _lock_po(po_id: int):
+    """Load a PO with its row locked until the end of the transaction (404 if missing)."""
     from app.models import PurchaseOrder
 
-    pos = PurchaseOrder.query.all()
-    return jsonify([
-        {
-            "id": p.id,
-            "supplier_id": p.supplier_id,
-            "po_number": p.po_number,
-            "status": p.status,
-            "eta": str(p.eta) if p.eta else None,
-            "currency": p.currency,
-            "total": float(p.total) if p.total is not None else None,
-        }
-        for p in pos
-    ])
+    po = db.session.execute(
+        db.select(PurchaseOrder.id).where(PurchaseOrder.id == po_id).with_for_update()
+    ).scalar()
+    if po is None:
+        abort(404, description="PO not found")
 
 
-@procurement_bp.route("/pos/<int:po_id>/lines", methods=["POST"])
-def add_po_line(po_id: int):
-    """Add a line to a PO and recalculate the PO total.
+def _line_values(data: dict, po_id: int) -> dict:
+    """Validate one line payload and return its column values."""
+    from decimal import Decimal, InvalidOperation
 
-    The total is computed as sum(qty * price) for all lines of the PO.
-    """
-    data = request.get_json() or {}
     qty = data.get("qty")
     item_id = data.get("item_id")
-    uom_id = data.get("uom_id")
     price = data.get("price")
     if qty is None or item_id is None or price is None:
         abort(400, description="qty, item_id and price are required")
+    if not isinstance(item_id, int) or isinstance(item_id, bool):
+        abort(400, description="item_id must be an integer")
+    try:
+        qty, price = Decimal(str(qty)), Decimal(str(price))
+    except InvalidOperation:
+        abort(400, description="qty and price must be numbers")
+    if not qty.is_finite() or not price.is_finite():
+        abort(400, description="qty and price must be finite numbers")
+    return {
+        "po_id": po_id,
+        "item_id": item_id,
+        "qty": qty,
+        "uom_id": data.get("uom_id"),
+        "price": price,
+        "lot_request": data.get("lot_request"),
+        "shade_request": data.get("shade_request"),
+    }
+
+
+def _add_to_total(po_id: int, delta):
+    """Add ``delta`` to the PO total atomically and return the new total.
+
+    The delta accumulates in the unrounded ``lines_total`` and ``total`` is
+    that sum rounded once, so a PO built line by line ends with the same
+    total as a full recompute. POs written before ``lines_total`` existed
+    start from their stored total.
+    """
+    from app.models import PurchaseOrder
 
-    from app.models import PurchaseOrder, PoLine, Item
+    po = PurchaseOrder.__table__
+    lines_total = db.func.coalesce(po.c.lines_total, po.c.total, 0) + delta
+    return db.session.execute(
+        db.update(po)
+        .where(po.c.id == po_id)
+        .values(lines_total=lines_total, total=db.func.round(lines_total, 2))
+        .returning(po.c.total)
+    ).scalar()
 
-    po = PurchaseOrder.query.get(po_id)
-    if not po:
-        abort(404, description="PO not found")
 
-    if not Item.query.get(item_id):
+@procurement_bp.route("/pos/<int:po_id>/lines", methods=["POST"])
+def add_po_line(po_id: int):
+    """Add a line to a PO and update the PO total.
+
+    The PO row is locked and its total increased by the line's qty * price,
+    so the total stays equal to sum(qty * price) over the PO's lines
+    without re-aggregating them.
+    """
+    from app.models import Item, PoLine
+
+    values = _line_values(request.get_json() or {}, po_id)
+    _lock_po(po_id)
+    if db.session.get(Item, values["item_id"]) is None:
         abort(400, description="item not found")
 
-    line = PoLine(
-        po_id=po_id,
-        item_id=item_id,
-        qty=qty,
-        uom_id=uom_id,
-        price=price,
-        lot_request=data.get("lot_request"),
-        shade_request=data.get("shade_request"),
-    )
+    line = PoLine(**values)
     db.session.add(line)
     db.session.flush()
+    total = _add_to_total(po_id, values["qty"] * values["price"])
+    touch("pos")
+    db.session.commit()
+
+    return jsonify({"id": line.id, "po_total": total}), 201
 
-    # Recalculate the PO total
-    total = db.session.query(db.func.coalesce(db.func.sum(PoLine.qty * PoLine.price), 0)).filter(PoLine.po_id == po_id).scalar()
-    po.total = total
+
+@procurement_bp.route("/pos/<int:po_id>/lines:batch", methods=["POST"])
+def add_po_lines_batch(po_id: int):
+    """Add many lines to a PO in one transaction.
+
+    Item ids are validated with one query, the lines are bulk inserted and
+    the PO total is updated once with the sum of their amounts.
+
+    Args:
+        request.json: a list of line objects (or {"lines": [...]}) with the
+            fields accepted by POST /pos/<id>/lines.
+
+    Returns:
+        JSON with the new line ``ids`` (in request order) and ``po_total``,
+        HTTP 201.
+    """
+    from flask import current_app
+    from app.models import Item, PoLine
+
+    data = request.get_json(silent=True)
+    if isinstance(data, dict):
+        data = data.get("lines")
+    if not isinstance(data, list) or not data:
+        abort(400, description="expected a non-empty list of lines")
+    limit = current_app.config["PO_LINES_MAX_BATCH"]
+    if len(data) > limit:
+        abort(413, description=f"at most {limit} lines per request")
+    if not all(isinstance(d, dict) for d in data):
+        abort(400, description="every line must be an object")
+    rows = [_line_values(d, po_id) for d in data]
+
+    _lock_po(po_id)
+    item_ids = {r["item_id"] for r in rows}
+    found = set(db.session.execute(db.select(Item.id).where(Item.id.in_(item_ids))).scalars())
+    if found != item_ids:
+        abort(400, description=f"unknown item ids: {sorted(item_ids - found, key=str)}")
+
+    ids = db.session.execute(
+        db.insert(PoLine).returning(PoLine.id, sort_by_parameter_order=True), rows
+    ).scalars().all()
+    total = _add_to_total(po_id, sum(r["qty"] * r["price"] for r in rows))
+    touch("pos")
     db.session.commit()
 
-    return jsonify({"id": line.id, "po_total": float(po.total)}), 201
+    return jsonify({"ids": ids, "po_total": total}), 201
@@ -0,0 +1,318 @@
+"""Inventory routes.
+
+Blueprint exposing stock postings, current availability, lot allocation,
+inventory valuation, as-of-date balances and balance checkpoints.
+
+Routes:
+ - POST /stock/moves
+ - GET /stock/availability
+ - POST /stock/allocations
+ - GET /stock/valuation
+ - GET /stock/as_of
+ - GET /stock/checkpoints
+ - POST /stock/checkpoints
+"""
+from datetime import date, datetime, time, timedelta
+
+from flask import Blueprint, abort, current_app, jsonify, request
+
+from app.db import db
+
+stock_bp = Blueprint("stock", __name__)
+
+
+def _instant(value: str | None, name: str) -> datetime:
+    """Parse an as-of parameter; a plain date means the end of that day.
+
+    Datetimes with an offset are converted to naive UTC, like move dates.
+    """
+    from app.stock import naive_utc
+
+    if not value:
+        abort(400, description=f"'{name}' is required")
+    try:
+        return datetime.combine(date.fromisoformat(value) + timedelta(days=1), time.min)
+    except ValueError:
+        pass
+    try:
+        return naive_utc(datetime.fromisoformat(value))
+    except ValueError:
+        abort(400, description=f"'{name}' must be an ISO date or datetime")
+
+
+@stock_bp.route("/stock/moves", methods=["POST"])
+def create_stock_moves():
+    """Post one or many stock moves and update the on-hand balances.
+
+    All moves of the request are written in one transaction: either every
+    move and balance change is committed or none is.
+
+    Args:
+        request.json: a move object or a list of them, each with
+            ``item_id``, ``qty`` (> 0), ``from_location`` and/or
+            ``to_location`` and optional ``lot_code``, ``uom_id``,
+            ``move_type``, ``ref_type``, ``ref_id``, ``moved_at``, ``unit_cost``.
+
+    Returns:
+        201 with ``{"id": ...}`` for a single move or ``{"ids": [...]}``
+        for a list, in request order.
+    """
+    from app import stock
+
+    data = request.get_json(silent=True)
+    single = isinstance(data, dict)
+    records = [data] if single else data
+    if isinstance(records, list) and len(records) > current_app.config["STOCK_MOVES_MAX_BATCH"]:
+        abort(413, description=f"at most {current_app.config['STOCK_MOVES_MAX_BATCH']} moves per request")
+    try:
+        moves = stock.parse_moves(records)
+        ids = stock.post_moves(moves)
+    except stock.PostingError as e:
+        db.session.rollback()
+        abort(400, description=str(e))
+    db.session.commit()
+    return jsonify({"id": ids[0]} if single else {"ids": ids}), 201
+
+
+@stock_bp.route("/stock/availability", methods=["GET"])
+def stock_availability():
+    """Return current on-hand quantities of many items in one call.
+
+    Served from the availability rollup (:mod:`app.stock_availability`).
+
+    Query params:
+        item_ids: comma-separated item ids (at most ``MULTI_GET_MAX_IDS``).
+        group_by: ``warehouse`` (default), ``location`` or ``lot``.
+
+    Returns:
+        JSON with ``group_by`` and ``items`` in request order, each with
+        ``item_id``, the total ``on_hand`` and its non-zero ``groups``
+        (``warehouse_id``, ``location_id`` or ``lot_code`` plus ``qty``).
+    """
+    from decimal import Decimal
+    from app import stock_availability
+
+    group_by = request.args.get("group_by", "warehouse")
+    if group_by not in stock_availability.GROUP_BY:
+        abort(400, description="'group_by' must be warehouse, location or lot")
+    try:
+        item_ids = list(dict.fromkeys(
+            int(part) for part in request.args.get("item_ids", "").split(",") if part.strip()
+        ))
+    except ValueError:
+        abort(400, description="'item_ids' must be a comma-separated list of integers")
+    if not item_ids:
+        abort(400, description="'item_ids' is required")
+    if len(item_ids) > current_app.config["MULTI_GET_MAX_IDS"]:
+        abort(400, description=f"at most {current_app.config['MULTI_GET_MAX_IDS']} item ids per request")
+
+    key = {"warehouse": "warehouse_id", "location": "location_id", "lot": "lot_code"}[group_by]
+    found = stock_availability.availability(item_ids, group_by)
+    return jsonify({
+        "group_by": group_by,
+        "items": [
+            {
+                "item_id": item_id,
+                "on_hand": sum((qty for _, qty in found.get(item_id, ())), Decimal(0)),
+                "groups": [{key: value, "qty": qty} for value, qty in found.get(item_id, ())],
+            }
+            for item_id in item_ids
+        ],
+    })
+
+
+@stock_bp.route("/stock/allocations", methods=["POST"])
+def create_allocation():
+    """Plan which lots and locations to cut a garment order from.
+
+    Explodes the BOM for ``qty`` garments and allocates on-hand lots to its
+    purchased components under the same-lot and shade rules of
+    :mod:`app.allocation`. Nothing is reserved; the plan is returned only.
+
+    Args:
+        request.json: {"bom_id", "qty" (whole garments), optional "shade",
+            "warehouse_id", "include_optional" and "on" (ISO date used to
+            pick sub-assembly BOM versions)}.
+
+    Returns:
+        JSON reservation plan: ``complete``, the number of ``lots`` and
+        ``locations`` touched, the shade chosen per colour-match ``groups``
+        and, per component, ``required``, ``allocated``, ``short`` and the
+        ``picks`` (``lot_code``, ``shade``, ``location_id``, ``qty``).
+    """
+    from app import allocation
+    from app.bom_explosion import BomCycleError, BomGraph
+    from app.models import Bom
+
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict):
+        abort(400, description="a JSON object is required")
+    bom_id, qty, warehouse_id = data.get("bom_id"), data.get("qty"), data.get("warehouse_id")
+    if not isinstance(bom_id, int) or isinstance(bom_id, bool):
+        abort(400, description="'bom_id' must be an integer")
+    if not isinstance(qty, int) or isinstance(qty, bool) or qty <= 0:
+        abort(400, description="'qty' must be a positive whole number of garments")
+    if qty > current_app.config["ALLOCATION_MAX_GARMENTS"]:
+        abort(400, description=f"at most {current_app.config['ALLOCATION_MAX_GARMENTS']} garments per order")
+    if warehouse_id is not None and (not isinstance(warehouse_id, int) or isinstance(warehouse_id, bool)):
+        abort(400, description="'warehouse_id' must be an integer")
+    shade = data.get("shade")
+    if shade is not None and not isinstance(shade, str):
+        abort(400, description="'shade' must be a string")
+    try:
+        on = date.fromisoformat(data["on"]) if data.get("on") else None
+    except (TypeError, ValueError):
+        abort(400, description="'on' must be an ISO date")
+    if db.session.get(Bom, bom_id) is None:
+        abort(404)
+
+    graph = BomGraph.load(bom_ids=[bom_id], on=on)
+    try:
+        explosion = graph.explode(bom_id, qty, include_optional=bool(data.get("include_optional")))
+    except BomCycleError as e:
+        abort(400, description=str(e))
+    plan = allocation.allocate(explosion, shade=shade, warehouse_id=warehouse_id)
+    return jsonify(plan.to_dict())
+
+
+@stock_bp.route("/stock/valuation", methods=["GET"])
+def stock_valuation():
+    """Return inventory quantity and value per item from the costing tables.
+
+    Answered from the maintained cost state (:mod:`app.costing`), never a
+    replay of the ledger.
+
+    Query params:
+        item_ids: optional comma-separated item ids (at most
+            ``MULTI_GET_MAX_IDS``); by default every item with stock or value.
+        as_of: optional ISO date (end of that day) or datetime; by default
+            the current valuation.
+        since: optional ISO date or datetime; adds the ``cogs`` (cost of
+            issues) of each item from then until ``as_of``.
+        include: ``layers`` adds the open FIFO layers (current valuation only).
+
+    Returns:
+        JSON with ``method``, ``as_of``, ``total_value`` and ``items`` with
+        ``item_id``, ``qty``, ``value`` and average ``unit_cost``.
+    """
+    from decimal import Decimal
+    from app import costing
+    from app.stock import naive_utc
+
+    item_ids = None
+    if request.args.get("item_ids"):
+        try:
+            item_ids = list(dict.fromkeys(
+                int(part) for part in request.args["item_ids"].split(",") if part.strip()
+            ))
+        except ValueError:
+            abort(400, description="'item_ids' must be a comma-separated list of integers")
+        if len(item_ids) > current_app.config["MULTI_GET_MAX_IDS"]:
+            abort(400, description=f"at most {current_app.config['MULTI_GET_MAX_IDS']} item ids per request")
+    as_of = _instant(request.args["as_of"], "as_of") if request.args.get("as_of") else None
+    since = None
+    if request.args.get("since"):
+        try:
+            since = naive_utc(datetime.fromisoformat(request.args["since"]))
+        except ValueError:
+            abort(400, description="'since' must be an ISO date or datetime")
+    include = {part.strip() for part in request.args.get("include", "").split(",") if part.strip()}
+    if include - {"layers"}:
+        abort(400, description="'include' accepts layers")
+    if "layers" in include and as_of is not None:
+        abort(400, description="layers are only available for the current valuation")
+
+    rows = {item_id: (qty, value) for item_id, qty, value in costing.valuation(item_ids, as_of)}
+    order = item_ids if item_ids is not None else list(rows)
+    cogs = costing.cogs(since, as_of, order) if since is not None else None
+    layers = costing.open_layers(order) if "layers" in include else None
+    items = []
+    for item_id in order:
+        qty, value = rows.get(item_id, (Decimal(0), Decimal(0)))
+        entry = {
+            "item_id": item_id,
+            "qty": qty,
+            "value": value,
+            "unit_cost": (value / qty).quantize(Decimal("0.0001")) if qty > 0 else None,
+        }
+        if cogs is not None:
+            entry["cogs"] = cogs.get(item_id, Decimal(0))
+        if layers is not None:
+            entry["layers"] = layers.get(item_id, [])
+        items.append(entry)
+    return jsonify({
+        "method": current_app.config["STOCK_COSTING_METHOD"],
+        "as_of": as_of.isoformat() if as_of else None,
+        "total_value": sum((e["value"] for e in items), Decimal(0)),
+        "items": items,
+    })
+
+
+@stock_bp.route("/stock/as_of", methods=["GET"])
+def stock_as_of():
+    """Return on-hand balances as of a date.
+
+    Answered from the nearest ready checkpoint plus the moves after it.
+
+    Query params:
+        date: ISO date (balances at the end of that day) or datetime.
+        item_id: optional, repeatable.
+        location_id: optional.
+
+    Returns:
+        JSON with ``as_of``, the ``checkpoint_id`` used (or null) and
+        ``balances`` of ``item_id``, ``location_id``, ``lot_code``, ``qty``.
+    """
+    from app import stock_checkpoints
+
+    at = _instant(request.args.get("date"), "date")
+    try:
+        item_ids = [int(v) for v in request.args.getlist("item_id")] or None
+        location_id = request.args.get("location_id")
+        location_id = int(location_id) if location_id else None
+    except ValueError:
+        abort(400, description="'item_id' and 'location_id' must be integers")
+    checkpoint, rows = stock_checkpoints.balances_as_of(at, item_ids=item_ids, location_id=location_id)
+    return jsonify({
+        "as_of": at.isoformat(),
+        "checkpoint_id": checkpoint.id if checkpoint else None,
+        "balances": [
+            {"item_id": i, "location_id": loc, "lot_code": lot, "qty": qty}
+            for i, loc, lot, qty in rows
+        ],
+    })
+
+
+@stock_bp.route("/stock/checkpoints", methods=["GET"])
+def list_checkpoints():
+    """Return all balance checkpoints ordered by ``as_of``."""
+    from app.serializers import STOCK_CHECKPOINT
+
+    return jsonify(STOCK_CHECKPOINT.fetch())
+
+
+@stock_bp.route("/stock/checkpoints", methods=["POST"])
+def create_checkpoint():
+    """Build (or rebuild a stale) checkpoint.
+
+    Args:
+        request.json: {"as_of": ISO date or datetime} (a date means the end
+            of that day).
+
+    Returns:
+        201 with the checkpoint; 400 when ``as_of`` is in the future.
+    """
+    from app import stock_checkpoints
+    from app.models import StockCheckpoint
+    from app.serializers import STOCK_CHECKPOINT
+
+    data = request.get_json(silent=True) or {}
+    as_of = _instant(data.get("as_of"), "as_of")
+    try:
+        checkpoint = stock_checkpoints.build_checkpoint(
+            as_of, current_app.config["STOCK_CHECKPOINT_CHUNK_ITEMS"]
+        )
+    except stock_checkpoints.CheckpointError as e:
+        abort(400, description=str(e))
+    stmt = STOCK_CHECKPOINT.select().where(StockCheckpoint.id == checkpoint.id)
+    return jsonify(STOCK_CHECKPOINT.fetch(stmt)[0]), 201
@@ -0,0 +1,64 @@
+"""Operational routes.
+
+Blueprint for introspection endpoints used to verify caches and other
+process-level machinery.
+
+Routes:
+ - GET /metrics
+ - GET /refcache/stats
+ - GET /sourcing/stats
+ - GET /cost_rollup/stats
+ - GET /response_cache/stats
+"""
+from flask import Blueprint, Response, current_app, jsonify
+
+system_bp = Blueprint("system", __name__)
+
+
+@system_bp.route("/metrics", methods=["GET"])
+def metrics():
+    """Expose request, latency, SQL, N+1 and connection pool metrics for Prometheus."""
+    from app import metrics as metrics_module
+    from app import routing
+
+    return Response(
+        metrics_module.get_registry(current_app).render(routing.engines(current_app)),
+        mimetype="text/plain; version=0.0.4",
+    )
+
+
+@system_bp.route("/refcache/stats", methods=["GET"])
+def refcache_stats():
+    """Return hit/miss/load counters of the reference-data cache.
+
+    Returns:
+        JSON mapping each reference table (uom, category, supplier) to its
+        counters and current version.
+    """
+    from app import refcache
+
+    return jsonify(refcache.get_cache().stats())
+
+
+@system_bp.route("/sourcing/stats", methods=["GET"])
+def sourcing_stats():
+    """Return the entry count and hit/miss counters of the sourcing index."""
+    from app import sourcing
+
+    return jsonify(sourcing.get_index().stats())
+
+
+@system_bp.route("/cost_rollup/stats", methods=["GET"])
+def cost_rollup_stats():
+    """Return the entry count and hit/miss counters of the BOM cost rollup."""
+    from app import cost_rollup
+
+    return jsonify(cost_rollup.get_rollup().stats())
+
+
+@system_bp.route("/response_cache/stats", methods=["GET"])
+def response_cache_stats():
+    """Return the entry count and hit/miss counters of the rendered-body LRU."""
+    from app import conditional
+
+    return jsonify(conditional.get_cache().stats())
@@ -0,0 +1,232 @@
+"""Read/write routing between the primary database and read replicas.
+
+``DATABASE_REPLICA_URLS`` lists replica URLs; :func:`init_app` creates
+one engine per replica (``replica_0``, ``replica_1``, ...) in
+``app.extensions["routing"]``. They are not Flask-SQLAlchemy binds:
+binds register metadata on the shared ``db`` object, and replicas hold
+the same tables as the primary anyway.
+
+GET/HEAD requests of the blueprints in ``DB_REPLICA_BLUEPRINTS`` pick one
+replica at random; :class:`RoutingSession` then sends every statement the
+request runs on the default bind to that replica instead (flushes always
+go to the primary). Writes are never routed. Process-wide caches load
+inside :func:`on_primary`: what they keep is served to every client, and
+a row read from a lagging replica would reach a client that just wrote a
+newer one and is meant to read from the primary.
+
+Read-your-writes: a successful write request (any method other than
+GET/HEAD/OPTIONS, status < 400) sets the ``DB_STICKY_COOKIE`` cookie to
+the time until which that client reads from the primary
+(``DB_REPLICA_STICKY_SECONDS`` after the write), so a client never reads
+a replica that has not replayed its own write yet, as long as replication
+lag stays below the window. Browsers must send credentials for the cookie
+to travel cross-origin.
+
+Pools: engines backed by a ``QueuePool`` (PostgreSQL, file SQLite) get
+``DB_POOL_*`` size, overflow, timeout, recycle and pre-ping settings and
+use :class:`TimedQueuePool`, which records how long each checkout waited
+for a connection; :mod:`app.metrics` exposes it per bind. In-memory
+SQLite keeps Flask-SQLAlchemy's ``StaticPool``.
+
+Locally, two SQLite files (or two PostgreSQL databases) can stand in for
+primary and replica; nothing replicates between them, which is exactly
+what the tests rely on to see where a read went.
+"""
+from __future__ import annotations
+
+import os
+import random
+import threading
+import time
+from contextlib import contextmanager
+
+from flask import current_app, g, request
+from flask_sqlalchemy.session import Session
+from sqlalchemy import create_engine, exc
+from sqlalchemy.engine import make_url
+from sqlalchemy.pool import QueuePool, StaticPool
+
+REPLICA_PREFIX = "replica_"
+_READ_METHODS = frozenset(("GET", "HEAD"))
+_SAFE_METHODS = frozenset(("GET", "HEAD", "OPTIONS"))
+
+WAIT_BUCKETS = (0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 30.0)
+
+
+class CheckoutStats:
+    """Histogram of connection checkout waits of one pool."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.counts = [0] * len(WAIT_BUCKETS)
+        self.sum = 0.0
+        self.count = 0
+        self.timeouts = 0
+
+    def observe(self, seconds: float, timed_out: bool = False) -> None:
+        with self._lock:
+            for i, bound in enumerate(WAIT_BUCKETS):
+                if seconds <= bound:
+                    self.counts[i] += 1
+                    break
+            self.sum += seconds
+            self.count += 1
+            if timed_out:
+                self.timeouts += 1
+
+    def snapshot(self) -> tuple[list[int], float, int, int]:
+        with self._lock:
+            return list(self.counts), self.sum, self.count, self.timeouts
+
+
+class TimedQueuePool(QueuePool):
+    """``QueuePool`` that records how long each checkout waits.
+
+    The stats belong to the pool object; ``engine.dispose()`` recreates the
+    pool and starts them from zero.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.checkout_stats = CheckoutStats()
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            conn = super()._do_get()
+        except exc.TimeoutError:
+            self.checkout_stats.observe(time.perf_counter() - start, timed_out=True)
+            raise
+        self.checkout_stats.observe(time.perf_counter() - start)
+        return conn
+
+
+class RoutingSession(Session):
+    """Session that sends a routed request's default-bind reads to its replica."""
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        engine = super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+        replica = self.info.get("replica")
+        if replica is None or bind is not None or self._flushing:
+            return engine
+        return replica if engine is self._db.engines.get(None) else engine
+
+
+@contextmanager
+def on_primary():
+    """Run the statements of the block on the primary, even in a routed request."""
+    from app.db import db
+
+    session = db.session
+    replica = session.info.pop("replica", None)
+    try:
+        yield
+    finally:
+        if replica is not None:
+            session.info["replica"] = replica
+
+
+def _uses_queue_pool(url) -> bool:
+    url = make_url(url)
+    if url.get_backend_name() != "sqlite":
+        return True
+    return url.database not in (None, "", ":memory:") and url.query.get("mode") != "memory"
+
+
+def _pool_options(config) -> dict:
+    return {
+        "poolclass": TimedQueuePool,
+        "pool_size": config["DB_POOL_SIZE"],
+        "max_overflow": config["DB_MAX_OVERFLOW"],
+        "pool_timeout": config["DB_POOL_TIMEOUT"],
+        "pool_recycle": config["DB_POOL_RECYCLE"],
+        "pool_pre_ping": config["DB_POOL_PRE_PING"],
+    }
+
+
+def configure(app) -> None:
+    """Add the primary's pool options to ``app.config`` (before ``db.init_app``)."""
+    config = app.config
+    uri = config.get("SQLALCHEMY_DATABASE_URI")
+    if uri and _uses_queue_pool(uri):
+        options = _pool_options(config)
+        options.update(config.get("SQLALCHEMY_ENGINE_OPTIONS") or {})
+        config["SQLALCHEMY_ENGINE_OPTIONS"] = options
+
+
+def _replica_engine(app, url):
+    url = make_url(url)
+    options = {}
+    if _uses_queue_pool(url):
+        options = _pool_options(app.config)
+        if url.get_backend_name() == "sqlite" and not os.path.isabs(url.database):
+            # Relative SQLite paths resolve against the instance folder, like the primary's
+            os.makedirs(app.instance_path, exist_ok=True)
+            url = url.set(database=os.path.join(app.instance_path, url.database))
+    elif url.get_backend_name() == "sqlite":
+        options = {"poolclass": StaticPool, "connect_args": {"check_same_thread": False}}
+    return create_engine(url, **options)
+
+
+def engines(app) -> dict:
+    """Return ``{bind: Engine}`` for the primary (``None``) and every replica."""
+    from app.db import db
+
+    return {None: db.engines[None], **app.extensions["routing"]}
+
+
+def _sticky(config) -> bool:
+    value = request.cookies.get(config["DB_STICKY_COOKIE"])
+    try:
+        return value is not None and float(value) > time.time()
+    except ValueError:
+        return False
+
+
+def _route_request():
+    from app.db import db
+
+    config = current_app.config
+    replicas = current_app.extensions["routing"]
+    if (
+        replicas
+        and request.method in _READ_METHODS
+        and request.blueprint in config["DB_REPLICA_BLUEPRINTS"]
+        and not _sticky(config)
+    ):
+        g.db_replica = random.choice(list(replicas))
+        db.session.info["replica"] = replicas[g.db_replica]
+
+
+def _mark_write(response):
+    config = current_app.config
+    window = config["DB_REPLICA_STICKY_SECONDS"]
+    if (
+        current_app.extensions["routing"]
+        and window > 0
+        and request.method not in _SAFE_METHODS
+        and response.status_code < 400
+    ):
+        response.set_cookie(
+            config["DB_STICKY_COOKIE"], f"{time.time() + window:.3f}",
+            max_age=int(window) + 1, httponly=True, samesite="Lax",
+        )
+    return response
+
+
+def _unroute(error=None):
+    from app.db import db
+
+    if g.pop("db_replica", None) is not None:
+        db.session.info.pop("replica", None)
+
+
+def init_app(app) -> None:
+    """Create the replica engines and install the per-request routing hooks."""
+    app.extensions["routing"] = {
+        f"{REPLICA_PREFIX}{n}": _replica_engine(app, url)
+        for n, url in enumerate(app.config["SQLALCHEMY_REPLICA_URIS"])
+    }
+    app.before_request(_route_request)
+    app.after_request(_mark_write)
+    app.teardown_request(_unroute)
@@ -0,0 +1,121 @@
+"""Indexed item search over ``sku``, ``name``, ``brand`` and ``spec``.
+
+SQLite uses an external-content FTS5 table (``items_fts``) kept in sync
+with ``items`` by triggers; PostgreSQL uses a GIN ``tsvector`` expression
+index for ranked prefix matching plus ``pg_trgm`` GIN indexes so that
+substring and fuzzy matches on ``name``/``sku`` never scan the table.
+
+The DDL is attached to the ``items`` table so ``db.create_all()`` builds
+the index for new databases; existing databases get it from the Alembic
+migration ``b41c7e2a9d10_item_search_index``. Other dialects fall back to
+``ILIKE`` filtering.
+"""
+from __future__ import annotations
+
+import re
+
+from sqlalchemy import DDL, Float, Integer, event
+
+from app.db import db
+from app.models import Item
+
+# Relative bm25 weights for the FTS5 columns (sku, name, brand, spec).
+_SQLITE_WEIGHTS = "10.0, 5.0, 2.0, 1.0"
+
+# Must stay identical to the expression of ix_items_search_tsv.
+PG_DOCUMENT = (
+    "to_tsvector('simple', coalesce(items.sku, '') || ' ' || coalesce(items.name, '')"
+    " || ' ' || coalesce(items.brand, '') || ' ' || coalesce(items.spec::text, ''))"
+)
+
+SQLITE_DDL = [
+    "CREATE VIRTUAL TABLE IF NOT EXISTS items_fts USING fts5("
+    "sku, name, brand, spec, content='items', content_rowid='id', "
+    "tokenize='unicode61 remove_diacritics 2', prefix='2 3')",
+    "CREATE TRIGGER IF NOT EXISTS items_fts_ai AFTER INSERT ON items BEGIN "
+    "INSERT INTO items_fts(rowid, sku, name, brand, spec) "
+    "VALUES (new.id, new.sku, new.name, new.brand, new.spec); END",
+    "CREATE TRIGGER IF NOT EXISTS items_fts_ad AFTER DELETE ON items BEGIN "
+    "INSERT INTO items_fts(items_fts, rowid, sku, name, brand, spec) "
+    "VALUES ('delete', old.id, old.sku, old.name, old.brand, old.spec); END",
+    "CREATE TRIGGER IF NOT EXISTS items_fts_au AFTER UPDATE ON items BEGIN "
+    "INSERT INTO items_fts(items_fts, rowid, sku, name, brand, spec) "
+    "VALUES ('delete', old.id, old.sku, old.name, old.brand, old.spec); "
+    "INSERT INTO items_fts(rowid, sku, name, brand, spec) "
+    "VALUES (new.id, new.sku, new.name, new.brand, new.spec); END",
+]
+
+POSTGRES_DDL = [
+    "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+    f"CREATE INDEX IF NOT EXISTS ix_items_search_tsv ON items USING gin (({PG_DOCUMENT}))",
+    "CREATE INDEX IF NOT EXISTS ix_items_name_trgm ON items USING gin (name gin_trgm_ops)",
+    "CREATE INDEX IF NOT EXISTS ix_items_sku_trgm ON items USING gin (sku gin_trgm_ops)",
+]
+
+for _stmt in SQLITE_DDL:
+    event.listen(Item.__table__, "after_create", DDL(_stmt).execute_if(dialect="sqlite"))
+for _stmt in POSTGRES_DDL:
+    event.listen(Item.__table__, "after_create", DDL(_stmt).execute_if(dialect="postgresql"))
+event.listen(
+    Item.__table__, "before_drop",
+    DDL("DROP TABLE IF EXISTS items_fts").execute_if(dialect="sqlite"),
+)
+
+_TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+
+
+def tokenize(q: str) -> list[str]:
+    """Split a user query into word tokens, dropping FTS syntax characters."""
+    return _TOKEN_RE.findall(q or "")
+
+
+def matches(q: str):
+    """Return a selectable of ``(id, rank)`` rows for items matching ``q``.
+
+    Every token is prefix-matched and all tokens must match. Lower ``rank``
+    sorts first on every dialect.
+
+    Returns:
+        A subquery with ``id`` and ``rank`` columns, or ``None`` when ``q``
+        has no searchable tokens.
+    """
+    tokens = tokenize(q)
+    if not tokens:
+        return None
+    dialect = db.session.get_bind().dialect.name
+    if dialect == "sqlite":
+        stmt = db.text(
+            f"SELECT rowid AS id, bm25(items_fts, {_SQLITE_WEIGHTS}) AS rank "
+            "FROM items_fts WHERE items_fts MATCH :match"
+        ).bindparams(match=" ".join(f'"{t}"*' for t in tokens))
+    elif dialect == "postgresql":
+        stmt = db.text(
+            f"SELECT items.id AS id, -greatest(ts_rank({PG_DOCUMENT}, query), "
+            "similarity(items.name, :raw)) AS rank "
+            "FROM items, to_tsquery('simple', :tsquery) AS query "
+            f"WHERE {PG_DOCUMENT} @@ query OR items.name % :raw"
+        ).bindparams(tsquery=" & ".join(f"{t}:*" for t in tokens), raw=q)
+    else:
+        pattern = f"%{q}%"
+        stmt = db.text(
+            "SELECT id, 0.0 AS rank FROM items "
+            "WHERE name LIKE :pattern OR sku LIKE :pattern"
+        ).bindparams(pattern=pattern)
+    return stmt.columns(id=Integer, rank=Float).subquery("search_hits")
+
+
+def search_items(q: str, limit: int) -> list[dict]:
+    """Return up to ``limit`` items matching ``q``, best match first."""
+    from app.serializers import ITEM
+
+    hits = matches(q)
+    if hits is None:
+        return []
+    stmt = (
+        ITEM.select()
+        .join(hits, hits.c.id == Item.id)
+        .order_by(None)
+        .order_by(hits.c.rank, Item.id)
+        .limit(limit)
+    )
+    return ITEM.fetch(stmt)
@@ -0,0 +1,217 @@
+"""Column-projection serializers for list endpoints.
+
+Each public projection declares the JSON schema of one resource once: the
+output key, the SQL column it comes from and an optional converter. The
+projection compiles into a ``select()`` of only those columns (plus the
+outer joins needed to reach related codes) and maps the resulting row
+tuples straight to JSON-ready dicts, so list routes never hydrate ORM
+instances or trigger relationship lazy loads.
+
+Converters run column by column over a whole page of rows rather than
+key by key inside every dict, which keeps the per-row cost to a single
+``dict(zip(...))``. Category and UoM codes are resolved from the
+reference-data cache (:mod:`app.refcache`) instead of joined tables.
+``Numeric`` and date values are left as is: the app's JSON provider
+(:mod:`app.json_provider`) encodes them natively.
+"""
+from __future__ import annotations
+
+from typing import Any, Callable, Iterable, Sequence
+
+from app import refcache
+from app.db import db
+from app.models import (
+    Bom, Item, PoLine, PurchaseOrder, StockCheckpoint, StockMove, Supplier, SupplierItem,
+)
+
+
+class Lookup:
+    """Converter mapping a reference id to its code through :mod:`app.refcache`.
+
+    Args:
+        kind: reference table kind, e.g. ``refcache.CATEGORY``.
+    """
+
+    def __init__(self, kind: str):
+        self.kind = kind
+
+    def bind(self) -> Callable[[Any], Any]:
+        """Return the per-value converter for the current application."""
+        return refcache.get_cache().code_resolver(self.kind)
+
+
+class Field:
+    """One output key of a projection.
+
+    Args:
+        name: key in the rendered dict.
+        column: SQLAlchemy column expression selected for this key.
+        convert: optional callable (or :class:`Lookup`) applied to every value.
+    """
+
+    __slots__ = ("name", "column", "convert")
+
+    def __init__(self, name: str, column, convert: Callable[[Any], Any] | None = None):
+        self.name = name
+        self.column = column
+        self.convert = convert
+
+
+class Projection:
+    """Output schema of a resource compiled to a column ``select()``.
+
+    Args:
+        fields: ordered output fields.
+        joins: ``(target, onclause)`` pairs outer-joined into the select.
+        order_by: column used as the default (and keyset) ordering.
+    """
+
+    def __init__(self, *fields: Field, joins: Sequence[tuple] = (), order_by=None):
+        self.fields = fields
+        self.joins = tuple(joins)
+        self.order_by = order_by
+        self.names = tuple(f.name for f in fields)
+        self._converters = [(i, f.convert) for i, f in enumerate(fields) if f.convert]
+
+    def select(self):
+        """Return a ``select()`` of the projected columns with its joins."""
+        stmt = db.select(*(f.column for f in self.fields))
+        for target, onclause in self.joins:
+            stmt = stmt.outerjoin(target, onclause)
+        if self.order_by is not None:
+            stmt = stmt.order_by(self.order_by)
+        return stmt
+
+    def _bound_converters(self) -> list[tuple[int, Callable[[Any], Any]]]:
+        return [
+            (i, convert.bind() if isinstance(convert, Lookup) else convert)
+            for i, convert in self._converters
+        ]
+
+    def renderer(self) -> Callable[[Sequence[Any]], dict]:
+        """Return a function rendering one row tuple at a time (for streaming)."""
+        converters = self._bound_converters()
+        names = self.names
+
+        def render(row):
+            values = list(row)
+            for i, convert in converters:
+                values[i] = convert(values[i])
+            return dict(zip(names, values))
+
+        return render
+
+    def row(self, row: Sequence[Any]) -> dict:
+        """Render a single row tuple."""
+        return self.renderer()(row)
+
+    def tuples(self, rows: Iterable[Sequence[Any]]) -> list[tuple]:
+        """Convert many row tuples column by column, keeping them as tuples."""
+        rows = list(rows)
+        if not rows or not self._converters:
+            return [tuple(r) for r in rows]
+        columns = list(zip(*rows))
+        for i, convert in self._bound_converters():
+            columns[i] = map(convert, columns[i])
+        return list(zip(*columns))
+
+    def rows(self, rows: Iterable[Sequence[Any]]) -> list[dict]:
+        """Render many row tuples, converting each column in one pass."""
+        names = self.names
+        return [dict(zip(names, r)) for r in self.tuples(rows)]
+
+    def fetch(self, stmt=None) -> list[dict]:
+        """Execute ``stmt`` (default: :meth:`select`) and render all rows."""
+        if stmt is None:
+            stmt = self.select()
+        return self.rows(db.session.execute(stmt))
+
+
+ITEM = Projection(
+    Field("id", Item.id),
+    Field("sku", Item.sku),
+    Field("name", Item.name),
+    Field("category", Item.category_id, Lookup(refcache.CATEGORY)),
+    Field("base_uom", Item.base_uom_id, Lookup(refcache.UOM)),
+    Field("brand", Item.brand),
+    Field("active", Item.active),
+    Field("spec", Item.spec),
+    order_by=Item.id,
+)
+
+BOM = Projection(
+    Field("id", Bom.id),
+    Field("product_item_id", Bom.product_item_id),
+    Field("version", Bom.version),
+    order_by=Bom.id,
+)
+
+SUPPLIER = Projection(
+    Field("id", Supplier.id),
+    Field("name", Supplier.name),
+    Field("country", Supplier.country),
+    Field("payment_terms", Supplier.payment_terms),
+    Field("lead_time_days", Supplier.lead_time_days),
+    Field("currency", Supplier.currency),
+    order_by=Supplier.id,
+)
+
+SUPPLIER_ITEM = Projection(
+    Field("id", SupplierItem.id),
+    Field("supplier_id", SupplierItem.supplier_id),
+    Field("item_id", SupplierItem.item_id),
+    Field("vendor_sku", SupplierItem.vendor_sku),
+    Field("price", SupplierItem.price),
+    Field("moq", SupplierItem.moq),
+    Field("incoterms", SupplierItem.incoterms),
+    order_by=SupplierItem.id,
+)
+
+PURCHASE_ORDER = Projection(
+    Field("id", PurchaseOrder.id),
+    Field("supplier_id", PurchaseOrder.supplier_id),
+    Field("po_number", PurchaseOrder.po_number),
+    Field("status", PurchaseOrder.status),
+    Field("eta", PurchaseOrder.eta),
+    Field("currency", PurchaseOrder.currency),
+    Field("total", PurchaseOrder.total),
+    order_by=PurchaseOrder.id,
+)
+
+STOCK_CHECKPOINT = Projection(
+    Field("id", StockCheckpoint.id),
+    Field("as_of", StockCheckpoint.as_of),
+    Field("status", StockCheckpoint.status),
+    Field("base_id", StockCheckpoint.base_id),
+    Field("created_at", StockCheckpoint.created_at),
+    Field("completed_at", StockCheckpoint.completed_at),
+    order_by=StockCheckpoint.as_of,
+)
+
+PO_LINE = Projection(
+    Field("id", PoLine.id),
+    Field("po_id", PoLine.po_id),
+    Field("item_id", PoLine.item_id),
+    Field("qty", PoLine.qty),
+    Field("uom", PoLine.uom_id, Lookup(refcache.UOM)),
+    Field("price", PoLine.price),
+    Field("lot_request", PoLine.lot_request),
+    Field("shade_request", PoLine.shade_request),
+    order_by=PoLine.id,
+)
+
+STOCK_MOVE = Projection(
+    Field("id", StockMove.id),
+    Field("item_id", StockMove.item_id),
+    Field("from_location", StockMove.from_location),
+    Field("to_location", StockMove.to_location),
+    Field("qty", StockMove.qty),
+    Field("uom", StockMove.uom_id, Lookup(refcache.UOM)),
+    Field("move_type", StockMove.move_type),
+    Field("ref_type", StockMove.ref_type),
+    Field("ref_id", StockMove.ref_id),
+    Field("moved_at", StockMove.moved_at),
+    Field("lot_code", StockMove.lot_code),
+    Field("unit_cost", StockMove.unit_cost),
+    order_by=StockMove.id,
+)
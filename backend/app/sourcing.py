@@ -0,0 +1,286 @@
+"""Best-source index over ``SupplierItem`` offers.
+
+:class:`SourcingIndex` keeps, per ``item_id``, the candidate offers
+(supplier item joined with its supplier's lead time and currency) sorted
+by unit price. Entries are loaded lazily for the requested items only, in
+one ``IN`` query per chunk of missing ids, so a lookup never scans the
+supplier items table and MRP can resolve thousands of items at once.
+
+The index is maintained incrementally: committing a change to a
+``SupplierItem`` drops the entries of the items it belongs to (before and
+after the change), committing a change to a ``Supplier`` drops the cached
+items that have an offer from it. Entries also expire after
+``SOURCING_INDEX_TTL`` seconds to pick up writes made by other processes,
+and at most ``SOURCING_INDEX_SIZE`` items are kept, least recently used
+evicted first.
+
+:func:`rank` orders the offers of one item for a requested quantity:
+offers whose lead time meets ``need_by`` first, then by effective unit
+cost, i.e. the cost of the quantity actually bought (at least the MOQ)
+divided by the quantity needed.
+
+One index lives in ``app.extensions["sourcing"]`` per application.
+"""
+from __future__ import annotations
+
+import threading
+import time
+from collections import OrderedDict, defaultdict
+from datetime import date, timedelta
+from decimal import Decimal
+from typing import Iterable, NamedTuple
+
+from flask import current_app
+from sqlalchemy import inspect
+
+from app import cache_hooks, routing
+from app.db import db
+from app.models import Supplier, SupplierItem
+
+_CHUNK = 1000
+
+
+class Source(NamedTuple):
+    """One supplier offer for an item."""
+
+    supplier_item_id: int
+    supplier_id: int
+    supplier_name: str
+    vendor_sku: str | None
+    price: Decimal
+    moq: Decimal | None
+    lead_time_days: int | None
+    currency: str | None
+    incoterms: str | None
+
+
+class Quote(NamedTuple):
+    """A :class:`Source` priced for a requested quantity."""
+
+    source: Source
+    order_qty: Decimal
+    total_cost: Decimal
+    effective_unit_cost: Decimal
+    available_on: date
+    meets_need_by: bool
+
+    def to_dict(self) -> dict:
+        s = self.source
+        return {
+            "supplier_item_id": s.supplier_item_id,
+            "supplier_id": s.supplier_id,
+            "supplier_name": s.supplier_name,
+            "vendor_sku": s.vendor_sku,
+            "currency": s.currency,
+            "incoterms": s.incoterms,
+            "unit_price": s.price,
+            "moq": s.moq,
+            "lead_time_days": s.lead_time_days,
+            "order_qty": self.order_qty,
+            "total_cost": self.total_cost,
+            "effective_unit_cost": self.effective_unit_cost,
+            "available_on": self.available_on,
+            "meets_need_by": self.meets_need_by,
+        }
+
+
+def quote(source: Source, qty: Decimal, need_by: date | None, today: date) -> Quote:
+    """Price ``source`` for ``qty`` units, rounding the order up to its MOQ.
+
+    Raises:
+        ValueError: if ``qty`` is not positive.
+    """
+    if qty <= 0:
+        raise ValueError("qty must be positive")
+    order_qty = max(qty, source.moq or 0)
+    total = source.price * order_qty
+    available_on = today + timedelta(days=source.lead_time_days or 0)
+    return Quote(
+        source, order_qty, total, total / qty, available_on,
+        need_by is None or available_on <= need_by,
+    )
+
+
+def rank(sources: Iterable[Source], qty, need_by: date | None = None,
+         today: date | None = None, currency: str | None = None) -> list[Quote]:
+    """Return quotes for ``qty`` units, best first.
+
+    Offers arriving by ``need_by`` rank before late ones; ties break on
+    effective unit cost, lead time and supplier id. Prices are compared as
+    is: pass ``currency`` to restrict the ranking to one currency.
+    """
+    qty = Decimal(str(qty))
+    today = today or date.today()
+    quotes = [
+        quote(s, qty, need_by, today)
+        for s in sources
+        if currency is None or s.currency == currency
+    ]
+    quotes.sort(key=lambda q: (
+        not q.meets_need_by, q.effective_unit_cost, q.source.lead_time_days or 0,
+        q.source.supplier_id,
+    ))
+    return quotes
+
+
+class SourcingIndex:
+    """Lazily loaded, change-invalidated LRU of offers per item."""
+
+    def __init__(self, ttl: float = 300, maxsize: int = 100000):
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self._lock = threading.Lock()
+        self._entries: OrderedDict[int, tuple[float, tuple[Source, ...]]] = OrderedDict()
+        # supplier id -> cached items with an offer from it
+        self._by_supplier: dict[int, set[int]] = defaultdict(set)
+        self._generation = 0
+        self.hits = 0
+        self.misses = 0
+
+    def _drop(self, item_id: int, entry=None) -> None:
+        """Remove ``item_id`` from the supplier map (and the entries unless ``entry`` is given)."""
+        if entry is None:
+            entry = self._entries.pop(item_id, None)
+        if entry is None:
+            return
+        for source in entry[1]:
+            items = self._by_supplier.get(source.supplier_id)
+            if items is not None:
+                items.discard(item_id)
+                if not items:
+                    del self._by_supplier[source.supplier_id]
+
+    def invalidate(self, item_ids: Iterable[int] | None = None) -> None:
+        """Drop the entries of ``item_ids`` (all entries when None)."""
+        with self._lock:
+            self._generation += 1
+            if item_ids is None:
+                self._entries.clear()
+                self._by_supplier.clear()
+            else:
+                for item_id in item_ids:
+                    self._drop(item_id)
+
+    def invalidate_suppliers(self, supplier_ids: Iterable[int]) -> None:
+        """Drop the entries of every cached item with an offer from ``supplier_ids``."""
+        with self._lock:
+            self._generation += 1
+            for supplier_id in supplier_ids:
+                for item_id in list(self._by_supplier.get(supplier_id, ())):
+                    self._drop(item_id)
+
+    def _load(self, item_ids: list[int]) -> dict[int, tuple[Source, ...]]:
+        found: dict[int, list[Source]] = {item_id: [] for item_id in item_ids}
+        # Shared by every client: never fill from a lagging replica.
+        with routing.on_primary():
+            for start in range(0, len(item_ids), _CHUNK):
+                rows = db.session.execute(
+                    db.select(
+                        SupplierItem.item_id, SupplierItem.id, SupplierItem.supplier_id, Supplier.name,
+                        SupplierItem.vendor_sku, SupplierItem.price, SupplierItem.moq,
+                        Supplier.lead_time_days, Supplier.currency, SupplierItem.incoterms,
+                    )
+                    .join(Supplier, Supplier.id == SupplierItem.supplier_id)
+                    .where(
+                        SupplierItem.item_id.in_(item_ids[start:start + _CHUNK]),
+                        SupplierItem.price.is_not(None),
+                    )
+                    .order_by(SupplierItem.item_id, SupplierItem.price, SupplierItem.id)
+                ).all()
+                for item_id, *fields in rows:
+                    found[item_id].append(Source(*fields))
+        return {item_id: tuple(sources) for item_id, sources in found.items()}
+
+    def sources_for(self, item_ids: Iterable[int]) -> dict[int, tuple[Source, ...]]:
+        """Return the offers of every item in ``item_ids``, cheapest price first.
+
+        Items without offers map to an empty tuple.
+        """
+        now = time.monotonic()
+        result: dict[int, tuple[Source, ...]] = {}
+        missing = []
+        with self._lock:
+            for item_id in dict.fromkeys(item_ids):
+                entry = self._entries.get(item_id)
+                if entry is not None and now - entry[0] < self.ttl:
+                    self._entries.move_to_end(item_id)
+                    result[item_id] = entry[1]
+                else:
+                    missing.append(item_id)
+            self.hits += len(result)
+            self.misses += len(missing)
+            generation = self._generation
+        if missing:
+            loaded = self._load(missing)
+            self._store(loaded, now, generation)
+            result.update(loaded)
+        return result
+
+    def _store(self, loaded: dict[int, tuple[Source, ...]], now: float, generation: int) -> None:
+        if self.maxsize <= 0:
+            return
+        with self._lock:
+            # Do not cache rows read before a concurrent invalidation.
+            if generation != self._generation:
+                return
+            for item_id, sources in loaded.items():
+                self._drop(item_id)
+                self._entries[item_id] = (now, sources)
+                for source in sources:
+                    self._by_supplier[source.supplier_id].add(item_id)
+            while len(self._entries) > self.maxsize:
+                self._drop(*self._entries.popitem(last=False))
+
+    def best(self, requests: dict[int, tuple], today: date | None = None) -> dict[int, Quote]:
+        """Return the best quote per item for ``{item_id: (qty, need_by)}``.
+
+        Items without offers are left out.
+        """
+        sources = self.sources_for(requests)
+        best = {}
+        for item_id, (qty, need_by) in requests.items():
+            quotes = rank(sources[item_id], qty, need_by, today)
+            if quotes:
+                best[item_id] = quotes[0]
+        return best
+
+    def stats(self) -> dict:
+        return {"entries": len(self._entries), "hits": self.hits, "misses": self.misses}
+
+
+def init_app(app) -> None:
+    """Attach a fresh index to ``app``."""
+    app.extensions["sourcing"] = SourcingIndex(
+        ttl=app.config["SOURCING_INDEX_TTL"], maxsize=app.config["SOURCING_INDEX_SIZE"],
+    )
+
+
+def get_index() -> SourcingIndex:
+    """Return the index of the current application."""
+    return current_app.extensions["sourcing"]
+
+
+# ----------------------------------------------------------------------
+# Invalidation: record the items whose offers a flush touched, and the
+# suppliers, and drop them once the transaction commits (a rollback
+# discards them). Supplier ids are kept as ``("supplier", id)``.
+# ----------------------------------------------------------------------
+
+def _collect_changes(session, changed: set) -> None:
+    for obj in (*session.new, *session.dirty, *session.deleted):
+        if isinstance(obj, SupplierItem):
+            history = inspect(obj).attrs.item_id.history
+            changed.update(i for i in (obj.item_id, *history.deleted) if i is not None)
+        elif isinstance(obj, Supplier) and obj.id is not None:
+            # Name, lead time or currency changes affect every item of the supplier.
+            changed.add(("supplier", obj.id))
+
+
+def _invalidate(changed: set) -> None:
+    index = current_app.extensions.get("sourcing")
+    if index is not None:
+        index.invalidate(c for c in changed if not isinstance(c, tuple))
+        index.invalidate_suppliers(c[1] for c in changed if isinstance(c, tuple))
+
+
+cache_hooks.track("sourcing_dirty", _collect_changes, _invalidate)
@@ -0,0 +1,235 @@
+"""Transactional stock posting.
+
+:func:`post_moves` inserts ``StockMove`` rows and applies their deltas to
+the ``StockOnHand`` balances of ``(item_id, location_id, lot_code)`` in
+the caller's transaction, so the ledger and the balances never diverge:
+
+- all moves of a call are validated with one query per referenced table
+  and inserted with one executemany;
+- deltas are aggregated per balance key, so a batch touching the same
+  balance many times issues one statement for it;
+- balances change through atomic ``qty = qty + :delta`` upserts, never
+  read-modify-write from Python;
+- on PostgreSQL the existing balance rows are locked in sorted key order
+  first, so concurrent batches cannot deadlock on each other.
+
+A move from ``from_location`` to ``to_location`` decrements the first and
+increments the second; either may be empty (receipt or issue). Moves
+dated before existing balance checkpoints invalidate them
+(:func:`app.stock_checkpoints.invalidate_after`), and the per-warehouse
+availability rollup gets the same deltas
+(:func:`app.stock_availability.apply_deltas`). Receipts and issues are
+costed in the same transaction (:func:`app.costing.apply_moves`).
+"""
+from __future__ import annotations
+
+from collections import defaultdict
+from datetime import datetime, timezone
+from decimal import Decimal, InvalidOperation
+
+from app import costing, stock_availability, stock_checkpoints
+from app.db import db
+from app.models import Item, Location, StockMove, StockOnHand, Uom
+
+
+class PostingError(ValueError):
+    """Raised when a batch of moves cannot be posted."""
+
+
+def _decimal(value, field: str, n: int) -> Decimal:
+    try:
+        result = Decimal(str(value))
+    except (InvalidOperation, ValueError):
+        raise PostingError(f"move {n}: '{field}' must be a number")
+    if not result.is_finite():
+        raise PostingError(f"move {n}: '{field}' must be a number")
+    return result
+
+
+def naive_utc(value: datetime) -> datetime:
+    """Return ``value`` as a naive UTC datetime, the form stored in the ledger.
+
+    Naive values are taken to be UTC already; aware ones are converted.
+    """
+    if value.tzinfo is None:
+        return value
+    return value.astimezone(timezone.utc).replace(tzinfo=None)
+
+
+def _location(value) -> int | None:
+    return None if value is None else int(value)
+
+
+def _optional_id(record: dict, field: str, n: int) -> int | None:
+    value = record.get(field)
+    if value is not None and (not isinstance(value, int) or isinstance(value, bool)):
+        raise PostingError(f"move {n}: '{field}' must be an integer id")
+    return value
+
+
+def parse_moves(records) -> list[dict]:
+    """Validate the shape of move records and normalise their values.
+
+    Raises:
+        PostingError: naming the first invalid record (1-based).
+    """
+    if not isinstance(records, list) or not records:
+        raise PostingError("expected a move object or a non-empty list of moves")
+    moves = []
+    for n, record in enumerate(records, start=1):
+        if not isinstance(record, dict):
+            raise PostingError(f"move {n}: must be an object")
+        try:
+            item_id = int(record["item_id"])
+        except (KeyError, TypeError, ValueError):
+            raise PostingError(f"move {n}: 'item_id' is required")
+        qty = _decimal(record.get("qty"), "qty", n)
+        if qty <= 0:
+            raise PostingError(f"move {n}: 'qty' must be positive")
+        try:
+            from_location = _location(record.get("from_location"))
+            to_location = _location(record.get("to_location"))
+        except (TypeError, ValueError):
+            raise PostingError(f"move {n}: locations must be integer ids")
+        if from_location is None and to_location is None:
+            raise PostingError(f"move {n}: 'from_location' or 'to_location' is required")
+        if from_location is not None and from_location == to_location:
+            raise PostingError(f"move {n}: source and destination are the same location")
+        moved_at = record.get("moved_at")
+        if moved_at is not None:
+            try:
+                moved_at = naive_utc(datetime.fromisoformat(str(moved_at)))
+            except ValueError:
+                raise PostingError(f"move {n}: 'moved_at' must be an ISO datetime")
+        lot_code = record.get("lot_code")
+        if lot_code is not None and not isinstance(lot_code, str):
+            raise PostingError(f"move {n}: 'lot_code' must be a string")
+        unit_cost = record.get("unit_cost")
+        moves.append({
+            "item_id": item_id,
+            "from_location": from_location,
+            "to_location": to_location,
+            "qty": qty,
+            "uom_id": _optional_id(record, "uom_id", n),
+            "move_type": record.get("move_type"),
+            "ref_type": record.get("ref_type"),
+            "ref_id": _optional_id(record, "ref_id", n),
+            "moved_at": moved_at,
+            "lot_code": lot_code or None,
+            "unit_cost": None if unit_cost is None else _decimal(unit_cost, "unit_cost", n),
+        })
+    return moves
+
+
+def balance_deltas(moves: list[dict]) -> dict[tuple, Decimal]:
+    """Aggregate moves into net deltas per ``(item_id, location_id, lot_code)``."""
+    deltas: dict[tuple, Decimal] = defaultdict(Decimal)
+    for move in moves:
+        lot = move["lot_code"] or ""
+        if move["from_location"] is not None:
+            deltas[(move["item_id"], move["from_location"], lot)] -= move["qty"]
+        if move["to_location"] is not None:
+            deltas[(move["item_id"], move["to_location"], lot)] += move["qty"]
+    return {key: delta for key, delta in deltas.items() if delta}
+
+
+def _check_references(moves: list[dict]) -> tuple[dict[int, int | None], dict[int, int | None]]:
+    """Verify items, locations and UoMs exist.
+
+    Returns:
+        The base UoM of each item and the warehouse of each location.
+    """
+    item_ids = {m["item_id"] for m in moves}
+    base_uoms = dict(db.session.execute(
+        db.select(Item.id, Item.base_uom_id).where(Item.id.in_(item_ids))
+    ).all())
+    missing = item_ids - base_uoms.keys()
+    if missing:
+        raise PostingError(f"unknown item ids: {sorted(missing)}")
+    location_ids = {m[k] for m in moves for k in ("from_location", "to_location")} - {None}
+    warehouses = dict(db.session.execute(
+        db.select(Location.id, Location.warehouse_id).where(Location.id.in_(location_ids))
+    ).all())
+    missing = location_ids - warehouses.keys()
+    if missing:
+        raise PostingError(f"unknown location ids: {sorted(missing)}")
+    uom_ids = {m["uom_id"] for m in moves} - {None}
+    if uom_ids:
+        missing = uom_ids - set(db.session.execute(db.select(Uom.id).where(Uom.id.in_(uom_ids))).scalars())
+        if missing:
+            raise PostingError(f"unknown uom ids: {sorted(missing)}")
+    return base_uoms, warehouses
+
+
+def _apply_deltas(deltas: dict[tuple, Decimal], uoms: dict[int, int | None], now: datetime) -> None:
+    table = StockOnHand.__table__
+    keys = sorted(deltas)
+    dialect = db.session.get_bind().dialect.name
+    rows = [
+        {"item_id": i, "location_id": loc, "lot_code": lot, "qty": deltas[(i, loc, lot)],
+         "uom_id": uoms.get(i), "updated_at": now}
+        for i, loc, lot in keys
+    ]
+    if dialect in ("postgresql", "sqlite"):
+        if dialect == "postgresql":
+            from sqlalchemy.dialects.postgresql import insert
+            # Lock existing balances in key order before touching them.
+            db.session.execute(
+                db.select(table.c.item_id)
+                .where(db.tuple_(table.c.item_id, table.c.location_id, table.c.lot_code).in_(keys))
+                .order_by(table.c.item_id, table.c.location_id, table.c.lot_code)
+                .with_for_update()
+            )
+        else:
+            from sqlalchemy.dialects.sqlite import insert
+        stmt = insert(table)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[table.c.item_id, table.c.location_id, table.c.lot_code],
+            set_={"qty": table.c.qty + stmt.excluded.qty, "updated_at": stmt.excluded.updated_at},
+        )
+        db.session.execute(stmt, rows)
+        return
+    # Portable fallback: atomic increments, then insert the balances that did not exist.
+    for row in rows:
+        result = db.session.execute(
+            db.update(table)
+            .where(table.c.item_id == row["item_id"], table.c.location_id == row["location_id"],
+                   table.c.lot_code == row["lot_code"])
+            .values(qty=table.c.qty + row["qty"], updated_at=now)
+        )
+        if result.rowcount == 0:
+            db.session.execute(db.insert(table), [row])
+
+
+def post_moves(moves: list[dict]) -> list[int]:
+    """Insert moves and apply them to stock balances in the current transaction.
+
+    Args:
+        moves: records normalised by :func:`parse_moves`.
+
+    Returns:
+        The ids of the inserted moves, in input order. The caller commits.
+
+    Raises:
+        PostingError: if an item, location or UoM does not exist.
+    """
+    uoms, warehouses = _check_references(moves)
+    now = datetime.utcnow()
+    for move in moves:
+        if move["moved_at"] is None:
+            move["moved_at"] = now
+        if move["uom_id"] is None:
+            move["uom_id"] = uoms[move["item_id"]]
+    ids = db.session.execute(
+        db.insert(StockMove).returning(StockMove.id, sort_by_parameter_order=True),
+        moves,
+    ).scalars().all()
+    deltas = balance_deltas(moves)
+    if deltas:
+        _apply_deltas(deltas, uoms, now)
+        stock_availability.apply_deltas(deltas, warehouses, now)
+    for move, id_ in zip(moves, ids):
+        move["id"] = id_
+    costing.apply_moves(moves)
+    stock_checkpoints.invalidate_after(min(m["moved_at"] for m in moves))
+    return ids
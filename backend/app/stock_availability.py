@@ -0,0 +1,160 @@
+"""Pre-aggregated stock availability.
+
+``stock_availability`` holds the on-hand quantity of every ``(item_id,
+warehouse_id, lot_code)``: the ``stock_on_hand`` balances summed over the
+locations of each warehouse. :func:`app.stock.post_moves` applies every
+balance delta to it too, in the same transaction and with the same atomic
+``qty = qty + :delta`` upserts, so availability reads never join
+``Location`` to ``Warehouse`` or scan balances:
+
+- ``group_by=warehouse`` and ``group_by=lot`` sum a handful of rollup rows
+  per item, found through the primary key (it leads with ``item_id``);
+- ``group_by=location`` is the grain of ``stock_on_hand`` itself, read
+  through its primary key the same way.
+
+Writes that bypass :func:`app.stock.post_moves` (bulk loads, SQL fixes)
+and locations moved to another warehouse leave the rollup behind;
+:func:`rebuild` recomputes it from ``stock_on_hand`` in item-id chunks,
+each committed on its own.
+"""
+from __future__ import annotations
+
+from collections import defaultdict
+from datetime import datetime
+from decimal import Decimal
+
+from app.db import db
+from app.models import Item, Location, StockAvailability, StockOnHand
+
+GROUP_BY = ("warehouse", "location", "lot")
+
+# Rollup key for balances in locations without a warehouse.
+NO_WAREHOUSE = 0
+
+
+def rollup_deltas(deltas: dict[tuple, Decimal], warehouses: dict[int, int | None]) -> dict[tuple, Decimal]:
+    """Sum balance deltas per ``(item_id, warehouse_id, lot_code)``.
+
+    Args:
+        deltas: net deltas per ``(item_id, location_id, lot_code)``, as
+            returned by :func:`app.stock.balance_deltas`.
+        warehouses: warehouse id of every location in ``deltas``.
+    """
+    rolled: dict[tuple, Decimal] = defaultdict(Decimal)
+    for (item_id, location_id, lot), delta in deltas.items():
+        warehouse_id = warehouses.get(location_id)
+        rolled[(item_id, NO_WAREHOUSE if warehouse_id is None else warehouse_id, lot)] += delta
+    return {key: delta for key, delta in rolled.items() if delta}
+
+
+def apply_deltas(deltas: dict[tuple, Decimal], warehouses: dict[int, int | None], now: datetime) -> None:
+    """Apply balance deltas to the rollup in the current transaction.
+
+    Rows are upserted in key order, so concurrent postings touching the
+    same warehouses lock them in the same order.
+    """
+    rolled = rollup_deltas(deltas, warehouses)
+    if not rolled:
+        return
+    table = StockAvailability.__table__
+    rows = [
+        {"item_id": i, "warehouse_id": wh, "lot_code": lot, "qty": rolled[(i, wh, lot)], "updated_at": now}
+        for i, wh, lot in sorted(rolled)
+    ]
+    dialect = db.session.get_bind().dialect.name
+    if dialect in ("postgresql", "sqlite"):
+        if dialect == "postgresql":
+            from sqlalchemy.dialects.postgresql import insert
+        else:
+            from sqlalchemy.dialects.sqlite import insert
+        stmt = insert(table)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[table.c.item_id, table.c.warehouse_id, table.c.lot_code],
+            set_={"qty": table.c.qty + stmt.excluded.qty, "updated_at": stmt.excluded.updated_at},
+        )
+        db.session.execute(stmt, rows)
+        return
+    for row in rows:
+        result = db.session.execute(
+            db.update(table)
+            .where(table.c.item_id == row["item_id"], table.c.warehouse_id == row["warehouse_id"],
+                   table.c.lot_code == row["lot_code"])
+            .values(qty=table.c.qty + row["qty"], updated_at=now)
+        )
+        if result.rowcount == 0:
+            db.session.execute(db.insert(table), [row])
+
+
+def availability(item_ids: list[int], group_by: str = "warehouse") -> dict[int, list[tuple]]:
+    """Return non-zero on-hand quantities of ``item_ids`` grouped by ``group_by``.
+
+    Returns:
+        ``{item_id: [(key, qty), ...]}`` sorted by key, where the key is a
+        warehouse id (None for locations without one), a location id or a
+        lot code ("" for stock without a lot). Items without stock are
+        left out.
+    """
+    if group_by == "location":
+        key, item_col, qty_col = StockOnHand.location_id, StockOnHand.item_id, StockOnHand.qty
+    else:
+        a = StockAvailability
+        key = a.warehouse_id if group_by == "warehouse" else a.lot_code
+        item_col, qty_col = a.item_id, a.qty
+    total = db.func.sum(qty_col, type_=qty_col.type)
+    rows = db.session.execute(
+        db.select(item_col, key, total)
+        .where(item_col.in_(item_ids))
+        .group_by(item_col, key)
+        .having(total != 0)
+        .order_by(item_col, key)
+    ).all()
+    out: dict[int, list[tuple]] = defaultdict(list)
+    for item_id, value, qty in rows:
+        if group_by == "warehouse" and value == NO_WAREHOUSE:
+            value = None
+        out[item_id].append((value, qty))
+    return out
+
+
+def rebuild(chunk_items: int = 5000) -> int:
+    """Recompute the whole rollup from ``stock_on_hand``.
+
+    Replaces the rows of ``chunk_items`` item ids at a time and commits
+    after each range. On PostgreSQL the balances of the range are share
+    locked first, so postings to those items wait for the chunk instead
+    of being lost between its delete and insert.
+
+    Returns:
+        The number of rollup rows written.
+    """
+    soh, a = StockOnHand, StockAvailability
+    written = 0
+    lo, hi = db.session.execute(db.select(db.func.min(Item.id), db.func.max(Item.id))).one()
+    if lo is None:
+        return 0
+    postgres = db.session.get_bind().dialect.name == "postgresql"
+    warehouse = db.func.coalesce(Location.warehouse_id, NO_WAREHOUSE)
+    for start in range(lo, hi + 1, chunk_items):
+        item_range = (start, start + chunk_items)
+        if postgres:
+            db.session.execute(
+                db.select(soh.item_id)
+                .where(soh.item_id >= item_range[0], soh.item_id < item_range[1])
+                .with_for_update(read=True)
+            )
+        db.session.execute(
+            db.delete(a).where(a.item_id >= item_range[0], a.item_id < item_range[1])
+        )
+        result = db.session.execute(
+            db.insert(a).from_select(
+                ["item_id", "warehouse_id", "lot_code", "qty", "updated_at"],
+                db.select(soh.item_id, warehouse, soh.lot_code, db.func.sum(soh.qty),
+                          db.literal(datetime.utcnow()))
+                .join(Location, Location.id == soh.location_id)
+                .where(soh.item_id >= item_range[0], soh.item_id < item_range[1])
+                .group_by(soh.item_id, warehouse, soh.lot_code),
+            )
+        )
+        written += result.rowcount
+        db.session.commit()
+    return written
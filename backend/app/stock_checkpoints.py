@@ -0,0 +1,201 @@
+"""Stock balance checkpoints for as-of-date queries.
+
+A checkpoint materialises the ``(item_id, location_id, lot_code)``
+balances of every move with ``moved_at < as_of`` into
+``stock_checkpoint_balances``. Balances at any instant are then the
+nearest ready checkpoint before it plus the moves in between, instead of
+a sum over the whole ledger.
+
+Building is incremental and chunked: a new checkpoint starts from the
+latest ready checkpoint before it and adds only the moves since, one
+``INSERT ... SELECT`` per range of item ids, each committed on its own so
+no long transaction holds locks on a live database.
+
+Posting a move dated before a checkpoint's ``as_of`` (a late, back-dated
+move) marks that checkpoint, and only those after it, ``STALE``; stale
+checkpoints are ignored by queries until rebuilt. A checkpoint is only
+marked ``READY`` if nothing made it stale while it was being built.
+"""
+from __future__ import annotations
+
+from datetime import datetime
+
+from app.db import db
+from app.models import Item, StockCheckpoint, StockCheckpointBalance, StockMove
+
+BUILDING = "BUILDING"
+READY = "READY"
+STALE = "STALE"
+
+
+class CheckpointError(ValueError):
+    """Raised for a checkpoint that cannot be built."""
+
+
+def _filters(item_col, location_col, item_range=None, item_ids=None, location_id=None):
+    conds = []
+    if item_range is not None:
+        conds += [item_col >= item_range[0], item_col < item_range[1]]
+    if item_ids is not None:
+        conds.append(item_col.in_(item_ids))
+    if location_id is not None:
+        conds.append(location_col == location_id)
+    return conds
+
+
+def balance_select(checkpoint_id: int | None, after: datetime | None, before: datetime,
+                   **filters):
+    """Return a select of ``(item_id, location_id, lot_code, qty)`` balances.
+
+    Sums the balances of checkpoint ``checkpoint_id`` (if any) and the move
+    deltas with ``after <= moved_at < before``; zero balances are dropped.
+
+    Args:
+        filters: optional ``item_range`` (``[lo, hi)``), ``item_ids`` and
+            ``location_id`` restrictions.
+    """
+    lot = db.func.coalesce(StockMove.lot_code, "")
+    window = [StockMove.moved_at < before]
+    if after is not None:
+        window.append(StockMove.moved_at >= after)
+    parts = [
+        db.select(
+            StockMove.item_id, StockMove.from_location.label("location_id"),
+            lot.label("lot_code"), (-StockMove.qty).label("qty"),
+        ).where(StockMove.from_location.isnot(None), *window,
+                *_filters(StockMove.item_id, StockMove.from_location, **filters)),
+        db.select(
+            StockMove.item_id, StockMove.to_location.label("location_id"),
+            lot.label("lot_code"), StockMove.qty.label("qty"),
+        ).where(StockMove.to_location.isnot(None), *window,
+                *_filters(StockMove.item_id, StockMove.to_location, **filters)),
+    ]
+    if checkpoint_id is not None:
+        b = StockCheckpointBalance
+        parts.append(
+            db.select(b.item_id, b.location_id, b.lot_code, b.qty)
+            .where(b.checkpoint_id == checkpoint_id, *_filters(b.item_id, b.location_id, **filters))
+        )
+    deltas = db.union_all(*parts).subquery("deltas")
+    total = db.func.round(db.func.sum(deltas.c.qty), 4)
+    return (
+        db.select(deltas.c.item_id, deltas.c.location_id, deltas.c.lot_code, total.label("qty"))
+        .group_by(deltas.c.item_id, deltas.c.location_id, deltas.c.lot_code)
+        .having(total != 0)
+    )
+
+
+def latest_ready(before: datetime) -> StockCheckpoint | None:
+    """Return the ready checkpoint with the greatest ``as_of <= before``."""
+    return db.session.execute(
+        db.select(StockCheckpoint)
+        .where(StockCheckpoint.status == READY, StockCheckpoint.as_of <= before)
+        .order_by(StockCheckpoint.as_of.desc())
+        .limit(1)
+    ).scalar()
+
+
+def balances_as_of(at: datetime, item_ids=None, location_id=None):
+    """Return ``(checkpoint, rows)`` with the balances just before ``at``.
+
+    ``rows`` are ``(item_id, location_id, lot_code, qty)`` tuples sorted by
+    key; ``checkpoint`` is the one the answer started from, or None.
+    """
+    checkpoint = latest_ready(at)
+    stmt = balance_select(
+        checkpoint.id if checkpoint else None,
+        checkpoint.as_of if checkpoint else None,
+        at,
+        item_ids=item_ids,
+        location_id=location_id,
+    ).order_by("item_id", "location_id", "lot_code")
+    return checkpoint, db.session.execute(stmt).all()
+
+
+def build_checkpoint(as_of: datetime, chunk_items: int = 5000) -> StockCheckpoint:
+    """Create (or rebuild a stale) checkpoint at ``as_of``.
+
+    Starts from the latest ready checkpoint before ``as_of`` and commits
+    once per ``chunk_items`` item ids. A checkpoint that is already ready
+    is returned as is.
+
+    Raises:
+        CheckpointError: if ``as_of`` is in the future; moves still to be
+            posted before it would not be in the balances.
+    """
+    if as_of > datetime.utcnow():
+        raise CheckpointError(f"as_of {as_of.isoformat()} is in the future")
+    checkpoint = db.session.execute(
+        db.select(StockCheckpoint).where(StockCheckpoint.as_of == as_of)
+    ).scalar()
+    if checkpoint is not None and checkpoint.status == READY:
+        return checkpoint
+    base = db.session.execute(
+        db.select(StockCheckpoint)
+        .where(StockCheckpoint.status == READY, StockCheckpoint.as_of < as_of)
+        .order_by(StockCheckpoint.as_of.desc())
+        .limit(1)
+    ).scalar()
+    if checkpoint is None:
+        checkpoint = StockCheckpoint(as_of=as_of)
+        db.session.add(checkpoint)
+    else:
+        db.session.execute(
+            db.delete(StockCheckpointBalance)
+            .where(StockCheckpointBalance.checkpoint_id == checkpoint.id)
+        )
+    checkpoint.status = BUILDING
+    checkpoint.base_id = base.id if base else None
+    checkpoint.created_at = datetime.utcnow()
+    checkpoint.completed_at = None
+    db.session.commit()
+
+    checkpoint_id = checkpoint.id
+    base_id = base.id if base else None
+    after = base.as_of if base else None
+    lo, hi = db.session.execute(db.select(db.func.min(Item.id), db.func.max(Item.id))).one()
+    if lo is not None:
+        for start in range(lo, hi + 1, chunk_items):
+            balances = balance_select(base_id, after, as_of,
+                                      item_range=(start, start + chunk_items)).subquery()
+            db.session.execute(
+                db.insert(StockCheckpointBalance).from_select(
+                    ["checkpoint_id", "item_id", "location_id", "lot_code", "qty"],
+                    db.select(db.literal(checkpoint_id), balances.c.item_id,
+                              balances.c.location_id, balances.c.lot_code, balances.c.qty),
+                )
+            )
+            db.session.commit()
+
+    # A back-dated move posted during the build has already marked the
+    # checkpoint stale; only a checkpoint still building becomes ready.
+    db.session.execute(
+        db.update(StockCheckpoint)
+        .where(StockCheckpoint.id == checkpoint_id, StockCheckpoint.status == BUILDING)
+        .values(status=READY, completed_at=datetime.utcnow())
+    )
+    db.session.commit()
+    return db.session.get(StockCheckpoint, checkpoint_id, populate_existing=True)
+
+
+def rebuild_stale(chunk_items: int = 5000) -> list[StockCheckpoint]:
+    """Rebuild every stale checkpoint not in the future, oldest first."""
+    stale = db.session.execute(
+        db.select(StockCheckpoint.as_of)
+        .where(StockCheckpoint.status == STALE, StockCheckpoint.as_of <= datetime.utcnow())
+        .order_by(StockCheckpoint.as_of)
+    ).scalars().all()
+    return [build_checkpoint(as_of, chunk_items) for as_of in stale]
+
+
+def invalidate_after(moved_at: datetime) -> None:
+    """Mark checkpoints that should include a move at ``moved_at`` as stale.
+
+    Runs in the posting transaction; checkpoints at or before ``moved_at``
+    are untouched.
+    """
+    db.session.execute(
+        db.update(StockCheckpoint)
+        .where(StockCheckpoint.as_of > moved_at, StockCheckpoint.status != STALE)
+        .values(status=STALE)
+    )
@@ -0,0 +1,5 @@
+"""Micro-benchmarks and load tools for the backend.
+
+Run modules from the ``backend/`` directory, e.g.
+``python -m benchmarks.serializers``.
+"""
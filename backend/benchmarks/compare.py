@@ -0,0 +1,80 @@
+"""Compare two :mod:`benchmarks.load` result files.
+
+Prints, per scenario present in either file, p50/p99 latency and
+throughput before and after with the relative change, and flags
+scenarios whose p99 grew (or throughput dropped) by more than
+``--threshold`` percent. Exits with status 1 when any scenario regressed,
+so it can gate a CI job.
+
+Usage (from ``backend/``)::
+
+    python -m benchmarks.compare baseline.json candidate.json --threshold 10
+"""
+import argparse
+import json
+import sys
+
+
+def _change(before, after) -> float | None:
+    if before in (None, 0) or after is None:
+        return None
+    return (after - before) / before * 100
+
+
+def _fmt(value, width: int, digits: int = 2) -> str:
+    return f"{'-':>{width}}" if value is None else f"{value:>{width}.{digits}f}"
+
+
+def compare(before: dict, after: dict, threshold: float) -> list[str]:
+    """Print the comparison table and return the names of regressed scenarios."""
+    names = list(before["scenarios"])
+    names += [n for n in after["scenarios"] if n not in before["scenarios"]]
+    print(f"{'scenario':<36}{'p50 ms':>19}{'p99 ms':>19}{'rps':>21}{'Δp99':>8}{'Δrps':>8}")
+    regressed = []
+    for name in names:
+        a, b = before["scenarios"].get(name, {}), after["scenarios"].get(name, {})
+        d_p99 = _change(a.get("p99_ms"), b.get("p99_ms"))
+        d_rps = _change(a.get("throughput_rps"), b.get("throughput_rps"))
+        flag = ""
+        if (d_p99 is not None and d_p99 > threshold) or (d_rps is not None and d_rps < -threshold):
+            regressed.append(name)
+            flag = "  REGRESSED"
+        if b.get("errors"):
+            flag += f"  errors={b['errors']}"
+        print(
+            f"{name:<36}{_fmt(a.get('p50_ms'), 9)} {_fmt(b.get('p50_ms'), 9)}"
+            f"{_fmt(a.get('p99_ms'), 9)} {_fmt(b.get('p99_ms'), 9)}"
+            f"{_fmt(a.get('throughput_rps'), 10, 1)} {_fmt(b.get('throughput_rps'), 10, 1)}"
+            f"{_fmt(d_p99, 7, 1)}%{_fmt(d_rps, 7, 1)}%{flag}"
+        )
+    print(f"peak RSS MB: {before.get('peak_rss_mb')} -> {after.get('peak_rss_mb')}")
+    return regressed
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("before")
+    parser.add_argument("after")
+    parser.add_argument("--threshold", type=float, default=10.0,
+                        help="Percent change in p99 or throughput counted as a regression.")
+    args = parser.parse_args()
+
+    with open(args.before) as f:
+        before = json.load(f)
+    with open(args.after) as f:
+        after = json.load(f)
+    for label, doc in (("before", before), ("after", after)):
+        meta = doc.get("meta", {})
+        print(f"{label}: {meta.get('commit', '?')[:12]} {meta.get('dialect')} {meta.get('target')} "
+              f"{meta.get('dataset')}")
+    if before.get("meta", {}).get("dataset") != after.get("meta", {}).get("dataset"):
+        print("warning: the runs used different datasets")
+
+    regressed = compare(before, after, args.threshold)
+    if regressed:
+        print(f"{len(regressed)} scenario(s) regressed: {', '.join(regressed)}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,402 @@
+"""Deterministic synthetic data for a tailoring shop.
+
+Fills an empty database (SQLite or PostgreSQL) with reference data and
+a catalog in three tiers, identified by SKU prefix:
+
+- ``RM-``: raw materials (fabrics, linings, trims, buttons, thread);
+- ``SA-``: sub-assemblies (fronts, collars, sleeves...), whose BOMs use
+  raw materials and sometimes a lower-numbered sub-assembly;
+- ``FG-``: finished garments, whose BOMs use sub-assemblies and raw
+  materials, so BOMs are three or more levels deep and acyclic.
+
+Suppliers offer raw materials (``supplier_items``), purchase orders have
+lines, and stock moves (receipts, transfers, issues to WIP) spread over
+the last year, with ``stock_on_hand``, the availability rollup and the
+inventory costs derived from them.
+
+The same ``--seed`` and counts always produce the same rows. Ids are
+assigned explicitly so later tables reference earlier ones without
+queries; rows are written with Core ``executemany`` in batches.
+
+Usage (from ``backend/``)::
+
+    python -m benchmarks.datagen --database-url sqlite:///bench.db --preset small
+    python -m benchmarks.datagen --database-url postgresql://localhost/bench \\
+        --preset large --drop
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import random
+import time
+from datetime import date, datetime, timedelta
+
+from app import create_app
+from app.db import db
+
+PRESETS = {
+    "tiny": dict(items=2_000, boms=300, suppliers=100, supplier_items=1_000, pos=200,
+                 moves=20_000),
+    "small": dict(items=50_000, boms=5_000, suppliers=2_000, supplier_items=20_000, pos=2_000,
+                  moves=500_000),
+    "medium": dict(items=250_000, boms=25_000, suppliers=10_000, supplier_items=50_000,
+                   pos=10_000, moves=2_000_000),
+    "large": dict(items=1_000_000, boms=100_000, suppliers=50_000, supplier_items=50_000,
+                  pos=50_000, moves=10_000_000),
+}
+
+UOMS = ("M", "EA", "KG", "ROLL", "CONE")
+CATEGORIES = ("FABRIC", "LINING", "TRIM", "BUTTON", "THREAD", "INTERLINING", "SUBASSEMBLY", "GARMENT")
+RAW_KINDS = (
+    # (category, uom, name words)
+    ("FABRIC", "M", ("wool", "flannel", "tweed", "linen", "cotton", "cashmere", "twill")),
+    ("LINING", "M", ("bemberg", "viscose", "silk")),
+    ("TRIM", "EA", ("zipper", "label", "hanger", "tape")),
+    ("BUTTON", "EA", ("horn", "corozo", "mother-of-pearl", "metal")),
+    ("THREAD", "CONE", ("polyester", "silk", "cotton")),
+    ("INTERLINING", "M", ("canvas", "fusible", "horsehair")),
+)
+GARMENTS = ("jacket", "trousers", "waistcoat", "overcoat", "shirt", "suit")
+PARTS = ("front", "back", "sleeve", "collar", "lapel", "pocket", "waistband", "cuff")
+COLORS = ("navy", "charcoal", "grey", "black", "brown", "olive", "camel", "white")
+BRANDS = ("Loro", "Holland", "Dormeuil", "Fox", "Harrisons", "Vitale", "Reda", "House")
+PO_STATUSES = ("OPEN", "OPEN", "OPEN", "RECEIVED", "CLOSED", "CANCELLED")
+LOCATION_TYPES = ("RECEIVING", "STORAGE", "STORAGE", "STORAGE", "WIP", "SHIPPING")
+
+BATCH = 10_000
+
+
+def _chunks(rows, size=BATCH):
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def _insert(table, rows) -> int:
+    count = 0
+    for batch in _chunks(rows):
+        db.session.execute(table.insert(), batch)
+        db.session.commit()
+        count += len(batch)
+    return count
+
+
+class Generator:
+    """Produce the dataset for given counts; see :data:`PRESETS`."""
+
+    def __init__(self, seed: int, items: int, boms: int, suppliers: int, supplier_items: int,
+                 pos: int, moves: int, today: date | None = None):
+        self.seed = seed
+        self.counts = dict(items=items, boms=boms, suppliers=suppliers,
+                           supplier_items=supplier_items, pos=pos, moves=moves)
+        self.today = today or date(2026, 1, 1)
+        self.n_fg = max(1, items // 20)
+        self.n_sa = max(1, items // 10)
+        self.n_rm = max(1, items - self.n_fg - self.n_sa)
+
+    def rng(self, table: str) -> random.Random:
+        # One stream per table: changing one count does not reshuffle the others.
+        return random.Random(f"{self.seed}:{table}")
+
+    # Item id layout: raw materials first, then sub-assemblies, then garments.
+    def rm_id(self, n):
+        return 1 + n
+
+    def sa_id(self, n):
+        return 1 + self.n_rm + n
+
+    def fg_id(self, n):
+        return 1 + self.n_rm + self.n_sa + n
+
+    def run(self, log=print) -> dict:
+        from flask import current_app
+        from app import bom_closure, costing, stock_availability
+        from app.models import (Bom, BomLine, Item, ItemCategory, Location, PoLine, PurchaseOrder,
+                                StockMove, Supplier, SupplierItem, Uom, Warehouse)
+
+        written = {}
+        t0 = time.perf_counter()
+
+        def step(name, table, rows):
+            start = time.perf_counter()
+            written[name] = _insert(table.__table__, rows)
+            log(f"{name:<16}{written[name]:>12,} rows {time.perf_counter() - start:>8.1f}s")
+
+        step("uoms", Uom, ({"id": i + 1, "code": c} for i, c in enumerate(UOMS)))
+        step("categories", ItemCategory, ({"id": i + 1, "code": c} for i, c in enumerate(CATEGORIES)))
+        step("warehouses", Warehouse, (
+            {"id": w + 1, "code": f"WH{w + 1}", "name": f"Warehouse {w + 1}"} for w in range(3)
+        ))
+        self.locations = [(w * 20 + n + 1, LOCATION_TYPES[n % len(LOCATION_TYPES)])
+                          for w in range(3) for n in range(20)]
+        step("locations", Location, (
+            {"id": loc, "warehouse_id": (loc - 1) // 20 + 1, "code": f"L{loc:03d}", "type": kind}
+            for loc, kind in self.locations
+        ))
+        step("items", Item, self._items())
+        step("boms", Bom, self._boms())
+        step("bom_lines", BomLine, self._bom_lines())
+        start = time.perf_counter()
+        written["bom_closure"] = bom_closure.rebuild()
+        log(f"{'bom_closure':<16}{written['bom_closure']:>12,} rows {time.perf_counter() - start:>8.1f}s")
+        step("suppliers", Supplier, self._suppliers())
+        step("supplier_items", SupplierItem, self._supplier_items())
+        step("purchase_orders", PurchaseOrder, self._pos())
+        step("po_lines", PoLine, self._po_lines())
+        self._po_totals()
+        step("stock_moves", StockMove, self._moves())
+        written["stock_on_hand"] = self._stock_on_hand()
+        written["stock_availability"] = stock_availability.rebuild()
+        start = time.perf_counter()
+        written["stock_move_costs"] = costing.replay(current_app.config["STOCK_COSTING_METHOD"])["moves"]
+        log(f"{'stock_move_costs':<16}{written['stock_move_costs']:>12,} rows {time.perf_counter() - start:>8.1f}s")
+        self._fix_sequences()
+        written["seconds"] = round(time.perf_counter() - t0, 1)
+        return written
+
+    # ------------------------------------------------------------------
+    # Catalog
+    # ------------------------------------------------------------------
+
+    def _items(self):
+        rng = self.rng("items")
+        uom = {c: i + 1 for i, c in enumerate(UOMS)}
+        cat = {c: i + 1 for i, c in enumerate(CATEGORIES)}
+        for n in range(self.n_rm):
+            category, unit, words = RAW_KINDS[n % len(RAW_KINDS)]
+            color = rng.choice(COLORS)
+            spec = {"color": color, "kind": rng.choice(words)}
+            if category == "FABRIC":
+                spec["weight_gsm"] = rng.randrange(180, 420, 10)
+            yield {
+                "id": self.rm_id(n), "sku": f"RM-{n:07d}",
+                "name": f"{spec['kind'].title()} {category.lower()} {color}",
+                "category_id": cat[category], "base_uom_id": uom[unit],
+                "brand": rng.choice(BRANDS), "active": rng.random() > 0.02,
+                "spec": spec,
+            }
+        for n in range(self.n_sa):
+            part, garment = PARTS[n % len(PARTS)], GARMENTS[n % len(GARMENTS)]
+            yield {
+                "id": self.sa_id(n), "sku": f"SA-{n:07d}", "name": f"{garment.title()} {part}",
+                "category_id": cat["SUBASSEMBLY"], "base_uom_id": uom["EA"], "brand": "House",
+                "active": True, "spec": {"garment": garment, "part": part},
+            }
+        for n in range(self.n_fg):
+            garment, color = GARMENTS[n % len(GARMENTS)], rng.choice(COLORS)
+            yield {
+                "id": self.fg_id(n), "sku": f"FG-{n:07d}", "name": f"{color.title()} {garment}",
+                "category_id": cat["GARMENT"], "base_uom_id": uom["EA"], "brand": "House",
+                "active": True,
+                "spec": {"garment": garment, "color": color, "size": 36 + 2 * (n % 10)},
+            }
+
+    def _bom_products(self):
+        """Product item of every BOM id: garments first, then sub-assemblies, then new versions."""
+        products = [self.fg_id(n) for n in range(self.n_fg)] + [self.sa_id(n) for n in range(self.n_sa)]
+        boms = self.counts["boms"]
+        for bom_id in range(1, boms + 1):
+            index = bom_id - 1
+            yield bom_id, products[index % len(products)], index // len(products) + 1
+
+    def _boms(self):
+        for bom_id, product, version in self._bom_products():
+            yield {
+                "id": bom_id, "product_item_id": product, "version": version,
+                "effective_from": date(2024, 1, 1) + timedelta(days=30 * (version - 1)),
+                "effective_to": None, "notes": None,
+            }
+
+    def _bom_lines(self):
+        rng = self.rng("bom_lines")
+        uom = {c: i + 1 for i, c in enumerate(UOMS)}
+        first_sa = self.sa_id(0)
+        line_id = 0
+        for bom_id, product, _ in self._bom_products():
+            # (component item id, uom id): sub-assemblies count in EA, raw
+            # materials in the unit of their kind.
+            components = []
+            if product >= self.fg_id(0):
+                components += [(self.sa_id(rng.randrange(self.n_sa)), uom["EA"])
+                               for _ in range(rng.randint(2, 4))]
+                raw_lines = rng.randint(3, 8)
+            else:
+                sa_index = product - first_sa
+                if sa_index > 0 and rng.random() < 0.2:
+                    components.append((self.sa_id(rng.randrange(sa_index)), uom["EA"]))
+                raw_lines = rng.randint(2, 6)
+            for _ in range(raw_lines):
+                n = rng.randrange(self.n_rm)
+                components.append((self.rm_id(n), uom[RAW_KINDS[n % len(RAW_KINDS)][1]]))
+            seen = set()
+            for component, uom_id in components:
+                if component in seen:
+                    continue
+                seen.add(component)
+                line_id += 1
+                yield {
+                    "id": line_id, "bom_id": bom_id, "component_item_id": component,
+                    "qty_per": round(rng.uniform(0.1, 3.5), 4), "uom_id": uom_id,
+                    "scrap_pct": rng.choice((0, 0, 2, 3, 5)), "is_optional": rng.random() < 0.05,
+                    "alt_group": None, "color_match_rule": rng.choice((None, "MATCH_SHELL")),
+                    "size_rule": None, "notes": None,
+                }
+
+    # ------------------------------------------------------------------
+    # Procurement
+    # ------------------------------------------------------------------
+
+    def _suppliers(self):
+        rng = self.rng("suppliers")
+        for n in range(self.counts["suppliers"]):
+            yield {
+                "id": n + 1, "name": f"{rng.choice(BRANDS)} Mill {n}",
+                "country": rng.choice(("IT", "GB", "PT", "TR", "IN", "CN")),
+                "payment_terms": rng.choice(("NET30", "NET60", "PREPAID")),
+                "lead_time_days": rng.choice((7, 14, 21, 30, 45, 60)),
+                "currency": rng.choice(("EUR", "EUR", "GBP", "USD")),
+            }
+
+    def _supplier_items(self):
+        rng = self.rng("supplier_items")
+        for n in range(self.counts["supplier_items"]):
+            item = self.rm_id(n % self.n_rm if n < self.n_rm else rng.randrange(self.n_rm))
+            yield {
+                "id": n + 1, "supplier_id": rng.randrange(self.counts["suppliers"]) + 1,
+                "item_id": item, "vendor_sku": f"V{n:08d}",
+                "price": round(rng.uniform(0.2, 80), 2),
+                "moq": rng.choice((None, 1, 10, 50, 100)), "incoterms": rng.choice((None, "EXW", "FOB")),
+            }
+
+    def _pos(self):
+        rng = self.rng("purchase_orders")
+        for n in range(self.counts["pos"]):
+            yield {
+                "id": n + 1, "supplier_id": rng.randrange(self.counts["suppliers"]) + 1,
+                "po_number": f"PO-{n:08d}", "status": rng.choice(PO_STATUSES),
+                "eta": self.today + timedelta(days=rng.randint(-60, 120)),
+                "currency": "EUR", "total": 0, "lines_total": 0,
+            }
+
+    def _po_lines(self):
+        rng = self.rng("po_lines")
+        line_id = 0
+        for po in range(1, self.counts["pos"] + 1):
+            for _ in range(rng.randint(1, 40)):
+                line_id += 1
+                item = self.rm_id(rng.randrange(self.n_rm))
+                # Lot codes match the stock moves; the shade is a function of item and lot
+                lot = line_id % 50
+                yield {
+                    "id": line_id, "po_id": po, "item_id": item,
+                    "qty": rng.randint(1, 500), "uom_id": 1, "price": round(rng.uniform(0.2, 80), 2),
+                    "lot_request": f"L{lot:02d}", "shade_request": COLORS[(item + lot) % len(COLORS)],
+                }
+
+    def _po_totals(self) -> None:
+        from app.models import PoLine, PurchaseOrder
+
+        lines_total = (
+            db.select(db.func.coalesce(db.func.sum(PoLine.qty * PoLine.price), 0))
+            .where(PoLine.po_id == PurchaseOrder.id)
+            .scalar_subquery()
+        )
+        db.session.execute(
+            db.update(PurchaseOrder).values(lines_total=lines_total, total=db.func.round(lines_total, 2))
+        )
+        db.session.commit()
+
+    # ------------------------------------------------------------------
+    # Inventory
+    # ------------------------------------------------------------------
+
+    def _moves(self):
+        rng = self.rng("stock_moves")
+        total = self.counts["moves"]
+        receiving = [loc for loc, kind in self.locations if kind == "RECEIVING"]
+        storage = [loc for loc, kind in self.locations if kind == "STORAGE"]
+        wip = [loc for loc, kind in self.locations if kind == "WIP"]
+        start = datetime.combine(self.today - timedelta(days=365), datetime.min.time())
+        step = timedelta(days=365) / max(total, 1)
+        for n in range(total):
+            roll = rng.random()
+            if roll < 0.4:
+                kind, src, dst = "RECEIPT", None, rng.choice(receiving + storage)
+            elif roll < 0.7:
+                kind, src, dst = "TRANSFER", rng.choice(receiving + storage), rng.choice(storage)
+            else:
+                kind, src, dst = "ISSUE", rng.choice(storage), rng.choice(wip)
+            yield {
+                "id": n + 1, "item_id": self.rm_id(rng.randrange(self.n_rm)),
+                "from_location": src, "to_location": dst,
+                "qty": rng.randint(1, 200), "uom_id": 1, "move_type": kind,
+                "ref_type": None, "ref_id": None, "moved_at": start + step * n,
+                "lot_code": f"L{rng.randrange(50):02d}", "unit_cost": round(rng.uniform(0.2, 80), 2),
+            }
+
+    def _stock_on_hand(self) -> int:
+        from app.models import StockOnHand
+        from app.stock_checkpoints import balance_select
+
+        balances = balance_select(None, None, datetime.max).subquery()
+        result = db.session.execute(
+            db.insert(StockOnHand).from_select(
+                ["item_id", "location_id", "lot_code", "qty"],
+                db.select(balances.c.item_id, balances.c.location_id, balances.c.lot_code,
+                          balances.c.qty),
+            )
+        )
+        db.session.commit()
+        return result.rowcount
+
+    def _fix_sequences(self) -> None:
+        """Move PostgreSQL id sequences past the explicitly assigned ids."""
+        if db.session.get_bind().dialect.name != "postgresql":
+            return
+        for table in ("uoms", "item_categories", "warehouses", "locations", "items", "boms",
+                      "bom_lines", "suppliers", "supplier_items", "purchase_orders", "po_lines",
+                      "stock_moves"):
+            db.session.execute(db.text(
+                f"SELECT setval(pg_get_serial_sequence('{table}', 'id'), "
+                f"coalesce((SELECT max(id) FROM {table}), 1))"
+            ))
+        db.session.commit()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--database-url", required=True)
+    parser.add_argument("--preset", choices=sorted(PRESETS), default="small")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--drop", action="store_true", help="Drop and recreate all tables first.")
+    for name in PRESETS["small"]:
+        parser.add_argument(f"--{name.replace('_', '-')}", type=int, help=f"Override the preset's {name}.")
+    args = parser.parse_args()
+
+    counts = dict(PRESETS[args.preset])
+    for name in counts:
+        value = getattr(args, name)
+        if value is not None:
+            counts[name] = value
+
+    app = create_app({"SQLALCHEMY_DATABASE_URI": args.database_url})
+    with app.app_context():
+        from app.models import Item
+
+        if args.drop:
+            db.drop_all()
+        db.create_all()
+        if db.session.execute(db.select(Item.id).limit(1)).first() is not None:
+            raise SystemExit("database already has items; pass --drop to regenerate")
+        summary = Generator(args.seed, **counts).run()
+    print(json.dumps({"seed": args.seed, "counts": counts, "written": summary}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+"""Bytes and CPU time per request for the JSON provider and compression.
+
+Seeds an in-memory SQLite database (see :mod:`benchmarks.serializers`)
+and requests the big list endpoints through the test client in two
+setups:
+
+- ``before``: Flask's stdlib JSON provider, no in-process compression;
+  the gzip a reverse proxy would then apply is timed separately and
+  added, since that CPU is spent either way;
+- ``after``: :class:`app.json_provider.FastJSONProvider` with the
+  in-process compression hook (gzip, or br with ``--encoding br``).
+
+CPU time is process time (``time.process_time``), best of ``--repeat``.
+
+Usage (from ``backend/``)::
+
+    python -m benchmarks.json_compression --rows 20000 --repeat 5
+"""
+import argparse
+import gzip
+import time
+
+from flask.json.provider import DefaultJSONProvider
+
+from app import create_app
+from app.db import db
+from benchmarks.serializers import _seed
+
+PATHS = ("/items?limit=1000", "/items?stream=1", "/supplier_items")
+
+
+class _StdlibProvider(DefaultJSONProvider):
+    """Flask's default provider plus the ``dumpb`` hook the streaming route uses."""
+
+    def dumpb(self, obj) -> bytes:
+        return self.dumps(obj).encode()
+
+
+def _measure(client, path: str, headers: dict, repeat: int, proxy_gzip: bool):
+    best = float("inf")
+    size = 0
+    for _ in range(repeat):
+        start = time.process_time()
+        body = client.get(path, headers=headers).data
+        if proxy_gzip:
+            body = gzip.compress(body, 6)
+        best = min(best, time.process_time() - start)
+        size = len(body)
+    return best, size
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=20000)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--encoding", choices=("gzip", "br"), default="gzip")
+    args = parser.parse_args()
+
+    app = create_app({"SQLALCHEMY_DATABASE_URI": "sqlite:///:memory:"})
+    with app.app_context():
+        db.create_all()
+        _seed(args.rows)
+    fast = app.json
+    client = app.test_client()
+    print(f"JSON backend: {fast.backend}")
+    print(f"{'path':<22}{'before ms':>11}{'before KB':>11}{'after ms':>10}{'after KB':>10}{'raw KB':>9}")
+    for path in PATHS:
+        app.json = _StdlibProvider(app)
+        app.config["COMPRESS_ENABLED"] = False
+        raw = len(client.get(path).data)
+        t_before, b_before = _measure(client, path, {}, args.repeat, proxy_gzip=True)
+
+        app.json = fast
+        app.config["COMPRESS_ENABLED"] = True
+        t_after, b_after = _measure(
+            client, path, {"Accept-Encoding": args.encoding}, args.repeat, proxy_gzip=False
+        )
+        print(
+            f"{path:<22}{t_before * 1e3:>11.1f}{b_before / 1024:>11.1f}"
+            f"{t_after * 1e3:>10.1f}{b_after / 1024:>10.1f}{raw / 1024:>9.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
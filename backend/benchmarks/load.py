@@ -0,0 +1,450 @@
+"""Scenario load runner for every blueprint endpoint.
+
+Drives a database filled by :mod:`benchmarks.datagen` either through the
+Flask test client (in process, no network) or over HTTP against a running
+server, and writes one JSON document per run:
+
+- ``meta``: git commit, time, target, database dialect, row counts;
+- ``scenarios``: per scenario the request count, errors, status codes,
+  throughput and p50/p95/p99/max latency in milliseconds, plus the peak
+  RSS (MB) of the measured process after the scenario;
+- ``peak_rss_mb``: the peak RSS over the whole run.
+
+With ``--target`` ``testclient`` the measured process is the runner
+itself; over HTTP pass ``--server-pid`` to read the server's peak RSS
+from ``/proc`` (Linux), otherwise it is reported as null. Requests are
+drawn from a seeded RNG, so two runs against the same dataset issue the
+same requests. Write scenarios insert rows: run against a disposable copy.
+Compare two result files with :mod:`benchmarks.compare`.
+
+Usage (from ``backend/``)::
+
+    python -m benchmarks.load --database-url sqlite:///bench.db --requests 200 \\
+        --output results.json
+    python -m benchmarks.load --database-url postgresql://localhost/bench \\
+        --target http://127.0.0.1:5000 --concurrency 8 --server-pid 1234
+"""
+from __future__ import annotations
+
+import argparse
+import fnmatch
+import http.client
+import json
+import os
+import platform
+import random
+import resource
+import subprocess
+import threading
+import time
+from dataclasses import dataclass, field
+from datetime import date, datetime, timedelta, timezone
+from typing import Callable
+from urllib.parse import urlsplit
+
+from app import create_app
+from app.db import db
+
+
+# ----------------------------------------------------------------------
+# Dataset context
+# ----------------------------------------------------------------------
+
+@dataclass
+class Context:
+    """Ids sampled from the dataset that scenarios draw requests from."""
+
+    raw: list[int]
+    subassemblies: list[int]
+    garments: list[int]
+    boms: list[int]
+    suppliers: list[int]
+    pos: list[int]
+    locations: list[int]
+    counts: dict = field(default_factory=dict)
+    tag: str = ""
+
+    @classmethod
+    def load(cls, sample: int = 2000) -> "Context":
+        from app.models import Bom, Item, Location, PurchaseOrder, StockMove, Supplier, SupplierItem
+
+        def ids(column, *where):
+            return list(db.session.execute(
+                db.select(column).where(*where).order_by(column).limit(sample)
+            ).scalars())
+
+        def count(column):
+            return db.session.execute(db.select(db.func.count(column))).scalar()
+
+        context = cls(
+            raw=ids(Item.id, Item.sku.like("RM-%")),
+            subassemblies=ids(Item.id, Item.sku.like("SA-%")),
+            garments=ids(Item.id, Item.sku.like("FG-%")),
+            boms=ids(Bom.id),
+            suppliers=ids(Supplier.id),
+            pos=ids(PurchaseOrder.id),
+            locations=ids(Location.id),
+            counts={
+                "items": count(Item.id), "boms": count(Bom.id), "suppliers": count(Supplier.id),
+                "supplier_items": count(SupplierItem.id), "purchase_orders": count(PurchaseOrder.id),
+                "stock_moves": count(StockMove.id),
+            },
+            tag=f"{int(time.time())}{os.getpid()}",
+        )
+        if not (context.raw and context.garments and context.boms and context.suppliers):
+            raise SystemExit("dataset is empty; fill it with python -m benchmarks.datagen first")
+        return context
+
+
+# ----------------------------------------------------------------------
+# Scenarios
+# ----------------------------------------------------------------------
+
+@dataclass
+class Request:
+    method: str
+    path: str
+    json: object = None
+    data: bytes | None = None
+    content_type: str | None = None
+
+
+@dataclass
+class Scenario:
+    name: str
+    build: Callable[[Context, random.Random, int], Request]
+    # Fraction of --requests to run (full-table listings and MRP runs are slow).
+    weight: float = 1.0
+
+
+def _csv_items(ctx: Context, seq: int, rows: int = 100) -> bytes:
+    lines = ["sku,name,category,base_uom,brand"]
+    lines += [f"BULK-{ctx.tag}-{seq}-{n},Bulk item {n},FABRIC,M,Bench" for n in range(rows)]
+    return ("\n".join(lines) + "\n").encode()
+
+
+def _moves(ctx: Context, rng: random.Random, n: int = 50) -> list[dict]:
+    moves = []
+    for _ in range(n):
+        src, dst = rng.sample(ctx.locations, 2)
+        moves.append({"item_id": rng.choice(ctx.raw), "from_location": src, "to_location": dst,
+                      "qty": rng.randint(1, 20), "lot_code": f"L{rng.randrange(50):02d}",
+                      "move_type": "TRANSFER"})
+    return moves
+
+
+def _costed_moves(ctx: Context, rng: random.Random, n: int = 50, days_back: int = 0) -> list[dict]:
+    """Receipts and issues (costed, unlike transfers), optionally back-dated."""
+    moved_at = (datetime.utcnow() - timedelta(days=days_back)).isoformat() if days_back else None
+    moves = []
+    for _ in range(n):
+        loc = rng.choice(ctx.locations)
+        move = {"item_id": rng.choice(ctx.raw), "qty": rng.randint(1, 20),
+                "lot_code": f"L{rng.randrange(50):02d}", "moved_at": moved_at}
+        if rng.random() < 0.5:
+            move.update(to_location=loc, unit_cost=round(rng.uniform(0.2, 80), 2), move_type="RECEIPT")
+        else:
+            move.update(from_location=loc, move_type="ISSUE")
+        moves.append(move)
+    return moves
+
+
+SCENARIOS = [
+    # catalog
+    Scenario("catalog.items_page", lambda c, r, s: Request(
+        "GET", f"/items?limit=100&after={r.choice(c.raw)}")),
+    Scenario("catalog.items_category", lambda c, r, s: Request("GET", "/items?category=FABRIC&limit=100")),
+    Scenario("catalog.items_q", lambda c, r, s: Request(
+        "GET", f"/items?q={r.choice(('wool', 'twill', 'horn', 'silk'))}&limit=50")),
+    Scenario("catalog.items_stream", lambda c, r, s: Request("GET", "/items?stream=1&limit=5000"), 0.1),
+    Scenario("catalog.items_spec", lambda c, r, s: Request(
+        "GET", f"/items?spec.color={r.choice(('navy', 'charcoal', 'grey'))}&spec.weight_gsm>=250&limit=100")),
+    Scenario("catalog.items_search", lambda c, r, s: Request(
+        "GET", f"/items/search?q={r.choice(('navy wool', 'charcoal fl', 'jacket col', 'corozo'))}")),
+    Scenario("catalog.item_get", lambda c, r, s: Request("GET", f"/items/{r.choice(c.raw)}")),
+    Scenario("catalog.items_multi_get", lambda c, r, s: Request(
+        "GET", "/items?ids=" + ",".join(map(str, r.sample(c.raw, min(60, len(c.raw))))))),
+    Scenario("catalog.item_sources", lambda c, r, s: Request(
+        "GET", f"/items/{r.choice(c.raw)}/sources?qty={r.randint(1, 500)}")),
+    Scenario("catalog.item_where_used", lambda c, r, s: Request(
+        "GET", f"/items/{r.choice(c.raw)}/where_used")),
+    Scenario("catalog.subassembly_create", lambda c, r, s: Request("POST", "/boms", json={
+        "product_item_id": r.choice(c.subassemblies), "version": 1000 + s,
+        "lines": [{"component_item_id": i, "qty_per": 0.5, "uom_id": 1} for i in r.sample(c.raw, 3)],
+    }), 0.2),
+    Scenario("catalog.item_create", lambda c, r, s: Request("POST", "/items", json={
+        "sku": f"BENCH-{c.tag}-{s}", "name": "Bench item", "category": "FABRIC", "base_uom": "M"})),
+    Scenario("catalog.items_bulk", lambda c, r, s: Request(
+        "POST", "/items/bulk", data=_csv_items(c, s), content_type="text/csv"), 0.2),
+    Scenario("catalog.bom_create", lambda c, r, s: Request("POST", "/boms", json={
+        "product_item_id": r.choice(c.garments), "version": 1000 + s,
+        "lines": [{"component_item_id": i, "qty_per": 1.5, "uom_id": 1} for i in r.sample(c.raw, 5)],
+    })),
+    Scenario("catalog.bom_get", lambda c, r, s: Request("GET", f"/boms/{r.choice(c.boms)}")),
+    Scenario("catalog.boms_multi_get", lambda c, r, s: Request(
+        "GET", "/boms?include=lines,components&ids=" + ",".join(map(str, r.sample(c.boms, min(10, len(c.boms))))))),
+    Scenario("catalog.bom_explode", lambda c, r, s: Request(
+        "GET", f"/boms/{r.choice(c.boms)}/explode?qty={r.randint(1, 50)}")),
+    Scenario("catalog.bom_cost", lambda c, r, s: Request("GET", f"/boms/{r.choice(c.boms)}/cost")),
+    Scenario("catalog.boms_list", lambda c, r, s: Request("GET", "/boms"), 0.05),
+    # procurement
+    Scenario("procurement.suppliers_list", lambda c, r, s: Request("GET", "/suppliers"), 0.05),
+    Scenario("procurement.supplier_create", lambda c, r, s: Request("POST", "/suppliers", json={
+        "name": f"Bench supplier {s}", "lead_time_days": 14, "currency": "EUR"})),
+    Scenario("procurement.supplier_items_list", lambda c, r, s: Request("GET", "/supplier_items"), 0.05),
+    Scenario("procurement.supplier_item_create", lambda c, r, s: Request("POST", "/supplier_items", json={
+        "supplier_id": r.choice(c.suppliers), "item_id": r.choice(c.raw), "price": 9.5, "moq": 10})),
+    Scenario("procurement.pos_list", lambda c, r, s: Request("GET", "/pos"), 0.05),
+    Scenario("procurement.po_create", lambda c, r, s: Request("POST", "/pos", json={
+        "supplier_id": r.choice(c.suppliers), "po_number": f"BENCH-{c.tag}-{s}", "status": "OPEN"})),
+    Scenario("procurement.po_line_add", lambda c, r, s: Request("POST", f"/pos/{r.choice(c.pos)}/lines", json={
+        "item_id": r.choice(c.raw), "qty": r.randint(1, 100), "price": 4.25})),
+    Scenario("procurement.po_lines_batch", lambda c, r, s: Request(
+        "POST", f"/pos/{r.choice(c.pos)}/lines:batch",
+        json=[{"item_id": i, "qty": 10, "price": 2.5} for i in r.sample(c.raw, 20)])),
+    # planning
+    Scenario("mrp.run", lambda c, r, s: Request("POST", "/mrp/runs", json={
+        "today": date.today().isoformat(),
+        "demand": [{"item_id": i, "qty": r.randint(1, 20), "due_date": date.today().isoformat()}
+                   for i in r.sample(c.garments, min(20, len(c.garments)))],
+    }), 0.1),
+    # stock
+    Scenario("stock.moves_post", lambda c, r, s: Request("POST", "/stock/moves", json=_moves(c, r))),
+    Scenario("stock.costed_moves_post", lambda c, r, s: Request(
+        "POST", "/stock/moves", json=_costed_moves(c, r))),
+    Scenario("stock.backdated_moves_post", lambda c, r, s: Request(
+        "POST", "/stock/moves", json=_costed_moves(c, r, n=5, days_back=90)), 0.1),
+    Scenario("stock.availability", lambda c, r, s: Request(
+        "GET", "/stock/availability?group_by=" + r.choice(("warehouse", "location", "lot"))
+        + "&item_ids=" + ",".join(map(str, r.sample(c.raw, min(60, len(c.raw))))))),
+    Scenario("stock.allocation", lambda c, r, s: Request(
+        "POST", "/stock/allocations", json={"bom_id": r.choice(c.boms), "qty": 500})),
+    Scenario("stock.valuation", lambda c, r, s: Request(
+        "GET", "/stock/valuation?since=2026-01-01&item_ids=" + ",".join(map(str, r.sample(c.raw, min(60, len(c.raw))))))),
+    Scenario("stock.valuation_all", lambda c, r, s: Request("GET", "/stock/valuation"), 0.05),
+    Scenario("stock.valuation_as_of", lambda c, r, s: Request(
+        "GET", f"/stock/valuation?as_of={(date.today() - timedelta(days=30)).isoformat()}"), 0.05),
+    Scenario("stock.as_of", lambda c, r, s: Request(
+        "GET", f"/stock/as_of?date={date.today().isoformat()}&item_id={r.choice(c.raw)}")),
+    Scenario("stock.checkpoints_list", lambda c, r, s: Request("GET", "/stock/checkpoints")),
+    Scenario("stock.checkpoint_build", lambda c, r, s: Request("POST", "/stock/checkpoints", json={
+        "as_of": (date.today() - timedelta(days=30 + s)).isoformat()}), 0.05),
+    # system
+    Scenario("system.metrics", lambda c, r, s: Request("GET", "/metrics")),
+    Scenario("system.refcache_stats", lambda c, r, s: Request("GET", "/refcache/stats")),
+    Scenario("system.sourcing_stats", lambda c, r, s: Request("GET", "/sourcing/stats")),
+    Scenario("system.response_cache_stats", lambda c, r, s: Request("GET", "/response_cache/stats")),
+]
+
+
+# ----------------------------------------------------------------------
+# Targets
+# ----------------------------------------------------------------------
+
+class TestClientTarget:
+    """Send requests through ``app.test_client()`` in this process."""
+
+    name = "testclient"
+
+    def __init__(self, app):
+        self.client = app.test_client()
+
+    def send(self, req: Request) -> int:
+        response = self.client.open(
+            req.path, method=req.method, json=req.json, data=req.data,
+            content_type=req.content_type, headers={"Accept-Encoding": "gzip"},
+        )
+        response.get_data()
+        return response.status_code
+
+
+class HttpTarget:
+    """Send requests over keep-alive HTTP connections, one per thread."""
+
+    def __init__(self, base_url: str):
+        parts = urlsplit(base_url)
+        self.name = base_url
+        self.host, self.port = parts.hostname, parts.port or 80
+        self.prefix = parts.path.rstrip("/")
+        self._local = threading.local()
+
+    def _connection(self) -> http.client.HTTPConnection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self._local.conn = http.client.HTTPConnection(self.host, self.port, timeout=120)
+        return conn
+
+    def send(self, req: Request) -> int:
+        body, headers = req.data, {"Accept-Encoding": "gzip"}
+        if req.json is not None:
+            body, headers["Content-Type"] = json.dumps(req.json).encode(), "application/json"
+        elif req.content_type:
+            headers["Content-Type"] = req.content_type
+        conn = self._connection()
+        try:
+            conn.request(req.method, self.prefix + req.path, body=body, headers=headers)
+            response = conn.getresponse()
+            response.read()
+        except (OSError, http.client.HTTPException):
+            conn.close()
+            self._local.conn = None
+            raise
+        return response.status
+
+
+# ----------------------------------------------------------------------
+# Measurement
+# ----------------------------------------------------------------------
+
+def percentile(sorted_values: list[float], pct: float) -> float | None:
+    """Nearest-rank percentile of an ascending list."""
+    if not sorted_values:
+        return None
+    rank = max(1, min(len(sorted_values), round(pct / 100 * len(sorted_values) + 0.5)))
+    return sorted_values[rank - 1]
+
+
+def peak_rss_mb(pid: int | None = None) -> float | None:
+    """Peak resident set size of ``pid`` (default: this process) in MB."""
+    if pid is None:
+        return round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+    try:
+        with open(f"/proc/{pid}/status") as status:
+            for line in status:
+                if line.startswith("VmHWM:"):
+                    return round(int(line.split()[1]) / 1024, 1)
+    except OSError:
+        pass
+    return None
+
+
+def run_scenario(target, scenario: Scenario, ctx: Context, requests: int, concurrency: int,
+                 seed: int, warmup: int) -> dict:
+    rng = random.Random(f"{seed}:{scenario.name}")
+    total = max(1, int(requests * scenario.weight))
+    plan = [scenario.build(ctx, rng, n) for n in range(total + warmup)]
+    for req in plan[:warmup]:
+        target.send(req)
+    plan = plan[warmup:]
+
+    latencies: list[float] = []
+    statuses: dict[str, int] = {}
+    errors = 0
+    lock = threading.Lock()
+    cursor = iter(plan)
+
+    def worker():
+        nonlocal errors
+        while True:
+            with lock:
+                req = next(cursor, None)
+            if req is None:
+                return
+            start = time.perf_counter()
+            try:
+                status = str(target.send(req))
+            except Exception:  # noqa: BLE001 - any failure counts as an error
+                status = "exception"
+            elapsed = time.perf_counter() - start
+            with lock:
+                latencies.append(elapsed)
+                statuses[status] = statuses.get(status, 0) + 1
+                if not status.isdigit() or int(status) >= 400:
+                    errors += 1
+
+    started = time.perf_counter()
+    threads = [threading.Thread(target=worker) for _ in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    wall = time.perf_counter() - started
+
+    latencies.sort()
+    ms = lambda v: None if v is None else round(v * 1e3, 3)  # noqa: E731
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "status_codes": statuses,
+        "throughput_rps": round(len(latencies) / wall, 2) if wall else None,
+        "p50_ms": ms(percentile(latencies, 50)),
+        "p95_ms": ms(percentile(latencies, 95)),
+        "p99_ms": ms(percentile(latencies, 99)),
+        "max_ms": ms(latencies[-1] if latencies else None),
+    }
+
+
+def _git_commit() -> str | None:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True,
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--database-url", required=True,
+                        help="Dataset to sample ids from (and to serve, for the test client).")
+    parser.add_argument("--target", default="testclient",
+                        help="'testclient' or the base URL of a running server.")
+    parser.add_argument("--requests", type=int, default=200, help="Requests per scenario (before weights).")
+    parser.add_argument("--warmup", type=int, default=5)
+    parser.add_argument("--concurrency", type=int, default=1, help="Client threads (HTTP target only).")
+    parser.add_argument("--scenarios", default="*", help="Comma-separated name globs, e.g. 'catalog.*'.")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--server-pid", type=int, help="Server process to read peak RSS from.")
+    parser.add_argument("--output", help="Write the JSON result here (default: stdout).")
+    args = parser.parse_args()
+
+    app = create_app({"SQLALCHEMY_DATABASE_URI": args.database_url})
+    with app.app_context():
+        ctx = Context.load()
+        dialect = db.engine.dialect.name
+        json_backend = app.json.backend
+
+    if args.target == "testclient":
+        target, concurrency, pid = TestClientTarget(app), 1, None
+    else:
+        target, concurrency, pid = HttpTarget(args.target), args.concurrency, args.server_pid
+    measure_rss = args.target == "testclient" or pid is not None
+
+    patterns = [p.strip() for p in args.scenarios.split(",") if p.strip()]
+    selected = [s for s in SCENARIOS if any(fnmatch.fnmatch(s.name, p) for p in patterns)]
+    results = {}
+    for scenario in selected:
+        result = run_scenario(target, scenario, ctx, args.requests, concurrency, args.seed, args.warmup)
+        result["peak_rss_mb"] = peak_rss_mb(pid) if measure_rss else None
+        results[scenario.name] = result
+        print(f"{scenario.name:<36}{result['requests']:>6} req {result['throughput_rps'] or 0:>9.1f} rps "
+              f"p50 {result['p50_ms']:>9.2f} ms  p99 {result['p99_ms']:>9.2f} ms  "
+              f"errors {result['errors']}", flush=True)
+
+    document = {
+        "meta": {
+            "commit": _git_commit(),
+            "started_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "target": target.name,
+            "dialect": dialect,
+            "concurrency": concurrency,
+            "requests_per_scenario": args.requests,
+            "seed": args.seed,
+            "python": platform.python_version(),
+            "json_backend": json_backend,
+            "dataset": ctx.counts,
+        },
+        "scenarios": results,
+        "peak_rss_mb": peak_rss_mb(pid) if measure_rss else None,
+    }
+    text = json.dumps(document, indent=2)
+    if args.output:
+        with open(args.output, "w") as out:
+            out.write(text + "\n")
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    main()
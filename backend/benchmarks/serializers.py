@@ -0,0 +1,126 @@
+"""Compare the column-projection serializers against ORM hydration.
+
+Seeds an in-memory SQLite database with ``--rows`` items and supplier
+items, then times the per-route code the list endpoints used before
+(``Model.query.all()`` plus a hand-built dict per instance, with lazy
+loads for related codes) against :mod:`app.serializers`.
+
+Usage (from ``backend/``)::
+
+    python -m benchmarks.serializers --rows 20000 --repeat 5
+"""
+import argparse
+import time
+from decimal import Decimal
+
+from app import create_app
+from app.db import db
+
+
+def _seed(rows: int) -> None:
+    from app.models import Item, ItemCategory, Supplier, SupplierItem, Uom
+
+    uoms = [Uom(code=c) for c in ("EA", "M", "KG", "ROLL")]
+    cats = [ItemCategory(code=c) for c in ("FABRIC", "TRIM", "THREAD", "LINING", "BUTTON")]
+    supplier = Supplier(name="Mill", currency="EUR", lead_time_days=30)
+    db.session.add_all(uoms + cats + [supplier])
+    db.session.flush()
+    db.session.execute(db.insert(Item), [
+        {
+            "sku": f"SKU{n:07d}",
+            "name": f"Item {n}",
+            "category_id": cats[n % len(cats)].id,
+            "base_uom_id": uoms[n % len(uoms)].id,
+            "brand": "Bench",
+            "spec": {},
+        }
+        for n in range(rows)
+    ])
+    db.session.execute(db.insert(SupplierItem), [
+        {
+            "supplier_id": supplier.id,
+            "item_id": n + 1,
+            "vendor_sku": f"V{n}",
+            "price": Decimal("12.5000"),
+            "moq": Decimal("10.0000"),
+        }
+        for n in range(rows)
+    ])
+    db.session.commit()
+
+
+def _legacy_items():
+    from app.models import Item
+
+    return [
+        {
+            "id": item.id,
+            "sku": item.sku,
+            "name": item.name,
+            "category": item.category.code if item.category else None,
+            "base_uom": item.uom.code if item.uom else None,
+            "brand": item.brand,
+            "active": item.active,
+            "spec": item.spec,
+        }
+        for item in Item.query.all()
+    ]
+
+
+def _legacy_supplier_items():
+    from app.models import SupplierItem
+
+    return [
+        {
+            "id": i.id,
+            "supplier_id": i.supplier_id,
+            "item_id": i.item_id,
+            "vendor_sku": i.vendor_sku,
+            "price": float(i.price) if i.price is not None else None,
+            "moq": float(i.moq) if i.moq is not None else None,
+            "incoterms": i.incoterms,
+        }
+        for i in SupplierItem.query.all()
+    ]
+
+
+def _time(fn, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        # Drop the identity map so every run hydrates from scratch.
+        db.session.expunge_all()
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=20000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    from app.serializers import ITEM, SUPPLIER_ITEM
+
+    app = create_app({"SQLALCHEMY_DATABASE_URI": "sqlite:///:memory:"})
+    with app.app_context():
+        db.create_all()
+        _seed(args.rows)
+        cases = [
+            ("items", _legacy_items, ITEM.fetch),
+            ("supplier_items", _legacy_supplier_items, SUPPLIER_ITEM.fetch),
+        ]
+        print(f"{'endpoint':<16}{'legacy ms':>12}{'projection ms':>16}{'speedup':>10}{'us/row':>10}")
+        for name, legacy, projected in cases:
+            assert legacy() == projected()
+            t_legacy = _time(legacy, args.repeat)
+            t_proj = _time(projected, args.repeat)
+            print(
+                f"{name:<16}{t_legacy * 1e3:>12.1f}{t_proj * 1e3:>16.1f}"
+                f"{t_legacy / t_proj:>9.1f}x{t_proj / args.rows * 1e6:>10.2f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
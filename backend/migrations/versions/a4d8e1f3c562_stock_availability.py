@@ -0,0 +1,41 @@
+"""stock availability rollup
+
+Revision ID: a4d8e1f3c562
+Revises: f2b7d4e8a1c9
+Create Date: 2026-10-18 15:12:48.306115
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = 'a4d8e1f3c562'
+down_revision: Union[str, Sequence[str], None] = 'f2b7d4e8a1c9'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'stock_availability',
+        sa.Column('item_id', sa.Integer(), nullable=False),
+        sa.Column('warehouse_id', sa.Integer(), nullable=False),
+        sa.Column('lot_code', sa.String(), nullable=False),
+        sa.Column('qty', sa.Numeric(precision=14, scale=4), nullable=False),
+        sa.Column('updated_at', sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(['item_id'], ['items.id']),
+        sa.PrimaryKeyConstraint('item_id', 'warehouse_id', 'lot_code'),
+    )
+    # Initial fill; large databases can use `flask stock-availability-rebuild` instead.
+    op.execute(
+        "INSERT INTO stock_availability (item_id, warehouse_id, lot_code, qty, updated_at) "
+        "SELECT s.item_id, coalesce(l.warehouse_id, 0), s.lot_code, sum(s.qty), CURRENT_TIMESTAMP "
+        "FROM stock_on_hand s JOIN locations l ON l.id = s.location_id "
+        "GROUP BY s.item_id, coalesce(l.warehouse_id, 0), s.lot_code"
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('stock_availability')
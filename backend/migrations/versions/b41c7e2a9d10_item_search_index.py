@@ -0,0 +1,80 @@
+"""item search index
+
+Revision ID: b41c7e2a9d10
+Revises: 797f575f929c
+Create Date: 2026-10-18 09:12:41.503117
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = 'b41c7e2a9d10'
+down_revision: Union[str, Sequence[str], None] = '797f575f929c'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+PG_DOCUMENT = (
+    "to_tsvector('simple', coalesce(items.sku, '') || ' ' || coalesce(items.name, '')"
+    " || ' ' || coalesce(items.brand, '') || ' ' || coalesce(items.spec::text, ''))"
+)
+
+
+def upgrade() -> None:
+    dialect = op.get_bind().dialect.name
+    if dialect == 'sqlite':
+        op.execute(
+            "CREATE VIRTUAL TABLE IF NOT EXISTS items_fts USING fts5("
+            "sku, name, brand, spec, content='items', content_rowid='id', "
+            "tokenize='unicode61 remove_diacritics 2', prefix='2 3')"
+        )
+        op.execute(
+            "CREATE TRIGGER IF NOT EXISTS items_fts_ai AFTER INSERT ON items BEGIN "
+            "INSERT INTO items_fts(rowid, sku, name, brand, spec) "
+            "VALUES (new.id, new.sku, new.name, new.brand, new.spec); END"
+        )
+        op.execute(
+            "CREATE TRIGGER IF NOT EXISTS items_fts_ad AFTER DELETE ON items BEGIN "
+            "INSERT INTO items_fts(items_fts, rowid, sku, name, brand, spec) "
+            "VALUES ('delete', old.id, old.sku, old.name, old.brand, old.spec); END"
+        )
+        op.execute(
+            "CREATE TRIGGER IF NOT EXISTS items_fts_au AFTER UPDATE ON items BEGIN "
+            "INSERT INTO items_fts(items_fts, rowid, sku, name, brand, spec) "
+            "VALUES ('delete', old.id, old.sku, old.name, old.brand, old.spec); "
+            "INSERT INTO items_fts(rowid, sku, name, brand, spec) "
+            "VALUES (new.id, new.sku, new.name, new.brand, new.spec); END"
+        )
+        # Backfill the external-content index from the existing rows
+        op.execute("INSERT INTO items_fts(items_fts) VALUES ('rebuild')")
+    elif dialect == 'postgresql':
+        op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+        # Expression indexes are built from existing rows; CONCURRENTLY keeps
+        # the items table writable while they build.
+        with op.get_context().autocommit_block():
+            op.execute(
+                "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_items_search_tsv "
+                f"ON items USING gin (({PG_DOCUMENT}))"
+            )
+            op.execute(
+                "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_items_name_trgm "
+                "ON items USING gin (name gin_trgm_ops)"
+            )
+            op.execute(
+                "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_items_sku_trgm "
+                "ON items USING gin (sku gin_trgm_ops)"
+            )
+
+
+def downgrade() -> None:
+    dialect = op.get_bind().dialect.name
+    if dialect == 'sqlite':
+        op.execute("DROP TRIGGER IF EXISTS items_fts_au")
+        op.execute("DROP TRIGGER IF EXISTS items_fts_ad")
+        op.execute("DROP TRIGGER IF EXISTS items_fts_ai")
+        op.execute("DROP TABLE IF EXISTS items_fts")
+    elif dialect == 'postgresql':
+        op.execute("DROP INDEX IF EXISTS ix_items_sku_trgm")
+        op.execute("DROP INDEX IF EXISTS ix_items_name_trgm")
+        op.execute("DROP INDEX IF EXISTS ix_items_search_tsv")
@@ -0,0 +1,78 @@
+"""inventory costing tables
+
+Revision ID: b9e2c7a4d815
+Revises: a4d8e1f3c562
+Create Date: 2026-10-18 16:05:21.774310
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = 'b9e2c7a4d815'
+down_revision: Union[str, Sequence[str], None] = 'a4d8e1f3c562'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Empty until `flask stock-costing-replay` costs the existing ledger.
+    op.create_table(
+        'item_costs',
+        sa.Column('item_id', sa.Integer(), nullable=False),
+        sa.Column('method', sa.String(), nullable=False),
+        sa.Column('qty', sa.Numeric(precision=14, scale=4), nullable=False),
+        sa.Column('value', sa.Numeric(precision=18, scale=4), nullable=False),
+        sa.Column('last_moved_at', sa.DateTime(), nullable=True),
+        sa.Column('last_move_id', sa.Integer(), nullable=True),
+        sa.Column('last_receipt_cost', sa.Numeric(precision=12, scale=4), nullable=True),
+        sa.Column('lots', sa.JSON(), nullable=False),
+        sa.Column('updated_at', sa.DateTime(), nullable=True),
+        sa.CheckConstraint("method IN ('fifo','average')"),
+        sa.ForeignKeyConstraint(['item_id'], ['items.id']),
+        sa.PrimaryKeyConstraint('item_id'),
+    )
+    op.create_table(
+        'stock_move_costs',
+        sa.Column('move_id', sa.Integer(), nullable=False),
+        sa.Column('item_id', sa.Integer(), nullable=False),
+        sa.Column('lot_code', sa.String(), nullable=False),
+        sa.Column('moved_at', sa.DateTime(), nullable=False),
+        sa.Column('qty', sa.Numeric(precision=14, scale=4), nullable=False),
+        sa.Column('value', sa.Numeric(precision=18, scale=4), nullable=False),
+        sa.Column('unit_cost', sa.Numeric(precision=12, scale=4), nullable=True),
+        sa.Column('qty_after', sa.Numeric(precision=14, scale=4), nullable=False),
+        sa.Column('value_after', sa.Numeric(precision=18, scale=4), nullable=False),
+        sa.Column('in_after', sa.Numeric(precision=14, scale=4), nullable=True),
+        sa.Column('out_after', sa.Numeric(precision=14, scale=4), nullable=True),
+        sa.ForeignKeyConstraint(['item_id'], ['items.id']),
+        sa.ForeignKeyConstraint(['move_id'], ['stock_moves.id']),
+        sa.PrimaryKeyConstraint('move_id'),
+    )
+    op.create_index('ix_stock_move_costs_item_id_moved_at', 'stock_move_costs',
+                    ['item_id', 'moved_at', 'move_id'])
+    op.create_table(
+        'cost_layers',
+        sa.Column('move_id', sa.Integer(), nullable=False),
+        sa.Column('item_id', sa.Integer(), nullable=False),
+        sa.Column('lot_code', sa.String(), nullable=False),
+        sa.Column('moved_at', sa.DateTime(), nullable=False),
+        sa.Column('start_pos', sa.Numeric(precision=14, scale=4), nullable=False),
+        sa.Column('qty', sa.Numeric(precision=14, scale=4), nullable=False),
+        sa.Column('unit_cost', sa.Numeric(precision=12, scale=4), nullable=False),
+        sa.ForeignKeyConstraint(['item_id'], ['items.id']),
+        sa.ForeignKeyConstraint(['move_id'], ['stock_moves.id']),
+        sa.PrimaryKeyConstraint('move_id'),
+    )
+    op.create_index('ix_cost_layers_item_id_lot_code_start_pos', 'cost_layers',
+                    ['item_id', 'lot_code', 'start_pos'])
+
+
+def downgrade() -> None:
+    op.drop_index('ix_cost_layers_item_id_lot_code_start_pos', table_name='cost_layers')
+    op.drop_table('cost_layers')
+    op.drop_index('ix_stock_move_costs_item_id_moved_at', table_name='stock_move_costs')
+    op.drop_table('stock_move_costs')
+    op.drop_table('item_costs')
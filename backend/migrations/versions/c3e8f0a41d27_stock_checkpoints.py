@@ -0,0 +1,60 @@
+"""stock balance checkpoints
+
+Revision ID: c3e8f0a41d27
+Revises: b41c7e2a9d10
+Create Date: 2026-10-18 11:40:05.218734
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = 'c3e8f0a41d27'
+down_revision: Union[str, Sequence[str], None] = 'b41c7e2a9d10'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'stock_checkpoints',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('as_of', sa.DateTime(), nullable=False),
+        sa.Column('status', sa.String(), nullable=False),
+        sa.Column('base_id', sa.Integer(), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.Column('completed_at', sa.DateTime(), nullable=True),
+        sa.CheckConstraint("status IN ('BUILDING','READY','STALE')"),
+        sa.ForeignKeyConstraint(['base_id'], ['stock_checkpoints.id'], ondelete='SET NULL'),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('as_of'),
+    )
+    op.create_table(
+        'stock_checkpoint_balances',
+        sa.Column('checkpoint_id', sa.Integer(), nullable=False),
+        sa.Column('item_id', sa.Integer(), nullable=False),
+        sa.Column('location_id', sa.Integer(), nullable=False),
+        sa.Column('lot_code', sa.String(), nullable=False),
+        sa.Column('qty', sa.Numeric(precision=14, scale=4), nullable=False),
+        sa.ForeignKeyConstraint(['checkpoint_id'], ['stock_checkpoints.id'], ondelete='CASCADE'),
+        sa.ForeignKeyConstraint(['item_id'], ['items.id']),
+        sa.ForeignKeyConstraint(['location_id'], ['locations.id']),
+        sa.PrimaryKeyConstraint('checkpoint_id', 'item_id', 'location_id', 'lot_code'),
+    )
+    # As-of queries and checkpoint builds scan moves by date range.
+    if op.get_bind().dialect.name == 'postgresql':
+        with op.get_context().autocommit_block():
+            op.execute(
+                "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_stock_moves_moved_at "
+                "ON stock_moves (moved_at)"
+            )
+    else:
+        op.create_index('ix_stock_moves_moved_at', 'stock_moves', ['moved_at'])
+
+
+def downgrade() -> None:
+    op.drop_index('ix_stock_moves_moved_at', table_name='stock_moves')
+    op.drop_table('stock_checkpoint_balances')
+    op.drop_table('stock_checkpoints')
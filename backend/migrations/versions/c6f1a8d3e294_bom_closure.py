@@ -0,0 +1,38 @@
+"""bom closure table for where-used lookups
+
+Revision ID: c6f1a8d3e294
+Revises: b9e2c7a4d815
+Create Date: 2026-10-18 17:21:09.518733
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = 'c6f1a8d3e294'
+down_revision: Union[str, Sequence[str], None] = 'b9e2c7a4d815'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Empty until `flask bom-closure-rebuild` indexes the existing BOMs.
+    op.create_table(
+        'bom_closure',
+        sa.Column('ancestor_id', sa.Integer(), nullable=False),
+        sa.Column('descendant_id', sa.Integer(), nullable=False),
+        sa.Column('depth', sa.Integer(), nullable=False),
+        sa.Column('paths', sa.Integer(), nullable=False),
+        sa.Column('qty', sa.Numeric(precision=18, scale=6), nullable=False),
+        sa.ForeignKeyConstraint(['ancestor_id'], ['items.id']),
+        sa.ForeignKeyConstraint(['descendant_id'], ['items.id']),
+        sa.PrimaryKeyConstraint('ancestor_id', 'descendant_id', 'depth'),
+    )
+    op.create_index('ix_bom_closure_descendant_id_depth', 'bom_closure', ['descendant_id', 'depth'])
+
+
+def downgrade() -> None:
+    op.drop_index('ix_bom_closure_descendant_id_depth', table_name='bom_closure')
+    op.drop_table('bom_closure')
@@ -0,0 +1,31 @@
+"""resource versions for conditional GETs
+
+Revision ID: d5a91c3e7b02
+Revises: c3e8f0a41d27
+Create Date: 2026-10-18 13:05:47.903611
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = 'd5a91c3e7b02'
+down_revision: Union[str, Sequence[str], None] = 'c3e8f0a41d27'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'resource_versions',
+        sa.Column('key', sa.String(), nullable=False),
+        sa.Column('version', sa.Integer(), nullable=False),
+        sa.Column('updated_at', sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint('key'),
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('resource_versions')
@@ -0,0 +1,31 @@
+"""unrounded running total of purchase order lines
+
+Revision ID: d8a3f5c1b702
+Revises: c6f1a8d3e294
+Create Date: 2026-10-19 09:12:40.227315
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = 'd8a3f5c1b702'
+down_revision: Union[str, Sequence[str], None] = 'c6f1a8d3e294'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('purchase_orders', sa.Column('lines_total', sa.Numeric(precision=20, scale=8), nullable=True))
+    # Totals maintained incrementally so far were rounded per line: recompute both from the lines.
+    op.execute(
+        "UPDATE purchase_orders SET lines_total = ("
+        "SELECT coalesce(sum(l.qty * l.price), 0) FROM po_lines l WHERE l.po_id = purchase_orders.id)"
+    )
+    op.execute("UPDATE purchase_orders SET total = round(lines_total, 2)")
+
+
+def downgrade() -> None:
+    op.drop_column('purchase_orders', 'lines_total')
@@ -0,0 +1,56 @@
+"""indexes for hot foreign-key access paths
+
+Revision ID: e7c4b9d2f613
+Revises: d5a91c3e7b02
+Create Date: 2026-10-18 13:40:12.551903
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = 'e7c4b9d2f613'
+down_revision: Union[str, Sequence[str], None] = 'd5a91c3e7b02'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# (name, table, columns); tests/test_query_plans.py checks the queries that need them.
+INDEXES = [
+    ('ix_boms_product_item_id', 'boms', ['product_item_id']),
+    ('ix_bom_lines_bom_id', 'bom_lines', ['bom_id']),
+    ('ix_bom_lines_component_item_id', 'bom_lines', ['component_item_id']),
+    ('ix_locations_warehouse_id', 'locations', ['warehouse_id']),
+    ('ix_stock_on_hand_location_id', 'stock_on_hand', ['location_id']),
+    ('ix_stock_moves_item_id_moved_at', 'stock_moves', ['item_id', 'moved_at']),
+    ('ix_supplier_items_item_id_price', 'supplier_items', ['item_id', 'price']),
+    ('ix_supplier_items_supplier_id', 'supplier_items', ['supplier_id']),
+    ('ix_purchase_orders_supplier_id', 'purchase_orders', ['supplier_id']),
+    ('ix_po_lines_po_id', 'po_lines', ['po_id']),
+    ('ix_po_lines_item_id', 'po_lines', ['item_id']),
+]
+
+
+def upgrade() -> None:
+    # Built without blocking writes on PostgreSQL (CONCURRENTLY cannot run in a transaction).
+    if op.get_bind().dialect.name == 'postgresql':
+        with op.get_context().autocommit_block():
+            for name, table, columns in INDEXES:
+                op.execute(
+                    f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {name} "
+                    f"ON {table} ({', '.join(columns)})"
+                )
+    else:
+        for name, table, columns in INDEXES:
+            op.create_index(name, table, columns)
+
+
+def downgrade() -> None:
+    if op.get_bind().dialect.name == 'postgresql':
+        with op.get_context().autocommit_block():
+            for name, _, _ in reversed(INDEXES):
+                op.execute(f"DROP INDEX CONCURRENTLY IF EXISTS {name}")
+    else:
+        for name, table, _ in reversed(INDEXES):
+            op.drop_index(name, table_name=table)
@@ -0,0 +1,128 @@
+"""item spec as JSON with indexed attributes
+
+Revision ID: f2b7d4e8a1c9
+Revises: e7c4b9d2f613
+Create Date: 2026-10-18 14:02:33.184260
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision: str = 'f2b7d4e8a1c9'
+down_revision: Union[str, Sequence[str], None] = 'e7c4b9d2f613'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Must stay identical to app.item_spec._SQLITE_VALUES (the trigger bodies).
+_SQLITE_VALUES = (
+    "SELECT {item}, j.key, "
+    "CASE j.type WHEN 'text' THEN j.value WHEN 'true' THEN 'true' WHEN 'false' THEN 'false' END, "
+    "CASE WHEN j.type IN ('integer', 'real') THEN j.value END "
+    "FROM json_each(CASE WHEN json_valid({spec}) AND json_type({spec}) = 'object' "
+    "THEN {spec} ELSE '{{}}' END) AS j "
+    "WHERE j.type NOT IN ('object', 'array', 'null')"
+)
+
+
+def _has_spec() -> bool:
+    return 'spec' in {c['name'] for c in sa.inspect(op.get_bind()).get_columns('items')}
+
+
+def upgrade() -> None:
+    """Convert ``items.spec`` to a JSON object column and index it.
+
+    Existing values convert the same way on every dialect and none is
+    dropped: NULL, blank or JSON null become ``{}``, JSON objects are kept,
+    a JSON string becomes ``{"text": <string>}`` and any other text (free
+    text, numbers, arrays) ``{"text": <original text>}``.
+    """
+    dialect = op.get_bind().dialect.name
+    if dialect == 'postgresql':
+        if not _has_spec():
+            op.add_column('items', sa.Column('spec', postgresql.JSONB(), nullable=True))
+        # Text or json column, parsed once here; unparsable text must not
+        # abort the cast, hence the exception-catching helper.
+        op.execute(
+            "CREATE FUNCTION pg_temp.item_spec_json(t text) RETURNS jsonb LANGUAGE plpgsql AS $$ "
+            "BEGIN RETURN t::jsonb; EXCEPTION WHEN others THEN RETURN NULL; END $$"
+        )
+        parsed = "pg_temp.item_spec_json(spec::text)"
+        op.execute("ALTER TABLE items ALTER COLUMN spec DROP DEFAULT")
+        op.execute(
+            "ALTER TABLE items ALTER COLUMN spec TYPE jsonb USING "
+            "CASE WHEN spec IS NULL OR btrim(spec::text) = '' "
+            f"OR jsonb_typeof({parsed}) = 'null' THEN '{{}}'::jsonb "
+            f"WHEN jsonb_typeof({parsed}) = 'object' THEN {parsed} "
+            f"WHEN jsonb_typeof({parsed}) = 'string' THEN jsonb_build_object('text', {parsed} #>> '{{}}') "
+            "ELSE jsonb_build_object('text', spec::text) END"
+        )
+        op.execute("DROP FUNCTION pg_temp.item_spec_json(text)")
+        op.execute("ALTER TABLE items ALTER COLUMN spec SET DEFAULT '{}'::jsonb")
+        with op.get_context().autocommit_block():
+            op.execute(
+                "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_items_spec_gin "
+                "ON items USING gin (spec jsonb_path_ops)"
+            )
+    elif dialect == 'sqlite':
+        if not _has_spec():
+            op.add_column('items', sa.Column('spec', sa.JSON(), nullable=True))
+        # JSON is stored as text on SQLite; only values that are not objects need fixing.
+        op.execute(
+            "UPDATE items SET spec = CASE "
+            "WHEN spec IS NULL OR trim(spec) = '' "
+            "OR (json_valid(spec) AND json_type(spec) = 'null') THEN '{}' "
+            "WHEN json_valid(spec) AND json_type(spec) = 'text' "
+            "THEN json_object('text', json_extract(spec, '$')) "
+            "ELSE json_object('text', CAST(spec AS TEXT)) END "
+            "WHERE spec IS NULL OR NOT json_valid(spec) OR json_type(spec) != 'object'"
+        )
+        op.execute(
+            "CREATE TABLE IF NOT EXISTS item_spec_attrs ("
+            "item_id INTEGER NOT NULL, key TEXT NOT NULL, value_text TEXT, value_num REAL, "
+            "PRIMARY KEY (item_id, key)) WITHOUT ROWID"
+        )
+        op.execute(
+            "CREATE INDEX IF NOT EXISTS ix_item_spec_attrs_text "
+            "ON item_spec_attrs (key, value_text, item_id)"
+        )
+        op.execute(
+            "CREATE INDEX IF NOT EXISTS ix_item_spec_attrs_num "
+            "ON item_spec_attrs (key, value_num, item_id)"
+        )
+        insert_new = "INSERT INTO item_spec_attrs " + _SQLITE_VALUES.format(item="new.id", spec="new.spec")
+        op.execute(f"CREATE TRIGGER IF NOT EXISTS items_spec_ai AFTER INSERT ON items BEGIN {insert_new}; END")
+        op.execute(
+            "CREATE TRIGGER IF NOT EXISTS items_spec_au AFTER UPDATE OF spec ON items BEGIN "
+            f"DELETE FROM item_spec_attrs WHERE item_id = old.id; {insert_new}; END"
+        )
+        op.execute(
+            "CREATE TRIGGER IF NOT EXISTS items_spec_ad AFTER DELETE ON items BEGIN "
+            "DELETE FROM item_spec_attrs WHERE item_id = old.id; END"
+        )
+        # Backfill from the existing rows
+        op.execute("DELETE FROM item_spec_attrs")
+        op.execute(
+            "INSERT INTO item_spec_attrs "
+            + _SQLITE_VALUES.format(item="items.id", spec="items.spec").replace(
+                "FROM json_each", "FROM items, json_each", 1
+            )
+        )
+
+
+def downgrade() -> None:
+    dialect = op.get_bind().dialect.name
+    if dialect == 'postgresql':
+        with op.get_context().autocommit_block():
+            op.execute("DROP INDEX CONCURRENTLY IF EXISTS ix_items_spec_gin")
+        op.execute("ALTER TABLE items ALTER COLUMN spec DROP DEFAULT")
+        op.execute("ALTER TABLE items ALTER COLUMN spec TYPE text USING spec::text")
+        op.execute("ALTER TABLE items ALTER COLUMN spec SET DEFAULT '{}'")
+    elif dialect == 'sqlite':
+        op.execute("DROP TRIGGER IF EXISTS items_spec_ad")
+        op.execute("DROP TRIGGER IF EXISTS items_spec_au")
+        op.execute("DROP TRIGGER IF EXISTS items_spec_ai")
+        op.execute("DROP TABLE IF EXISTS item_spec_attrs")
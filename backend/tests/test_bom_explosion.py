@@ -0,0 +1,98 @@
+import pytest
+from app import create_app
+from app.db import db
+
+
+@pytest.fixture
+def client():
+    """App con una estructura de traje de dos niveles.
+
+    SUIT = 2 x JACKET (+5% merma) + 1 x TROUSERS + 1 x BOX (opcional)
+    JACKET = 1.5 m WOOL (+10% merma) + 4 BUTTON
+    TROUSERS = 1.2 m WOOL + 1 BUTTON
+    """
+    app = create_app({"TESTING": True, "SQLALCHEMY_DATABASE_URI": "sqlite:///:memory:"})
+    with app.app_context():
+        from app import models
+        db.create_all()
+        from app.models import Uom, ItemCategory, Item, Bom, BomLine
+        u = Uom(code="EA")
+        c = ItemCategory(code="GEN")
+        db.session.add_all([u, c])
+        db.session.commit()
+        items = {}
+        for sku in ("SUIT", "JACKET", "TROUSERS", "WOOL", "BUTTON", "BOX"):
+            items[sku] = Item(sku=sku, name=sku, category_id=c.id, base_uom_id=u.id)
+        db.session.add_all(items.values())
+        db.session.commit()
+        ids = {k: v.id for k, v in items.items()}
+
+        def bom(product, lines):
+            b = Bom(product_item_id=ids[product], version=1)
+            db.session.add(b)
+            db.session.flush()
+            for comp, qty, scrap, optional in lines:
+                db.session.add(BomLine(bom_id=b.id, component_item_id=ids[comp], qty_per=qty,
+                                       uom_id=u.id, scrap_pct=scrap, is_optional=optional))
+            return b
+
+        suit = bom("SUIT", [("JACKET", 2, 5, False), ("TROUSERS", 1, 0, False), ("BOX", 1, 0, True)])
+        bom("JACKET", [("WOOL", 1.5, 10, False), ("BUTTON", 4, 0, False)])
+        bom("TROUSERS", [("WOOL", 1.2, 0, False), ("BUTTON", 1, 0, False)])
+        db.session.commit()
+        app.config["IDS"] = dict(ids, SUIT_BOM=suit.id)
+
+    with app.test_client() as client:
+        yield client
+
+    with app.app_context():
+        db.session.remove()
+        db.drop_all()
+
+
+def test_explode_multilevel_with_scrap(client):
+    """La explosión multiplica cantidades con merma a través de los niveles."""
+    ids = client.application.config["IDS"]
+    resp = client.get(f"/boms/{ids['SUIT_BOM']}/explode?qty=10")
+    assert resp.status_code == 200
+    data = resp.get_json()
+    comps = {c["item_id"]: c["qty"] for c in data["components"]}
+    # 10 trajes -> 21 chaquetas; lana = 21*1.65 + 10*1.2, botones = 21*4 + 10
+    assert comps[ids["WOOL"]] == pytest.approx(21 * 1.65 + 12)
+    assert comps[ids["BUTTON"]] == pytest.approx(94)
+    assert ids["BOX"] not in comps
+    subs = {s["item_id"]: s["qty"] for s in data["subassemblies"]}
+    assert subs == {ids["JACKET"]: pytest.approx(21), ids["TROUSERS"]: pytest.approx(10)}
+
+    data = client.get(f"/boms/{ids['SUIT_BOM']}/explode?include_optional=1").get_json()
+    assert ids["BOX"] in {c["item_id"] for c in data["components"]}
+    assert client.get(f"/boms/{ids['SUIT_BOM']}/explode?qty=-1").status_code == 400
+
+
+def test_explode_detects_cycles(client):
+    """Un subensamble que se contiene a sí mismo devuelve 400."""
+    ids = client.application.config["IDS"]
+    from app.models import Bom, BomLine
+    with client.application.app_context():
+        jacket_bom = Bom.query.filter_by(product_item_id=ids["JACKET"]).first()
+        db.session.add(BomLine(bom_id=jacket_bom.id, component_item_id=ids["SUIT"], qty_per=1))
+        db.session.commit()
+    resp = client.get(f"/boms/{ids['SUIT_BOM']}/explode")
+    assert resp.status_code == 400
+    assert "cycle" in resp.get_data(as_text=True)
+
+
+def test_explode_loads_graph_in_constant_queries(client):
+    """La carga del grafo no depende del número de nodos."""
+    from sqlalchemy import event
+    from app.bom_explosion import BomGraph
+    ids = client.application.config["IDS"]
+    with client.application.app_context():
+        statements = []
+        listener = lambda *args: statements.append(args[2])
+        event.listen(db.engine, "before_cursor_execute", listener)
+        try:
+            BomGraph.load(bom_ids=[ids["SUIT_BOM"]]).explode(ids["SUIT_BOM"], 3)
+        finally:
+            event.remove(db.engine, "before_cursor_execute", listener)
+    assert len(statements) == 1
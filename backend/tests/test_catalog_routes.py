@@ -1,4 +1,5 @@
 import pytest
+import json
 from app import create_app
 from app.db import db
 
@@ -103,3 +104,479 @@ def test_create_item(client):
     items = resp2.get_json()
     skus = [i.get("sku") for i in items]
     assert "SKU_NEW" in skus
+
+
+def test_list_items_keyset_pagination(client):
+    """GET /items pagina por cursor: limit/after y cabecera X-Next-After."""
+    for n in range(3):
+        client.post("/items", json={"sku": f"PAG{n}", "name": f"Pag {n}", "category": "GEN", "base_uom": "EA"})
+
+    resp = client.get("/items?limit=2")
+    assert resp.status_code == 200
+    page1 = resp.get_json()
+    assert len(page1) == 2
+    assert page1[0]["category"] == "GEN" and page1[0]["base_uom"] == "EA"
+    cursor = resp.headers["X-Next-After"]
+    assert cursor == str(page1[-1]["id"])
+
+    resp2 = client.get(f"/items?limit=2&after={cursor}")
+    page2 = resp2.get_json()
+    assert len(page2) == 2
+    assert "X-Next-After" not in resp2.headers
+    ids = [i["id"] for i in page1 + page2]
+    assert ids == sorted(ids) and len(set(ids)) == 4
+
+    assert client.get("/items?after=abc").status_code == 400
+    # Un cursor fuera del rango de 64 bits es un 400, no un OverflowError
+    assert client.get("/items?after=99999999999999999999").status_code == 400
+
+
+def test_list_items_ndjson_stream(client):
+    """GET /items?stream=1 devuelve NDJSON con una fila por línea."""
+    resp = client.get("/items?stream=1")
+    assert resp.status_code == 200
+    assert resp.mimetype == "application/x-ndjson"
+    lines = [json.loads(l) for l in resp.get_data(as_text=True).splitlines()]
+    assert [l["sku"] for l in lines] == ["SKU1"]
+
+
+def test_search_items_ranked_prefix(client):
+    """GET /items/search busca por prefijo en sku, nombre, marca y spec."""
+    client.post("/items", json={"sku": "FAB-NAVY", "name": "Navy wool twill", "category": "GEN",
+                                "base_uom": "EA", "brand": "Loro", "spec": {"color": "navy"}})
+    client.post("/items", json={"sku": "BTN-01", "name": "Horn button", "category": "GEN",
+                                "base_uom": "EA", "spec": {"color": "navy"}})
+
+    hits = client.get("/items/search?q=nav").get_json()
+    # El sku/nombre pesa más que el texto de spec
+    assert [h["sku"] for h in hits] == ["FAB-NAVY", "BTN-01"]
+    assert [h["sku"] for h in client.get("/items/search?q=wool tw").get_json()] == ["FAB-NAVY"]
+    assert len(client.get("/items/search?q=nav&limit=1").get_json()) == 1
+    assert client.get("/items/search?q=%22%2A").get_json() == []
+
+    # El filtro q de GET /items usa el mismo índice
+    assert [i["sku"] for i in client.get("/items?q=horn").get_json()] == ["BTN-01"]
+
+
+def test_bulk_import_csv_with_row_errors(client):
+    """POST /items/bulk importa CSV por lotes y reporta errores por fila."""
+    body = (
+        "sku,name,category,base_uom,brand,active,spec\n"
+        "B1,Linen,GEN,EA,Mill,true,\n"
+        "B2,Bad category,NOPE,EA,,,\n"
+        "B3,Thread,GEN,EA,,0,\"{\"\"color\"\": \"\"navy\"\"}\"\n"
+        "SKU1,Seed renamed,GEN,EA,,,\n"
+    )
+    resp = client.post("/items/bulk?batch_size=2", data=body, content_type="text/csv")
+    assert resp.status_code == 200
+    report = resp.get_json()
+    assert report["processed"] == 4 and report["written"] == 3 and report["failed"] == 1
+    assert report["errors"][0]["row"] == 2 and report["errors"][0]["sku"] == "B2"
+
+    items = {i["sku"]: i for i in client.get("/items").get_json()}
+    assert items["SKU1"]["name"] == "Seed renamed"
+    assert items["B3"]["active"] is False
+    assert {"B1", "B3"} <= set(items)
+
+
+def test_bulk_import_ndjson_skip_existing(client):
+    """NDJSON con on_conflict=skip no sobreescribe SKUs existentes."""
+    body = '{"sku": "SKU1", "name": "Ignored", "category": "GEN", "base_uom": "EA"}\nnot json\n' \
+           '{"sku": "N1", "name": "New", "category": "GEN", "base_uom": "EA", "spec": {"w": 1}}\n'
+    resp = client.post("/items/bulk?on_conflict=skip", data=body, content_type="application/x-ndjson")
+    report = resp.get_json()
+    assert report["failed"] == 1 and report["errors"][0]["row"] == 2
+    names = {i["sku"]: i["name"] for i in client.get("/items").get_json()}
+    assert names["SKU1"] == "Seed Item" and names["N1"] == "New"
+    # El SKU existente se cuenta como omitido, no como escrito
+    assert report["written"] == 1 and report["skipped"] == 1
+    # Códigos que no son texto se reportan como error de fila, no como 500
+    body = '{"sku": "N2", "name": "x", "category": ["GEN"], "base_uom": "EA"}\n' \
+           '{"sku": "N3", "name": "x", "category": "GEN", "base_uom": {"code": "EA"}}\n'
+    report = client.post("/items/bulk", data=body, content_type="application/x-ndjson").get_json()
+    assert report["failed"] == 2 and report["written"] == 0
+    assert client.post("/items/bulk", data="x", content_type="text/plain").status_code == 415
+
+
+def test_bulk_import_reports_duplicate_skus_in_batch(client):
+    """Un SKU repetido en el mismo lote se reporta en la fila sustituida."""
+    body = "sku,name,category,base_uom\nD1,First,GEN,EA\nD1,Second,GEN,EA\nD2,Other,GEN,EA\n"
+    report = client.post("/items/bulk", data=body, content_type="text/csv").get_json()
+    assert report["processed"] == 3 and report["written"] == 2 and report["failed"] == 1
+    assert report["errors"][0]["row"] == 1 and report["errors"][0]["sku"] == "D1"
+    names = {i["sku"]: i["name"] for i in client.get("/items").get_json()}
+    assert names["D1"] == "Second"
+
+
+def test_bulk_import_stops_on_undecodable_body(client):
+    """Un cuerpo que no es UTF-8 responde 400 con el informe parcial."""
+    resp = client.post("/items/bulk", data=b"\xff\xfesku,name\n", content_type="text/csv")
+    assert resp.status_code == 400
+    report = resp.get_json()
+    assert report["processed"] == 0 and "UTF-8" in report["fatal"]
+
+    # Las filas anteriores a la parte ilegible se escriben igualmente
+    rows = "".join(f'{{"sku": "U{n}", "name": "Ok", "category": "GEN", "base_uom": "EA"}}\n' for n in range(500))
+    resp = client.post("/items/bulk", data=rows.encode() + b"\xff\n", content_type="application/x-ndjson")
+    assert resp.status_code == 400
+    report = resp.get_json()
+    assert 0 < report["written"] == report["processed"] and report["failed"] == 0
+    assert "U0" in {i["sku"] for i in client.get("/items").get_json()}
+
+
+def test_refcache_resolves_codes_without_queries(client):
+    """La caché de referencia resuelve códigos y se invalida al escribir."""
+    for n in range(3):
+        client.post("/items", json={"sku": f"RC{n}", "name": "x", "category": "GEN", "base_uom": "EA"})
+    client.get("/items")
+    stats = client.get("/refcache/stats").get_json()
+    # Una sola carga por tabla; el resto de búsquedas son aciertos
+    assert stats["category"]["loads"] == 1 and stats["uom"]["loads"] == 1
+    assert stats["category"]["hits"] >= 7 and stats["category"]["misses"] == 0
+    version = stats["category"]["version"]
+
+    # Una categoría nueva confirmada en la sesión invalida el mapa
+    from app.models import ItemCategory
+    with client.application.app_context():
+        db.session.add(ItemCategory(code="TRIM"))
+        db.session.commit()
+    resp = client.post("/items", json={"sku": "RC-T", "name": "x", "category": "TRIM", "base_uom": "EA"})
+    assert resp.status_code == 201
+    stats = client.get("/refcache/stats").get_json()
+    assert stats["category"]["version"] == version + 1 and stats["category"]["loads"] == 2
+    assert [i["sku"] for i in client.get("/items?category=TRIM").get_json()] == ["RC-T"]
+    assert client.post("/items", json={"sku": "RC-X", "name": "x", "category": "NOPE", "base_uom": "EA"}).status_code == 400
+
+    # Un renombrado hecho por otro proceso (sin pasar por la sesión) se ve al caducar el TTL
+    from app import refcache
+    with client.application.app_context():
+        cache = refcache.get_cache()
+        gen_id = cache.category_id("GEN")
+        db.session.execute(db.update(ItemCategory).where(ItemCategory.id == gen_id).values(code="GENERAL"))
+        db.session.commit()
+        assert cache.category_code(gen_id) == "GEN"
+        cache.ttl = 0
+        assert cache.category_code(gen_id) == "GENERAL"
+
+
+def test_conditional_get_etag_and_304(client):
+    """Los GET devuelven ETag estable; If-None-Match da 304 hasta que una escritura cambia la versión."""
+    first = client.get("/items")
+    etag = first.headers["ETag"]
+    assert first.headers["Cache-Control"] == "no-cache"
+    assert client.get("/items").headers["ETag"] == etag
+    # Otro query string es otra representación
+    assert client.get("/items?limit=1").headers["ETag"] != etag
+
+    not_modified = client.get("/items", headers={"If-None-Match": etag})
+    assert not_modified.status_code == 304 and not_modified.data == b""
+
+    client.post("/items", json={"sku": "SKU-NEW", "name": "New", "category": "GEN", "base_uom": "EA"})
+    changed = client.get("/items", headers={"If-None-Match": etag})
+    assert changed.status_code == 200 and changed.headers["ETag"] != etag
+
+    # If-Modified-Since compara con precisión completa: una escritura posterior
+    # dentro del mismo segundo no da un 304 obsoleto
+    from datetime import timedelta
+    from app.models import ResourceVersion
+    with client.application.app_context():
+        written = db.session.get(ResourceVersion, "items").updated_at
+    same_second = written.strftime("%a, %d %b %Y %H:%M:%S GMT")
+    assert client.get("/items", headers={"If-Modified-Since": same_second}).status_code == 200
+
+    # Last-Modified solo se envía cuando su segundo ya ha pasado, y entonces valida
+    with client.application.app_context():
+        for row in db.session.execute(db.select(ResourceVersion)).scalars():
+            row.updated_at -= timedelta(seconds=2)
+        db.session.commit()
+    last_modified = client.get("/items").headers["Last-Modified"]
+    since = client.get("/items", headers={"If-Modified-Since": last_modified})
+    assert since.status_code == 304
+
+
+def test_conditional_get_caches_hot_resources(client):
+    """GET /items/<id> se renderiza una vez por versión y se invalida con una importación que sobrescribe."""
+    from app import conditional
+    item_id = client.get("/items").get_json()[0]["id"]
+    with client.application.app_context():
+        cache = conditional.get_cache()
+    first = client.get(f"/items/{item_id}")
+    again = client.get(f"/items/{item_id}")
+    assert again.get_json() == first.get_json()
+    assert again.headers["ETag"] == first.headers["ETag"]
+    assert cache.hits == 1
+    assert client.get(f"/items/{item_id}", headers={"If-None-Match": first.headers["ETag"]}).status_code == 304
+
+    body = "sku,name,category,base_uom\nSKU1,Renamed,GEN,EA\n"
+    client.post("/items/bulk", data=body, content_type="text/csv")
+    renamed = client.get(f"/items/{item_id}", headers={"If-None-Match": first.headers["ETag"]})
+    assert renamed.status_code == 200 and renamed.get_json()["name"] == "Renamed"
+    assert client.get("/items/9999").status_code == 404
+
+
+def test_gzip_compression_threshold_and_stream(client):
+    """Respuestas grandes se comprimen con gzip (también en streaming); las pequeñas no."""
+    import gzip
+    from app.models import Item
+    with client.application.app_context():
+        item = db.session.execute(db.select(Item)).scalars().first()
+        db.session.execute(db.insert(Item), [
+            {"sku": f"GZ{n:04d}", "name": f"Compressible item {n}", "category_id": item.category_id,
+             "base_uom_id": item.base_uom_id, "spec": {}}
+            for n in range(300)
+        ])
+        db.session.commit()
+
+    big = client.get("/items?limit=300", headers={"Accept-Encoding": "gzip"})
+    assert big.headers["Content-Encoding"] == "gzip"
+    assert "Accept-Encoding" in big.headers["Vary"]
+    assert big.headers["ETag"].startswith('W/"')
+    assert len(json.loads(gzip.decompress(big.data))) == 300
+    # El ETag débil sigue validando
+    assert client.get("/items?limit=300", headers={"If-None-Match": big.headers["ETag"]}).status_code == 304
+
+    small = client.get("/items?limit=1", headers={"Accept-Encoding": "gzip"})
+    assert "Content-Encoding" not in small.headers
+    assert "Content-Encoding" not in client.get("/items?limit=300").headers
+
+    stream = client.get("/items?stream=1", headers={"Accept-Encoding": "gzip"})
+    assert stream.headers["Content-Encoding"] == "gzip"
+    lines = gzip.decompress(stream.data).decode().splitlines()
+    assert len(lines) == 301 and json.loads(lines[-1])["sku"] == "GZ0299"
+
+
+def test_spec_is_object_and_filterable(client):
+    """spec se guarda como objeto JSON y GET /items filtra por sus atributos."""
+    for sku, spec in [
+        ("F1", {"color": "navy", "weight_gsm": 280}),
+        ("F2", {"color": "navy", "weight_gsm": 220}),
+        ("F3", '{"color": "grey", "weight_gsm": 300, "stretch": true}'),
+        ("F4", {"color": "navy"}),
+    ]:
+        res = client.post("/items", json={"sku": sku, "name": sku, "category": "GEN",
+                                          "base_uom": "EA", "spec": spec})
+        assert res.status_code == 201
+    f1 = next(i for i in client.get("/items").get_json() if i["sku"] == "F1")
+    assert f1["spec"] == {"color": "navy", "weight_gsm": 280}
+
+    def skus(query):
+        res = client.get(f"/items?{query}")
+        assert res.status_code == 200, res.get_data(as_text=True)
+        return [i["sku"] for i in res.get_json()]
+
+    assert skus("spec.color=navy") == ["F1", "F2", "F4"]
+    assert skus("spec.color=navy&spec.weight_gsm>=250") == ["F1"]
+    assert skus("spec.weight_gsm%3E250") == ["F1", "F3"]
+    assert skus("spec.weight_gsm<=280") == ["F1", "F2"]
+    assert skus("spec.weight_gsm=300") == ["F3"]
+    assert skus("spec.stretch=true") == ["F3"]
+    assert skus("spec.color!=navy") == ["F3"]
+
+    # Los cambios de spec (también por importación masiva) actualizan el filtro
+    body = '{"sku": "F4", "name": "F4", "category": "GEN", "base_uom": "EA", "spec": {"color": "black"}}\n'
+    client.post("/items/bulk", data=body, content_type="application/x-ndjson")
+    assert skus("spec.color=navy") == ["F1", "F2"]
+
+    assert client.get("/items?spec.weight_gsm>=heavy").status_code == 400
+    assert client.get("/items?spec.a%20b=1").status_code == 400
+    assert client.post("/items", json={"sku": "F9", "name": "x", "category": "GEN", "base_uom": "EA",
+                                       "spec": "[1, 2]"}).status_code == 400
+
+
+def _selects(client, url):
+    """Hace GET ``url`` y devuelve la respuesta y las SELECT lanzadas."""
+    from sqlalchemy import event
+
+    with client.application.app_context():
+        engine = db.engine
+    statements = []
+
+    def before(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith("SELECT"):
+            statements.append(" ".join(statement.split()))
+
+    event.listen(engine, "before_cursor_execute", before)
+    try:
+        resp = client.get(url)
+    finally:
+        event.remove(engine, "before_cursor_execute", before)
+    return resp, statements
+
+
+def test_multi_get_items_and_boms(client):
+    """GET /items?ids= y /boms?ids= resuelven cada tipo con una sola consulta IN."""
+    ids = []
+    for n in range(6):
+        res = client.post("/items", json={"sku": f"C{n}", "name": f"Comp {n}", "category": "GEN",
+                                          "base_uom": "EA", "spec": {"n": n}})
+        ids.append(res.get_json()["id"])
+    bom_ids = []
+    for start in (0, 2):
+        res = client.post("/boms", json={"product_item_id": 1, "lines": [
+            {"component_item_id": ids[start + k], "qty_per": k + 1, "uom_id": 1} for k in range(4)
+        ]})
+        bom_ids.append(res.get_json()["id"])
+
+    resp, statements = _selects(client, f"/items?ids={ids[3]},{ids[0]},999,{ids[3]}")
+    assert resp.status_code == 200
+    data = resp.get_json()
+    assert [i["id"] for i in data] == [ids[3], ids[0]]
+    assert data[0] == {"id": ids[3], "sku": "C3", "name": "Comp 3", "category": "GEN",
+                       "base_uom": "EA", "brand": None, "active": True, "spec": {"n": 3}}
+    assert sum(" FROM items " in s for s in statements) == 1
+    assert sum(" FROM uoms " in s for s in statements) == 1
+    assert sum(" FROM item_categories " in s for s in statements) == 1
+
+    resp, statements = _selects(client, f"/boms?ids={bom_ids[1]},{bom_ids[0]}&include=lines,components")
+    assert resp.status_code == 200
+    boms = resp.get_json()
+    assert [b["id"] for b in boms] == [bom_ids[1], bom_ids[0]]
+    assert [line["component_item_id"] for line in boms[1]["lines"]] == ids[:4]
+    assert [c["sku"] for c in boms[0]["components"]] == ["C2", "C3", "C4", "C5"]
+    # BOMs, líneas, artículos, categorías y UdM: una consulta cada uno para las dos BOMs
+    for table in ("boms", "bom_lines", "items", "uoms", "item_categories"):
+        assert sum(f" FROM {table} " in s for s in statements) == 1, table
+
+    plain = client.get(f"/boms?ids={bom_ids[0]}").get_json()
+    assert "lines" not in plain[0] and "components" not in plain[0]
+    assert client.get("/items?ids=1,x").status_code == 400
+    assert client.get("/items?ids=1,99999999999999999999").status_code == 400
+    assert client.get("/boms?ids=-99999999999999999999").status_code == 400
+    assert client.get("/boms?ids=1&include=suppliers").status_code == 400
+    client.application.config["MULTI_GET_MAX_IDS"] = 2
+    assert client.get("/items?ids=1,2,3").status_code == 400
+
+
+def test_where_used_from_maintained_closure(client):
+    """La tabla de cierre se mantiene al crear BOMs y responde el where-used a cualquier profundidad."""
+    from decimal import Decimal
+    from app import bom_closure
+    from app.models import BomClosure
+
+    ids = {}
+    for sku in ("FABRIC", "SLEEVE", "JACKET", "SUIT"):
+        res = client.post("/items", json={"sku": sku, "name": sku, "category": "GEN", "base_uom": "EA"})
+        ids[sku] = res.get_json()["id"]
+
+    def bom(product, version, lines):
+        res = client.post("/boms", json={"product_item_id": ids[product], "version": version, "lines": [
+            {"component_item_id": ids[c], "qty_per": q, "scrap_pct": s, "uom_id": 1} for c, q, s in lines
+        ]})
+        assert res.status_code == 201, res.get_data(as_text=True)
+
+    def used_in(query=""):
+        res = client.get(f"/items/{ids['FABRIC']}/where_used{query}")
+        assert res.status_code == 200
+        return {u["item_id"]: (u["depth"], Decimal(str(u["qty"]))) for u in res.get_json()["used_in"]}
+
+    # El traje se crea antes que sus componentes: el cierre se propaga hacia arriba
+    bom("SUIT", 1, [("JACKET", 1, 0), ("SLEEVE", 2, 0)])
+    bom("JACKET", 1, [("SLEEVE", 1, 0), ("FABRIC", 1, 0)])
+    bom("SLEEVE", 1, [("FABRIC", 2, 5)])
+    assert used_in() == {
+        ids["SLEEVE"]: (1, Decimal("2.1")),
+        ids["JACKET"]: (1, Decimal("3.1")),
+        ids["SUIT"]: (2, Decimal("7.3")),
+    }
+    assert used_in("?depth=2")[ids["SUIT"]] == (2, Decimal("5.2"))
+    assert set(used_in("?depth=1")) == {ids["SLEEVE"], ids["JACKET"]}
+
+    # Una versión nueva de la manga sustituye su estructura en todos los ancestros
+    bom("SLEEVE", 2, [("FABRIC", 3, 0)])
+    assert used_in()[ids["SUIT"]] == (2, Decimal("10"))
+
+    def closure():
+        with client.application.app_context():
+            return {(r.ancestor_id, r.descendant_id, r.depth): (r.paths, r.qty)
+                    for r in db.session.execute(db.select(BomClosure)).scalars()}
+
+    maintained = closure()
+    with client.application.app_context():
+        assert bom_closure.rebuild() == len(maintained)
+    assert closure() == maintained
+
+    # Un ciclo se rechaza sin tocar el cierre
+    res = client.post("/boms", json={"product_item_id": ids["FABRIC"], "lines": [
+        {"component_item_id": ids["SUIT"], "qty_per": 1, "uom_id": 1}]})
+    assert res.status_code == 400
+    assert closure() == maintained
+
+    assert client.get(f"/items/{ids['SUIT']}/where_used").get_json()["used_in"] == []
+    assert client.get("/items/999/where_used").status_code == 404
+    assert client.get(f"/items/{ids['FABRIC']}/where_used?depth=0").status_code == 400
+
+    runner = client.application.test_cli_runner()
+    result = runner.invoke(args=["bom-closure-rebuild"])
+    assert result.exit_code == 0 and "rows" in result.output
+
+
+def test_bom_cost_rollup_memoized_and_invalidated(client):
+    """El coste se acumula por subconjuntos, se memoiza y un cambio solo invalida a sus ancestros."""
+    from decimal import Decimal
+    from app.models import Location, Supplier, Warehouse
+
+    ids = {}
+    for sku in ("FABRIC", "LINING", "BUTTON", "SLEEVE", "JACKET"):
+        res = client.post("/items", json={"sku": sku, "name": sku, "category": "GEN", "base_uom": "EA"})
+        ids[sku] = res.get_json()["id"]
+    with client.application.app_context():
+        supplier = Supplier(name="Mill", lead_time_days=10, currency="EUR")
+        wh = Warehouse(code="MAIN", name="Main")
+        db.session.add_all([supplier, wh])
+        db.session.flush()
+        loc = Location(warehouse_id=wh.id, code="A1", type="STORAGE")
+        db.session.add(loc)
+        db.session.commit()
+        supplier_id, loc_id = supplier.id, loc.id
+    for price in (10, 8):
+        client.post("/supplier_items", json={"supplier_id": supplier_id, "item_id": ids["FABRIC"], "price": price})
+    # Sin oferta, el forro se valora al coste de su última recepción
+    client.post("/stock/moves", json={"item_id": ids["LINING"], "to_location": loc_id, "qty": 10, "unit_cost": 4})
+
+    def bom(product, version, lines):
+        res = client.post("/boms", json={"product_item_id": ids[product], "version": version, "lines": [
+            {"component_item_id": ids[c], "qty_per": q, "scrap_pct": s, "uom_id": 1} for c, q, s in lines
+        ]})
+        return res.get_json()["id"]
+
+    bom("SLEEVE", 1, [("FABRIC", 2, 5)])
+    jacket = bom("JACKET", 1, [("SLEEVE", 2, 0), ("LINING", 1, 0), ("BUTTON", 3, 0)])
+
+    def cost():
+        res = client.get(f"/boms/{jacket}/cost")
+        assert res.status_code == 200
+        data = res.get_json()
+        return data, {c["item_id"]: (c["source"], Decimal(str(c["unit_cost"] or 0))) for c in data["components"]}
+
+    rollup = client.application.extensions["cost_rollup"]
+    data, components = cost()
+    assert Decimal(str(data["cost"])) == Decimal("37.6")
+    assert not data["complete"] and data["missing_prices"] == [ids["BUTTON"]]
+    assert components == {ids["SLEEVE"]: ("rollup", Decimal("16.8")), ids["LINING"]: ("receipt", 4),
+                          ids["BUTTON"]: (None, 0)}
+    hits = rollup.hits
+    cost()
+    assert rollup.hits == hits + 3
+
+    # Un precio nuevo del botón solo invalida el botón (la chaqueta no está en caché por sí misma)
+    client.post("/supplier_items", json={"supplier_id": supplier_id, "item_id": ids["BUTTON"], "price": 0.5})
+    assert ids["BUTTON"] not in rollup._entries
+    assert {ids["SLEEVE"], ids["FABRIC"], ids["LINING"]} <= set(rollup._entries)
+    data, _ = cost()
+    assert data["complete"] and Decimal(str(data["cost"])) == Decimal("39.1")
+
+    # Una versión nueva de la manga invalida la manga y la chaqueta, no los tejidos
+    with client.application.app_context():
+        rollup.costs([ids["JACKET"]])
+    bom("SLEEVE", 2, [("FABRIC", 3, 0)])
+    assert ids["SLEEVE"] not in rollup._entries and ids["JACKET"] not in rollup._entries
+    assert ids["FABRIC"] in rollup._entries
+    data, components = cost()
+    assert components[ids["SLEEVE"]] == ("rollup", 24)
+    assert Decimal(str(data["cost"])) == Decimal("53.5")
+
+    result = client.application.test_cli_runner().invoke(args=["bom-cost-rollup"])
+    assert result.exit_code == 0, result.output
+    rolled = {r["item_id"]: Decimal(str(r["cost"])) for r in json.loads(result.output)}
+    assert rolled[ids["JACKET"]] == Decimal("53.5") and rolled[ids["SLEEVE"]] == 24
+    assert client.get("/boms/999/cost").status_code == 404
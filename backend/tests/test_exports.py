@@ -0,0 +1,139 @@
+import csv
+import io
+import json
+import os
+import threading
+import time
+
+import pytest
+from app import create_app
+from app.db import db
+
+
+@pytest.fixture
+def client(tmp_path):
+    """App con 25 movimientos de stock, exportaciones en tmp_path y un solo hilo."""
+    app = create_app({
+        "TESTING": True,
+        "SQLALCHEMY_DATABASE_URI": f"sqlite:///{tmp_path / 'exports.db'}",
+        "EXPORT_DIR": str(tmp_path / "exports"),
+        "EXPORT_MAX_WORKERS": 1,
+        "EXPORT_MAX_JOBS": 1,
+        "EXPORT_CHUNK_ROWS": 10,
+    })
+    with app.app_context():
+        from app import models
+        db.create_all()
+        from app.models import Uom, Item, StockMove
+        u = Uom(code="M")
+        db.session.add(u)
+        db.session.commit()
+        wool = Item(sku="WOOL", name="Wool", base_uom_id=u.id)
+        db.session.add(wool)
+        db.session.commit()
+        db.session.add_all([
+            StockMove(item_id=wool.id, to_location=1, qty=n + 1, uom_id=u.id, move_type="RECEIPT")
+            for n in range(25)
+        ])
+        db.session.commit()
+
+    with app.test_client() as client:
+        yield client
+
+    app.extensions["exports"].shutdown()
+    with app.app_context():
+        db.session.remove()
+        db.drop_all()
+
+
+def _wait(client, job_id, timeout=10):
+    deadline = time.monotonic() + timeout
+    while True:
+        job = client.get(f"/exports/{job_id}").get_json()
+        if job["status"] in ("done", "failed", "cancelled") or time.monotonic() > deadline:
+            return job
+        time.sleep(0.02)
+
+
+def test_csv_export_streams_whole_table(client):
+    """La exportación CSV escribe todas las filas por bloques y se descarga al terminar."""
+    res = client.post("/exports", json={"source": "stock_moves", "format": "csv"})
+    assert res.status_code == 202
+    job_id = res.get_json()["id"]
+    assert res.headers["Location"].endswith(f"/exports/{job_id}")
+
+    job = _wait(client, job_id)
+    assert job["status"] == "done"
+    assert job["rows_written"] == job["total_rows"] == 25
+
+    res = client.get(f"/exports/{job_id}/download")
+    assert res.status_code == 200
+    rows = list(csv.DictReader(io.StringIO(res.get_data(as_text=True))))
+    assert len(rows) == 25
+    assert rows[0]["uom"] == "M"
+    assert sum(float(r["qty"]) for r in rows) == 325
+
+
+def test_invalid_and_unknown_exports(client):
+    """Fuente o formato inválidos dan 400; un id desconocido da 404."""
+    assert client.post("/exports", json={"source": "users"}).status_code == 400
+    assert client.post("/exports", json={"source": "items", "format": "xlsx"}).status_code == 400
+    assert client.get("/exports/" + "0" * 32).status_code == 404
+    assert client.get("/exports/../../etc").status_code == 404
+
+
+def test_job_cap_and_cancel(client, monkeypatch):
+    """Con el cupo lleno se responde 429; una exportación cancelada no deja fichero."""
+    from app.exports import ExportManager
+
+    release = threading.Event()
+    export = ExportManager._export
+
+    def blocked(self, job, path):
+        release.wait(10)
+        return export(self, job, path)
+
+    monkeypatch.setattr(ExportManager, "_export", blocked)
+
+    job_id = client.post("/exports", json={"source": "stock_moves"}).get_json()["id"]
+    busy = client.post("/exports", json={"source": "items"})
+    assert busy.status_code == 429
+    assert busy.headers["Retry-After"] == "30"
+
+    assert client.post(f"/exports/{job_id}/cancel").status_code == 202
+    release.set()
+    job = _wait(client, job_id)
+    assert job["status"] == "cancelled"
+    assert client.get(f"/exports/{job_id}/download").status_code == 409
+    assert client.post(f"/exports/{job_id}/cancel").status_code == 409
+    # El marcador de cancelación se borra al terminar el trabajo
+    assert not os.path.exists(os.path.join(client.application.config["EXPORT_DIR"], f"{job_id}.cancel"))
+
+    # El cupo se libera al terminar
+    assert client.post("/exports", json={"source": "items"}).status_code == 202
+
+
+def test_export_dir_created_lazily_and_swept(client):
+    """El directorio se crea con la primera exportación y los ficheros viejos se barren."""
+    directory = client.application.config["EXPORT_DIR"]
+    assert not os.path.exists(directory)
+
+    old_id = client.post("/exports", json={"source": "stock_moves"}).get_json()["id"]
+    assert _wait(client, old_id)["status"] == "done"
+    assert os.path.exists(os.path.join(directory, f"{old_id}.csv"))
+
+    # Simular que terminó hace más que la retención
+    sidecar = os.path.join(directory, f"{old_id}.json")
+    with open(sidecar) as f:
+        job = json.load(f)
+    job["finished_at"] = "2000-01-01T00:00:00+00:00"
+    with open(sidecar, "w") as f:
+        json.dump(job, f)
+
+    new_id = client.post("/exports", json={"source": "items"}).get_json()["id"]
+    assert client.get(f"/exports/{old_id}").status_code == 404
+    assert not os.path.exists(os.path.join(directory, f"{old_id}.csv"))
+    # Un trabajo reciente se conserva
+    assert _wait(client, new_id)["status"] == "done"
+    assert client.application.extensions["exports"].sweep() == 0
+    assert client.get(f"/exports/{new_id}/download").status_code == 200
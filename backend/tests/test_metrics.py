@@ -0,0 +1,77 @@
+import pytest
+from app import create_app
+from app.db import db
+
+
+@pytest.fixture
+def client():
+    """App con umbral N+1 bajo y una ruta de prueba que consulta item a item."""
+    app = create_app({
+        "TESTING": True,
+        "SQLALCHEMY_DATABASE_URI": "sqlite:///:memory:",
+        "METRICS_N_PLUS_ONE_THRESHOLD": 3,
+    })
+    with app.app_context():
+        from app import models
+        db.create_all()
+        from app.models import Item
+        db.session.add_all([Item(sku=f"M{n}", name=f"Item {n}") for n in range(5)])
+        db.session.commit()
+
+    def one_by_one():
+        from app.models import Item
+        ids = db.session.execute(db.select(Item.id)).scalars().all()
+        for item_id in ids:
+            db.session.execute(db.select(Item.name).where(Item.id == item_id)).scalar()
+        return {"n": len(ids)}
+
+    app.add_url_rule("/test/n_plus_one", view_func=one_by_one)
+
+    with app.test_client() as client:
+        yield client
+
+    with app.app_context():
+        db.session.remove()
+        db.drop_all()
+
+
+def _metric(text, prefix):
+    for line in text.splitlines():
+        if line.startswith(prefix):
+            return float(line.rsplit(" ", 1)[1])
+    return None
+
+
+def test_metrics_count_requests_and_queries(client):
+    """/metrics expone peticiones, latencia y consultas SQL por endpoint en formato Prometheus."""
+    client.get("/items")
+    client.get("/items")
+    client.get("/items/9999")
+    res = client.get("/metrics")
+    assert res.status_code == 200
+    assert res.mimetype == "text/plain"
+    text = res.get_data(as_text=True)
+    assert "# TYPE http_request_duration_seconds histogram" in text
+    assert _metric(text, 'http_requests_total{endpoint="/items",method="GET",status="200"}') == 2
+    assert _metric(text, 'http_requests_total{endpoint="/items/<int:item_id>",method="GET",status="404"}') == 1
+    assert _metric(text, 'http_request_duration_seconds_count{endpoint="/items"}') == 2
+    assert _metric(text, 'http_request_duration_seconds_bucket{endpoint="/items",le="+Inf"}') == 2
+    assert _metric(text, 'db_queries_total{endpoint="/items"}') >= 2
+    assert _metric(text, 'n_plus_one_requests_total{endpoint="/items"}') is None
+
+
+def test_n_plus_one_detector_logs_and_counts(client, caplog):
+    """Repetir la misma sentencia por encima del umbral genera un aviso y un contador."""
+    with caplog.at_level("WARNING", logger="app.metrics"):
+        assert client.get("/test/n_plus_one").get_json() == {"n": 5}
+    assert any("N+1 suspected" in r.message and "/test/n_plus_one" in r.message for r in caplog.records)
+    text = client.get("/metrics").get_data(as_text=True)
+    assert _metric(text, 'n_plus_one_requests_total{endpoint="/test/n_plus_one"}') == 1
+    assert _metric(text, 'db_queries_total{endpoint="/test/n_plus_one"}') == 6
+
+
+def test_normalize_folds_in_lists_and_numbers():
+    """La normalización agrupa listas IN expandidas y literales numéricos."""
+    from app.metrics import normalize
+    assert normalize("SELECT a FROM t WHERE id IN (?, ?, ?) LIMIT 10") == \
+        normalize("SELECT a FROM t\n WHERE id IN (?) LIMIT 20")
@@ -0,0 +1,131 @@
+import pytest
+from datetime import date
+from app import create_app
+from app.db import db
+
+
+@pytest.fixture
+def client():
+    """App con BOM de dos niveles, stock, una PO abierta y proveedores.
+
+    SUIT = 1 JACKET + 2 BUTTON; JACKET = 1.5 WOOL + 4 BUTTON.
+    Stock: 2 JACKET, 3 WOOL. PO abierta: 10 WOOL con ETA 2025-01-10.
+    """
+    app = create_app({"TESTING": True, "SQLALCHEMY_DATABASE_URI": "sqlite:///:memory:"})
+    with app.app_context():
+        from app import models
+        db.create_all()
+        from app.models import (Uom, ItemCategory, Item, Bom, BomLine, Warehouse, Location,
+                                StockOnHand, Supplier, SupplierItem, PurchaseOrder, PoLine)
+        u = Uom(code="EA")
+        c = ItemCategory(code="GEN")
+        db.session.add_all([u, c])
+        db.session.commit()
+        items = {sku: Item(sku=sku, name=sku, category_id=c.id, base_uom_id=u.id)
+                 for sku in ("SUIT", "JACKET", "WOOL", "BUTTON")}
+        wh = Warehouse(code="MAIN", name="Main")
+        db.session.add_all(list(items.values()) + [wh])
+        db.session.commit()
+        ids = {k: v.id for k, v in items.items()}
+        loc = Location(warehouse_id=wh.id, code="A1", type="STORAGE")
+        suit = Bom(product_item_id=ids["SUIT"], version=1, effective_from=date(2024, 1, 1))
+        jacket = Bom(product_item_id=ids["JACKET"], version=1, effective_from=date(2024, 1, 1))
+        cheap = Supplier(name="Cheap", lead_time_days=20)
+        fast = Supplier(name="Fast", lead_time_days=5)
+        db.session.add_all([loc, suit, jacket, cheap, fast])
+        db.session.flush()
+        db.session.add_all([
+            BomLine(bom_id=suit.id, component_item_id=ids["JACKET"], qty_per=1),
+            BomLine(bom_id=suit.id, component_item_id=ids["BUTTON"], qty_per=2),
+            BomLine(bom_id=jacket.id, component_item_id=ids["WOOL"], qty_per=1.5),
+            BomLine(bom_id=jacket.id, component_item_id=ids["BUTTON"], qty_per=4),
+            StockOnHand(item_id=ids["JACKET"], location_id=loc.id, lot_code="", qty=2),
+            StockOnHand(item_id=ids["WOOL"], location_id=loc.id, lot_code="L1", qty=3),
+            SupplierItem(supplier_id=cheap.id, item_id=ids["WOOL"], price=8, moq=50),
+            SupplierItem(supplier_id=fast.id, item_id=ids["WOOL"], price=10),
+        ])
+        open_po = PurchaseOrder(supplier_id=fast.id, po_number="OPEN", status="OPEN", eta=date(2025, 1, 10))
+        closed_po = PurchaseOrder(supplier_id=fast.id, po_number="DONE", status="CLOSED", eta=date(2025, 1, 2))
+        db.session.add_all([open_po, closed_po])
+        db.session.flush()
+        db.session.add_all([
+            PoLine(po_id=open_po.id, item_id=ids["WOOL"], qty=10, price=10),
+            PoLine(po_id=closed_po.id, item_id=ids["WOOL"], qty=100, price=10),
+        ])
+        db.session.commit()
+        app.config["IDS"] = ids
+
+    with app.test_client() as client:
+        yield client
+
+    with app.app_context():
+        db.session.remove()
+        db.drop_all()
+
+
+def test_mrp_run_nets_against_stock_and_open_pos(client):
+    """La corrida MRP explota, neta contra stock y POs abiertas y sugiere proveedor."""
+    ids = client.application.config["IDS"]
+    resp = client.post("/mrp/runs", json={
+        "today": "2025-01-01",
+        "demand": [
+            {"item_id": ids["SUIT"], "qty": 5, "due_date": "2025-01-06"},
+            {"item_id": ids["SUIT"], "qty": 5, "due_date": "2025-01-16"},
+        ],
+    })
+    assert resp.status_code == 200
+    orders = resp.get_json()["planned_orders"]
+    by_item = {}
+    for o in orders:
+        by_item.setdefault(o["item_id"], []).append((o["due_date"], o["qty"], o["action"]))
+
+    assert sorted(by_item[ids["SUIT"]]) == [("2025-01-06", 5, "make"), ("2025-01-16", 5, "make")]
+    # 2 chaquetas en stock cubren parte de la primera demanda
+    assert sorted(by_item[ids["JACKET"]]) == [("2025-01-06", 3, "make"), ("2025-01-16", 5, "make")]
+    # Botones: 2 por traje + 4 por chaqueta planificada
+    assert sorted(by_item[ids["BUTTON"]]) == [("2025-01-06", 22, "buy"), ("2025-01-16", 30, "buy")]
+    # Lana: 4.5 el día 6 contra 3 en stock; la PO abierta del día 10 cubre el resto
+    wool = [o for o in orders if o["item_id"] == ids["WOOL"]]
+    assert len(wool) == 1
+    assert wool[0]["due_date"] == "2025-01-06"
+    # El barato (MOQ 50, 20 días) no llega a tiempo: se elige el rápido; fecha de pedido no anterior a hoy
+    assert wool[0]["qty"] == 1.5 and wool[0]["supplier_id"] is not None
+    assert wool[0]["unit_price"] == 10 and wool[0]["order_date"] == "2025-01-01"
+
+
+def test_mrp_run_validates_demand(client):
+    """Demanda inválida o items inexistentes devuelven 400."""
+    assert client.post("/mrp/runs", json={"demand": []}).status_code == 400
+    resp = client.post("/mrp/runs", json={"demand": [{"item_id": 999, "qty": 1, "due_date": "2025-01-01"}]})
+    assert resp.status_code == 400
+
+
+def test_mrp_past_due_demand_and_tiny_residues(client):
+    """La demanda vencida se neta contra el stock y los restos mínimos no generan pedidos."""
+    ids = client.application.config["IDS"]
+    # 2 de lana vencidos antes de hoy: los 3 en stock los cubren
+    resp = client.post("/mrp/runs", json={
+        "today": "2025-01-20",
+        "demand": [{"item_id": ids["WOOL"], "qty": 2, "due_date": "2025-01-05"}],
+    })
+    assert resp.status_code == 200 and resp.get_json()["planned_orders"] == []
+
+    # Un faltante por debajo de la precisión del informe no se pide ni rompe el presupuesto
+    resp = client.post("/mrp/runs", json={
+        "today": "2025-01-01",
+        "demand": [{"item_id": ids["WOOL"], "qty": 3.00001, "due_date": "2025-01-05"}],
+    })
+    assert resp.status_code == 200 and resp.get_json()["planned_orders"] == []
+
+    for bad in ("inf", "nan"):
+        resp = client.post("/mrp/runs", json={"demand": [{"item_id": ids["WOOL"], "qty": bad, "due_date": "2025-01-05"}]})
+        assert resp.status_code == 400
+
+
+def test_mrp_cli_reports_bad_today(client, tmp_path):
+    """El CLI rechaza --today mal formado sin traza."""
+    ids = client.application.config["IDS"]
+    demand = tmp_path / "demand.json"
+    demand.write_text(f'[{{"item_id": {ids["WOOL"]}, "qty": 1, "due_date": "2025-01-05"}}]')
+    result = client.application.test_cli_runner().invoke(args=["mrp-run", str(demand), "--today", "mañana"])
+    assert result.exit_code == 2 and "--today" in result.output
@@ -81,3 +81,146 @@ def test_create_po_and_add_lines(client):
     body = r3.get_json()
     assert "po_total" in body
     assert body["po_total"] == 10.0
+
+
+def test_list_endpoints_render_numeric_and_dates(client):
+    """Los listados proyectados convierten Numeric a float y fechas a texto."""
+    sid = client.post("/suppliers", json={"name": "Vendor3", "currency": "EUR"}).get_json()["id"]
+    from app.models import Item
+    with client.application.app_context():
+        item = Item.query.filter_by(sku="PO_ITEM").first()
+    client.post("/supplier_items", json={"supplier_id": sid, "item_id": item.id, "price": 2.5, "moq": 10})
+    from datetime import date
+    from app.models import PurchaseOrder
+    with client.application.app_context():
+        db.session.add(PurchaseOrder(supplier_id=sid, po_number="PO-D", eta=date(2025, 3, 1), total=0))
+        db.session.commit()
+
+    si = client.get("/supplier_items").get_json()[0]
+    assert si["price"] == 2.5 and si["moq"] == 10.0 and si["incoterms"] is None
+    po = client.get("/pos").get_json()[0]
+    assert po["eta"] == "2025-03-01" and po["total"] == 0.0
+    sup = client.get("/suppliers").get_json()[0]
+    assert sup["currency"] == "EUR"
+
+
+def test_po_total_matches_full_recompute(client):
+    """El total incremental (línea a línea y por lote) coincide con recalcular SUM(qty * price)."""
+    from decimal import Decimal
+    from app.models import Item, PoLine, PurchaseOrder
+    sid = client.post("/suppliers", json={"name": "Trims"}).get_json()["id"]
+    po_id = client.post("/pos", json={"supplier_id": sid, "po_number": "PO-TRIM"}).get_json()["id"]
+    with client.application.app_context():
+        item_id = Item.query.filter_by(sku="PO_ITEM").first().id
+
+    for n in range(1, 6):
+        assert client.post(f"/pos/{po_id}/lines", json={"item_id": item_id, "qty": n, "price": "1.25"}).status_code == 201
+    lines = [{"item_id": item_id, "qty": n % 9 + 1, "price": f"{n % 7}.{n % 4 * 25:02d}"} for n in range(400)]
+    r = client.post(f"/pos/{po_id}/lines:batch", json=lines)
+    assert r.status_code == 201
+    body = r.get_json()
+    assert len(body["ids"]) == 400
+
+    with client.application.app_context():
+        expected = db.session.execute(
+            db.select(db.func.sum(PoLine.qty * PoLine.price)).where(PoLine.po_id == po_id)
+        ).scalar()
+        total = db.session.get(PurchaseOrder, po_id).total
+    assert Decimal(str(total)) == Decimal(str(expected)).quantize(Decimal("0.01"))
+    assert body["po_total"] == float(total)
+
+    # Metros fraccionarios a precio de 4 decimales: redondear por línea desviaría el total
+    po2 = client.post("/pos", json={"supplier_id": sid, "po_number": "PO-FRAC"}).get_json()["id"]
+    for _ in range(4):
+        r = client.post(f"/pos/{po2}/lines", json={"item_id": item_id, "qty": "1.5", "price": "1.005"})
+        assert r.status_code == 201
+    assert Decimal(str(r.get_json()["po_total"])) == Decimal("6.03")
+    r = client.post(f"/pos/{po2}/lines:batch", json=[{"item_id": item_id, "qty": "0.25", "price": "2.0004"}] * 3)
+    assert Decimal(str(r.get_json()["po_total"])) == Decimal("7.53")
+
+
+def test_po_lines_batch_validation(client):
+    """Un lote con un item inexistente se rechaza sin insertar líneas ni tocar el total."""
+    from app.models import Item, PoLine
+    sid = client.post("/suppliers", json={"name": "Trims2"}).get_json()["id"]
+    po_id = client.post("/pos", json={"supplier_id": sid, "po_number": "PO-BAD"}).get_json()["id"]
+    with client.application.app_context():
+        item_id = Item.query.filter_by(sku="PO_ITEM").first().id
+
+    r = client.post(f"/pos/{po_id}/lines:batch", json=[
+        {"item_id": item_id, "qty": 1, "price": 1}, {"item_id": 9999, "qty": 1, "price": 1},
+    ])
+    assert r.status_code == 400
+    assert client.post(f"/pos/{po_id}/lines:batch", json=[{"item_id": item_id, "qty": 1}]).status_code == 400
+    assert client.post("/pos/9999/lines:batch", json=[{"item_id": item_id, "qty": 1, "price": 1}]).status_code == 404
+    # Cantidades no finitas e ids no escalares se rechazan con 400
+    for bad in ({"item_id": item_id, "qty": "NaN", "price": 1}, {"item_id": item_id, "qty": 1, "price": "Infinity"},
+                {"item_id": [item_id], "qty": 1, "price": 1}):
+        assert client.post(f"/pos/{po_id}/lines", json=bad).status_code == 400
+        assert client.post(f"/pos/{po_id}/lines:batch", json=[bad]).status_code == 400
+    with client.application.app_context():
+        assert db.session.execute(db.select(db.func.count(PoLine.id))).scalar() == 0
+    assert client.get("/pos").get_json()[0]["total"] == 0.0
+
+
+def test_item_sources_ranked_and_maintained(client):
+    """GET /items/<id>/sources ordena por coste efectivo con MOQ y se actualiza al cambiar ofertas."""
+    from app.models import Item
+    with client.application.app_context():
+        item_id = Item.query.filter_by(sku="PO_ITEM").first().id
+    cheap = client.post("/suppliers", json={"name": "Cheap", "lead_time_days": 30, "currency": "EUR"}).get_json()["id"]
+    fast = client.post("/suppliers", json={"name": "Fast", "lead_time_days": 3, "currency": "EUR"}).get_json()["id"]
+    client.post("/supplier_items", json={"supplier_id": cheap, "item_id": item_id, "price": 2, "moq": 100})
+    client.post("/supplier_items", json={"supplier_id": fast, "item_id": item_id, "price": 5})
+
+    big = client.get(f"/items/{item_id}/sources?qty=200").get_json()["sources"]
+    assert [s["supplier_id"] for s in big] == [cheap, fast]
+    # 10 unidades: el MOQ de 100 sube el coste efectivo del barato a 20/unidad
+    small = client.get(f"/items/{item_id}/sources?qty=10").get_json()["sources"]
+    assert [s["supplier_id"] for s in small] == [fast, cheap]
+    assert small[1]["order_qty"] == 100 and small[1]["effective_unit_cost"] == 20
+    # Con fecha límite, el que no llega queda al final aunque sea más barato
+    from datetime import date, timedelta
+    need_by = (date.today() + timedelta(days=5)).isoformat()
+    urgent = client.get(f"/items/{item_id}/sources?qty=200&need_by={need_by}").get_json()["sources"]
+    assert [(s["supplier_id"], s["meets_need_by"]) for s in urgent] == [(fast, True), (cheap, False)]
+
+    # Una oferta nueva invalida la entrada del índice
+    cheaper = client.post("/suppliers", json={"name": "Cheaper", "lead_time_days": 10}).get_json()["id"]
+    client.post("/supplier_items", json={"supplier_id": cheaper, "item_id": item_id, "price": 1})
+    assert client.get(f"/items/{item_id}/sources?qty=200").get_json()["sources"][0]["supplier_id"] == cheaper
+    assert client.get("/items/9999/sources").status_code == 404
+    assert client.get(f"/items/{item_id}/sources?qty=abc").status_code == 400
+
+
+def test_sourcing_index_bounded_and_supplier_scoped(client):
+    """El índice es un LRU acotado y un cambio de proveedor solo invalida sus artículos."""
+    from app import sourcing
+    from app.models import Item, Supplier
+    app = client.application
+    with app.app_context():
+        base = Item.query.filter_by(sku="PO_ITEM").first()
+        other = Item(sku="OTHER", name="Other", category_id=base.category_id, base_uom_id=base.base_uom_id)
+        db.session.add(other)
+        db.session.commit()
+        item_id, other_id = base.id, other.id
+    acme = client.post("/suppliers", json={"name": "Acme"}).get_json()["id"]
+    zeta = client.post("/suppliers", json={"name": "Zeta"}).get_json()["id"]
+    client.post("/supplier_items", json={"supplier_id": acme, "item_id": item_id, "price": 2})
+    client.post("/supplier_items", json={"supplier_id": zeta, "item_id": other_id, "price": 3})
+
+    with app.app_context():
+        index = sourcing.get_index()
+        index.sources_for([item_id, other_id])
+        # Renombrar Acme solo descarta el artículo que ofrece
+        db.session.get(Supplier, acme).name = "Acme Textiles"
+        db.session.commit()
+        assert index.stats()["entries"] == 1
+
+        # Con tamaño 1, recargar el artículo expulsa al menos usado
+        index.maxsize = 1
+        assert index.sources_for([item_id])[item_id][0].supplier_name == "Acme Textiles"
+        assert index.stats()["entries"] == 1
+        misses = index.misses
+        index.sources_for([other_id])
+        assert index.misses == misses + 1
@@ -0,0 +1,204 @@
+"""Planes de consulta de los accesos calientes.
+
+Cada caso ejecuta una ruta contra una base sembrada, captura las sentencias
+SQL que lanza y pide su plan (``EXPLAIN QUERY PLAN`` en SQLite,
+``EXPLAIN (FORMAT JSON)`` con ``enable_seqscan = off`` en PostgreSQL). El
+test falla si alguna recorre entera una tabla caliente en vez de usar un
+índice. Las rutas que listan o agregan tablas completas (listados, MRP,
+exportaciones) quedan fuera a propósito.
+
+Por defecto usa SQLite en memoria; ``QUERY_PLAN_DATABASE_URL`` permite
+apuntar a una base PostgreSQL vacía de pruebas.
+"""
+import os
+import re
+from datetime import date, datetime, timedelta
+
+import pytest
+from sqlalchemy import event
+from app import create_app
+from app.db import db
+
+HOT_TABLES = {
+    "boms", "bom_lines", "locations", "stock_on_hand", "stock_moves",
+    "supplier_items", "purchase_orders", "po_lines", "item_spec_attrs", "bom_closure",
+    "stock_availability", "item_costs", "stock_move_costs", "cost_layers",
+}
+
+_SQLITE_SCAN = re.compile(r"^SCAN (\w+)")
+
+
+@pytest.fixture
+def client():
+    """Base con 40 artículos, BOMs de dos niveles, proveedores, OCs y movimientos."""
+    app = create_app({
+        "TESTING": True,
+        "SQLALCHEMY_DATABASE_URI": os.getenv("QUERY_PLAN_DATABASE_URL", "sqlite:///:memory:"),
+    })
+    with app.app_context():
+        from app import models
+        from app.models import (
+            Uom, ItemCategory, Item, Bom, BomLine, Warehouse, Location, Supplier,
+            SupplierItem, PurchaseOrder, PoLine, StockMove,
+        )
+        db.create_all()
+        u, c = Uom(code="M"), ItemCategory(code="FABRIC")
+        db.session.add_all([u, c])
+        db.session.flush()
+        items = [Item(sku=f"I{n}", name=f"Item {n}", category_id=c.id, base_uom_id=u.id,
+                      spec={"color": ("navy", "grey")[n % 2], "weight_gsm": 200 + n * 5}) for n in range(40)]
+        whs = [Warehouse(code=f"W{n}", name=f"W{n}") for n in range(3)]
+        sups = [Supplier(name=f"S{n}", lead_time_days=10, currency="EUR") for n in range(5)]
+        db.session.add_all(items + whs + sups)
+        db.session.flush()
+        locs = [Location(warehouse_id=whs[n % 3].id, code=f"L{n}", type="STORAGE") for n in range(9)]
+        boms = [Bom(product_item_id=items[n].id, version=1) for n in range(10)]
+        db.session.add_all(locs + boms)
+        db.session.flush()
+        for n, bom in enumerate(boms):
+            # Los BOMs 0-4 usan los productos 5-9 como subconjuntos
+            comps = [items[10 + (n * 3 + k) % 30].id for k in range(3)]
+            if n < 5:
+                comps.append(items[n + 5].id)
+            db.session.add_all(BomLine(bom_id=bom.id, component_item_id=i, qty_per=2, uom_id=u.id) for i in comps)
+        db.session.add_all(
+            SupplierItem(supplier_id=sups[n % 5].id, item_id=items[10 + n % 30].id, price=5 + n % 7, moq=10)
+            for n in range(60)
+        )
+        pos = [PurchaseOrder(supplier_id=sups[n % 5].id, po_number=f"PO{n}", status="OPEN", total=0)
+               for n in range(10)]
+        db.session.add_all(pos)
+        db.session.flush()
+        db.session.add_all(PoLine(po_id=pos[n % 10].id, item_id=items[10 + n % 30].id, qty=5, price=2)
+                           for n in range(50))
+        db.session.add_all(
+            StockMove(item_id=items[10 + n % 30].id, to_location=locs[n % 9].id, qty=3, uom_id=u.id,
+                      move_type="RECEIPT", unit_cost=2, moved_at=datetime(2026, 1, 1) + timedelta(hours=n))
+            for n in range(200)
+        )
+        db.session.commit()
+        from app import costing
+        costing.replay("fifo")
+        from app import bom_closure
+        bom_closure.rebuild()
+        app.config["IDS"] = {
+            "item": items[12].id, "product": items[0].id, "sub": items[5].id, "bom": boms[0].id, "po": pos[0].id,
+            "loc": locs[0].id, "loc2": locs[1].id, "wh": whs[0].id, "supplier": sups[0].id,
+        }
+
+    with app.test_client() as client:
+        yield client
+
+    with app.app_context():
+        db.session.remove()
+        db.drop_all()
+
+
+def _capture(app, call):
+    """Run ``call()`` and return the (statement, parameters) of its reads."""
+    captured = []
+
+    def before(conn, cursor, statement, parameters, context, executemany):
+        if not executemany and statement.lstrip().upper().startswith(("SELECT", "WITH", "UPDATE", "DELETE")):
+            captured.append((statement, parameters))
+
+    with app.app_context():
+        engine = db.engine
+    event.listen(engine, "before_cursor_execute", before)
+    try:
+        call()
+    finally:
+        event.remove(engine, "before_cursor_execute", before)
+    return captured
+
+
+def _full_scans(conn, statement, parameters) -> set[str]:
+    """Return the hot tables the plan of ``statement`` reads in full."""
+    if conn.dialect.name == "postgresql":
+        conn.exec_driver_sql("SET enable_seqscan = off")
+        plan = conn.exec_driver_sql("EXPLAIN (FORMAT JSON) " + statement, parameters).scalar()
+        scans, nodes = set(), [plan[0]["Plan"]]
+        while nodes:
+            node = nodes.pop()
+            if node["Node Type"] == "Seq Scan" and node.get("Relation Name") in HOT_TABLES:
+                scans.add(node["Relation Name"])
+            nodes.extend(node.get("Plans", ()))
+        return scans
+    rows = conn.exec_driver_sql("EXPLAIN QUERY PLAN " + statement, parameters).all()
+    return {
+        m.group(1) for m in (_SQLITE_SCAN.match(r[-1]) for r in rows)
+        if m and m.group(1) in HOT_TABLES
+    }
+
+
+def _assert_indexed(app, statements):
+    offenders = []
+    with app.app_context(), db.engine.connect() as conn:
+        for statement, parameters in statements:
+            scans = _full_scans(conn, statement, parameters)
+            if scans:
+                offenders.append(f"{sorted(scans)}: {' '.join(statement.split())[:200]}")
+    assert not offenders, "full scans of hot tables:\n" + "\n".join(offenders)
+
+
+ROUTES = {
+    "item": lambda c, i: c.get(f"/items/{i['item']}"),
+    "items_spec": lambda c, i: c.get("/items?spec.color=navy&spec.weight_gsm>=250"),
+    "item_where_used": lambda c, i: c.get(f"/items/{i['item']}/where_used?depth=2"),
+    "item_sources": lambda c, i: c.get(f"/items/{i['item']}/sources?qty=20"),
+    "bom": lambda c, i: c.get(f"/boms/{i['bom']}"),
+    "bom_create": lambda c, i: c.post("/boms", json={
+        "product_item_id": i["sub"], "version": 2,
+        "lines": [{"component_item_id": i["item"], "qty_per": 1, "uom_id": None}]}),
+    "bom_cost": lambda c, i: c.get(f"/boms/{i['bom']}/cost"),
+    "bom_explode": lambda c, i: c.get(f"/boms/{i['bom']}/explode?qty=3"),
+    "po_line": lambda c, i: c.post(f"/pos/{i['po']}/lines", json={"item_id": i["item"], "qty": 1, "price": 2}),
+    "po_lines_batch": lambda c, i: c.post(f"/pos/{i['po']}/lines:batch",
+                                          json=[{"item_id": i["item"], "qty": 1, "price": 2}]),
+    "stock_availability": lambda c, i: c.get(f"/stock/availability?item_ids={i['item']},{i['product']}"),
+    "stock_availability_location": lambda c, i: c.get(
+        f"/stock/availability?item_ids={i['item']}&group_by=location"),
+    "stock_allocation": lambda c, i: c.post("/stock/allocations", json={"bom_id": i["bom"], "qty": 500}),
+    "stock_valuation": lambda c, i: c.get(f"/stock/valuation?item_ids={i['item']}&include=layers"),
+    "stock_valuation_as_of": lambda c, i: c.get(
+        f"/stock/valuation?item_ids={i['item']}&as_of={date.today()}&since=2026-01-01"),
+    "stock_backdated_move": lambda c, i: c.post("/stock/moves", json={
+        "item_id": i["item"], "to_location": i["loc"], "qty": 2, "unit_cost": 1, "moved_at": "2020-01-01"}),
+    "stock_as_of_item": lambda c, i: c.get(f"/stock/as_of?date={date.today()}&item_id={i['item']}"),
+    "stock_moves": lambda c, i: c.post("/stock/moves", json={
+        "item_id": i["item"], "from_location": i["loc"], "to_location": i["loc2"], "qty": 1}),
+}
+
+
+@pytest.mark.parametrize("route", sorted(ROUTES))
+def test_route_queries_use_indexes(client, route):
+    """Las consultas de cada ruta caliente usan índices, nunca un recorrido completo."""
+    app, ids = client.application, client.application.config["IDS"]
+    responses = []
+    statements = _capture(app, lambda: responses.append(ROUTES[route](client, ids)))
+    assert responses[0].status_code < 400, responses[0].get_data(as_text=True)
+    assert statements
+    _assert_indexed(app, statements)
+
+
+def test_foreign_key_access_paths_use_indexes(client):
+    """Los accesos por clave foránea sin ruta propia todavía también tienen índice."""
+    from app.models import BomLine, Location, PurchaseOrder, StockOnHand, SupplierItem
+
+    app, ids = client.application, client.application.config["IDS"]
+    stmts = [
+        db.select(StockOnHand).where(StockOnHand.location_id == ids["loc"]),
+        db.select(Location).where(Location.warehouse_id == ids["wh"]),
+        db.select(SupplierItem).where(SupplierItem.supplier_id == ids["supplier"]),
+        db.select(PurchaseOrder).where(PurchaseOrder.supplier_id == ids["supplier"]),
+        db.select(BomLine.bom_id).where(BomLine.component_item_id == ids["item"]),
+    ]
+
+    def run():
+        with app.app_context():
+            for stmt in stmts:
+                db.session.execute(stmt).all()
+
+    statements = _capture(app, run)
+    assert len(statements) == len(stmts)
+    _assert_indexed(app, statements)
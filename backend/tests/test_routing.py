@@ -0,0 +1,111 @@
+import pytest
+from app import create_app
+from app.db import db
+
+
+@pytest.fixture
+def app(tmp_path):
+    """App con dos ficheros SQLite: primario y réplica, con datos distintos.
+
+    Nada replica entre ellos, así que el nombre del artículo devuelto indica
+    de qué base de datos se leyó.
+    """
+    app = create_app({
+        "TESTING": True,
+        "SQLALCHEMY_DATABASE_URI": f"sqlite:///{tmp_path / 'primary.db'}",
+        "SQLALCHEMY_REPLICA_URIS": (f"sqlite:///{tmp_path / 'replica.db'}",),
+        "DB_REPLICA_STICKY_SECONDS": 30,
+    })
+    with app.app_context():
+        from app import models
+        from app.models import Item, ItemCategory, Uom
+
+        db.create_all()
+        db.session.add_all([Uom(code="M"), ItemCategory(code="FABRIC")])
+        db.metadata.create_all(app.extensions["routing"]["replica_0"])
+        db.session.add(Item(sku="A1", name="from primary"))
+        db.session.commit()
+        with app.extensions["routing"]["replica_0"].begin() as conn:
+            conn.execute(db.insert(Item).values(sku="A1", name="from replica"))
+
+    yield app
+
+    with app.app_context():
+        db.session.remove()
+        db.drop_all()
+        db.metadata.drop_all(app.extensions["routing"]["replica_0"])
+
+
+def _names(client):
+    res = client.get("/items")
+    assert res.status_code == 200
+    return [i["name"] for i in res.get_json()]
+
+
+def test_reads_go_to_replica_and_writes_to_primary(app):
+    """Los GET de catálogo leen de la réplica; las escrituras van al primario."""
+    client = app.test_client()
+    assert _names(client) == ["from replica"]
+
+    res = app.test_client().post("/items", json={
+        "sku": "B2", "name": "new", "category": "FABRIC", "base_uom": "M",
+    })
+    assert res.status_code == 201
+    with app.app_context():
+        from app.models import Item
+
+        primary = db.session.execute(db.select(Item.sku).order_by(Item.id)).scalars().all()
+        with app.extensions["routing"]["replica_0"].connect() as conn:
+            replica = conn.execute(db.select(Item.sku)).scalars().all()
+    assert primary == ["A1", "B2"]
+    assert replica == ["A1"]
+
+
+def test_client_reads_its_writes_within_sticky_window(app):
+    """Tras escribir, el mismo cliente lee del primario durante la ventana configurada."""
+    writer = app.test_client()
+    res = writer.post("/items", json={
+        "sku": "B2", "name": "new", "category": "FABRIC", "base_uom": "M",
+    })
+    assert res.status_code == 201
+    assert "db_primary_until=" in res.headers["Set-Cookie"]
+    assert _names(writer) == ["from primary", "new"]
+
+    # Otro cliente (sin cookie) sigue leyendo de la réplica
+    assert _names(app.test_client()) == ["from replica"]
+
+    # Una cookie caducada ya no fija el primario
+    writer.set_cookie("db_primary_until", "1")
+    assert _names(writer) == ["from replica"]
+
+
+def test_pool_checkout_metrics_per_bind(app):
+    """/metrics expone la espera de checkout de cada pool (primario y réplica)."""
+    client = app.test_client()
+    client.get("/items")
+    text = client.get("/metrics").get_data(as_text=True)
+    assert 'db_pool_checkout_wait_seconds_count{bind="default"}' in text
+    assert 'db_pool_checkout_wait_seconds_count{bind="replica_0"}' in text
+    assert 'db_pool_size{bind="replica_0"} 5' in text
+
+
+def test_shared_caches_fill_from_primary(app):
+    """Las cachés de proceso se llenan desde el primario: la réplica con retraso no llega al que escribió."""
+    from app.models import Supplier, SupplierItem
+    with app.app_context():
+        db.session.add(Supplier(id=1, name="Mill"))
+        db.session.add(SupplierItem(supplier_id=1, item_id=1, price=10))
+        db.session.commit()
+        with app.extensions["routing"]["replica_0"].begin() as conn:
+            conn.execute(db.insert(Supplier).values(id=1, name="Mill"))
+            conn.execute(db.insert(SupplierItem).values(supplier_id=1, item_id=1, price=10))
+
+    writer, reader = app.test_client(), app.test_client()
+    res = writer.post("/supplier_items", json={"supplier_id": 1, "item_id": 1, "price": 5})
+    assert res.status_code == 201
+
+    # El lector va a la réplica, pero el índice compartido se carga del primario
+    prices = [s["unit_price"] for s in reader.get("/items/1/sources").get_json()["sources"]]
+    assert prices == [5.0, 10.0]
+    prices = [s["unit_price"] for s in writer.get("/items/1/sources").get_json()["sources"]]
+    assert prices == [5.0, 10.0]
@@ -0,0 +1,461 @@
+import pytest
+from decimal import Decimal
+from app import create_app
+from app.db import db
+
+
+@pytest.fixture
+def client():
+    """App con un artículo, otro artículo y dos ubicaciones de un almacén."""
+    app = create_app({"TESTING": True, "SQLALCHEMY_DATABASE_URI": "sqlite:///:memory:"})
+    with app.app_context():
+        from app import models
+        db.create_all()
+        from app.models import Uom, ItemCategory, Item, Warehouse, Location
+        u = Uom(code="M")
+        c = ItemCategory(code="FABRIC")
+        wh = Warehouse(code="MAIN", name="Main")
+        db.session.add_all([u, c, wh])
+        db.session.commit()
+        wool = Item(sku="WOOL", name="Wool", category_id=c.id, base_uom_id=u.id)
+        silk = Item(sku="SILK", name="Silk", category_id=c.id, base_uom_id=u.id)
+        a1 = Location(warehouse_id=wh.id, code="A1", type="STORAGE")
+        cut = Location(warehouse_id=wh.id, code="CUT", type="WIP")
+        db.session.add_all([wool, silk, a1, cut])
+        db.session.commit()
+        app.config["IDS"] = {"wool": wool.id, "silk": silk.id, "a1": a1.id, "cut": cut.id}
+
+    with app.test_client() as client:
+        yield client
+
+    with app.app_context():
+        db.drop_all()
+
+
+def _balances(client):
+    from app.models import StockOnHand
+    with client.application.app_context():
+        return {
+            (r.item_id, r.location_id, r.lot_code): r.qty
+            for r in db.session.execute(db.select(StockOnHand)).scalars()
+        }
+
+
+def test_post_single_and_batch_moves(client):
+    """Una recepción y un lote de traspasos actualizan los saldos por lote."""
+    ids = client.application.config["IDS"]
+    res = client.post("/stock/moves", json={
+        "item_id": ids["wool"], "to_location": ids["a1"], "qty": 100, "lot_code": "L1",
+        "move_type": "RECEIPT",
+    })
+    assert res.status_code == 201
+    assert "id" in res.get_json()
+
+    res = client.post("/stock/moves", json=[
+        {"item_id": ids["wool"], "from_location": ids["a1"], "to_location": ids["cut"],
+         "qty": "12.5", "lot_code": "L1"},
+        {"item_id": ids["wool"], "from_location": ids["a1"], "to_location": ids["cut"],
+         "qty": "7.5", "lot_code": "L1"},
+        {"item_id": ids["silk"], "to_location": ids["a1"], "qty": 3},
+    ])
+    assert res.status_code == 201
+    assert len(res.get_json()["ids"]) == 3
+
+    balances = _balances(client)
+    assert balances[(ids["wool"], ids["a1"], "L1")] == Decimal("80")
+    assert balances[(ids["wool"], ids["cut"], "L1")] == Decimal("20")
+    assert balances[(ids["silk"], ids["a1"], "")] == Decimal("3")
+
+
+def test_balances_match_move_ledger(client):
+    """Tras muchos movimientos los saldos coinciden con la suma del libro de movimientos."""
+    from app.models import StockMove
+    ids = client.application.config["IDS"]
+    moves = []
+    for n in range(300):
+        src, dst = (ids["a1"], ids["cut"]) if n % 3 else (None, ids["a1"])
+        moves.append({"item_id": ids["wool"] if n % 2 else ids["silk"], "from_location": src,
+                      "to_location": dst, "qty": n % 7 + 1, "lot_code": f"L{n % 4}"})
+    for start in range(0, len(moves), 50):
+        assert client.post("/stock/moves", json=moves[start:start + 50]).status_code == 201
+
+    expected = {}
+    with client.application.app_context():
+        for m in db.session.execute(db.select(StockMove)).scalars():
+            if m.from_location is not None:
+                key = (m.item_id, m.from_location, m.lot_code or "")
+                expected[key] = expected.get(key, 0) - m.qty
+            if m.to_location is not None:
+                key = (m.item_id, m.to_location, m.lot_code or "")
+                expected[key] = expected.get(key, 0) + m.qty
+    balances = _balances(client)
+    assert {k: v for k, v in balances.items() if v} == {k: v for k, v in expected.items() if v}
+
+
+def test_invalid_batch_writes_nothing(client):
+    """Un lote con un artículo o ubicación desconocidos se rechaza entero."""
+    from app.models import StockMove
+    ids = client.application.config["IDS"]
+    res = client.post("/stock/moves", json=[
+        {"item_id": ids["wool"], "to_location": ids["a1"], "qty": 5},
+        {"item_id": 999, "to_location": ids["a1"], "qty": 5},
+    ])
+    assert res.status_code == 400
+    assert b"999" in res.data
+
+    assert client.post("/stock/moves", json={"item_id": ids["wool"], "to_location": 999, "qty": 1}).status_code == 400
+    assert client.post("/stock/moves", json={"item_id": ids["wool"], "to_location": ids["a1"], "qty": 0}).status_code == 400
+    assert client.post("/stock/moves", json={"item_id": ids["wool"], "qty": 1}).status_code == 400
+    # lot_code solo texto; uom_id y ref_id enteros y la unidad debe existir
+    for bad in ({"lot_code": ["L1"]}, {"lot_code": 5}, {"uom_id": 999}, {"uom_id": True}, {"ref_id": "abc"}):
+        move = dict({"item_id": ids["wool"], "to_location": ids["a1"], "qty": 1}, **bad)
+        assert client.post("/stock/moves", json=move).status_code == 400
+    with client.application.app_context():
+        assert db.session.execute(db.select(db.func.count(StockMove.id))).scalar() == 0
+    assert _balances(client) == {}
+
+
+def _post(client, item, qty, day, src=None, dst=None, lot="L1"):
+    res = client.post("/stock/moves", json={
+        "item_id": item, "from_location": src, "to_location": dst, "qty": qty,
+        "lot_code": lot, "moved_at": f"2025-01-{day:02d}T10:00:00",
+    })
+    assert res.status_code == 201
+
+
+def test_as_of_from_checkpoints(client):
+    """Los saldos a fecha parten del checkpoint más cercano y coinciden con el libro."""
+    ids = client.application.config["IDS"]
+    _post(client, ids["wool"], 100, 1, dst=ids["a1"])
+    _post(client, ids["wool"], 30, 3, src=ids["a1"], dst=ids["cut"])
+    res = client.post("/stock/checkpoints", json={"as_of": "2025-01-03"})
+    assert res.status_code == 201
+    first = res.get_json()
+    assert first["status"] == "READY" and first["base_id"] is None
+    _post(client, ids["wool"], 10, 5, src=ids["cut"])
+    second = client.post("/stock/checkpoints", json={"as_of": "2025-01-05"}).get_json()
+    assert second["base_id"] == first["id"]
+    _post(client, ids["silk"], 4, 7, dst=ids["a1"])
+
+    body = client.get("/stock/as_of?date=2025-01-06").get_json()
+    assert body["checkpoint_id"] == second["id"]
+    assert {(b["location_id"], b["qty"]) for b in body["balances"]} == {(ids["a1"], 70.0), (ids["cut"], 20.0)}
+
+    body = client.get(f"/stock/as_of?date=2025-01-07&item_id={ids['silk']}").get_json()
+    assert body["balances"] == [{"item_id": ids["silk"], "location_id": ids["a1"], "lot_code": "L1", "qty": 4.0}]
+
+    body = client.get("/stock/as_of?date=2025-01-02").get_json()
+    assert body["checkpoint_id"] is None
+    assert [b["qty"] for b in body["balances"]] == [100.0]
+    assert client.get("/stock/as_of?date=yesterday").status_code == 400
+
+    # Un checkpoint en el futuro se rechaza: aún pueden llegar movimientos anteriores
+    res = client.post("/stock/checkpoints", json={"as_of": "2999-01-01T00:00:00"})
+    assert res.status_code == 400
+    result = client.application.test_cli_runner().invoke(args=["stock-checkpoint", "--as-of", "2999-01-01"])
+    assert result.exit_code != 0 and "future" in result.output
+    # Una fecha mal formada es un error de parámetro, no una traza
+    for bad in ("nope", "2025-13-01", "9999-12-31"):
+        result = client.application.test_cli_runner().invoke(args=["stock-checkpoint", "--as-of", bad])
+        assert result.exit_code == 2 and "--as-of" in result.output
+
+
+def test_backdated_move_invalidates_later_checkpoints(client):
+    """Un movimiento con fecha pasada invalida solo los checkpoints posteriores."""
+    ids = client.application.config["IDS"]
+    _post(client, ids["wool"], 100, 1, dst=ids["a1"])
+    first = client.post("/stock/checkpoints", json={"as_of": "2025-01-02"}).get_json()
+    _post(client, ids["wool"], 10, 5, src=ids["a1"])
+    second = client.post("/stock/checkpoints", json={"as_of": "2025-01-06"}).get_json()
+
+    _post(client, ids["wool"], 5, 4, src=ids["a1"])
+    status = {c["id"]: c["status"] for c in client.get("/stock/checkpoints").get_json()}
+    assert status == {first["id"]: "READY", second["id"]: "STALE"}
+
+    body = client.get("/stock/as_of?date=2025-01-06").get_json()
+    assert body["checkpoint_id"] == first["id"]
+    assert body["balances"][0]["qty"] == 85.0
+
+    rebuilt = client.post("/stock/checkpoints", json={"as_of": "2025-01-06"}).get_json()
+    assert rebuilt["id"] == second["id"] and rebuilt["status"] == "READY"
+    body = client.get("/stock/as_of?date=2025-01-06").get_json()
+    assert body["checkpoint_id"] == second["id"]
+    assert body["balances"][0]["qty"] == 85.0
+
+
+def test_availability_rollup_and_rebuild(client):
+    """La disponibilidad por almacén, ubicación y lote sale del rollup y se puede reconstruir."""
+    from app import stock_availability
+    from app.models import Location, StockAvailability, Warehouse
+
+    ids = client.application.config["IDS"]
+    with client.application.app_context():
+        wh2 = Warehouse(code="SHOP", name="Shop")
+        db.session.add(wh2)
+        db.session.flush()
+        shelf = Location(warehouse_id=wh2.id, code="S1", type="STORAGE")
+        db.session.add(shelf)
+        db.session.commit()
+        wh2_id, shelf_id = wh2.id, shelf.id
+        main_id = db.session.get(Location, ids["a1"]).warehouse_id
+
+    wool = ids["wool"]
+    res = client.post("/stock/moves", json=[
+        {"item_id": wool, "to_location": ids["a1"], "qty": 100, "lot_code": "L1"},
+        {"item_id": wool, "to_location": ids["cut"], "qty": 40, "lot_code": "L2"},
+        {"item_id": wool, "to_location": shelf_id, "qty": 25, "lot_code": "L1"},
+        {"item_id": wool, "from_location": ids["a1"], "to_location": shelf_id, "qty": 10, "lot_code": "L1"},
+    ])
+    assert res.status_code == 201
+
+    def groups(group_by):
+        res = client.get(f"/stock/availability?item_ids={wool},{ids['silk']}&group_by={group_by}")
+        assert res.status_code == 200
+        data = res.get_json()
+        assert [i["item_id"] for i in data["items"]] == [wool, ids["silk"]]
+        assert Decimal(str(data["items"][0]["on_hand"])) == 165
+        assert data["items"][1] == {"item_id": ids["silk"], "on_hand": 0, "groups": []}
+        return {tuple(g.values())[0]: Decimal(str(g["qty"])) for g in data["items"][0]["groups"]}
+
+    assert groups("warehouse") == {main_id: 130, wh2_id: 35}
+    assert groups("lot") == {"L1": 125, "L2": 40}
+    assert groups("location") == {ids["a1"]: 90, ids["cut"]: 40, shelf_id: 35}
+
+    # La reconstrucción por bloques deja el mismo resultado
+    with client.application.app_context():
+        db.session.execute(db.delete(StockAvailability))
+        db.session.commit()
+        assert stock_availability.rebuild(chunk_items=1) == 3
+    assert groups("warehouse") == {main_id: 130, wh2_id: 35}
+
+    assert client.get("/stock/availability").status_code == 400
+    assert client.get(f"/stock/availability?item_ids={wool}&group_by=bin").status_code == 400
+    assert client.get("/stock/availability?item_ids=1,a").status_code == 400
+
+
+def _valuation(client, query=""):
+    res = client.get(f"/stock/valuation?{query}")
+    assert res.status_code == 200, res.get_data(as_text=True)
+    return res.get_json()
+
+
+def test_fifo_costing_with_backdated_receipt_and_replay(client):
+    """FIFO por lote; un recibo con fecha anterior recalcula solo desde ese punto y coincide con el replay."""
+    from app import costing
+    from app.models import ItemCost, StockMoveCost
+
+    ids = client.application.config["IDS"]
+    wool, a1 = ids["wool"], ids["a1"]
+
+    def post(moves):
+        res = client.post("/stock/moves", json=[dict(m, item_id=wool) for m in moves])
+        assert res.status_code == 201, res.get_data(as_text=True)
+
+    post([
+        {"to_location": a1, "qty": 10, "unit_cost": 2, "moved_at": "2026-01-02T09:00:00"},
+        {"to_location": a1, "qty": 10, "unit_cost": 3, "moved_at": "2026-01-03T09:00:00"},
+    ])
+    post([{"from_location": a1, "qty": 15, "moved_at": "2026-01-04T09:00:00"}])
+    # Un traspaso no cambia el valor
+    post([{"from_location": a1, "to_location": ids["cut"], "qty": 1, "moved_at": "2026-01-04T10:00:00"}])
+
+    item = _valuation(client, f"item_ids={wool}&since=2026-01-01&include=layers")["items"][0]
+    assert Decimal(str(item["qty"])) == 5 and Decimal(str(item["value"])) == 15
+    assert Decimal(str(item["cogs"])) == 35
+    assert [(Decimal(str(l["qty"])), Decimal(str(l["unit_cost"]))) for l in item["layers"]] == [(5, 3)]
+
+    # Recepción con fecha anterior: la salida pasa a consumir 5 @ 1 + 10 @ 2
+    post([{"to_location": a1, "qty": 5, "unit_cost": 1, "moved_at": "2026-01-01T09:00:00"}])
+    item = _valuation(client, f"item_ids={wool}&since=2026-01-01")["items"][0]
+    assert Decimal(str(item["qty"])) == 10 and Decimal(str(item["value"])) == 30
+    assert Decimal(str(item["cogs"])) == 25
+
+    data = _valuation(client, "as_of=2026-01-03")
+    assert data["method"] == "fifo"
+    assert [(i["item_id"], Decimal(str(i["qty"])), Decimal(str(i["value"]))) for i in data["items"]] == [
+        (wool, 25, 55),
+    ]
+
+    # Otro lote se consume por separado; la salida sin stock usa el último coste del lote
+    post([
+        {"to_location": a1, "qty": 4, "unit_cost": 5, "lot_code": "B", "moved_at": "2026-01-05T09:00:00"},
+        {"from_location": a1, "qty": 6, "lot_code": "B", "moved_at": "2026-01-06T09:00:00"},
+    ])
+    item = _valuation(client, f"item_ids={wool}")["items"][0]
+    assert Decimal(str(item["qty"])) == 8 and Decimal(str(item["value"])) == 20
+
+    def snapshot():
+        with client.application.app_context():
+            costs = db.session.execute(
+                db.select(StockMoveCost.move_id, StockMoveCost.value, StockMoveCost.value_after)
+                .order_by(StockMoveCost.move_id)
+            ).all()
+            state = db.session.get(ItemCost, wool)
+            return costs, (state.qty, state.value, state.lots)
+
+    incremental = snapshot()
+    with client.application.app_context():
+        assert costing.replay("fifo", chunk_moves=2) == {"moves": 6, "items": 1}
+    assert snapshot() == incremental
+
+
+def test_fifo_closed_lots_leave_state_and_resume(client):
+    """Un lote consumido del todo sale del estado y, si vuelve a moverse, sigue en su posición."""
+    from app import costing
+    from app.models import ItemCost, StockMoveCost
+
+    ids = client.application.config["IDS"]
+    silk, a1 = ids["silk"], ids["a1"]
+
+    def post(moves):
+        res = client.post("/stock/moves", json=[dict(m, item_id=silk, lot_code="C") for m in moves])
+        assert res.status_code == 201, res.get_data(as_text=True)
+
+    def state():
+        with client.application.app_context():
+            row = db.session.get(ItemCost, silk)
+            costs = db.session.execute(
+                db.select(StockMoveCost.move_id, StockMoveCost.value, StockMoveCost.in_after,
+                          StockMoveCost.out_after).order_by(StockMoveCost.move_id)
+            ).all()
+            return row.lots, costs
+
+    post([{"to_location": a1, "qty": 4, "unit_cost": 5, "moved_at": "2026-02-01T09:00:00"}])
+    post([{"from_location": a1, "qty": 4, "moved_at": "2026-02-02T09:00:00"}])
+    assert state()[0] == {}
+
+    # Vuelve a entrar: posiciones a partir de 4 y la salida sin stock usa el último coste del lote
+    post([{"to_location": a1, "qty": 2, "unit_cost": 7, "moved_at": "2026-02-03T09:00:00"}])
+    post([{"from_location": a1, "qty": 3, "moved_at": "2026-02-04T09:00:00"}])
+    lots, costs = state()
+    assert lots["C"]["received"] == "6.0000" and lots["C"]["issued"] == "7.0000"
+    assert Decimal(costs[-1].value) == -21
+
+    incremental = state()
+    with client.application.app_context():
+        costing.replay("fifo")
+    assert state() == incremental
+
+
+def test_moving_average_costing(client):
+    """Con coste medio, las salidas se valoran al promedio vigente."""
+    client.application.config["STOCK_COSTING_METHOD"] = "average"
+    ids = client.application.config["IDS"]
+    silk, a1 = ids["silk"], ids["a1"]
+    res = client.post("/stock/moves", json=[
+        {"item_id": silk, "to_location": a1, "qty": 10, "unit_cost": 2, "lot_code": "A"},
+        {"item_id": silk, "to_location": a1, "qty": 10, "unit_cost": 4, "lot_code": "B"},
+        {"item_id": silk, "from_location": a1, "qty": 5, "lot_code": "A"},
+        {"item_id": silk, "to_location": a1, "qty": 5},
+    ])
+    assert res.status_code == 201
+    data = _valuation(client)
+    assert data["method"] == "average"
+    item = data["items"][0]
+    # 20 @ 3 - 5 @ 3 + 5 sin coste al promedio (3)
+    assert Decimal(str(item["qty"])) == 20 and Decimal(str(item["value"])) == 60
+    assert Decimal(str(item["unit_cost"])) == 3
+
+    assert client.get("/stock/valuation?item_ids=x").status_code == 400
+    assert client.get("/stock/valuation?as_of=2026-01-01&include=layers").status_code == 400
+
+
+def test_lot_and_shade_allocation(client):
+    """Las piezas que casan color salen de un solo lote por prenda y de un mismo tono."""
+    from app.models import Bom, BomLine, Item, Location, PoLine, PurchaseOrder, Supplier
+
+    ids = client.application.config["IDS"]
+    wool, silk = ids["wool"], ids["silk"]
+    with client.application.app_context():
+        wool_item = db.session.get(Item, wool)
+        lining = Item(sku="LINING", name="Lining", category_id=wool_item.category_id,
+                      base_uom_id=wool_item.base_uom_id)
+        jacket = Item(sku="JACKET", name="Jacket", category_id=wool_item.category_id,
+                      base_uom_id=wool_item.base_uom_id)
+        a1 = db.session.get(Location, ids["a1"])
+        a2 = Location(warehouse_id=a1.warehouse_id, code="A2", type="STORAGE")
+        supplier = Supplier(name="Mill", lead_time_days=10, currency="EUR")
+        db.session.add_all([lining, jacket, a2, supplier])
+        db.session.flush()
+        bom = Bom(product_item_id=jacket.id, version=1)
+        po = PurchaseOrder(supplier_id=supplier.id, po_number="PO1", status="OPEN", total=0)
+        db.session.add_all([bom, po])
+        db.session.flush()
+        db.session.add_all([
+            BomLine(bom_id=bom.id, component_item_id=wool, qty_per=2, color_match_rule="MATCH_SHELL"),
+            BomLine(bom_id=bom.id, component_item_id=silk, qty_per=1, color_match_rule="MATCH_SHELL"),
+            BomLine(bom_id=bom.id, component_item_id=lining.id, qty_per=1),
+        ])
+        db.session.add_all(
+            PoLine(po_id=po.id, item_id=item, qty=1, price=1, lot_request=lot, shade_request=shade)
+            for item, lot, shade in [(wool, "W1", "navy"), (wool, "W2", "navy"), (wool, "W3", "grey"),
+                                     (silk, "S1", "navy"), (silk, "S2", "grey")]
+        )
+        db.session.commit()
+        bom_id, lining_id, a2_id = bom.id, lining.id, a2.id
+
+    a1 = ids["a1"]
+    res = client.post("/stock/moves", json=[
+        {"item_id": wool, "to_location": a1, "qty": 10, "lot_code": "W1"},
+        {"item_id": wool, "to_location": a1, "qty": 30, "lot_code": "W2"},
+        {"item_id": wool, "to_location": a1, "qty": 100, "lot_code": "W3"},
+        {"item_id": wool, "to_location": ids["cut"], "qty": 500, "lot_code": "W4"},
+        {"item_id": silk, "to_location": a1, "qty": 5, "lot_code": "S1"},
+        {"item_id": silk, "to_location": a2_id, "qty": 10, "lot_code": "S1"},
+        {"item_id": silk, "to_location": a1, "qty": 40, "lot_code": "S2"},
+        {"item_id": silk, "to_location": a1, "qty": 100},
+        {"item_id": lining_id, "to_location": a1, "qty": 8},
+        {"item_id": lining_id, "to_location": a2_id, "qty": 5},
+    ])
+    assert res.status_code == 201
+
+    def plan(**body):
+        res = client.post("/stock/allocations", json={"bom_id": bom_id, **body})
+        assert res.status_code == 200, res.get_data(as_text=True)
+        data = res.get_json()
+        picks = {
+            c["item_id"]: [(p["lot_code"], p["location_id"], Decimal(str(p["qty"]))) for p in c["picks"]]
+            for c in data["components"]
+        }
+        return data, picks
+
+    # El gris cubre las 10 prendas con un lote por tejido y una sola ubicación
+    data, picks = plan(qty=10)
+    assert data["complete"] and data["groups"][0]["shade"] == "grey"
+    assert picks[wool] == [("W3", a1, 20)]
+    assert picks[silk] == [("S2", a1, 10)]
+    assert picks[lining_id] == [("", a1, 8), ("", a2_id, 2)]
+    assert (data["lots"], data["locations"]) == (3, 2)
+
+    # En marino sólo hay seda para 15 prendas: la lana se limita a esas mismas prendas
+    data, picks = plan(qty=20, shade="navy")
+    assert not data["complete"]
+    assert data["groups"] == [{"color_match_rule": "MATCH_SHELL", "shade": "navy", "garments": 15,
+                               "item_ids": [wool, silk]}]
+    assert picks[wool] == [("W2", a1, 30)]
+    assert picks[silk] == [("S1", a2_id, 10), ("S1", a1, 5)]
+    shorts = {c["item_id"]: Decimal(str(c["short"])) for c in data["components"]}
+    assert shorts == {wool: 10, silk: 5, lining_id: 7}
+
+    assert client.post("/stock/allocations", json={"bom_id": bom_id, "qty": 1.5}).status_code == 400
+    assert client.post("/stock/allocations", json={"bom_id": 999, "qty": 1}).status_code == 404
+
+
+def test_aware_timestamps_are_stored_as_naive_utc(client):
+    """Las fechas con zona horaria se guardan como UTC sin zona y se comparan con las demás."""
+    from datetime import datetime
+    from app.models import StockMove
+
+    ids = client.application.config["IDS"]
+    for moved_at in ("2026-01-01T10:00:00Z", "2026-01-01T12:30:00+02:00", "2026-01-01T11:00:00"):
+        res = client.post("/stock/moves", json={"item_id": ids["wool"], "to_location": ids["a1"], "qty": 1,
+                                                "unit_cost": 2, "moved_at": moved_at})
+        assert res.status_code == 201, res.get_data(as_text=True)
+    with client.application.app_context():
+        dates = db.session.execute(db.select(StockMove.moved_at).order_by(StockMove.id)).scalars().all()
+    assert dates == [datetime(2026, 1, 1, 10), datetime(2026, 1, 1, 10, 30), datetime(2026, 1, 1, 11)]
+
+    res = client.get("/stock/as_of?date=2026-01-01T10:45:00%2B00:00")
+    assert res.status_code == 200
+    assert sum(Decimal(str(b["qty"])) for b in res.get_json()["balances"]) == 2
+    assert client.get("/stock/valuation?since=2026-01-01T00:00:00Z").status_code == 200